@@ -1,16 +1,20 @@
 """Accounting and financial reporting routes"""
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, func
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 from shared.database import get_db
-from shared.models import LedgerEntry, Order, OrderItem, User, RoleEnum, ChartOfAccounts
+from shared.pagination import NEXT_CURSOR_HEADER, keyset_paginate
+from shared.models import LedgerEntry, Order, OrderItem, Product, User, RoleEnum, ChartOfAccounts
 from shared.security import verify_token
 from shared.exceptions import UnauthorizedException, NotFoundException, ValidationException
+from app.accounting.balances import AccountBalanceService
+from app.accounting.exports import AccountingExportService
 
 router = APIRouter(prefix="/api/v1/accounting", tags=["accounting"])
 
@@ -110,16 +114,19 @@ def check_owner_access(token: str, db: Session, shop_id: int):
 def get_ledger(
     shop_id: int,
     token: str,
+    response: Response,
     db: Session = Depends(get_db),
     account: Optional[str] = Query(None),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    limit: int = Query(100, le=1000)
+    limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None)
 ):
     """
-    Get ledger entries for a date range.
+    Get ledger entries for a date range, newest first.
 
-    Optionally filter by account code.
+    Optionally filter by account code. Pass the X-Next-Cursor header of the
+    previous page as `cursor` to get the next one.
     """
     user, token_data = check_owner_access(token, db, shop_id)
 
@@ -137,7 +144,11 @@ def get_ledger(
     if end_date:
         query = query.filter(LedgerEntry.entry_date <= end_date)
 
-    entries = query.order_by(LedgerEntry.entry_date.desc()).limit(limit).all()
+    entries, next_cursor, _ = keyset_paginate(
+        query, (LedgerEntry.entry_date, LedgerEntry.id), limit,
+        cursor=cursor, descending=True)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     return [
         {
@@ -177,22 +188,29 @@ def get_profit_loss(
     period_start = datetime.utcnow() - timedelta(days=period_days)
     period_end = datetime.utcnow()
 
-    # Get all orders in period (sales)
-    orders = db.query(Order).filter(
+    # Sales: one aggregate over the period's orders
+    in_period = and_(
         Order.shop_id == shop_id,
         Order.order_date >= period_start,
         Order.order_date <= period_end
-    ).all()
-
-    total_revenue = sum(order.total_amount for order in orders)
-
-    # TODO: Calculate COGS from purchase orders
-    # For now, estimate based on product cost
-    total_cogs = Decimal(0)
-    for order in orders:
-        for item in order.items:
-            cost = item.quantity * Decimal(item.product_id)  # Placeholder
-            total_cogs += cost
+    )
+    total_revenue, order_count = db.query(
+        func.coalesce(func.sum(Order.total_amount), 0),
+        func.count(Order.id)
+    ).filter(in_period).one()
+    total_revenue = Decimal(str(total_revenue))
+
+    # COGS: cost captured on each line at sale (the product's cost price for
+    # lines from before cost capture), one aggregate over the order lines
+    total_cogs = Decimal(str(db.query(
+        func.coalesce(func.sum(
+            OrderItem.quantity * func.coalesce(OrderItem.unit_cost, Product.cost_price)
+        ), 0)
+    ).join(
+        Order, Order.id == OrderItem.order_id
+    ).join(
+        Product, Product.id == OrderItem.product_id
+    ).filter(in_period).scalar()))
 
     gross_profit = total_revenue - total_cogs
 
@@ -219,7 +237,7 @@ def get_profit_loss(
         "total_expenses": expenses,
         "net_profit": net_profit,
         "profit_margin_percent": profit_margin,
-        "order_count": len(orders)
+        "order_count": order_count
     }
 
 
@@ -227,15 +245,18 @@ def get_profit_loss(
 def get_sales_ledger(
     shop_id: int,
     token: str,
+    response: Response,
     db: Session = Depends(get_db),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    limit: int = Query(100, le=1000)
+    limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None)
 ):
     """
-    Get sales ledger (all customer sales).
+    Get sales ledger (all customer sales), newest first.
 
-    Shows: Order number, date, customer, amount, tax
+    Shows: Order number, date, customer, amount, tax. Pass the X-Next-Cursor
+    header of the previous page as `cursor` to get the next one.
     """
     user, token_data = check_owner_access(token, db, shop_id)
 
@@ -247,7 +268,11 @@ def get_sales_ledger(
     if end_date:
         query = query.filter(Order.order_date <= end_date)
 
-    orders = query.order_by(Order.order_date.desc()).limit(limit).all()
+    orders, next_cursor, _ = keyset_paginate(
+        query, (Order.order_date, Order.id), limit,
+        cursor=cursor, descending=True)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     return [
         {
@@ -263,6 +288,37 @@ def get_sales_ledger(
     ]
 
 
+@router.get("/sales-ledger/export")
+def export_sales_ledger(
+    shop_id: int,
+    token: str,
+    start_date: date,
+    end_date: date,
+    format: str = Query("csv", pattern="^(csv|pdf)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Export the sales ledger for a date range as CSV or PDF.
+
+    Unlike /sales-ledger there is no row limit: orders are streamed as they
+    are read (see app.accounting.exports).
+    """
+    user, token_data = check_owner_access(token, db, shop_id)
+
+    try:
+        chunks = AccountingExportService.stream(
+            db, "sales-ledger", format, shop_id, start_date, end_date)
+    except ValueError as e:
+        raise ValidationException(str(e))
+
+    filename = f"sales-ledger-{shop_id}-{start_date}-{end_date}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type="text/csv" if format == "csv" else "application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/account-balance/{account_code}")
 def get_account_balance(
     shop_id: int,
@@ -274,26 +330,16 @@ def get_account_balance(
     """
     Get balance of specific account as of a date.
 
-    Balance = SUM(debit) - SUM(credit)
+    Balance = SUM(debit) - SUM(credit), read from the account's balance
+    snapshot plus the entries of the as-of day
     """
     user, token_data = check_owner_access(token, db, shop_id)
 
     if not as_of_date:
         as_of_date = datetime.utcnow()
 
-    # Sum debits for this account
-    debits = db.query(func.sum(LedgerEntry.debit_amount)).filter(
-        LedgerEntry.shop_id == shop_id,
-        LedgerEntry.debit_account == account_code,
-        LedgerEntry.entry_date <= as_of_date
-    ).scalar() or Decimal(0)
-
-    # Sum credits for this account
-    credits = db.query(func.sum(LedgerEntry.credit_amount)).filter(
-        LedgerEntry.shop_id == shop_id,
-        LedgerEntry.credit_account == account_code,
-        LedgerEntry.entry_date <= as_of_date
-    ).scalar() or Decimal(0)
+    debits, credits = AccountBalanceService.ledger_totals(
+        db, shop_id, account_code, as_of_date)
 
     balance = debits - credits
 
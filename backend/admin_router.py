@@ -3,10 +3,10 @@ from fastapi import APIRouter, Depends
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
-from sqlalchemy.orm import Session
-from shared.database import get_db
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from shared.database import get_async_db
 from shared.models import Product, Order, Shop, User
-from sqlalchemy import desc
 import os
 
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
@@ -19,20 +19,20 @@ router = APIRouter(
 
 
 @router.get("/", response_class=HTMLResponse)
-async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
+async def admin_dashboard(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Admin Home Dashboard"""
     try:
         # Get summary data
-        total_products = db.query(Product).count()
-        total_orders = db.query(Order).count()
-        total_shops = db.query(Shop).count()
+        total_products = await db.scalar(select(func.count(Product.id)))
+        total_orders = await db.scalar(select(func.count(Order.id)))
+        total_shops = await db.scalar(select(func.count(Shop.id)))
 
         # Get today's sales
         from datetime import date, datetime
         today = date.today()
-        today_orders = db.query(Order).filter(
+        today_orders = (await db.scalars(select(Order).where(
             Order.created_at >= datetime.combine(today, datetime.min.time())
-        ).all()
+        ))).all()
         today_sales = 0
         for o in today_orders:
             if o.total_amount:
@@ -40,7 +40,7 @@ async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
 
         # Get low stock items
         low_stock = []
-        all_products = db.query(Product).all()
+        all_products = (await db.scalars(select(Product))).all()
         for p in all_products:
             if p.current_stock < 10:
                 low_stock.append(p)
@@ -66,11 +66,12 @@ async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/orders", response_class=HTMLResponse)
-async def admin_orders(request: Request, db: Session = Depends(get_db)):
+async def admin_orders(request: Request, db: AsyncSession = Depends(get_async_db)):
     """List all orders with details"""
     try:
-        orders = db.query(Order).order_by(
-            desc(Order.created_at)).limit(100).all()
+        orders = (await db.scalars(
+            select(Order).order_by(desc(Order.created_at)).limit(100)
+        )).all()
 
         total_value = 0
         for o in orders:
@@ -101,10 +102,10 @@ async def admin_orders(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/products", response_class=HTMLResponse)
-async def admin_products(request: Request, db: Session = Depends(get_db)):
+async def admin_products(request: Request, db: AsyncSession = Depends(get_async_db)):
     """List all products"""
     try:
-        products = db.query(Product).limit(100).all()
+        products = (await db.scalars(select(Product).limit(100))).all()
 
         # Calculate statistics
         inventory_value = 0
@@ -137,10 +138,10 @@ async def admin_products(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/inventory", response_class=HTMLResponse)
-async def admin_inventory(request: Request, db: Session = Depends(get_db)):
+async def admin_inventory(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Show inventory and stock levels"""
     try:
-        products = db.query(Product).all()
+        products = (await db.scalars(select(Product))).all()
         low_stock = []
         out_of_stock = []
         adequate_stock = []
@@ -183,11 +184,11 @@ async def admin_inventory(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/accounting", response_class=HTMLResponse)
-async def admin_accounting(request: Request, db: Session = Depends(get_db)):
+async def admin_accounting(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Show accounting summary"""
     try:
         # Get all orders
-        all_orders = db.query(Order).all() or []
+        all_orders = (await db.scalars(select(Order))).all() or []
 
         # Calculate sales totals
         daily_sales = 0
@@ -234,11 +235,11 @@ async def admin_accounting(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/ai", response_class=HTMLResponse)
-async def admin_ai(request: Request, db: Session = Depends(get_db)):
+async def admin_ai(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Show AI insights and recommendations"""
     try:
         # Get products with low stock for reorder suggestions
-        all_products = db.query(Product).all() or []
+        all_products = (await db.scalars(select(Product))).all() or []
         low_stock = []
         best_sellers = []
         underperformers = []
@@ -267,7 +268,7 @@ async def admin_ai(request: Request, db: Session = Depends(get_db)):
 
         # Get customer count
         try:
-            total_customers = db.query(User).count() or 0
+            total_customers = await db.scalar(select(func.count(User.id))) or 0
         except:
             pass
 
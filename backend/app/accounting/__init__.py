@@ -1,5 +1,9 @@
 """Accounting module - Financial tracking and reporting"""
 from app.accounting.router import router
 from app.accounting.service import AccountingService
+from app.accounting.balances import AccountBalanceService
+from app.accounting.exports import AccountingExportService
+from app.accounting.gst import GSTReturnService
 
-__all__ = ["router", "AccountingService"]
+__all__ = ["router", "AccountingService", "AccountBalanceService",
+           "AccountingExportService", "GSTReturnService"]
@@ -0,0 +1,381 @@
+"""Account balance snapshots - balance lookups read one row, not the whole history"""
+import zlib
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, event, func, or_, select, text, update
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from shared.database import upsert_for
+from shared.models import AccountBalance, CashBook, LedgerEntry
+from app.orders.daily_sales import as_date
+
+# Books of account_balances rows
+LEDGER_BOOK = "ledger"
+CASH_BOOK = "cash"
+CASH_ACCOUNT = ""  # the cash book is a single account: IN debits, OUT credits
+
+Totals = Tuple[Decimal, Decimal]  # (debit_total, credit_total)
+BookAccount = Tuple[str, str]  # (book, account)
+
+ZERO = Decimal("0")
+
+
+def account_lock_key(book: str, account: str) -> int:
+    """Stable signed 32-bit key of an account for pg_advisory_xact_lock"""
+    key = zlib.crc32(f"{book}:{account}".encode())
+    return key - (1 << 32) if key >= 1 << 31 else key
+
+
+class AccountBalanceService:
+    """Running per-account totals of the ledger and the cash book
+
+    Every LedgerEntry / CashBook row inserted or deleted through the ORM is
+    applied to account_balances by mapper events, on the flush's own
+    connection: snapshots commit (or roll back) with the entries, whatever
+    code wrote them. Entries are not edited in place (corrections post a
+    reversal). Core bulk inserts bypass the events and post their rows with
+    `post_inserted`. Bulk query deletes bypass them too; `rebuild` repairs
+    those, and backfills existing data (scripts/backfill_account_balances.py).
+    """
+
+    @staticmethod
+    def post(
+        connection,
+        shop_id: int,
+        book: str,
+        account: str,
+        day: date,
+        debit: Decimal,
+        credit: Decimal,
+    ) -> None:
+        """Add a posting to an account's rows from `day` on (two statements)
+
+        The day's row is created first if missing, carrying the totals of
+        the account's previous row; then it and every later row (a
+        back-dated posting) get the amounts added.
+
+        On PostgreSQL postings to the same account are serialized with a
+        transaction-scoped advisory lock: otherwise the UPDATE misses a later
+        day's row that a concurrent transaction has inserted but not yet
+        committed, and that row (and every one after it) loses the amount.
+        SQLite already allows a single writer.
+        """
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:shop_id, :account_key)"),
+                {"shop_id": shop_id, "account_key": account_lock_key(book, account)})
+
+        table = AccountBalance.__table__
+        account_rows = and_(
+            table.c.shop_id == shop_id,
+            table.c.book == book,
+            table.c.account == account,
+        )
+
+        def carried(column):
+            return func.coalesce(
+                select(column).where(
+                    account_rows, table.c.balance_date < day
+                ).order_by(table.c.balance_date.desc()).limit(1).scalar_subquery(),
+                0)
+
+        now = datetime.utcnow()
+        insert = upsert_for(connection.dialect.name)(table).values(
+            shop_id=shop_id, book=book, account=account, balance_date=day,
+            debit_total=carried(table.c.debit_total),
+            credit_total=carried(table.c.credit_total),
+            is_period_close=False, updated_at=now,
+        ).on_conflict_do_nothing(index_elements=[
+            table.c.shop_id, table.c.book, table.c.account, table.c.balance_date])
+        connection.execute(insert)
+        connection.execute(update(table).where(
+            account_rows, table.c.balance_date >= day
+        ).values(
+            debit_total=table.c.debit_total + debit,
+            credit_total=table.c.credit_total + credit,
+            updated_at=now,
+        ))
+
+    @staticmethod
+    def post_inserted(
+        connection,
+        ledger_rows: Iterable[dict] = (),
+        cash_rows: Iterable[dict] = (),
+    ) -> None:
+        """Post rows written with Core bulk inserts (does not commit)
+
+        Rows are the inserted LedgerEntry / CashBook values. They are summed
+        per account and day first, so a batch of any size costs two
+        statements per account and day.
+        """
+        postings: Dict[Tuple[int, str, str, date], List[Decimal]] = {}
+
+        def add(shop_id, book, account, day, debit, credit):
+            totals = postings.setdefault((shop_id, book, account, day), [ZERO, ZERO])
+            totals[0] += debit
+            totals[1] += credit
+
+        for row in ledger_rows:
+            day = row["entry_date"].date()
+            add(row["shop_id"], LEDGER_BOOK, row["debit_account"], day,
+                Decimal(str(row["debit_amount"])), ZERO)
+            add(row["shop_id"], LEDGER_BOOK, row["credit_account"], day,
+                ZERO, Decimal(str(row["credit_amount"])))
+        for row in cash_rows:
+            if row["entry_type"] not in ("IN", "OUT"):
+                continue
+            amount = Decimal(str(row["amount"]))
+            debit, credit = (amount, ZERO) if row["entry_type"] == "IN" else (ZERO, amount)
+            add(row["shop_id"], CASH_BOOK, CASH_ACCOUNT,
+                (row.get("created_at") or datetime.utcnow()).date(), debit, credit)
+
+        for (shop_id, book, account, day), (debit, credit) in sorted(postings.items()):
+            AccountBalanceService.post(
+                connection, shop_id, book, account, day, debit, credit)
+
+    @staticmethod
+    def totals_as_of(
+        db: Session,
+        shop_id: int,
+        book: str,
+        account: str,
+        day: date,
+    ) -> Totals:
+        """Debits and credits of an account up to the end of `day` (one index seek)"""
+        row = db.query(
+            AccountBalance.debit_total,
+            AccountBalance.credit_total
+        ).filter(
+            AccountBalance.shop_id == shop_id,
+            AccountBalance.book == book,
+            AccountBalance.account == account,
+            AccountBalance.balance_date <= day
+        ).order_by(AccountBalance.balance_date.desc()).first()
+        if row is None:
+            return ZERO, ZERO
+        return Decimal(str(row[0])), Decimal(str(row[1]))
+
+    @staticmethod
+    def ledger_totals(
+        db: Session,
+        shop_id: int,
+        account: str,
+        as_of: datetime,
+    ) -> Totals:
+        """Debits and credits posted to a ledger account up to `as_of`
+
+        The snapshot up to the previous day plus the entries of as_of's own
+        day: the cost does not grow with the ledger's history.
+        """
+        debits, credits = AccountBalanceService.totals_as_of(
+            db, shop_id, LEDGER_BOOK, account, as_of.date() - timedelta(days=1))
+        day_debits, day_credits = db.query(
+            func.sum(case(
+                (LedgerEntry.debit_account == account, LedgerEntry.debit_amount),
+                else_=0)),
+            func.sum(case(
+                (LedgerEntry.credit_account == account, LedgerEntry.credit_amount),
+                else_=0))
+        ).filter(
+            LedgerEntry.shop_id == shop_id,
+            LedgerEntry.entry_date >= datetime.combine(as_of.date(), datetime.min.time()),
+            LedgerEntry.entry_date <= as_of,
+            or_(LedgerEntry.debit_account == account,
+                LedgerEntry.credit_account == account)
+        ).one()
+        return (debits + Decimal(str(day_debits or 0)),
+                credits + Decimal(str(day_credits or 0)))
+
+    @staticmethod
+    def close_period(db: Session, shop_id: int, period_end: date) -> List[AccountBalance]:
+        """Checkpoint every account's totals at the end of a period (does not commit)
+
+        Writes a row at `period_end` for each account with postings on or
+        before it, flagged as a period close. The next period's opening
+        balances read these rows, and repairs start after the latest close
+        (`open_period_start`).
+
+        Returns: the closing rows
+        """
+        latest = AccountBalanceService._latest_totals(db, shop_id, period_end)
+        if latest:
+            table = AccountBalance.__table__
+            stmt = upsert_for(db.get_bind().dialect.name)(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.shop_id, table.c.book, table.c.account,
+                                table.c.balance_date],
+                set_={"is_period_close": True, "updated_at": stmt.excluded.updated_at}
+            )
+            now = datetime.utcnow()
+            db.execute(stmt, [
+                {"shop_id": shop_id, "book": book, "account": account,
+                 "balance_date": period_end, "debit_total": debit,
+                 "credit_total": credit, "is_period_close": True, "updated_at": now}
+                for (book, account), (debit, credit) in latest.items()
+            ])
+        return db.query(AccountBalance).filter(
+            AccountBalance.shop_id == shop_id,
+            AccountBalance.balance_date == period_end,
+            AccountBalance.is_period_close.is_(True)
+        ).order_by(AccountBalance.book, AccountBalance.account).all()
+
+    @staticmethod
+    def open_period_start(db: Session, shop_id: int) -> Optional[date]:
+        """Day after the shop's latest period close (None: never closed)"""
+        last_close = db.query(func.max(AccountBalance.balance_date)).filter(
+            AccountBalance.shop_id == shop_id,
+            AccountBalance.is_period_close.is_(True)
+        ).scalar()
+        return as_date(last_close) + timedelta(days=1) if last_close else None
+
+    @staticmethod
+    def rebuild(db: Session, shop_id: int, start: Optional[date] = None) -> int:
+        """Recompute a shop's snapshot rows from its entries (does not commit)
+
+        Rows from `start` on (all rows if None) are replaced; earlier rows
+        are kept and their totals carried in. Starting at
+        `open_period_start` only scans the entries after the latest period
+        close. Three GROUP BY queries over the entries in range.
+
+        Returns: number of rows written
+        """
+        in_range = [AccountBalance.shop_id == shop_id]
+        ledger_range = [LedgerEntry.shop_id == shop_id]
+        cash_range = [CashBook.shop_id == shop_id]
+        carried: Dict[BookAccount, Totals] = {}
+        if start is not None:
+            start_at = datetime.combine(start, datetime.min.time())
+            in_range.append(AccountBalance.balance_date >= start)
+            ledger_range.append(LedgerEntry.entry_date >= start_at)
+            cash_range.append(CashBook.created_at >= start_at)
+            carried = AccountBalanceService._latest_totals(
+                db, shop_id, start - timedelta(days=1))
+        closes = [as_date(day) for day, in db.query(
+            AccountBalance.balance_date.distinct()
+        ).filter(*in_range, AccountBalance.is_period_close.is_(True))]
+        db.query(AccountBalance).filter(
+            *in_range).delete(synchronize_session=False)
+
+        movements: Dict[BookAccount, Dict[date, List[Decimal]]] = {}
+
+        def add(book, account, day, debit, credit):
+            day_totals = movements.setdefault((book, account), {}).setdefault(
+                as_date(day), [ZERO, ZERO])
+            day_totals[0] += Decimal(str(debit or 0))
+            day_totals[1] += Decimal(str(credit or 0))
+
+        ledger_day = func.date(LedgerEntry.entry_date)
+        for account, day, amount in db.query(
+            LedgerEntry.debit_account, ledger_day, func.sum(LedgerEntry.debit_amount)
+        ).filter(*ledger_range).group_by(LedgerEntry.debit_account, ledger_day):
+            add(LEDGER_BOOK, account, day, amount, 0)
+        for account, day, amount in db.query(
+            LedgerEntry.credit_account, ledger_day, func.sum(LedgerEntry.credit_amount)
+        ).filter(*ledger_range).group_by(LedgerEntry.credit_account, ledger_day):
+            add(LEDGER_BOOK, account, day, 0, amount)
+
+        cash_day = func.date(CashBook.created_at)
+        for entry_type, day, amount in db.query(
+            CashBook.entry_type, cash_day, func.sum(CashBook.amount)
+        ).filter(*cash_range).group_by(CashBook.entry_type, cash_day):
+            if entry_type == "IN":
+                add(CASH_BOOK, CASH_ACCOUNT, day, amount, 0)
+            elif entry_type == "OUT":
+                add(CASH_BOOK, CASH_ACCOUNT, day, 0, amount)
+
+        rows = []
+        now = datetime.utcnow()
+        for (book, account), days in movements.items():
+            debit, credit = carried.get((book, account), (ZERO, ZERO))
+            for day in sorted(days):
+                debit += days[day][0]
+                credit += days[day][1]
+                rows.append({
+                    "shop_id": shop_id, "book": book, "account": account,
+                    "balance_date": day, "debit_total": debit,
+                    "credit_total": credit, "is_period_close": False,
+                    "updated_at": now,
+                })
+        if rows:
+            db.execute(AccountBalance.__table__.insert(), rows)
+
+        # Period closes inside the range are checkpointed again
+        for day in sorted(closes):
+            AccountBalanceService.close_period(db, shop_id, day)
+        return len(rows)
+
+    @staticmethod
+    def _latest_totals(db: Session, shop_id: int, day: date) -> Dict[BookAccount, Totals]:
+        """Totals of every account as of the end of `day` (one query)"""
+        latest = db.query(
+            AccountBalance.book,
+            AccountBalance.account,
+            func.max(AccountBalance.balance_date).label("balance_date")
+        ).filter(
+            AccountBalance.shop_id == shop_id,
+            AccountBalance.balance_date <= day
+        ).group_by(AccountBalance.book, AccountBalance.account).subquery()
+
+        rows = db.query(
+            AccountBalance.book,
+            AccountBalance.account,
+            AccountBalance.debit_total,
+            AccountBalance.credit_total
+        ).join(
+            latest, and_(
+                AccountBalance.book == latest.c.book,
+                AccountBalance.account == latest.c.account,
+                AccountBalance.balance_date == latest.c.balance_date
+            )
+        ).filter(AccountBalance.shop_id == shop_id)
+        return {
+            (book, account): (Decimal(str(debit)), Decimal(str(credit)))
+            for book, account, debit, credit in rows
+        }
+
+
+# ===== POSTING EVENTS =====
+
+def _post_ledger_entry(connection, entry: LedgerEntry, sign: int) -> None:
+    day = entry.entry_date.date()
+    postings = sorted([
+        (entry.debit_account, sign * Decimal(str(entry.debit_amount)), ZERO),
+        (entry.credit_account, ZERO, sign * Decimal(str(entry.credit_amount))),
+    ], key=lambda posting: posting[0])
+    # Lock the two accounts in a fixed order, as post_inserted does
+    for account, debit, credit in postings:
+        AccountBalanceService.post(
+            connection, entry.shop_id, LEDGER_BOOK, account, day, debit, credit)
+
+
+def _post_cash_entry(connection, entry: CashBook, sign: int) -> None:
+    if entry.entry_type not in ("IN", "OUT"):
+        return
+    amount = sign * Decimal(str(entry.amount))
+    debit, credit = (amount, ZERO) if entry.entry_type == "IN" else (ZERO, amount)
+    AccountBalanceService.post(
+        connection, entry.shop_id, CASH_BOOK, CASH_ACCOUNT,
+        (entry.created_at or datetime.utcnow()).date(), debit, credit)
+
+
+def _ledger_entry_inserted(mapper, connection, target: LedgerEntry):
+    _post_ledger_entry(connection, target, 1)
+
+
+def _ledger_entry_deleted(mapper, connection, target: LedgerEntry):
+    _post_ledger_entry(connection, target, -1)
+
+
+def _cash_entry_inserted(mapper, connection, target: CashBook):
+    _post_cash_entry(connection, target, 1)
+
+
+def _cash_entry_deleted(mapper, connection, target: CashBook):
+    _post_cash_entry(connection, target, -1)
+
+
+event.listen(LedgerEntry, "after_insert", _ledger_entry_inserted)
+event.listen(LedgerEntry, "after_delete", _ledger_entry_deleted)
+event.listen(CashBook, "after_insert", _cash_entry_inserted)
+event.listen(CashBook, "after_delete", _cash_entry_deleted)
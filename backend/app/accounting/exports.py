@@ -0,0 +1,401 @@
+"""Accounting exports - ledgers and reports streamed as CSV or PDF, any date range"""
+import csv
+import io
+import logging
+import os
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+import reportlab
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfbase.pdfmetrics import getFont, registerFont, stringWidth
+from reportlab.pdfbase.ttfonts import (
+    FF_NONSYMBOLIC, FF_SYMBOLIC, SUBSETN, TTFont, makeToUnicodeCMap
+)
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from shared.config import get_settings
+from shared.models import CashBook, LedgerEntry, Order, OrderStatusEnum
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "pdf")
+
+
+class ExportReport(NamedTuple):
+    """An exportable report: title, column headers and its row query"""
+    title: str
+    headers: List[str]
+    # (shop_id, start, end, customer_id) -> SELECT of the rows, in order
+    query: Callable[[int, datetime, datetime, Optional[int]], Select]
+    needs_customer: bool = False
+
+
+def _ledger(shop_id, start, end, customer_id) -> Select:
+    return select(
+        LedgerEntry.entry_date, LedgerEntry.entry_number, LedgerEntry.description,
+        LedgerEntry.debit_account, LedgerEntry.debit_amount,
+        LedgerEntry.credit_account, LedgerEntry.credit_amount,
+        LedgerEntry.reference_type, LedgerEntry.reference_id
+    ).where(
+        LedgerEntry.shop_id == shop_id,
+        LedgerEntry.entry_date >= start,
+        LedgerEntry.entry_date < end
+    ).order_by(LedgerEntry.entry_date, LedgerEntry.id)
+
+
+def _cash_book(shop_id, start, end, customer_id) -> Select:
+    return select(
+        CashBook.created_at, CashBook.entry_type, CashBook.amount,
+        CashBook.description, CashBook.reference_number, CashBook.order_id
+    ).where(
+        CashBook.shop_id == shop_id,
+        CashBook.created_at >= start,
+        CashBook.created_at < end
+    ).order_by(CashBook.created_at, CashBook.id)
+
+
+def _daily_sales(shop_id, start, end, customer_id) -> Select:
+    return select(
+        Order.delivery_date, Order.order_number, Order.customer_name,
+        Order.subtotal, Order.tax_amount, Order.total_amount,
+        case((Order.is_credit_sale == True, "Credit"), else_="Cash")
+    ).where(
+        Order.shop_id == shop_id,
+        Order.order_status == OrderStatusEnum.DELIVERED,
+        Order.delivery_date >= start,
+        Order.delivery_date < end
+    ).order_by(Order.delivery_date, Order.id)
+
+
+def _sales_ledger(shop_id, start, end, customer_id) -> Select:
+    return select(
+        Order.order_date, Order.order_number, Order.customer_id,
+        Order.subtotal, Order.tax_amount, Order.total_amount,
+        Order.order_status, Order.payment_status
+    ).where(
+        Order.shop_id == shop_id,
+        Order.order_date >= start,
+        Order.order_date < end
+    ).order_by(Order.order_date, Order.id)
+
+
+def _khata(shop_id, start, end, customer_id) -> Select:
+    return select(
+        Order.order_date, Order.order_number, Order.order_status,
+        Order.total_amount, Order.delivery_date
+    ).where(
+        Order.shop_id == shop_id,
+        Order.customer_id == customer_id,
+        Order.is_credit_sale == True,
+        Order.order_date >= start,
+        Order.order_date < end
+    ).order_by(Order.order_date, Order.id)
+
+
+EXPORT_REPORTS = {
+    "ledger": ExportReport(
+        "Ledger", ["Date", "Entry No", "Description", "Debit Account", "Debit",
+                   "Credit Account", "Credit", "Reference", "Reference ID"], _ledger),
+    "cash-book": ExportReport(
+        "Cash Book", ["Date", "Type", "Amount", "Description", "Reference",
+                      "Order ID"], _cash_book),
+    "daily-sales": ExportReport(
+        "Sales (delivered orders)", ["Delivered", "Order No", "Customer", "Subtotal",
+                                     "Tax", "Total", "Payment"], _daily_sales),
+    "sales-ledger": ExportReport(
+        "Sales Ledger", ["Date", "Order No", "Customer ID", "Subtotal", "Tax",
+                         "Total", "Status", "Payment Status"], _sales_ledger),
+    "khata": ExportReport(
+        "Khata (credit sales)", ["Date", "Order No", "Status", "Amount",
+                                 "Delivered"], _khata, needs_customer=True),
+}
+
+
+def format_cell(value) -> str:
+    """Text of one exported value"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, float):
+        value = Decimal(str(value))
+    return str(value)
+
+
+@lru_cache(maxsize=None)
+def export_font(path: str, fallback: str) -> str:
+    """Register a TrueType font with reportlab once; returns its name
+
+    reportlab's bundled (Latin-only) Vera font stands in when the file is
+    missing, so exports still work on a machine without the font package.
+    """
+    if not os.path.exists(path):
+        logger.warning(f"PDF export font {path} not found, using {fallback} (Latin only)")
+        path = os.path.join(os.path.dirname(reportlab.__file__), "fonts", fallback)
+    name = f"export:{os.path.basename(path)}"
+    registerFont(TTFont(name, path))
+    return name
+
+
+class AccountingExportService:
+    """Exports of accounting reports over arbitrary date ranges
+
+    Rows are read `batch_size` at a time (a server-side cursor on
+    PostgreSQL) as plain tuples and written out as they arrive, so memory
+    stays flat however long the range: CSV one chunk per batch, PDF one
+    page at a time.
+    """
+
+    @staticmethod
+    def stream(
+        db: Session,
+        report: str,
+        fmt: str,
+        shop_id: int,
+        from_date: date,
+        to_date: date,
+        customer_id: Optional[int] = None,
+        shop_name: str = "",
+        batch_size: int = 2000,
+    ) -> Iterator[bytes]:
+        """Stream a report's rows from `from_date` to `to_date` (inclusive)
+
+        Raises ValueError for an unknown report or format, a reversed range,
+        or a customer report without a customer.
+        """
+        spec = EXPORT_REPORTS.get(report)
+        if spec is None:
+            raise ValueError(f"Unknown report '{report}' "
+                             f"(use {', '.join(EXPORT_REPORTS)})")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}' (use csv or pdf)")
+        if to_date < from_date:
+            raise ValueError("to_date is before from_date")
+        if spec.needs_customer and customer_id is None:
+            raise ValueError(f"The {report} export needs a customer_id")
+
+        start = datetime.combine(from_date, datetime.min.time())
+        end = datetime.combine(to_date + timedelta(days=1), datetime.min.time())
+        statement = spec.query(shop_id, start, end, customer_id)
+
+        def partitions() -> Iterator[list]:
+            result = db.execute(statement.execution_options(yield_per=batch_size))
+            for partition in result.partitions():
+                yield [[format_cell(value) for value in row] for row in partition]
+
+        if fmt == "csv":
+            return AccountingExportService._csv(spec, partitions())
+        subtitle = f"{shop_name or f'Shop {shop_id}'}  |  {from_date} to {to_date}"
+        return PDFTableWriter(spec.title, subtitle, spec.headers).stream(partitions())
+
+    @staticmethod
+    def _csv(spec: ExportReport, partitions: Iterator[list]) -> Iterator[bytes]:
+        """Header, then one chunk per batch of rows"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(spec.headers)
+        for rows in partitions:
+            writer.writerows(rows)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+
+class PDFTableWriter:
+    """A table as a PDF written page by page
+
+    reportlab's canvas keeps every page until save() assembles the file,
+    so pages are emitted here as PDF objects as soon as they fill; only byte
+    offsets of written objects are kept (for the cross-reference table).
+    Text is set in a Unicode TrueType font (EXPORT_PDF_FONT) with
+    reportlab's TTFont, which assigns each character a code in 256-glyph
+    subsets and measures it; the embedded subset fonts and their ToUnicode
+    maps follow the last page. Scripts that need shaping (Devanagari
+    conjuncts) are set glyph by glyph.
+    """
+
+    PAGE_SIZE = landscape(A4)
+    MARGIN = 36
+    FONT_SIZE = 8
+    LINE_HEIGHT = 11
+
+    # Fixed object numbers; pages and fonts take 4, 5, ... as they are written
+    CATALOG, PAGES, RESOURCES = 1, 2, 3
+
+    def __init__(self, title: str, subtitle: str, headers: List[str]):
+        self.title = title
+        self.subtitle = subtitle
+        self.headers = headers
+        self.fonts = [export_font(settings.EXPORT_PDF_FONT, "Vera.ttf"),
+                      export_font(settings.EXPORT_PDF_BOLD_FONT, "VeraBd.ttf")]
+        self.font, self.bold_font = self.fonts
+        width, height = self.PAGE_SIZE
+        usable = width - 2 * self.MARGIN
+        self.column_width = usable / len(headers)
+        self.cell_limit = self.column_width - 4
+        # Title, subtitle and header lines above the rows
+        self.rows_per_page = int((height - 2 * self.MARGIN) / self.LINE_HEIGHT) - 4
+        self.offsets = {}
+        self.position = 0
+        self.next_object = self.RESOURCES + 1
+        self.page_objects = []
+
+    def stream(self, partitions: Iterator[list]) -> Iterator[bytes]:
+        """PDF bytes: header, each page as it fills, the fonts, then the trailer"""
+        try:
+            yield self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+            page = []
+            for rows in partitions:
+                for row in rows:
+                    page.append(row)
+                    if len(page) == self.rows_per_page:
+                        yield self._page(page)
+                        page = []
+            if page or not self.page_objects:
+                yield self._page(page)
+
+            fonts, chunk = self._font_objects()
+            yield chunk
+            yield self._object(self.RESOURCES, (
+                "<< /Font << " + " ".join(f"/{name} {number} 0 R" for name, number in fonts)
+                + " >> >>").encode("ascii"))
+            kids = " ".join(f"{number} 0 R" for number in self.page_objects)
+            yield self._object(self.PAGES, (
+                f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_objects)} >>"
+            ).encode("ascii"))
+            yield self._object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode("ascii"))
+            yield self._trailer()
+        finally:
+            # Subset assignments are kept per document on the shared font
+            for name in self.fonts:
+                getFont(name).state.pop(self, None)
+
+    def _page(self, rows: List[List[str]]) -> bytes:
+        """Content stream and page object of one page"""
+        content_obj, page_obj = self._allocate(), self._allocate()
+        self.page_objects.append(page_obj)
+        number = len(self.page_objects)
+
+        width, height = self.PAGE_SIZE
+        y = height - self.MARGIN
+        ops = [self._text(self.MARGIN, y, self.title, self.bold_font, self.FONT_SIZE + 4)]
+        y -= self.LINE_HEIGHT * 1.5
+        ops.append(self._text(self.MARGIN, y, f"{self.subtitle}  |  Page {number}",
+                              self.font, self.FONT_SIZE))
+        y -= self.LINE_HEIGHT * 1.5
+        for lines, font in (([self.headers], self.bold_font), (rows, self.font)):
+            for row in lines:
+                for column, value in enumerate(row):
+                    x = self.MARGIN + column * self.column_width
+                    ops.append(self._text(x, y, self._fit(value, font), font, self.FONT_SIZE))
+                y -= self.LINE_HEIGHT
+
+        chunk = self._stream(content_obj, "\n".join(ops).encode("ascii"))
+        chunk += self._object(page_obj, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R "
+            f"/MediaBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Resources {self.RESOURCES} 0 R /Contents {content_obj} 0 R >>"
+        ).encode("ascii"))
+        return chunk
+
+    def _fit(self, value: str, font: str) -> str:
+        """Cut a cell to its column width (reportlab's metrics of the font)"""
+        if stringWidth(value, font, self.FONT_SIZE) <= self.cell_limit:
+            return value
+        limit = self.cell_limit - stringWidth("...", font, self.FONT_SIZE)
+        # Longest prefix that fits with the ellipsis
+        low, high = 0, len(value)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if stringWidth(value[:middle], font, self.FONT_SIZE) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        return value[:low] + "..."
+
+    def _text(self, x: float, y: float, value: str, font: str, size: int) -> str:
+        """Text operators; each run of one font subset is shown as hex codes"""
+        index = self.fonts.index(font)
+        runs = [f"/F{index}S{subset} {size} Tf <{codes.hex()}> Tj"
+                for subset, codes in getFont(font).splitString(value, self)]
+        return f"BT {x:.2f} {y:.2f} Td {' '.join(runs)} ET"
+
+    def _font_objects(self) -> Tuple[List[Tuple[str, int]], bytes]:
+        """Embedded TrueType subsets used by the document
+
+        Returns: ([(resource name, font object number), ...], PDF bytes)
+        """
+        fonts, chunk = [], b""
+        for index, name in enumerate(self.fonts):
+            font = getFont(name)
+            state = font.state.get(self)
+            if state is None:
+                continue
+            face = font.face
+            for subset_number, subset in enumerate(state.subsets):
+                base_font = b"".join((SUBSETN(subset_number), b"+", face.name,
+                                      face.subfontNameX)).decode("latin-1")
+                font_file = face.makeSubset(subset)
+                file_obj, descriptor_obj = self._allocate(), self._allocate()
+                cmap_obj, font_obj = self._allocate(), self._allocate()
+                chunk += self._stream(file_obj, font_file, f"/Length1 {len(font_file)}")
+                chunk += self._object(descriptor_obj, (
+                    f"<< /Type /FontDescriptor /FontName /{base_font} "
+                    f"/Flags {(face.flags & ~FF_NONSYMBOLIC) | FF_SYMBOLIC} "
+                    f"/FontBBox [{' '.join(str(v) for v in face.bbox)}] "
+                    f"/ItalicAngle {face.italicAngle} /Ascent {face.ascent} "
+                    f"/Descent {face.descent} /CapHeight {face.capHeight} "
+                    f"/StemV {face.stemV} /FontFile2 {file_obj} 0 R >>"
+                ).encode("ascii"))
+                chunk += self._stream(
+                    cmap_obj, makeToUnicodeCMap(base_font, subset).encode("ascii"))
+                widths = " ".join(str(face.getCharWidth(code)) for code in subset)
+                chunk += self._object(font_obj, (
+                    f"<< /Type /Font /Subtype /TrueType /BaseFont /{base_font} "
+                    f"/FirstChar 0 /LastChar {len(subset) - 1} /Widths [{widths}] "
+                    f"/FontDescriptor {descriptor_obj} 0 R /ToUnicode {cmap_obj} 0 R >>"
+                ).encode("ascii"))
+                fonts.append((f"F{index}S{subset_number}", font_obj))
+        return fonts, chunk
+
+    def _allocate(self) -> int:
+        number = self.next_object
+        self.next_object += 1
+        return number
+
+    def _stream(self, number: int, data: bytes, extra: str = "") -> bytes:
+        content = zlib.compress(data)
+        return self._object(number, (
+            f"<< /Length {len(content)} /Filter /FlateDecode {extra}>>\nstream\n"
+        ).encode("ascii") + content + b"\nendstream")
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        self.offsets[number] = self.position
+        return self._write(f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+
+    def _write(self, data: bytes) -> bytes:
+        self.position += len(data)
+        return data
+
+    def _trailer(self) -> bytes:
+        size = max(self.offsets) + 1
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{self.offsets[number]:010d} 00000 n \n" for number in range(1, size))
+        xref.append(f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\n"
+                    f"startxref\n{self.position}\n%%EOF\n")
+        return "".join(xref).encode("ascii")
@@ -0,0 +1,276 @@
+"""GST return summaries - a month's GSTR-1/3B reads one row per rate and HSN"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, insert
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from shared.database import upsert_for
+from shared.models import (
+    GSTMonthlySummary, GSTRecord, GSTRecordLine, OrderItem, Product
+)
+from app.accounting.schemas import (
+    GSTHSNSummary, GSTR1Summary, GSTR3BSummary, GSTRateSummary, GSTReturnSummary
+)
+from app.orders.daily_sales import as_date
+
+# Additive columns of lines and summaries
+MEASURES = ("quantity", "taxable_value", "cgst_amount", "sgst_amount", "igst_amount")
+
+SummaryKey = Tuple[date, Decimal, str]  # (period_start, gst_rate, hsn_code)
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+
+
+def period_start(value) -> date:
+    """First day of the return month of a date/datetime"""
+    return as_date(value).replace(day=1)
+
+
+def parse_period(period: str) -> date:
+    """First day of a YYYY-MM return period (ValueError when malformed)"""
+    year, month = period.split("-")
+    return date(int(year), int(month), 1)
+
+
+class GSTReturnService:
+    """Per-rate, per-HSN GST lines and their monthly summaries
+
+    `record_orders` runs in the transaction that writes orders' GSTRecords
+    at delivery, and `reverse_record` in the one that deletes a record on
+    cancellation, so summaries commit (or roll back) with the records.
+    `backfill_lines` splits records written before lines existed and
+    `rebuild` recomputes a shop's summaries from the lines
+    (scripts/backfill_gst_summaries.py).
+
+    Sales are intra-state, as on GSTRecord: tax splits evenly into CGST and
+    SGST, IGST stays zero.
+    """
+
+    @staticmethod
+    def record_orders(
+        db: Session,
+        shop_id: int,
+        records: List[Tuple[int, int]],
+        invoice_date: datetime,
+    ) -> int:
+        """Split new records of orders by rate and HSN (does not commit)
+
+        Args:
+            records: [(gst_record_id, order_id), ...]
+
+        One GROUP BY over the orders' lines, one executemany INSERT of the
+        record lines and one upsert of the month's summaries.
+
+        Returns: number of lines written
+        """
+        period = period_start(invoice_date)
+        splits = GSTReturnService._split(db, [order_id for _, order_id in records])
+        rows = [
+            {"gst_record_id": record_id, "shop_id": shop_id,
+             "period_start": period, **split}
+            for record_id, order_id in records
+            for split in splits.get(order_id, [])
+        ]
+        if rows:
+            db.execute(insert(GSTRecordLine), rows)
+            GSTReturnService._add(db, shop_id, rows, sign=1)
+        return len(rows)
+
+    @staticmethod
+    def reverse_record(db: Session, gst_record: GSTRecord) -> None:
+        """Take a record's lines out of their month's summaries (does not commit)
+
+        Call before deleting the record; its lines are deleted with it.
+        """
+        GSTReturnService._add(db, gst_record.shop_id, [
+            {column: getattr(line, column) for column in ("period_start", "gst_rate",
+                                                          "hsn_code") + MEASURES}
+            for line in gst_record.lines
+        ], sign=-1)
+
+    @staticmethod
+    def backfill_lines(db: Session, shop_id: int, batch_size: int = 500) -> int:
+        """Split a shop's records that have no lines yet (does not commit)
+
+        Lines fall in the month the record was written; HSN codes are the
+        products' current ones.
+
+        Returns: number of records split
+        """
+        records = db.query(
+            GSTRecord.id, GSTRecord.order_id, GSTRecord.created_at
+        ).filter(
+            GSTRecord.shop_id == shop_id,
+            ~GSTRecord.lines.any()
+        ).order_by(GSTRecord.id).all()
+
+        for offset in range(0, len(records), batch_size):
+            batch = records[offset:offset + batch_size]
+            splits = GSTReturnService._split(db, [order_id for _, order_id, _ in batch])
+            rows = [
+                {"gst_record_id": record_id, "shop_id": shop_id,
+                 "period_start": period_start(created_at or datetime.utcnow()),
+                 **split}
+                for record_id, order_id, created_at in batch
+                for split in splits.get(order_id, [])
+            ]
+            if rows:
+                db.execute(insert(GSTRecordLine), rows)
+        return len(records)
+
+    @staticmethod
+    def rebuild(db: Session, shop_id: int, start: Optional[date] = None) -> int:
+        """Recompute a shop's summaries from its lines (does not commit)
+
+        Only months from `start` on are replaced (all when None). One
+        GROUP BY over the lines.
+
+        Returns: number of summary rows written
+        """
+        in_range = [GSTMonthlySummary.shop_id == shop_id]
+        lines_in_range = [GSTRecordLine.shop_id == shop_id]
+        if start is not None:
+            in_range.append(GSTMonthlySummary.period_start >= period_start(start))
+            lines_in_range.append(GSTRecordLine.period_start >= period_start(start))
+        db.query(GSTMonthlySummary).filter(
+            and_(*in_range)
+        ).delete(synchronize_session=False)
+
+        totals = db.query(
+            GSTRecordLine.period_start,
+            GSTRecordLine.gst_rate,
+            GSTRecordLine.hsn_code,
+            *[func.sum(getattr(GSTRecordLine, column)) for column in MEASURES]
+        ).filter(
+            and_(*lines_in_range)
+        ).group_by(
+            GSTRecordLine.period_start, GSTRecordLine.gst_rate, GSTRecordLine.hsn_code
+        ).all()
+
+        if totals:
+            now = datetime.utcnow()
+            db.execute(insert(GSTMonthlySummary), [
+                {"shop_id": shop_id, "period_start": as_date(period),
+                 "gst_rate": gst_rate, "hsn_code": hsn_code, "updated_at": now,
+                 **{column: value or 0 for column, value in zip(MEASURES, measures)}}
+                for period, gst_rate, hsn_code, *measures in totals
+            ])
+        return len(totals)
+
+    @staticmethod
+    def get_return_summary(db: Session, shop_id: int, period: str) -> GSTReturnSummary:
+        """GSTR-1 (B2C rate-wise and HSN-wise) and GSTR-3B 3.1 totals of a month
+
+        One indexed read of the month's summary rows.
+        """
+        rows = db.query(GSTMonthlySummary).filter(
+            GSTMonthlySummary.shop_id == shop_id,
+            GSTMonthlySummary.period_start == parse_period(period)
+        ).order_by(GSTMonthlySummary.hsn_code, GSTMonthlySummary.gst_rate).all()
+
+        hsn = []
+        by_rate: Dict[Decimal, Dict[str, Decimal]] = {}
+        for row in rows:
+            amounts = {column: Decimal(str(getattr(row, column) or 0))
+                       for column in MEASURES[1:]}
+            if not row.quantity and not any(amounts.values()):
+                continue  # every sale of it was reversed
+            total_tax = amounts["cgst_amount"] + amounts["sgst_amount"] + amounts["igst_amount"]
+            gst_rate = Decimal(str(row.gst_rate))
+            hsn.append(GSTHSNSummary(hsn_code=row.hsn_code, gst_rate=gst_rate,
+                                     quantity=row.quantity or 0,
+                                     total_tax=total_tax, **amounts))
+            rate = by_rate.setdefault(gst_rate, dict.fromkeys(MEASURES[1:], ZERO))
+            for column, value in amounts.items():
+                rate[column] += value
+
+        b2cs = [
+            GSTRateSummary(
+                gst_rate=gst_rate,
+                total_tax=amounts["cgst_amount"] + amounts["sgst_amount"] + amounts["igst_amount"],
+                **amounts)
+            for gst_rate, amounts in sorted(by_rate.items())
+        ]
+        taxed = [rate for rate in b2cs if rate.gst_rate > 0]
+        return GSTReturnSummary(
+            shop_id=shop_id,
+            period=period,
+            gstr1=GSTR1Summary(b2cs=b2cs, hsn=hsn),
+            gstr3b=GSTR3BSummary(
+                taxable_value=sum((rate.taxable_value for rate in taxed), ZERO),
+                igst_amount=sum((rate.igst_amount for rate in taxed), ZERO),
+                cgst_amount=sum((rate.cgst_amount for rate in taxed), ZERO),
+                sgst_amount=sum((rate.sgst_amount for rate in taxed), ZERO),
+                nil_rated_value=sum((rate.taxable_value for rate in b2cs
+                                     if rate.gst_rate == 0), ZERO),
+            ),
+        )
+
+    @staticmethod
+    def _split(db: Session, order_ids: List[int]) -> Dict[int, List[dict]]:
+        """Quantity, taxable value and tax of orders per rate and HSN code
+
+        Returns: {order_id: [line measures with gst_rate and hsn_code]}
+        """
+        gst_rate = func.coalesce(OrderItem.gst_rate, 0)
+        hsn_code = func.coalesce(Product.hsn_code, "")
+        rows = db.query(
+            OrderItem.order_id,
+            gst_rate,
+            hsn_code,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.line_total),
+            func.sum(func.coalesce(OrderItem.gst_amount, 0))
+        ).outerjoin(
+            Product, Product.id == OrderItem.product_id
+        ).filter(
+            OrderItem.order_id.in_(order_ids)
+        ).group_by(OrderItem.order_id, gst_rate, hsn_code).all()
+
+        splits: Dict[int, List[dict]] = {}
+        for order_id, rate, hsn, quantity, taxable, tax in rows:
+            tax = Decimal(str(tax or 0)).quantize(CENT, ROUND_HALF_UP)
+            cgst = (tax / 2).quantize(CENT, ROUND_HALF_UP)
+            splits.setdefault(order_id, []).append({
+                "gst_rate": Decimal(str(rate or 0)),
+                "hsn_code": hsn or "",
+                "quantity": quantity or 0,
+                "taxable_value": Decimal(str(taxable or 0)).quantize(CENT, ROUND_HALF_UP),
+                "cgst_amount": cgst,
+                "sgst_amount": tax - cgst,
+                "igst_amount": ZERO,
+            })
+        return splits
+
+    @staticmethod
+    def _add(db: Session, shop_id: int, lines: Iterable[dict], sign: int) -> None:
+        """Add (sign 1) or subtract (sign -1) line values from their summaries (one upsert)"""
+        deltas: Dict[SummaryKey, Dict[str, Decimal]] = {}
+        for line in lines:
+            key = (line["period_start"], Decimal(str(line["gst_rate"])), line["hsn_code"] or "")
+            row = deltas.setdefault(key, {column: 0 if column == "quantity" else ZERO
+                                          for column in MEASURES})
+            for column in MEASURES:
+                row[column] += sign * (line[column] or 0)
+        if not deltas:
+            return
+
+        table = GSTMonthlySummary.__table__
+        stmt = upsert_for(db.get_bind().dialect.name)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.shop_id, table.c.period_start,
+                            table.c.gst_rate, table.c.hsn_code],
+            set_={
+                **{column: table.c[column] + stmt.excluded[column]
+                   for column in MEASURES},
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        now = datetime.utcnow()
+        db.execute(stmt, [
+            {"shop_id": shop_id, "period_start": period, "gst_rate": gst_rate,
+             "hsn_code": hsn_code, "updated_at": now, **measures}
+            for (period, gst_rate, hsn_code), measures in deltas.items()
+        ])
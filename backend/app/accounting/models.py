@@ -2,17 +2,23 @@
 from shared.models import (
     LedgerEntry,
     CashBook,
+    AccountBalance,
     BankBook,
     KhataAccount,
     GSTRecord,
+    GSTRecordLine,
+    GSTMonthlySummary,
     ChartOfAccounts
 )
 
 __all__ = [
     "LedgerEntry",
     "CashBook",
+    "AccountBalance",
     "BankBook",
     "KhataAccount",
     "GSTRecord",
+    "GSTRecordLine",
+    "GSTMonthlySummary",
     "ChartOfAccounts",
 ]
@@ -1,15 +1,21 @@
 """Accounting API routes - FastAPI endpoints for accounting reports"""
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from typing import Optional
 
-from shared.database import get_db
+from shared.database import get_db, get_read_db
+from shared.instrumentation import query_budget
 from app.auth.security import get_current_user
-from shared.models import User, RoleEnum
+from shared.models import Shop, User, RoleEnum
 from app.accounting.service import AccountingService
+from app.accounting.balances import AccountBalanceService
+from app.accounting.exports import AccountingExportService, EXPORT_REPORTS
+from app.accounting.gst import GSTReturnService
 from app.accounting.schemas import (
-    DailySalesReport, ProfitLossReport, CashBookSummary, KhataStatement
+    DailySalesReport, ProfitLossReport, CashBookSummary, KhataStatement,
+    AccountBalanceResponse, PeriodCloseResponse, GSTReturnSummary
 )
 
 router = APIRouter(prefix="/api/v1/accounting", tags=["Accounting"])
@@ -66,12 +72,13 @@ def require_accounting_full_access(current_user: User = Depends(get_current_user
     - Item-level sales details
     """
 )
+@query_budget(4)
 async def get_daily_sales_report(
     shop_id: int,
     report_date: str = Query(..., regex=r"^\d{4}-\d{2}-\d{2}$",
                              description="YYYY-MM-DD format"),
     current_user: User = Depends(require_accounting_read_access),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get daily sales report.
@@ -106,7 +113,6 @@ async def get_daily_sales_report(
         )
 
     # Validate shop exists
-    from shared.models import Shop
     shop = db.query(Shop).filter(Shop.id == shop_id).first()
     if not shop:
         raise HTTPException(
@@ -149,12 +155,13 @@ async def get_daily_sales_report(
     - Tax collected vs payable
     """
 )
+@query_budget(5)
 async def get_profit_loss_report(
     shop_id: int,
     period: str = Query(..., regex=r"^\d{4}-\d{2}$",
                         description="YYYY-MM format (e.g., 2024-01)"),
     current_user: User = Depends(require_accounting_read_access),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get Profit & Loss statement.
@@ -189,7 +196,6 @@ async def get_profit_loss_report(
         )
 
     # Validate shop exists
-    from shared.models import Shop
     shop = db.query(Shop).filter(Shop.id == shop_id).first()
     if not shop:
         raise HTTPException(
@@ -230,14 +236,19 @@ async def get_profit_loss_report(
     - Closing balance
     """
 )
+@query_budget(6)
 async def get_cash_book(
     shop_id: int,
     from_date: str = Query(..., regex=r"^\d{4}-\d{2}-\d{2}$",
                            description="YYYY-MM-DD format"),
     to_date: str = Query(..., regex=r"^\d{4}-\d{2}-\d{2}$",
                          description="YYYY-MM-DD format"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=1000, description="Transactions per page (default: all)"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page"),
     current_user: User = Depends(require_accounting_read_access),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get cash book for a date range.
@@ -252,6 +263,7 @@ async def get_cash_book(
     - shop_id: Target shop ID
     - from_date: Start date in YYYY-MM-DD format
     - to_date: End date in YYYY-MM-DD format
+    - limit/cursor: Page through transactions (totals cover the whole period)
 
     **Returns:**
     Cash book with opening balance, transactions, and closing balance
@@ -273,7 +285,6 @@ async def get_cash_book(
         )
 
     # Validate shop exists
-    from shared.models import Shop
     shop = db.query(Shop).filter(Shop.id == shop_id).first()
     if not shop:
         raise HTTPException(
@@ -295,7 +306,7 @@ async def get_cash_book(
 
     # Generate report
     cash_book = AccountingService.get_cash_book(
-        shop_id, from_date, to_date, db)
+        shop_id, from_date, to_date, db, limit=limit, cursor=cursor)
     return cash_book
 
 
@@ -327,7 +338,7 @@ async def get_khata_statement(
     shop_id: Optional[int] = Query(
         None, description="Shop ID (required for non-customers)"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get customer khata statement.
@@ -346,7 +357,6 @@ async def get_khata_statement(
     Khata statement with balance, credit limit, and transaction history
     """
 
-    from shared.models import Shop
 
     # RBAC Logic
     if current_user.role == RoleEnum.CUSTOMER:
@@ -407,6 +417,174 @@ async def get_khata_statement(
     return statement
 
 
+# ===== ENDPOINT 5: PERIOD CLOSE =====
+
+@router.post(
+    "/period-close/{shop_id}",
+    response_model=PeriodCloseResponse,
+    summary="Close Accounting Period",
+    description="""
+    Checkpoint every account's closing balance at the end of a period.
+
+    RBAC:
+    - OWNER: Own shop only
+    - ADMIN: Any shop
+    """
+)
+async def close_period(
+    shop_id: int,
+    period_end: date = Query(..., description="Last day of the period (YYYY-MM-DD)"),
+    current_user: User = Depends(require_accounting_full_access),
+    db: Session = Depends(get_db)
+):
+    """
+    Close an accounting period.
+
+    Writes the running debit/credit totals of every ledger account and of
+    the cash book as of `period_end`, flagged as a period close. Opening
+    balances of the next period read these rows, and balance repairs
+    (`scripts.backfill_account_balances`) only rescan entries after the
+    latest close. Closing the same day again refreshes the checkpoint.
+
+    **RBAC Rules:**
+    - ADMIN: Any shop
+    - OWNER: Own shop only
+    """
+    if current_user.role != RoleEnum.ADMIN and current_user.shop_id != shop_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only close periods for your shop (ID: {current_user.shop_id})"
+        )
+    if period_end >= datetime.utcnow().date():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only periods that have ended can be closed"
+        )
+
+    rows = AccountBalanceService.close_period(db, shop_id, period_end)
+    db.commit()
+    return PeriodCloseResponse(
+        shop_id=shop_id,
+        period_end=period_end,
+        accounts_closed=len(rows),
+        balances=[AccountBalanceResponse.from_row(row) for row in rows]
+    )
+
+
+# ===== ENDPOINT 6: GST RETURNS =====
+
+@router.get(
+    "/gst-returns/{shop_id}",
+    response_model=GSTReturnSummary,
+    summary="GST Return Summary",
+    description="""
+    Get the GSTR-1 and GSTR-3B summaries of a shop for one month.
+
+    RBAC:
+    - OWNER/ADMIN: Full access
+    - STAFF: Own shop only
+    - CUSTOMER: Forbidden
+    """
+)
+@query_budget(3)
+async def get_gst_returns(
+    shop_id: int,
+    period: str = Query(..., regex=r"^\d{4}-\d{2}$",
+                        description="YYYY-MM format (e.g., 2024-01)"),
+    current_user: User = Depends(require_accounting_read_access),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get GST return summaries for a month.
+
+    Orders delivered in the month, by the month they were invoiced (cancelled
+    orders drop out). Reads the month's per-rate, per-HSN summary rows,
+    which are kept up to date as orders are delivered and cancelled.
+
+    **Returns:**
+    - gstr1.b2cs: taxable value and CGST/SGST/IGST per rate
+    - gstr1.hsn: quantity, taxable value and tax per HSN code and rate
+    - gstr3b: table 3.1 totals (taxable and nil rated supplies)
+    """
+    if current_user.role != RoleEnum.ADMIN and current_user.shop_id != shop_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only access reports for your shop (ID: {current_user.shop_id})"
+        )
+
+    try:
+        return GSTReturnService.get_return_summary(db, shop_id, period)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid period format: {str(e)}"
+        )
+
+
+# ===== ENDPOINT 7: EXPORTS =====
+
+@router.get(
+    "/export/{shop_id}/{report}",
+    summary="Export Accounting Report",
+    description=f"""
+    Stream a report over any date range as CSV or PDF.
+
+    Reports: {", ".join(EXPORT_REPORTS)} (khata needs customer_id)
+
+    RBAC:
+    - OWNER/ADMIN: Full access
+    - STAFF: Own shop only
+    - CUSTOMER: Forbidden
+    """
+)
+@query_budget(4)
+def export_report(
+    shop_id: int,
+    report: str,
+    from_date: date = Query(..., description="First day (YYYY-MM-DD)"),
+    to_date: date = Query(..., description="Last day, inclusive (YYYY-MM-DD)"),
+    format: str = Query("csv", pattern="^(csv|pdf)$"),
+    customer_id: Optional[int] = Query(None, description="Customer (khata export)"),
+    current_user: User = Depends(require_accounting_read_access),
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
+    """
+    Export a ledger, the cash book or a sales report.
+
+    Rows are streamed as they are read: CSV in chunks, PDF a page at a
+    time, so a year of entries exports without `limit` caps or holding the
+    report in memory.
+    """
+    if current_user.role != RoleEnum.ADMIN and current_user.shop_id != shop_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only access reports for your shop (ID: {current_user.shop_id})"
+        )
+
+    shop = db.query(Shop).filter(Shop.id == shop_id).first()
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Shop {shop_id} not found"
+        )
+
+    try:
+        chunks = AccountingExportService.stream(
+            db, report, format, shop_id, from_date, to_date,
+            customer_id=customer_id, shop_name=shop.name)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    media_type = "text/csv" if format == "csv" else "application/pdf"
+    filename = f"{report}-{shop_id}-{from_date}-{to_date}.{format}"
+    # The session stays open until the response has been streamed
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 # ===== HEALTH CHECK =====
 
 @router.get(
@@ -1,6 +1,6 @@
 """Pydantic schemas for accounting operations"""
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional
 
@@ -126,6 +126,46 @@ class GSTRecordResponse(GSTRecordBase):
         from_attributes = True
 
 
+# ===== GST RETURN SCHEMAS =====
+class GSTRateSummary(BaseModel):
+    """Taxable value and tax at one GST rate (GSTR-1 B2C small, rate-wise)"""
+    gst_rate: Decimal
+    taxable_value: Decimal
+    cgst_amount: Decimal
+    sgst_amount: Decimal
+    igst_amount: Decimal
+    total_tax: Decimal
+
+
+class GSTHSNSummary(GSTRateSummary):
+    """Quantity, taxable value and tax of one HSN code at one rate (GSTR-1 table 12)"""
+    hsn_code: str  # '' for products without an HSN code
+    quantity: int
+
+
+class GSTR1Summary(BaseModel):
+    """Outward supplies of a month for GSTR-1"""
+    b2cs: List[GSTRateSummary]
+    hsn: List[GSTHSNSummary]
+
+
+class GSTR3BSummary(BaseModel):
+    """Outward supplies of a month for GSTR-3B table 3.1"""
+    taxable_value: Decimal  # 3.1(a): taxable supplies (rate above zero)
+    igst_amount: Decimal
+    cgst_amount: Decimal
+    sgst_amount: Decimal
+    nil_rated_value: Decimal  # 3.1(c): nil rated supplies
+
+
+class GSTReturnSummary(BaseModel):
+    """Filing summary of a shop's GST returns for one month"""
+    shop_id: int
+    period: str  # YYYY-MM
+    gstr1: GSTR1Summary
+    gstr3b: GSTR3BSummary
+
+
 # ===== REPORT SCHEMAS =====
 class DailySalesReportItem(BaseModel):
     """Item in daily sales report"""
@@ -185,6 +225,7 @@ class CashBookSummary(BaseModel):
     closing_balance: Decimal
 
     transactions: List[CashBookResponse]
+    next_cursor: Optional[str] = None  # set when transactions are paged
 
 
 class KhataStatement(BaseModel):
@@ -202,6 +243,31 @@ class KhataStatement(BaseModel):
     last_transaction_date: Optional[datetime]
 
 
+class AccountBalanceResponse(BaseModel):
+    """Running totals of one account (account_balances row)"""
+    book: str  # 'ledger' or 'cash'
+    account: str  # ledger account name; '' for the cash book
+    balance_date: date
+    debit_total: Decimal  # cash book: total IN
+    credit_total: Decimal  # cash book: total OUT
+    balance: Decimal  # debit_total - credit_total
+
+    @classmethod
+    def from_row(cls, row) -> "AccountBalanceResponse":
+        return cls(book=row.book, account=row.account,
+                   balance_date=row.balance_date, debit_total=row.debit_total,
+                   credit_total=row.credit_total,
+                   balance=row.debit_total - row.credit_total)
+
+
+class PeriodCloseResponse(BaseModel):
+    """Closing balances checkpointed at the end of a period"""
+    shop_id: int
+    period_end: date
+    accounts_closed: int
+    balances: List[AccountBalanceResponse]
+
+
 # ===== ACCOUNTING ENTRY (INTERNAL) =====
 class AccountingEntry(BaseModel):
     """Internal accounting entry for double-entry bookkeeping"""
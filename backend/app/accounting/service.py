@@ -1,13 +1,13 @@
 """Accounting service - Business logic for accounting operations"""
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, desc
+from sqlalchemy import and_, func, desc, insert
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import List, Optional, Tuple
 import logging
 
 from shared.models import (
-    Order, OrderItem, Shop, User, Inventory, Product,
+    DailyProductSales, Order, OrderItem, Shop, User, Product,
     LedgerEntry, CashBook, BankBook, KhataAccount, GSTRecord,
     OrderStatusEnum, RoleEnum
 )
@@ -15,6 +15,9 @@ from app.accounting.schemas import (
     DailySalesReport, DailySalesReportItem, ProfitLossReport,
     CashBookSummary, CashBookResponse, KhataStatement
 )
+from shared.pagination import keyset_paginate
+from app.accounting.balances import AccountBalanceService, CASH_BOOK, CASH_ACCOUNT
+from app.accounting.gst import GSTReturnService
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +49,8 @@ class AccountingService:
 
         Entries created:
         1. Sales Ledger: Debit Cash/Debtors, Credit Sales
-        2. GST Record: Tax tracking for compliance
+        2. GST Record: Tax tracking for compliance, split by rate and HSN
+           into the month's GST return summaries
         3. Cash/Khata: Payment method tracking
 
         Args:
@@ -58,127 +62,175 @@ class AccountingService:
             True if successful, False if failed
         """
         try:
-            # Check if accounting entries already exist for this order
-            existing_entry = db.query(LedgerEntry).filter(
-                and_(
-                    LedgerEntry.shop_id == order.shop_id,
-                    LedgerEntry.reference_type == "order",
-                    LedgerEntry.reference_id == order.id
-                )
-            ).first()
-
-            if existing_entry:
+            if not AccountingService.post_deliveries([order], db, current_user):
                 logger.warning(
                     f"Accounting entry already exists for order {order.id}")
                 return False
 
-            # ===== ENTRY 1: SALES LEDGER =====
-            # Debit: Cash/Debtors Account
-            # Credit: Sales Account
+            # Commit all entries
+            db.commit()
+            logger.info(f"✓ Accounting entries created for order {order.id}")
+            return True
 
-            debit_account = "Cash" if not order.is_credit_sale else "Debtors"
+        except Exception as e:
+            db.rollback()
+            logger.error(f"✗ Failed to create accounting entries: {str(e)}")
+            return False
 
-            entry = LedgerEntry(
-                shop_id=order.shop_id,
-                entry_date=datetime.utcnow(),
-                entry_number=f"ORD{order.id}{datetime.utcnow().strftime('%Y%m%d')}",
-                description=f"Sales from order {order.order_number}",
-                reference_type="order",
-                reference_id=order.id,
-                debit_account=debit_account,
-                debit_amount=order.total_amount,
-                credit_account="Sales",
-                credit_amount=order.total_amount,
-                notes=f"Customer: {order.customer_name}",
-                created_by=current_user.id
-            )
-            db.add(entry)
+    @staticmethod
+    def post_deliveries(orders: List[Order], db: Session, current_user: User) -> List[int]:
+        """
+        Create the delivery entries of many orders of one shop (does not commit).
 
-            # ===== ENTRY 2: GST RECORD =====
-            # Track GST for tax compliance and reports
+        The entries of process_order_delivery, written in bulk: one query
+        for orders that already have entries (skipped), executemany INSERTs
+        of the ledger, GST and cash book rows, and account balance, GST
+        summary and khata updates summed over the batch.
 
-            gst_record = GSTRecord(
-                shop_id=order.shop_id,
-                order_id=order.id,
-                taxable_amount=order.subtotal,
-                gst_rate=order.tax_amount / order.subtotal * 100 if order.subtotal > 0 else 0,
-                gst_amount=order.tax_amount,
-                # Simplified: assume equal CGST and SGST (not IGST for now)
-                cgst_amount=order.tax_amount / 2,
-                sgst_amount=order.tax_amount / 2,
-                igst_amount=Decimal(0),
-                invoice_number=order.order_number,
-                created_by=current_user.id
+        Args:
+            orders: Delivered orders, all of the same shop
+            db: Database session
+            current_user: User performing the action
+
+        Returns:
+            Ids of the orders whose entries were created
+        """
+        if not orders:
+            return []
+        shop_id = orders[0].shop_id
+        already_posted = {
+            reference_id for reference_id, in db.query(LedgerEntry.reference_id).filter(
+                and_(
+                    LedgerEntry.shop_id == shop_id,
+                    LedgerEntry.reference_type == "order",
+                    LedgerEntry.reference_id.in_([order.id for order in orders])
+                )
             )
-            db.add(gst_record)
+        }
+        orders = [order for order in orders if order.id not in already_posted]
+        if not orders:
+            return []
+
+        now = datetime.utcnow()
+        ledger_rows, gst_rows, cash_rows = [], [], []
+        credit_totals = {}
+        for order in orders:
+            # ===== ENTRY 1: SALES LEDGER =====
+            # Debit: Cash/Debtors Account
+            # Credit: Sales Account
+            ledger_rows.append({
+                "shop_id": shop_id,
+                "entry_date": now,
+                "entry_number": f"ORD{order.id}{now.strftime('%Y%m%d')}",
+                "description": f"Sales from order {order.order_number}",
+                "reference_type": "order",
+                "reference_id": order.id,
+                "debit_account": "Debtors" if order.is_credit_sale else "Cash",
+                "debit_amount": order.total_amount,
+                "credit_account": "Sales",
+                "credit_amount": order.total_amount,
+                "notes": f"Customer: {order.customer_name}",
+                "created_by": current_user.id,
+                "created_at": now,
+            })
 
-            # ===== ENTRY 3: PAYMENT TRACKING =====
+            # ===== ENTRY 2: GST RECORD =====
+            # Simplified: assume equal CGST and SGST (not IGST for now)
+            gst_rows.append({
+                "shop_id": shop_id,
+                "order_id": order.id,
+                "taxable_amount": order.subtotal,
+                "gst_rate": order.tax_amount / order.subtotal * 100 if order.subtotal > 0 else 0,
+                "gst_amount": order.tax_amount,
+                "cgst_amount": order.tax_amount / 2,
+                "sgst_amount": order.tax_amount / 2,
+                "igst_amount": Decimal(0),
+                "invoice_number": order.order_number,
+                "created_by": current_user.id,
+                "created_at": now,
+            })
 
+            # ===== ENTRY 3: PAYMENT TRACKING =====
             if order.is_credit_sale:
-                # Credit sale: Create khata entry
-                AccountingService._update_khata_account(
-                    order, db, current_user, is_credit=True
-                )
+                # Credit sale: customer's khata
+                if order.customer_id:
+                    credit_totals[order.customer_id] = credit_totals.get(
+                        order.customer_id, Decimal(0)) + order.total_amount
             else:
                 # Cash/COD sale: Record in cash book
-                cash_entry = CashBook(
-                    shop_id=order.shop_id,
-                    order_id=order.id,
-                    amount=order.total_amount,
-                    entry_type="IN",
-                    description=f"Cash received from {order.customer_name}",
-                    reference_number=order.order_number,
-                    created_by=current_user.id
-                )
-                db.add(cash_entry)
-
-            # Commit all entries
-            db.commit()
-            logger.info(f"✓ Accounting entries created for order {order.id}")
-            return True
-
-        except Exception as e:
-            db.rollback()
-            logger.error(f"✗ Failed to create accounting entries: {str(e)}")
-            return False
+                cash_rows.append({
+                    "shop_id": shop_id,
+                    "order_id": order.id,
+                    "amount": order.total_amount,
+                    "entry_type": "IN",
+                    "description": f"Cash received from {order.customer_name}",
+                    "reference_number": order.order_number,
+                    "created_by": current_user.id,
+                    "created_at": now,
+                })
+
+        db.execute(insert(LedgerEntry), ledger_rows)
+        if cash_rows:
+            db.execute(insert(CashBook), cash_rows)
+        AccountBalanceService.post_inserted(db.connection(), ledger_rows, cash_rows)
+
+        # Per-rate, per-HSN split and the month's GST return summaries
+        delivered_on = {order.id: order.delivery_date or now for order in orders}
+        records_by_month = {}
+        for record_id, order_id in db.execute(
+            insert(GSTRecord).returning(GSTRecord.id, GSTRecord.order_id), gst_rows
+        ):
+            invoice_date = delivered_on[order_id]
+            records_by_month.setdefault(
+                (invoice_date.year, invoice_date.month), (invoice_date, []))[1].append(
+                (record_id, order_id))
+        for invoice_date, records in records_by_month.values():
+            GSTReturnService.record_orders(db, shop_id, records, invoice_date)
+
+        AccountingService._update_khata_accounts(db, shop_id, credit_totals, now)
+        return [order.id for order in orders]
 
     @staticmethod
-    def _update_khata_account(order: Order, db: Session, current_user: User, is_credit: bool = True):
+    def _update_khata_accounts(db: Session, shop_id: int, credit_totals: dict, when: datetime):
         """
-        Update or create khata account for credit sales.
+        Add credit sales to customers' khata accounts, creating missing ones.
 
         Args:
-            order: Order object
             db: Database session
-            current_user: User performing action
-            is_credit: Whether this is a credit sale
+            shop_id: Shop ID
+            credit_totals: {customer_id: amount sold on credit}
+            when: Transaction time
         """
-        if not order.customer_id:
+        if not credit_totals:
             return
 
-        # Get or create khata account
-        khata = db.query(KhataAccount).filter(
-            and_(
-                KhataAccount.shop_id == order.shop_id,
-                KhataAccount.customer_id == order.customer_id
-            )
-        ).first()
-
-        if not khata:
-            khata = KhataAccount(
-                shop_id=order.shop_id,
-                customer_id=order.customer_id,
-                balance=Decimal(0),
-                credit_limit=Decimal(10000),
-                total_credit_given=Decimal(0),
-                total_credit_received=Decimal(0)
+        khatas = {
+            khata.customer_id: khata
+            for khata in db.query(KhataAccount).filter(
+                and_(
+                    KhataAccount.shop_id == shop_id,
+                    KhataAccount.customer_id.in_(list(credit_totals))
+                )
             )
-            db.add(khata)
+        }
+
+        for customer_id, amount in credit_totals.items():
+            khata = khatas.get(customer_id)
+            if not khata:
+                khata = KhataAccount(
+                    shop_id=shop_id,
+                    customer_id=customer_id,
+                    balance=Decimal(0),
+                    credit_limit=Decimal(10000),
+                    total_credit_given=Decimal(0),
+                    total_credit_received=Decimal(0)
+                )
+                db.add(khata)
 
-        # Update balance (customer owes amount)
-        khata.balance += order.total_amount
-        khata.total_credit_given += order.total_amount
-        khata.last_transaction_date = datetime.utcnow()
+            # Update balance (customer owes amount)
+            khata.balance += amount
+            khata.total_credit_given += amount
+            khata.last_transaction_date = when
 
     @staticmethod
     def reverse_accounting_entries(order: Order, db: Session, current_user: User) -> bool:
@@ -194,60 +246,7 @@ class AccountingService:
             True if successful
         """
         try:
-            # Find and reverse ledger entry
-            entry = db.query(LedgerEntry).filter(
-                and_(
-                    LedgerEntry.shop_id == order.shop_id,
-                    LedgerEntry.reference_type == "order",
-                    LedgerEntry.reference_id == order.id
-                )
-            ).first()
-
-            if entry:
-                # Create reverse entry
-                reverse_entry = LedgerEntry(
-                    shop_id=order.shop_id,
-                    entry_date=datetime.utcnow(),
-                    entry_number=f"REV{order.id}{datetime.utcnow().strftime('%Y%m%d')}",
-                    description=f"Reversal of order {order.order_number}",
-                    reference_type="order_reversal",
-                    reference_id=order.id,
-                    debit_account=entry.credit_account,
-                    debit_amount=entry.credit_amount,
-                    credit_account=entry.debit_account,
-                    credit_amount=entry.debit_amount,
-                    notes="Cancellation reversal",
-                    created_by=current_user.id
-                )
-                db.add(reverse_entry)
-
-            # Reverse GST record
-            gst_record = db.query(GSTRecord).filter(
-                GSTRecord.order_id == order.id
-            ).first()
-
-            if gst_record:
-                db.delete(gst_record)
-
-            # Reverse cash/khata entry
-            if order.is_credit_sale and order.customer_id:
-                khata = db.query(KhataAccount).filter(
-                    and_(
-                        KhataAccount.shop_id == order.shop_id,
-                        KhataAccount.customer_id == order.customer_id
-                    )
-                ).first()
-                if khata:
-                    khata.balance -= order.total_amount
-                    khata.last_transaction_date = datetime.utcnow()
-            else:
-                # Remove cash entry
-                cash_entry = db.query(CashBook).filter(
-                    CashBook.order_id == order.id
-                ).first()
-                if cash_entry:
-                    db.delete(cash_entry)
-
+            AccountingService.reverse_order_entries(order, db, current_user)
             db.commit()
             logger.info(f"✓ Accounting entries reversed for order {order.id}")
             return True
@@ -257,6 +256,64 @@ class AccountingService:
             logger.error(f"✗ Failed to reverse accounting entries: {str(e)}")
             return False
 
+    @staticmethod
+    def reverse_order_entries(order: Order, db: Session, current_user: User) -> None:
+        """Reverse the delivery entries of a cancelled order (does not commit)"""
+        # Find and reverse ledger entry
+        entry = db.query(LedgerEntry).filter(
+            and_(
+                LedgerEntry.shop_id == order.shop_id,
+                LedgerEntry.reference_type == "order",
+                LedgerEntry.reference_id == order.id
+            )
+        ).first()
+
+        if entry:
+            # Create reverse entry
+            reverse_entry = LedgerEntry(
+                shop_id=order.shop_id,
+                entry_date=datetime.utcnow(),
+                entry_number=f"REV{order.id}{datetime.utcnow().strftime('%Y%m%d')}",
+                description=f"Reversal of order {order.order_number}",
+                reference_type="order_reversal",
+                reference_id=order.id,
+                debit_account=entry.credit_account,
+                debit_amount=entry.credit_amount,
+                credit_account=entry.debit_account,
+                credit_amount=entry.debit_amount,
+                notes="Cancellation reversal",
+                created_by=current_user.id
+            )
+            db.add(reverse_entry)
+
+        # Reverse GST record
+        gst_record = db.query(GSTRecord).filter(
+            GSTRecord.order_id == order.id
+        ).first()
+
+        if gst_record:
+            GSTReturnService.reverse_record(db, gst_record)
+            db.delete(gst_record)
+
+        # Reverse cash/khata entry
+        if order.is_credit_sale and order.customer_id:
+            khata = db.query(KhataAccount).filter(
+                and_(
+                    KhataAccount.shop_id == order.shop_id,
+                    KhataAccount.customer_id == order.customer_id
+                )
+            ).first()
+            if khata:
+                khata.balance -= order.total_amount
+                khata.last_transaction_date = datetime.utcnow()
+        else:
+            # Remove cash entry
+            cash_entry = db.query(CashBook).filter(
+                CashBook.order_id == order.id
+            ).first()
+            if cash_entry:
+                db.delete(cash_entry)
+
     # ===== REPORT GENERATION =====
 
     @staticmethod
@@ -355,34 +412,34 @@ class AccountingService:
         else:
             end = dt(int(year), int(month) + 1, 1)
 
-        # Get all delivered orders in period
-        orders = db.query(Order).filter(
+        # Order-level totals of the orders delivered in the period
+        gross_sales, discounts, total_tax_collected = db.query(
+            func.coalesce(func.sum(Order.total_amount), 0),
+            func.coalesce(func.sum(Order.discount_amount), 0),
+            func.coalesce(func.sum(Order.tax_amount), 0)
+        ).filter(
             and_(
                 Order.shop_id == shop_id,
                 Order.order_status == OrderStatusEnum.DELIVERED,
                 Order.delivery_date >= start,
                 Order.delivery_date < end
             )
-        ).all()
-
-        # Calculate revenue
-        gross_sales = sum(o.total_amount or Decimal(0) for o in orders)
-        discounts = sum(o.discount_amount or Decimal(0) for o in orders)
+        ).one()
+        gross_sales = Decimal(str(gross_sales))
+        discounts = Decimal(str(discounts))
         net_sales = gross_sales - discounts
 
-        # Calculate COGS (simplified: cost of all items sold)
-        cost_of_goods = Decimal(0)
-        for order in orders:
-            for item in order.items:
-                # Get inventory to find cost price
-                inv = db.query(Inventory).filter(
-                    and_(
-                        Inventory.shop_id == shop_id,
-                        Inventory.product_id == item.product_id
-                    )
-                ).first()
-                if inv:
-                    cost_of_goods += inv.cost_price * item.quantity
+        # COGS from the daily sales rollup: units delivered at the cost
+        # captured on their order lines when sold
+        cost_of_goods = Decimal(str(db.query(
+            func.coalesce(func.sum(DailyProductSales.cost), 0)
+        ).filter(
+            and_(
+                DailyProductSales.shop_id == shop_id,
+                DailyProductSales.sale_date >= start.date(),
+                DailyProductSales.sale_date < end.date()
+            )
+        ).scalar()))
 
         # Calculate profit
         gross_profit = net_sales - cost_of_goods
@@ -390,7 +447,7 @@ class AccountingService:
                                100) if net_sales > 0 else Decimal(0)
 
         # Tax
-        total_tax_collected = sum(o.tax_amount or Decimal(0) for o in orders)
+        total_tax_collected = Decimal(str(total_tax_collected))
         total_tax_payable = total_tax_collected  # Simplified
 
         return ProfitLossReport(
@@ -407,7 +464,14 @@ class AccountingService:
         )
 
     @staticmethod
-    def get_cash_book(shop_id: int, from_date: str, to_date: str, db: Session) -> CashBookSummary:
+    def get_cash_book(
+        shop_id: int,
+        from_date: str,
+        to_date: str,
+        db: Session,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> CashBookSummary:
         """
         Get cash book for a period.
 
@@ -418,47 +482,45 @@ class AccountingService:
             from_date: YYYY-MM-DD format
             to_date: YYYY-MM-DD format
             db: Database session
+            limit: Transactions per page (None: the whole period)
+            cursor: next_cursor of the previous page
 
         Returns:
-            CashBookSummary with cash transactions
+            CashBookSummary with cash transactions; balances and totals always
+            cover the whole period, whichever page is returned
         """
         from datetime import datetime as dt
 
         start = dt.strptime(from_date, "%Y-%m-%d")
         end = dt.strptime(to_date, "%Y-%m-%d")
 
-        # Get opening balance (all IN before from_date)
-        opening = db.query(func.sum(CashBook.amount)).filter(
-            and_(
-                CashBook.shop_id == shop_id,
-                CashBook.entry_type == "IN",
-                CashBook.created_at < start
-            )
-        ).scalar() or Decimal(0)
+        # Balances and period totals from the account_balances snapshots:
+        # two index seeks instead of SUMs over the whole cash book
+        opening_in, opening_out = AccountBalanceService.totals_as_of(
+            db, shop_id, CASH_BOOK, CASH_ACCOUNT, start.date() - timedelta(days=1))
+        closing_in, closing_out = AccountBalanceService.totals_as_of(
+            db, shop_id, CASH_BOOK, CASH_ACCOUNT, end.date())
+        opening = opening_in - opening_out
+        cash_in = closing_in - opening_in
+        cash_out = closing_out - opening_out
+        closing = opening + cash_in - cash_out
 
-        opening -= db.query(func.sum(CashBook.amount)).filter(
-            and_(
-                CashBook.shop_id == shop_id,
-                CashBook.entry_type == "OUT",
-                CashBook.created_at < start
-            )
-        ).scalar() or Decimal(0)
+        # Whole days: to_date's transactions are part of the period
+        in_period = and_(
+            CashBook.shop_id == shop_id,
+            CashBook.created_at >= start,
+            CashBook.created_at < end + timedelta(days=1)
+        )
 
         # Get transactions in period
-        transactions = db.query(CashBook).filter(
-            and_(
-                CashBook.shop_id == shop_id,
-                CashBook.created_at >= start,
-                CashBook.created_at <= end
-            )
-        ).order_by(CashBook.created_at).all()
-
-        # Calculate totals
-        cash_in = sum(
-            t.amount for t in transactions if t.entry_type == "IN") or Decimal(0)
-        cash_out = sum(
-            t.amount for t in transactions if t.entry_type == "OUT") or Decimal(0)
-        closing = opening + cash_in - cash_out
+        query = db.query(CashBook).filter(in_period)
+        next_cursor = None
+        if limit is None:
+            transactions = query.order_by(
+                CashBook.created_at, CashBook.id).all()
+        else:
+            transactions, next_cursor, _ = keyset_paginate(
+                query, (CashBook.created_at, CashBook.id), limit, cursor=cursor)
 
         return CashBookSummary(
             shop_id=shop_id,
@@ -469,7 +531,8 @@ class AccountingService:
             closing_balance=closing,
             transactions=[
                 CashBookResponse.model_validate(t) for t in transactions
-            ]
+            ],
+            next_cursor=next_cursor
         )
 
     @staticmethod
@@ -0,0 +1,114 @@
+"""Batch anomaly detection - a shop's daily sales and stock movements as matrices"""
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from shared.models import StockMovement
+from app.orders.daily_sales import as_date
+
+# Movements backed by a sale, purchase or return. The rest (manual
+# adjustments, damage, ...) are stock changes the sales do not explain.
+EXPLAINED_MOVEMENTS = ("sale", "inbound", "return")
+
+# Baseline estimators for rolling_scores
+METHODS = ("mad", "zscore")
+
+# 1.4826 * MAD estimates the standard deviation of normally distributed data
+MAD_SCALE = 1.4826
+
+# Spread floor (units/day), so a flat baseline does not flag every change
+MIN_SPREAD = 1.0
+
+# utils.detect_stock_anomalies: unexplained loss as a share of the day's sales
+LOSS_SEVERITY = ((0.5, "CRITICAL"), (0.3, "HIGH"), (0.1, "MEDIUM"))
+
+
+def load_unexplained_movements(
+    db: Session,
+    shop_id: int,
+    start_date: date,
+    end_date: date,
+) -> List[Tuple[int, date, int]]:
+    """Net unexplained stock change per product and day, in one GROUP BY
+
+    Returns: [(product_id, day, quantity)], negative quantities are losses
+    """
+    day = func.date(StockMovement.created_at)
+    rows = db.query(
+        StockMovement.product_id, day, func.sum(StockMovement.quantity)
+    ).filter(
+        StockMovement.shop_id == shop_id,
+        StockMovement.created_at >= datetime.combine(
+            start_date, datetime.min.time()),
+        StockMovement.created_at < datetime.combine(
+            end_date + timedelta(days=1), datetime.min.time()),
+        StockMovement.movement_type.notin_(EXPLAINED_MOVEMENTS)
+    ).group_by(StockMovement.product_id, day).all()
+
+    return [(product_id, as_date(moved_on), quantity or 0)
+            for product_id, moved_on, quantity in rows]
+
+
+def rolling_scores(
+    quantities: np.ndarray,
+    window: int,
+    method: str = "mad",
+    sizes_only: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Score every day after the first `window` against the `window` days before it
+
+    "mad" uses the median and the scaled median absolute deviation (robust
+    to the spikes being looked for), "zscore" the mean and standard
+    deviation. With `sizes_only` the baseline is built from the days that
+    sold (demand sizes), so intermittent sellers are not flagged on every
+    sale, and the spread is at least Poisson noise (square root of the
+    baseline), as a few selling days understate it. Days with no sales in
+    their window then score NaN.
+
+    Returns: (baselines, scores), each of shape (products, days - window)
+    """
+    history = sliding_window_view(quantities, window, axis=1)[:, :-1]
+    observed = quantities[:, window:]
+    included = history > 0 if sizes_only else np.ones(history.shape, dtype=bool)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "mad":
+            baselines = _masked_median(history, included)
+            spread = MAD_SCALE * _masked_median(
+                np.abs(history - baselines[..., None]), included)
+        else:
+            counts = included.sum(axis=2)
+            baselines = np.where(included, history, 0).sum(axis=2) / counts
+            spread = np.sqrt(np.where(
+                included, (history - baselines[..., None]) ** 2, 0
+            ).sum(axis=2) / counts)
+        if sizes_only:
+            spread = np.fmax(spread, np.sqrt(baselines))
+        scores = (observed - baselines) / np.maximum(spread, MIN_SPREAD)
+    return baselines, scores
+
+
+def _masked_median(values: np.ndarray, included: np.ndarray) -> np.ndarray:
+    """Median over the last axis of the included entries (NaN if none)"""
+    n = values.shape[-1]
+    counts = included.sum(axis=-1)
+    # Excluded entries sort first, so the included ones are the last `counts`
+    ordered = np.sort(np.where(included, values, -np.inf), axis=-1)
+    low = np.clip(n - counts + (counts - 1) // 2, 0, n - 1)
+    high = np.clip(n - counts + counts // 2, 0, n - 1)
+    median = (np.take_along_axis(ordered, low[..., None], axis=-1)[..., 0] +
+              np.take_along_axis(ordered, high[..., None], axis=-1)[..., 0]) / 2
+    return np.where(counts > 0, median, np.nan)
+
+
+def loss_severities(losses: np.ndarray, sales: np.ndarray) -> np.ndarray:
+    """Vectorized utils.detect_stock_anomalies severity ("" when not an anomaly)"""
+    ratios = np.where(losses > 0, losses / np.maximum(sales, 1), 0)
+    return np.select(
+        [ratios > limit for limit, _ in LOSS_SEVERITY],
+        [severity for _, severity in LOSS_SEVERITY],
+        default="")
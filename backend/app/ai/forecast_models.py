@@ -0,0 +1,316 @@
+"""Forecasting model registry - time-series models fit in batch over a sales matrix
+
+Every model takes a (products, days) matrix of daily units (oldest first,
+column 0 on `start_date`) and returns (products, horizon) float forecasts
+for the days after the last column. Models loop over days at most, never
+over products, so a nightly refresh of every SKU stays cheap.
+"""
+from datetime import date, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .forecasting import forecast_matrix
+
+HORIZON = 7
+WEEK = 7
+
+# Pick the model with the lowest backtest error per product
+AUTO_MODEL = "auto"
+
+# Rolling-origin backtest: forecast each of the last N weeks
+BACKTEST_ORIGINS = 4
+
+# History the seasonal models fit on (13 weeks: three month starts)
+SEASONAL_HISTORY_DAYS = 91
+
+# Salary days: demand is higher on the first days of the month. The uplift
+# is estimated per product and shrunk towards none with this many days'
+# worth of evidence, so a single busy day does not make a pattern.
+MONTH_START_DAYS = 5
+MONTH_START_PRIOR_DAYS = 2.0
+MONTH_START_FACTOR_LIMITS = (0.5, 3.0)
+
+# Seasonal naive: average of the same weekday over the last N weeks
+SEASONAL_NAIVE_WEEKS = 4
+
+# Holt-Winters (additive weekly season, damped trend): smoothing weights
+# are picked per product from this grid by in-sample one-step error
+HW_ALPHAS = (0.1, 0.3, 0.5)
+HW_GAMMAS = (0.05, 0.2)
+HW_BETA = 0.02
+HW_PHI = 0.9
+
+# Croston (Syntetos-Boylan approximation) smoothing weight
+CROSTON_ALPHA = 0.1
+
+
+class ForecastModel(NamedTuple):
+    name: str
+    description: str
+    history_days: int  # days of history the model fits on
+    forecast: Callable[[np.ndarray, date, int], np.ndarray]
+
+
+FORECAST_MODELS: Dict[str, ForecastModel] = {}
+
+
+def register_model(name: str, description: str, history_days: int):
+    """Decorator - add a forecast function to FORECAST_MODELS"""
+    def decorator(forecast):
+        FORECAST_MODELS[name] = ForecastModel(name, description, history_days, forecast)
+        return forecast
+    return decorator
+
+
+def history_days_for(model: str) -> int:
+    """Days of history to load for a model
+
+    'auto' loads enough for every model plus the backtest weeks it selects on.
+    """
+    if model == AUTO_MODEL:
+        return (max(spec.history_days for spec in FORECAST_MODELS.values()) +
+                HORIZON + WEEK * (BACKTEST_ORIGINS - 1))
+    return FORECAST_MODELS[model].history_days
+
+
+def run_model(name: str, quantities: np.ndarray, start_date: date, horizon: int) -> np.ndarray:
+    """Forecast with a registered model on (at most) its history_days"""
+    spec = FORECAST_MODELS[name]
+    skip = max(0, quantities.shape[1] - spec.history_days)
+    return spec.forecast(quantities[:, skip:], start_date + timedelta(days=skip), horizon)
+
+
+# ===== MONTH-START SEASONALITY =====
+
+def month_start_mask(start_date: date, days: int) -> np.ndarray:
+    """True for the days (from start_date) in the first MONTH_START_DAYS of a month"""
+    return np.array([(start_date + timedelta(days=i)).day <= MONTH_START_DAYS
+                     for i in range(days)], dtype=bool)
+
+
+def month_start_factors(quantities: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Demand on month-start days relative to other days, per product
+
+    Expected month-start demand comes from the weekday profile of the other
+    days, so the weekdays the month starts on are not mistaken for uplift.
+
+    Returns: multiplicative factors (1.0 without enough evidence)
+    """
+    slots = np.arange(quantities.shape[1]) % WEEK
+    weekdays = np.eye(WEEK)[slots[~mask]]  # (other days, 7) one-hot
+    profile = quantities[:, ~mask] @ weekdays / np.maximum(weekdays.sum(axis=0), 1)
+    expected = profile[:, slots[mask]].sum(axis=1)
+    observed = quantities[:, mask].sum(axis=1)
+    prior = profile.mean(axis=1) * MONTH_START_PRIOR_DAYS
+    with np.errstate(invalid="ignore", divide="ignore"):
+        factors = (observed + prior) / (expected + prior)
+    factors = np.where(prior > 0, factors, 1.0)
+    return np.clip(factors, *MONTH_START_FACTOR_LIMITS)
+
+
+def with_month_start(forecast):
+    """Fit `forecast` on month-start-adjusted history and re-apply the uplift"""
+    def adjusted(quantities: np.ndarray, start_date: date, horizon: int) -> np.ndarray:
+        days = quantities.shape[1]
+        mask = month_start_mask(start_date, days + horizon)
+        factors = month_start_factors(quantities, mask[:days])
+        history = np.where(mask[:days], quantities / factors[:, None], quantities)
+        predicted = forecast(history, start_date, horizon)
+        return np.where(mask[days:], predicted * factors[:, None], predicted)
+    return adjusted
+
+
+def _flat(values: np.ndarray, horizon: int) -> np.ndarray:
+    return np.repeat(values[:, None], horizon, axis=1)
+
+
+# ===== MODELS =====
+
+@register_model("linear_regression",
+                "Least-squares trend over the last two weeks (no seasonality)",
+                history_days=15)
+def linear_regression(quantities: np.ndarray, start_date: date, horizon: int) -> np.ndarray:
+    return forecast_matrix(quantities, days_ahead=horizon).astype(np.float64)
+
+
+@register_model("moving_average", "Mean of the last 7 days", history_days=WEEK)
+def moving_average(quantities: np.ndarray, start_date: date, horizon: int) -> np.ndarray:
+    recent = quantities[:, -WEEK:]
+    means = recent.mean(axis=1) if recent.shape[1] else np.zeros(len(recent))
+    return _flat(means, horizon)
+
+
+@register_model("seasonal_naive",
+                "Same weekday over the last 4 weeks, with the month-start uplift",
+                history_days=SEASONAL_HISTORY_DAYS)
+@with_month_start
+def seasonal_naive(quantities: np.ndarray, start_date: date, horizon: int) -> np.ndarray:
+    days = quantities.shape[1]
+    weeks = min(SEASONAL_NAIVE_WEEKS, days // WEEK)
+    if weeks == 0:
+        return moving_average(quantities, start_date, horizon)
+    # Column j of the profile falls on the same weekday as future day j (mod 7)
+    profile = quantities[:, days - weeks * WEEK:].reshape(
+        len(quantities), weeks, WEEK).mean(axis=1)
+    return profile[:, np.arange(horizon) % WEEK]
+
+
+@register_model("holt_winters",
+                "Exponential smoothing with damped trend, weekly season and "
+                "month-start uplift",
+                history_days=SEASONAL_HISTORY_DAYS)
+@with_month_start
+def holt_winters(quantities: np.ndarray, start_date: date, horizon: int) -> np.ndarray:
+    products, days = quantities.shape
+    if days < 2 * WEEK:
+        return moving_average(quantities, start_date, horizon)
+
+    # Every (alpha, gamma) pair runs on its own copy of the rows
+    grid = [(alpha, gamma) for alpha in HW_ALPHAS for gamma in HW_GAMMAS]
+    history = np.tile(quantities, (len(grid), 1))
+    alpha = np.repeat([a for a, _ in grid], products)
+    gamma = np.repeat([g for _, g in grid], products)
+
+    first_week = history[:, :WEEK].mean(axis=1)
+    level = first_week
+    trend = (history[:, WEEK:2 * WEEK].mean(axis=1) - first_week) / WEEK
+    season = history[:, :WEEK] - first_week[:, None]
+    sse = np.zeros(len(history))
+
+    for t in range(WEEK, days):
+        observed = history[:, t]
+        slot = season[:, t % WEEK]
+        sse += (observed - (level + HW_PHI * trend + slot)) ** 2
+        new_level = alpha * (observed - slot) + (1 - alpha) * (level + HW_PHI * trend)
+        trend = HW_BETA * (new_level - level) + (1 - HW_BETA) * HW_PHI * trend
+        season[:, t % WEEK] = gamma * (observed - new_level) + (1 - gamma) * slot
+        level = new_level
+
+    rows = sse.reshape(len(grid), products).argmin(axis=0) * products + np.arange(products)
+    damping = np.cumsum(HW_PHI ** np.arange(1, horizon + 1))
+    slots = (days + np.arange(horizon)) % WEEK
+    return (level[rows, None] + trend[rows, None] * damping +
+            season[rows][:, slots])
+
+
+@register_model("croston",
+                "Croston (SBA) for intermittent demand: demand size / interval",
+                history_days=SEASONAL_HISTORY_DAYS)
+def croston(quantities: np.ndarray, start_date: date, horizon: int) -> np.ndarray:
+    products = len(quantities)
+    size = np.zeros(products)
+    interval = np.ones(products)
+    since_last = np.ones(products)
+    seen = np.zeros(products, dtype=bool)
+
+    for observed in quantities.T:
+        sold = observed > 0
+        first = sold & ~seen
+        repeat = sold & seen
+        size = np.where(first, observed, np.where(
+            repeat, size + CROSTON_ALPHA * (observed - size), size))
+        interval = np.where(first, since_last, np.where(
+            repeat, interval + CROSTON_ALPHA * (since_last - interval), interval))
+        seen |= sold
+        since_last = np.where(sold, 1, since_last + 1)
+
+    rates = np.where(seen, (1 - CROSTON_ALPHA / 2) * size / interval, 0.0)
+    return _flat(rates, horizon)
+
+
+# ===== BACKTEST & SELECTION =====
+
+class BacktestResult(NamedTuple):
+    """Rolling-origin errors of each model, summed over origins and horizon"""
+    models: List[str]
+    origins: int
+    abs_errors: np.ndarray  # (models, products)
+    actuals: np.ndarray  # (products,)
+    ape_sums: np.ndarray  # (models,) sum of |error| / actual over days that sold
+    ape_counts: int
+
+    def wape(self) -> np.ndarray:
+        """Weighted absolute percentage error per model (%)"""
+        total = self.actuals.sum()
+        if total == 0:
+            return np.zeros(len(self.models))
+        return self.abs_errors.sum(axis=1) / total * 100
+
+    def mape(self) -> np.ndarray:
+        """Mean absolute percentage error per model, over days that sold (%)"""
+        if self.ape_counts == 0:
+            return np.zeros(len(self.models))
+        return self.ape_sums / self.ape_counts * 100
+
+    def best_models(self) -> np.ndarray:
+        """Index into `models` of the lowest-error model per product
+
+        Ties (e.g. products without sales) go to the first model.
+        """
+        return self.abs_errors.argmin(axis=0)
+
+
+def round_forecasts(predicted: np.ndarray) -> np.ndarray:
+    """Non-negative whole units"""
+    return np.maximum(0, np.rint(predicted)).astype(np.int64)
+
+
+def backtest(
+    quantities: np.ndarray,
+    start_date: date,
+    models: Optional[Sequence[str]] = None,
+    horizon: int = HORIZON,
+    origins: int = BACKTEST_ORIGINS,
+) -> BacktestResult:
+    """Forecast the last `origins` weeks from the history before each one
+
+    Origins are a week apart; the latest forecasts the final `horizon`
+    days of the matrix. Forecasts are rounded as they would be served.
+    """
+    models = list(models or FORECAST_MODELS)
+    products, days = quantities.shape
+    origins = max(0, min(origins, (days - horizon) // WEEK))
+
+    abs_errors = np.zeros((len(models), products))
+    actuals = np.zeros(products)
+    ape_sums = np.zeros(len(models))
+    ape_counts = 0
+    for i in range(origins):
+        origin = days - horizon - WEEK * i
+        actual = quantities[:, origin:origin + horizon]
+        sold = actual > 0
+        actuals += actual.sum(axis=1)
+        ape_counts += int(sold.sum())
+        for m, name in enumerate(models):
+            predicted = round_forecasts(run_model(
+                name, quantities[:, :origin], start_date, horizon))
+            errors = np.abs(predicted - actual)
+            abs_errors[m] += errors.sum(axis=1)
+            ape_sums[m] += (errors[sold] / actual[sold]).sum()
+
+    return BacktestResult(models, origins, abs_errors, actuals, ape_sums, ape_counts)
+
+
+def forecast_products(
+    quantities: np.ndarray,
+    start_date: date,
+    model: str,
+    horizon: int = HORIZON,
+) -> Tuple[np.ndarray, List[str]]:
+    """Forecast every row with a model, or the backtest's best per row ('auto')
+
+    Returns: (int forecasts of shape (products, horizon), model name per row)
+    """
+    if model != AUTO_MODEL:
+        predicted = run_model(model, quantities, start_date, horizon)
+        return round_forecasts(predicted), [model] * len(quantities)
+
+    names = list(FORECAST_MODELS)
+    best = backtest(quantities, start_date, names, horizon).best_models()
+    predicted = np.empty((len(quantities), horizon))
+    for m, name in enumerate(names):
+        rows = best == m
+        if rows.any():
+            predicted[rows] = run_model(name, quantities[rows], start_date, horizon)
+    return round_forecasts(predicted), [names[m] for m in best.tolist()]
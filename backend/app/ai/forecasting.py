@@ -0,0 +1,161 @@
+"""Batch demand forecasting - every product of a shop in one query and a few array ops"""
+from datetime import date, datetime
+from operator import itemgetter
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import String, func, select, type_coerce
+from sqlalchemy.orm import Session
+
+from shared.models import DailyProductSales
+from app.orders.daily_sales import as_date
+
+
+class SalesMatrix(NamedTuple):
+    """Daily units sold: one row per product, one column per day (oldest first)"""
+    product_ids: List[int]
+    start_date: date
+    quantities: np.ndarray  # shape (products, days), float64
+
+
+def load_sales_matrix(
+    db: Session,
+    shop_id: int,
+    start: datetime,
+    end: datetime,
+    product_ids: Optional[Sequence[int]] = None,
+) -> SalesMatrix:
+    """The shop's daily_product_sales rows for the window, pivoted into a matrix
+
+    Demand is the units of orders that were not cancelled, on their order
+    date. Days run from start.date() to end.date() inclusive; days without
+    sales are 0. Rows are the products sold in the window, or exactly
+    `product_ids` (in that order) when given.
+    """
+    start_date = start.date()
+    query = select(
+        DailyProductSales.product_id,
+        # Driver values (ISO strings on SQLite): pivot_daily converts each
+        # distinct day once instead of parsing every row
+        type_coerce(DailyProductSales.sale_date, String),
+        DailyProductSales.ordered_qty
+    ).where(
+        DailyProductSales.shop_id == shop_id,
+        DailyProductSales.sale_date >= start_date,
+        DailyProductSales.sale_date <= end.date(),
+        DailyProductSales.ordered_qty > 0
+    )
+    if product_ids is not None:
+        query = query.where(
+            DailyProductSales.product_id.in_(list(product_ids)))
+    # Plain Core rows: with days x SKUs results, ORM row handling dominates
+    rows = db.connection().execute(query).all()
+
+    if product_ids is None:
+        product_ids = np.unique(np.fromiter(
+            map(itemgetter(0), rows), dtype=np.int64, count=len(rows))).tolist()
+    days = (end.date() - start_date).days + 1
+    return SalesMatrix(list(product_ids), start_date,
+                       pivot_daily(rows, product_ids, start_date, days))
+
+
+def pivot_daily(
+    rows: Sequence[tuple],
+    product_ids: Sequence[int],
+    start_date: date,
+    days: int,
+) -> np.ndarray:
+    """(product_id, day, value) rows as a (products, days) float64 matrix
+
+    Days may be dates or ISO date strings. Rows of products outside
+    `product_ids` or days outside the window are ignored; missing cells
+    are 0.
+    """
+    matrix = np.zeros((len(product_ids), days))
+    if not rows or not len(product_ids):
+        return matrix
+
+    # Whole columns through C-level maps: no Python code per row
+    count = len(rows)
+    row_products = np.fromiter(
+        map(itemgetter(0), rows), dtype=np.int64, count=count)
+    offsets = {
+        day: (as_date(day) - start_date).days
+        for day in set(map(itemgetter(1), rows))
+    }
+    day_idx = np.fromiter(
+        map(offsets.__getitem__, map(itemgetter(1), rows)),
+        dtype=np.int64, count=count)
+    values = np.fromiter(
+        map(itemgetter(2), rows), dtype=np.float64, count=count)
+
+    ids = np.asarray(product_ids, dtype=np.int64)
+    sorter = np.argsort(ids)
+    product_idx = sorter[np.minimum(
+        np.searchsorted(ids, row_products, sorter=sorter), len(ids) - 1)]
+    keep = (ids[product_idx] == row_products) & (day_idx >= 0) & (day_idx < days)
+    matrix[product_idx[keep], day_idx[keep]] = values[keep]
+    return matrix
+
+
+def units_sold_since(
+    db: Session,
+    shop_id: int,
+    since: datetime,
+    product_ids: Optional[Sequence[int]] = None,
+    until: Optional[datetime] = None,
+) -> Dict[int, int]:
+    """Units ordered per product from since.date() on (to until.date()), in one query"""
+    query = db.query(
+        DailyProductSales.product_id,
+        func.sum(DailyProductSales.ordered_qty)
+    ).filter(
+        DailyProductSales.shop_id == shop_id,
+        DailyProductSales.sale_date >= since.date()
+    )
+    if until is not None:
+        query = query.filter(DailyProductSales.sale_date <= until.date())
+    if product_ids is not None:
+        query = query.filter(
+            DailyProductSales.product_id.in_(list(product_ids)))
+    return {
+        product_id: int(quantity or 0)
+        for product_id, quantity in query.group_by(DailyProductSales.product_id)
+    }
+
+
+def moving_averages(quantities: np.ndarray, window: int = 7) -> np.ndarray:
+    """Mean of the last `window` days per row (all days if fewer)"""
+    if quantities.shape[1] == 0:
+        return np.zeros(quantities.shape[0])
+    return quantities[:, -window:].mean(axis=1)
+
+
+def linear_trends(quantities: np.ndarray):
+    """Least-squares slope and intercept of every row against day 0..n-1
+
+    Returns: (slopes, intercepts); slopes are 0 with fewer than two days
+    """
+    n = quantities.shape[1]
+    means = quantities.mean(axis=1) if n else np.zeros(quantities.shape[0])
+    if n < 2:
+        return np.zeros_like(means), means
+    x = np.arange(n, dtype=np.float64)
+    x_centered = x - x.mean()
+    slopes = (quantities - means[:, None]) @ x_centered / (x_centered @ x_centered)
+    return slopes, means - slopes * x.mean()
+
+
+def forecast_matrix(quantities: np.ndarray, days_ahead: int = 7) -> np.ndarray:
+    """Vectorized utils.linear_regression_forecast: non-negative whole units
+
+    Returns: int array of shape (products, days_ahead)
+    """
+    n = quantities.shape[1]
+    slopes, intercepts = linear_trends(quantities)
+    future = np.arange(n, n + days_ahead, dtype=np.float64)
+    predicted = intercepts[:, None] + slopes[:, None] * future
+    if n < 2:
+        # Flat at the (truncated) mean, like the scalar version
+        predicted = np.trunc(predicted)
+    return np.maximum(0, np.rint(predicted)).astype(np.int64)
@@ -0,0 +1,253 @@
+"""AI insights cache - endpoint payloads precomputed per shop by a job runner"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, NamedTuple, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from shared.config import get_settings
+from shared.database import SessionLocal, upsert_for
+from shared.models import (
+    AIInsight, DailyProductSales, Inventory, Product, Shop, StockMovement, User
+)
+from .schemas import (
+    ForecastResponse, ForecastAccuracyResponse, ReorderResponse,
+    LowStockRiskResponse, AnomalyDetectionResponse
+)
+from .service import (
+    DemandForecastingService, ReorderSuggestionService,
+    SmartLowStockAlertService, AnomalyDetectionService
+)
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Longest history an insight reads (anomalies: 90 days + a 60-day window;
+# 'auto' forecasts 119 days); older rows cannot change a payload, so the
+# watermark ignores them
+WATERMARK_HISTORY_DAYS = 150
+
+
+class InsightKind(NamedTuple):
+    """A cached endpoint: its response model and how to compute it"""
+    response_model: Type[BaseModel]
+    compute: Callable[..., BaseModel]  # (db, shop_id, **params)
+    default_params: Dict[str, Any]  # precomputed by the runner
+
+
+INSIGHTS: Dict[str, InsightKind] = {
+    "forecast": InsightKind(
+        ForecastResponse,
+        lambda db, shop_id: DemandForecastingService(db).forecast_all_products(shop_id),
+        {}),
+    "forecast_accuracy": InsightKind(
+        ForecastAccuracyResponse,
+        lambda db, shop_id: DemandForecastingService(db).get_forecast_accuracy(shop_id),
+        {}),
+    "reorder": InsightKind(
+        ReorderResponse,
+        lambda db, shop_id: ReorderSuggestionService(db).get_reorder_suggestions(shop_id),
+        {}),
+    # Cached unfiltered; min_risk / limit are applied to the cached list
+    "low_stock_risk": InsightKind(
+        LowStockRiskResponse,
+        lambda db, shop_id: SmartLowStockAlertService(db).get_low_stock_risks(shop_id),
+        {}),
+    "anomalies": InsightKind(
+        AnomalyDetectionResponse,
+        lambda db, shop_id, **params: AnomalyDetectionService(db).detect_anomalies(
+            shop_id, **params),
+        {"days_back": 7, "window": 14, "method": "mad"}),
+}
+
+
+def params_key(params: Optional[Dict[str, Any]]) -> str:
+    """Canonical string for a parameter set ('' for none)"""
+    return "&".join(f"{name}={value}" for name, value in sorted((params or {}).items()))
+
+
+def input_watermark(db: Session, shop_id: int) -> str:
+    """Fingerprint of everything the shop's insights are computed from (one query)
+
+    Changes with the day (forecasts and windows are relative to today), a
+    sales rollup or inventory update, an inventory row added or removed, a
+    product, shop or supplier edit (e.g. the forecast model or a lead
+    time) or a stock movement.
+    """
+    since = datetime.now().date() - timedelta(days=WATERMARK_HISTORY_DAYS)
+    row = db.execute(select(
+        select(func.max(DailyProductSales.updated_at)).where(
+            DailyProductSales.shop_id == shop_id,
+            DailyProductSales.sale_date >= since).scalar_subquery(),
+        select(func.count(Inventory.id)).where(
+            Inventory.shop_id == shop_id).scalar_subquery(),
+        select(func.max(Inventory.last_updated)).where(
+            Inventory.shop_id == shop_id).scalar_subquery(),
+        select(func.max(Product.updated_at)).where(
+            Product.shop_id == shop_id).scalar_subquery(),
+        select(Shop.updated_at).where(Shop.id == shop_id).scalar_subquery(),
+        select(func.max(User.updated_at)).where(User.id.in_(
+            select(Product.supplier_id).where(
+                Product.shop_id == shop_id))).scalar_subquery(),
+        select(func.max(StockMovement.id)).where(
+            StockMovement.shop_id == shop_id,
+            StockMovement.created_at >= since).scalar_subquery(),
+    )).one()
+    return "|".join([datetime.now().date().isoformat(), *(str(value) for value in row)])
+
+
+class InsightCache:
+    """Read, compute and refresh cached AI payloads (callers commit)"""
+
+    @staticmethod
+    def get(
+        db: Session,
+        shop_id: int,
+        kind: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Optional[AIInsight]:
+        return db.query(AIInsight).filter(
+            AIInsight.shop_id == shop_id,
+            AIInsight.kind == kind,
+            AIInsight.params == params_key(params)
+        ).first()
+
+    @staticmethod
+    def compute(
+        db: Session,
+        shop_id: int,
+        kind: str,
+        params: Optional[Dict[str, Any]] = None,
+        watermark: Optional[str] = None,
+    ) -> AIInsight:
+        """Compute a payload and store it (one upsert)
+
+        The watermark is read before computing, so data written meanwhile
+        shows up as a change on the next refresh.
+
+        Returns: the stored entry (not attached to the session)
+        """
+        if watermark is None:
+            watermark = input_watermark(db, shop_id)
+        result = INSIGHTS[kind].compute(db, shop_id, **(params or {}))
+        now = datetime.utcnow()
+        values = {
+            "shop_id": shop_id,
+            "kind": kind,
+            "params": params_key(params),
+            "payload": result.model_dump_json(),
+            "input_watermark": watermark,
+            "computed_at": now,
+            "checked_at": now,
+        }
+
+        table = AIInsight.__table__
+        stmt = upsert_for(db.get_bind().dialect.name)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.shop_id, table.c.kind, table.c.params],
+            set_={column: stmt.excluded[column] for column in
+                  ("payload", "input_watermark", "computed_at", "checked_at")}
+        )
+        db.execute(stmt, values)
+        return AIInsight(**values)
+
+    @staticmethod
+    def refresh(
+        db: Session,
+        shop_id: int,
+        kind: str,
+        params: Optional[Dict[str, Any]] = None,
+        watermark: Optional[str] = None,
+    ) -> bool:
+        """Recompute a payload if its inputs changed, else mark it checked
+
+        Returns: True if the payload was recomputed
+        """
+        if watermark is None:
+            watermark = input_watermark(db, shop_id)
+        entry = InsightCache.get(db, shop_id, kind, params)
+        if entry is not None and entry.input_watermark == watermark:
+            db.execute(update(AIInsight).where(AIInsight.id == entry.id).values(
+                checked_at=datetime.utcnow()))
+            return False
+        InsightCache.compute(db, shop_id, kind, params, watermark)
+        return True
+
+    @staticmethod
+    def refresh_shop(db: Session, shop_id: int) -> int:
+        """Refresh every insight of a shop with default parameters
+
+        Entries for other parameters are refreshed when they are served.
+
+        Returns: number of payloads recomputed
+        """
+        watermark = input_watermark(db, shop_id)
+        return sum(
+            InsightCache.refresh(db, shop_id, kind, spec.default_params, watermark)
+            for kind, spec in INSIGHTS.items()
+        )
+
+
+# ===== JOB RUNNER =====
+
+def refresh_all_shops(session_factory: Callable[[], Session] = SessionLocal) -> int:
+    """Refresh the insights of every active shop, committing shop by shop
+
+    Runs in a worker thread (asyncio runner) or a Celery worker.
+
+    Returns: number of payloads recomputed
+    """
+    db = session_factory()
+    try:
+        shop_ids = [shop_id for shop_id, in db.query(Shop.id).filter(
+            Shop.is_active == True,
+            Shop.deleted_at == None
+        ).order_by(Shop.id)]
+
+        recomputed = 0
+        for shop_id in shop_ids:
+            try:
+                recomputed += InsightCache.refresh_shop(db, shop_id)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"AI insights refresh failed for shop {shop_id}: {str(e)}")
+        return recomputed
+    finally:
+        db.close()
+
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+def revalidate(
+    shop_id: int,
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> None:
+    """Refresh one stale entry after it was served (background task)
+
+    Concurrent requests for the same entry start a single refresh per process.
+    """
+    key = (shop_id, kind, params_key(params))
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+
+    db = session_factory()
+    try:
+        InsightCache.refresh(db, shop_id, kind, params)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"AI insight {kind} refresh failed for shop {shop_id}: {str(e)}")
+    finally:
+        db.close()
+        with _revalidating_lock:
+            _revalidating.discard(key)
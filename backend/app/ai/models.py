@@ -1,7 +1,6 @@
 """AI models - Re-exports from shared.models"""
-# Note: AI service uses existing models from shared/models.py
-# - Order, OrderItem, Inventory, Product, Shop
-# No additional database tables required for AI features
-# All logic is computed from existing data
+# Note: AI features compute from existing data (daily_product_sales,
+# Inventory, Product, StockMovement); ai_insights only caches the results
+from shared.models import AIInsight
 
-__all__ = []
+__all__ = ["AIInsight"]
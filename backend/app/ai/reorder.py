@@ -0,0 +1,130 @@
+"""Batch reorder planning - every SKU of a shop in one pass
+
+Periodic review, order-up-to policy: the shop orders every `review_days`,
+and an order placed today must last until the one after it arrives, i.e.
+cover the demand of the supplier's lead time plus one review period.
+
+- Safety stock = z(service level) x daily demand deviation x sqrt(lead
+  time + review), at least the product's min_stock_level
+- Reorder point = forecast demand over the lead time + safety stock:
+  below it, stock runs into the safety stock before an order arrives
+- Order-up-to level = forecast demand over lead time + review + safety
+  stock, capped at max_stock_level
+- Order quantity = order-up-to level - stock, rounded up to the product's
+  reorder_quantity (the supplier's pack / minimum order), never above
+  max_stock_level
+"""
+from decimal import Decimal
+from statistics import NormalDist
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from shared.models import Inventory, Product, User
+
+
+class ReorderItems(NamedTuple):
+    """A shop's stocked products with their reorder settings, as parallel arrays"""
+    product_ids: List[int]
+    product_names: List[str]
+    supplier_ids: List[Optional[int]]
+    supplier_names: List[Optional[str]]
+    quantities: np.ndarray  # int64, all inventory rows (batches) summed
+    min_levels: np.ndarray  # int64
+    max_levels: np.ndarray  # int64, 0 = no cap
+    pack_sizes: np.ndarray  # int64, 1 = any quantity
+    lead_times: np.ndarray  # int64 days, the supplier's or the default
+    unit_costs: List[Decimal]  # last purchase price or cost price
+
+
+class ReorderPlan(NamedTuple):
+    """Per-product policy levels and order quantities"""
+    safety_stock: np.ndarray  # int64
+    reorder_points: np.ndarray  # int64
+    order_up_to: np.ndarray  # int64
+    order_quantities: np.ndarray  # int64
+
+
+def load_reorder_items(db: Session, shop_id: int, default_lead_time: int) -> ReorderItems:
+    """Every stocked product of the shop with its supplier, in one query"""
+    rows = db.query(
+        Product.id,
+        Product.name,
+        Product.supplier_id,
+        User.name,
+        func.sum(Inventory.quantity),
+        func.coalesce(Product.min_stock_level, func.max(Inventory.min_quantity)),
+        Product.max_stock_level,
+        Product.reorder_quantity,
+        User.lead_time_days,
+        func.coalesce(Product.last_purchase_price, Product.cost_price)
+    ).join(
+        Inventory, Inventory.product_id == Product.id
+    ).outerjoin(
+        User, User.id == Product.supplier_id
+    ).filter(
+        Inventory.shop_id == shop_id
+    ).group_by(Product.id, User.id).order_by(Product.id).all()
+
+    return ReorderItems(
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        [row[2] for row in rows],
+        [row[3] for row in rows],
+        np.array([row[4] or 0 for row in rows], dtype=np.int64),
+        np.array([row[5] or 0 for row in rows], dtype=np.int64),
+        np.array([row[6] or 0 for row in rows], dtype=np.int64),
+        np.array([max(row[7] or 1, 1) for row in rows], dtype=np.int64),
+        np.array([default_lead_time if row[8] is None else row[8] for row in rows],
+                 dtype=np.int64),
+        [row[9] or Decimal("0") for row in rows],
+    )
+
+
+def service_level_z(service_level: float) -> float:
+    """Standard normal quantile of a cycle service level (0.95 -> 1.645)"""
+    return NormalDist().inv_cdf(service_level)
+
+
+def demand_deviations(quantities: np.ndarray, days: int) -> np.ndarray:
+    """Sample standard deviation of daily demand over the last `days` per row"""
+    window = quantities[:, -days:]
+    if window.shape[1] < 2:
+        return np.zeros(len(quantities))
+    return window.std(axis=1, ddof=1)
+
+
+def plan_orders(
+    items: ReorderItems,
+    forecasts: np.ndarray,
+    deviations: np.ndarray,
+    review_days: int,
+    z: float,
+) -> ReorderPlan:
+    """Apply the order-up-to policy to every row at once
+
+    `forecasts` are daily forecasts of shape (products, days) covering at
+    least the longest lead time plus the review period.
+    """
+    rows = np.arange(len(items.product_ids))
+    cumulative = np.concatenate(
+        [np.zeros((len(rows), 1)), np.cumsum(forecasts, axis=1)], axis=1)
+    lead_demand = cumulative[rows, items.lead_times]
+    cycle_demand = cumulative[rows, items.lead_times + review_days]
+
+    safety = np.maximum(
+        np.ceil(z * deviations * np.sqrt(items.lead_times + review_days)),
+        items.min_levels).astype(np.int64)
+    reorder_points = np.ceil(lead_demand).astype(np.int64) + safety
+    order_up_to = np.ceil(cycle_demand).astype(np.int64) + safety
+    capped = items.max_levels > 0
+    order_up_to[capped] = np.minimum(order_up_to[capped], items.max_levels[capped])
+
+    shortfall = np.maximum(0, order_up_to - items.quantities)
+    packs = items.pack_sizes
+    quantities = -(-shortfall // packs) * packs
+    room = np.maximum(0, items.max_levels - items.quantities) // packs * packs
+    quantities[capped] = np.minimum(quantities[capped], room[capped])
+    return ReorderPlan(safety, reorder_points, order_up_to, quantities)
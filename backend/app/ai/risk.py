@@ -0,0 +1,64 @@
+"""Batch low-stock risk scoring - every inventory row of a shop in one pass"""
+from typing import List, NamedTuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from shared.models import Inventory, Product
+
+# Most urgent first; a level applies below its threshold (days until minimum)
+RISK_LEVELS = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+RISK_THRESHOLDS = np.array([1.0, 3.0, 7.0])
+
+# Days until minimum reported for products that are not selling
+NO_VELOCITY_DAYS = 999.0
+
+
+class StockLevels(NamedTuple):
+    """A shop's inventory rows as parallel arrays"""
+    product_ids: List[int]
+    product_names: List[str]
+    quantities: np.ndarray  # int64
+    min_quantities: np.ndarray  # int64
+
+
+def load_stock_levels(db: Session, shop_id: int) -> StockLevels:
+    """Every inventory row of the shop with its product name, in one query"""
+    rows = db.query(
+        Inventory.product_id,
+        Product.name,
+        Inventory.quantity,
+        Inventory.min_quantity
+    ).join(
+        Product, Product.id == Inventory.product_id
+    ).filter(
+        Inventory.shop_id == shop_id
+    ).order_by(Inventory.id).all()
+
+    return StockLevels(
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        np.array([row[2] or 0 for row in rows], dtype=np.int64),
+        np.array([row[3] or 0 for row in rows], dtype=np.int64),
+    )
+
+
+def days_until_minimum(
+    quantities: np.ndarray,
+    min_quantities: np.ndarray,
+    velocities: np.ndarray,
+) -> np.ndarray:
+    """Days of stock above the minimum at each row's daily velocity
+
+    Rows that are not selling get NO_VELOCITY_DAYS.
+    """
+    above_minimum = np.maximum(0, quantities - min_quantities).astype(np.float64)
+    selling = velocities > 0
+    days = np.full(len(quantities), NO_VELOCITY_DAYS)
+    days[selling] = above_minimum[selling] / velocities[selling]
+    return days
+
+
+def classify_risks(days: np.ndarray) -> np.ndarray:
+    """Vectorized utils.classify_stock_risk: index into RISK_LEVELS per row"""
+    return np.searchsorted(RISK_THRESHOLDS, days, side="right")
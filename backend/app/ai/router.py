@@ -1,19 +1,30 @@
 """AI router - REST API endpoints for AI features"""
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, Dict, Optional
 
-from shared.database import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.config import get_settings
+from shared.database import get_async_db
 from app.auth.security import get_current_user
-from shared.models import User, Shop
+from shared.models import AIInsight, User, Shop, RoleEnum
 
 from .schemas import (
     ForecastResponse, ReorderResponse,
-    LowStockRiskResponse, AnomalyDetectionResponse
-)
-from .service import (
-    DemandForecastingService, ReorderSuggestionService,
-    SmartLowStockAlertService, AnomalyDetectionService
+    LowStockRiskResponse, AnomalyDetectionResponse,
+    ForecastAccuracyResponse, ForecastModelUpdate, ForecastModelSetting
 )
+from .forecast_models import AUTO_MODEL, FORECAST_MODELS
+from .insights import INSIGHTS, InsightCache, revalidate
+from .risk import RISK_LEVELS
+
+settings = get_settings()
+
+# Response header: hit, stale (refresh scheduled), miss or bypass (?fresh=true)
+INSIGHTS_CACHE_HEADER = "X-Insights-Cache"
 
 
 router = APIRouter(
@@ -26,10 +37,10 @@ router = APIRouter(
 async def verify_shop_access(
     shop_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> bool:
     """Verify user has access to shop"""
-    shop = db.query(Shop).filter_by(id=shop_id).first()
+    shop = await db.get(Shop, shop_id)
     if not shop:
         raise HTTPException(status_code=404, detail="Shop not found")
 
@@ -39,9 +50,9 @@ async def verify_shop_access(
     # - STAFF: access to own shop only (read-only)
     # - CUSTOMER: no access
 
-    if current_user.role == "ADMIN":
+    if current_user.role == RoleEnum.ADMIN:
         return True
-    elif current_user.role in ["OWNER", "STAFF"]:
+    elif current_user.role in [RoleEnum.OWNER, RoleEnum.STAFF]:
         # Check if user owns/manages this shop
         if current_user.shop_id == shop_id:
             return True
@@ -57,39 +68,173 @@ async def verify_shop_access(
         )
 
 
+async def serve_insight(
+    db: AsyncSession,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    shop_id: int,
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    fresh: bool = False,
+) -> BaseModel:
+    """Serve a cached AI payload with stale-while-revalidate
+
+    Entries checked within AI_INSIGHTS_MAX_AGE_SECONDS are served as is;
+    older ones are served and refreshed after the response. Missing entries,
+    entries past AI_INSIGHTS_MAX_STALE_SECONDS and `fresh` requests are
+    computed in the request and stored.
+    """
+    entry = None
+    if not fresh:
+        entry = await db.run_sync(
+            lambda session: InsightCache.get(session, shop_id, kind, params))
+
+    status = "hit"
+    if entry is not None:
+        checked_age = (datetime.utcnow() - entry.checked_at).total_seconds()
+        if checked_age > settings.AI_INSIGHTS_MAX_STALE_SECONDS:
+            entry = None
+        elif checked_age > settings.AI_INSIGHTS_MAX_AGE_SECONDS:
+            status = "stale"
+            if settings.AI_INSIGHTS_RUNNER == "celery":
+                from .tasks import refresh_insight
+                refresh_insight.delay(shop_id, kind, params)
+            else:
+                background_tasks.add_task(revalidate, shop_id, kind, params)
+
+    if entry is None:
+        status = "bypass" if fresh else "miss"
+        entry = await db.run_sync(
+            lambda session: InsightCache.compute(session, shop_id, kind, params))
+        await db.commit()
+
+    response.headers[INSIGHTS_CACHE_HEADER] = status
+    response.headers["Age"] = str(int(
+        (datetime.utcnow() - entry.computed_at).total_seconds()))
+    return INSIGHTS[kind].response_model.model_validate_json(entry.payload)
+
+
+FRESH_QUERY = Query(
+    default=False, description="Recompute now instead of serving the cached result")
+
+
 # ===== DEMAND FORECASTING =====
 
 @router.get(
     "/forecast/{shop_id}",
     response_model=ForecastResponse,
     summary="7-Day Demand Forecast",
-    description="Generates 7-day demand forecast for all products using moving average and linear regression"
+    description="Generates 7-day demand forecast for all products with the shop's forecasting model"
 )
 async def get_demand_forecast(
     shop_id: int,
-    _: bool = Depends(lambda: verify_shop_access(shop_id)),
-    db: Session = Depends(get_db),
+    response: Response,
+    background_tasks: BackgroundTasks,
+    fresh: bool = FRESH_QUERY,
+    _: bool = Depends(verify_shop_access),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> ForecastResponse:
     """
     Get 7-day demand forecast for all products in shop.
 
     **Algorithm:**
-    1. Fetches last 14 days of sales data
+    1. Fetches the sales history the shop's model needs (14 days for
+       linear regression, 13 weeks for the seasonal models)
     2. Calculates moving average (baseline)
-    3. Applies linear regression for trend
-    4. Generates 7-day forecast per product
-    5. Assigns confidence based on data quality
+    3. Forecasts 7 days for every product at once with the shop's model:
+       linear_regression, moving_average, seasonal_naive (day of week),
+       holt_winters (trend + day of week) or croston (intermittent
+       demand); seasonal models add the month-start uplift. `auto` uses
+       the best model per product on a rolling backtest.
+    4. Assigns confidence based on data quality
 
     **Use Case:**
     - Plan purchasing for next week
     - Identify slow-moving vs. fast-moving items
     - Optimize stock levels
 
+    **Caching:** Served from the precomputed AI insights cache
+    (`X-Insights-Cache` header); `fresh=true` recomputes now.
+
+    **RBAC:** OWNER (own shop), ADMIN (all shops), STAFF (read-only, own shop)
+    """
+    return await serve_insight(
+        db, response, background_tasks, shop_id, "forecast", fresh=fresh)
+
+
+@router.get(
+    "/forecast-accuracy/{shop_id}",
+    response_model=ForecastAccuracyResponse,
+    summary="Forecast Model Accuracy",
+    description="Rolling backtest (WAPE / MAPE) of every forecasting model on the shop's sales"
+)
+async def get_forecast_accuracy(
+    shop_id: int,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    fresh: bool = FRESH_QUERY,
+    _: bool = Depends(verify_shop_access),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> ForecastAccuracyResponse:
+    """
+    Compare forecasting models on the shop's own sales.
+
+    Each of the last 4 weeks is forecast from the history before it, with
+    every model. WAPE (total error / total units) ranks models for the
+    shop; MAPE averages the error over days that sold. `products_best`
+    counts the products each model forecasts best, which is what `auto`
+    picks.
+
+    **Caching:** Served from the precomputed AI insights cache
+    (`X-Insights-Cache` header); `fresh=true` recomputes now.
+
     **RBAC:** OWNER (own shop), ADMIN (all shops), STAFF (read-only, own shop)
     """
-    service = DemandForecastingService(db)
-    return service.forecast_all_products(shop_id)
+    return await serve_insight(
+        db, response, background_tasks, shop_id, "forecast_accuracy", fresh=fresh)
+
+
+@router.put(
+    "/forecast-model/{shop_id}",
+    response_model=ForecastModelSetting,
+    summary="Select Forecasting Model",
+    description="Choose the forecasting model used for the shop's forecasts"
+)
+async def set_forecast_model(
+    shop_id: int,
+    selection: ForecastModelUpdate,
+    _: bool = Depends(verify_shop_access),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> ForecastModelSetting:
+    """
+    Select the shop's forecasting model (or `auto`).
+
+    Cached forecasts are dropped, so the next request uses the new model.
+
+    **RBAC:** OWNER (own shop), ADMIN (all shops)
+    """
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.OWNER]:
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied: Only owners can change the forecasting model"
+        )
+
+    shop = await db.get(Shop, shop_id)
+    shop.forecast_model = selection.model
+    await db.execute(delete(AIInsight).where(
+        AIInsight.shop_id == shop_id,
+        AIInsight.kind.in_(["forecast", "forecast_accuracy"])
+    ))
+    await db.commit()
+
+    return ForecastModelSetting(
+        shop_id=shop_id,
+        forecast_model=selection.model,
+        available_models=[AUTO_MODEL, *FORECAST_MODELS]
+    )
 
 
 # ===== REORDER SUGGESTIONS =====
@@ -98,38 +243,51 @@ async def get_demand_forecast(
     "/reorder-suggestions/{shop_id}",
     response_model=ReorderResponse,
     summary="Smart Reorder Suggestions",
-    description="Suggests optimal reorder quantities based on stock velocity and forecast"
+    description="Suggests reorder quantities from forecast demand, supplier lead times "
+                "and safety stock, with a purchase order draft per supplier"
 )
 async def get_reorder_suggestions(
     shop_id: int,
-    _: bool = Depends(lambda: verify_shop_access(shop_id)),
-    db: Session = Depends(get_db),
+    response: Response,
+    background_tasks: BackgroundTasks,
+    fresh: bool = FRESH_QUERY,
+    _: bool = Depends(verify_shop_access),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> ReorderResponse:
     """
     Get reorder suggestions for all products.
 
     **Algorithm:**
-    1. Calculates daily sales velocity (last 7 days)
-    2. Gets 7-day demand forecast
-    3. Computes optimal reorder quantity
-    4. Marks urgent if stock < 3 days
+    1. Forecasts demand with the shop's forecast model
+    2. Sizes safety stock from the daily demand deviation
+    3. Orders up to the demand of the supplier's lead time plus one review
+       period, plus safety stock
+    4. Groups the orders into one purchase order draft per supplier
+    5. Marks urgent if stock is below the reorder point
 
     **Reorder Calculation:**
-    - Safety Stock = (daily_velocity × lead_time) + 1
-    - Reorder Point = safety_stock + (forecast_7day / 2)
-    - Order Qty = (forecast_7day × 1.5) - current_stock
-    - Returns 0 if already above reorder point
+    - Safety Stock = z(service level) × demand std-dev × √(lead_time + review_days),
+      at least the product's min_stock_level
+    - Reorder Point = lead-time demand + safety_stock
+    - Order-up-to = lead-time + review-period demand + safety_stock,
+      capped at max_stock_level
+    - Order Qty = order-up-to - current_stock, rounded up to the product's
+      reorder_quantity (pack size); 0 if stock is already at the level
+    - Lead time: the supplier's (users.lead_time_days) or REORDER_LEAD_TIME_DAYS
 
     **Use Case:**
     - Never run out of stock
     - Avoid overstocking
     - Optimize purchase orders
 
+    **Caching:** Served from the precomputed AI insights cache
+    (`X-Insights-Cache` header); `fresh=true` recomputes now.
+
     **RBAC:** OWNER (own shop), ADMIN (all shops), STAFF (read-only, own shop)
     """
-    service = ReorderSuggestionService(db)
-    return service.get_reorder_suggestions(shop_id)
+    return await serve_insight(
+        db, response, background_tasks, shop_id, "reorder", fresh=fresh)
 
 
 # ===== LOW STOCK RISK =====
@@ -142,8 +300,17 @@ async def get_reorder_suggestions(
 )
 async def get_low_stock_risk(
     shop_id: int,
-    _: bool = Depends(lambda: verify_shop_access(shop_id)),
-    db: Session = Depends(get_db),
+    response: Response,
+    background_tasks: BackgroundTasks,
+    min_risk: Optional[str] = Query(
+        default=None, pattern="^(CRITICAL|HIGH|MEDIUM|LOW)$",
+        description="Only return risks at this level or more urgent"),
+    limit: Optional[int] = Query(
+        default=None, ge=1, le=1000,
+        description="Only return the N most urgent risks"),
+    fresh: bool = FRESH_QUERY,
+    _: bool = Depends(verify_shop_access),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> LowStockRiskResponse:
     """
@@ -160,15 +327,28 @@ async def get_low_stock_risk(
 
     **ASSUMPTION:** Risk is time-based, not just threshold.
 
+    Risks are returned most urgent first. `min_risk` and `limit` trim the
+    list; the counts always cover every product.
+
     **Use Case:**
     - Identify critical shortages
     - Prevent stockouts
     - Prioritize purchasing
 
+    **Caching:** Served from the precomputed AI insights cache
+    (`X-Insights-Cache` header); `fresh=true` recomputes now.
+
     **RBAC:** OWNER (own shop), ADMIN (all shops), STAFF (read-only, own shop)
     """
-    service = SmartLowStockAlertService(db)
-    return service.get_low_stock_risks(shop_id)
+    report = await serve_insight(
+        db, response, background_tasks, shop_id, "low_stock_risk", fresh=fresh)
+    risks = report.risks
+    if min_risk is not None:
+        risks = [risk for risk in risks if RISK_LEVELS.index(risk.risk_level) <=
+                 RISK_LEVELS.index(min_risk)]
+    if limit is not None:
+        risks = risks[:limit]
+    return report.model_copy(update={"risks": risks})
 
 
 # ===== ANOMALY DETECTION =====
@@ -181,26 +361,35 @@ async def get_low_stock_risk(
 )
 async def detect_stock_anomalies(
     shop_id: int,
-    days_back: int = Query(default=7, ge=1, le=30),
-    _: bool = Depends(lambda: verify_shop_access(shop_id)),
-    db: Session = Depends(get_db),
+    response: Response,
+    background_tasks: BackgroundTasks,
+    days_back: int = Query(default=7, ge=1, le=90),
+    window: int = Query(default=14, ge=3, le=60),
+    method: str = Query(default="mad", pattern="^(mad|zscore)$"),
+    fresh: bool = FRESH_QUERY,
+    _: bool = Depends(verify_shop_access),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> AnomalyDetectionResponse:
     """
     Detect abnormal stock changes.
 
     **Algorithm:**
-    1. Fetches sales data from last N days
-    2. Calculates expected vs. actual stock change
-    3. Flags deviations > 30% as anomalies
-    4. Classifies by severity (LOW → CRITICAL)
-    5. Suggests possible causes
+    1. Fetches daily sales for the last N days plus a baseline window
+    2. Scores each day against the previous `window` days (rolling z-score)
+    3. Flags sales spikes and drops
+    4. Compares expected vs. actual stock change from stock movements
+       (adjustments, damage) and flags losses > 10% of sales
+    5. Classifies by severity (LOW → CRITICAL)
+    6. Suggests possible causes
 
     **Severity Levels:**
     - CRITICAL: Loss > 50% of sales (potential theft)
     - HIGH: Loss > 30% of sales (significant discrepancy)
     - MEDIUM: Loss > 10% of sales (minor inconsistency)
-    - LOW: Normal variance
+    - LOW: Unusual drop in sales
+
+    Sales spikes are MEDIUM, or HIGH when twice the z-score threshold.
 
     **Possible Causes:**
     - Potential theft or shrinkage
@@ -214,12 +403,19 @@ async def detect_stock_anomalies(
     - Monitor stock accuracy
 
     **Query Parameters:**
-    - days_back: Period to analyze (1-30 days, default 7)
+    - days_back: Period to analyze (1-90 days, default 7)
+    - window: Baseline days each day is compared with (3-60, default 14)
+    - method: `mad` (median / median absolute deviation, default) or
+      `zscore` (mean / standard deviation)
+
+    **Caching:** Served from the precomputed AI insights cache
+    (`X-Insights-Cache` header); `fresh=true` recomputes now.
 
     **RBAC:** OWNER (own shop), ADMIN (all shops), STAFF (read-only, own shop)
     """
-    service = AnomalyDetectionService(db)
-    return service.detect_anomalies(shop_id, days_back=days_back)
+    return await serve_insight(
+        db, response, background_tasks, shop_id, "anomalies",
+        {"days_back": days_back, "window": window, "method": method}, fresh=fresh)
 
 
 # ===== HEALTH CHECK =====
@@ -1,9 +1,11 @@
 """AI schemas - Pydantic models for AI features"""
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import List, Optional
 from decimal import Decimal
 
+from .forecast_models import AUTO_MODEL, FORECAST_MODELS
+
 
 # ===== DEMAND FORECASTING =====
 
@@ -12,7 +14,7 @@ class DailyForecast(BaseModel):
     date: str  # YYYY-MM-DD
     predicted_quantity: int
     confidence: float  # 0.0 to 1.0
-    method: str  # "moving_average" or "linear_regression"
+    method: str  # a forecast_models.FORECAST_MODELS name, or "no_data"
 
 
 class ProductForecast(BaseModel):
@@ -35,6 +37,47 @@ class ForecastResponse(BaseModel):
     products: List[ProductForecast]
 
 
+class ModelAccuracy(BaseModel):
+    """Rolling backtest accuracy of one forecasting model"""
+    model: str
+    description: str
+    wape: float  # weighted absolute percentage error (%)
+    mape: float  # mean absolute percentage error over days that sold (%)
+    products_best: int  # products this model forecasts best ('auto' uses it)
+
+
+class ForecastAccuracyResponse(BaseModel):
+    """Accuracy of every forecasting model on the shop's recent sales"""
+    shop_id: int
+    generated_at: datetime
+    selected_model: str
+    horizon_days: int
+    backtest_origins: int  # weeks forecast from the history before each
+    products_evaluated: int
+    models: List[ModelAccuracy]
+
+
+class ForecastModelUpdate(BaseModel):
+    """Select the shop's forecasting model"""
+    model: str = Field(..., description="A model name, or 'auto' (best per product)")
+
+    @field_validator("model")
+    @classmethod
+    def validate_model(cls, v):
+        """Must be a registered model or 'auto'"""
+        if v != AUTO_MODEL and v not in FORECAST_MODELS:
+            raise ValueError(
+                f"Unknown model; choose one of {[AUTO_MODEL, *FORECAST_MODELS]}")
+        return v
+
+
+class ForecastModelSetting(BaseModel):
+    """The shop's forecasting model"""
+    shop_id: int
+    forecast_model: str
+    available_models: List[str]
+
+
 # ===== REORDER SUGGESTIONS =====
 
 class ReorderSuggestion(BaseModel):
@@ -46,7 +89,32 @@ class ReorderSuggestion(BaseModel):
     days_stock_left: float  # at current velocity
     forecasted_7day_demand: int
     suggested_reorder_qty: int
-    urgent: bool  # True if stock < 3 days
+    urgent: bool  # True if stock is below the reorder point
+    supplier_id: Optional[int] = None
+    lead_time_days: int = 1
+    safety_stock: int = 0
+    reorder_point: int = 0  # lead-time demand + safety stock
+    order_up_to: int = 0  # lead-time + review-period demand + safety stock
+
+
+class PurchaseOrderLine(BaseModel):
+    """One product of a purchase order draft"""
+    product_id: int
+    product_name: str
+    quantity: int
+    unit_cost: Decimal
+    line_total: Decimal
+
+
+class PurchaseOrderDraft(BaseModel):
+    """Suggested order to one supplier"""
+    supplier_id: Optional[int] = None  # None: products without a supplier
+    supplier_name: Optional[str] = None
+    lead_time_days: int  # longest lead time of the lines
+    expected_delivery: str  # YYYY-MM-DD
+    total_quantity: int
+    total_cost: Decimal
+    lines: List[PurchaseOrderLine]
 
 
 class ReorderResponse(BaseModel):
@@ -56,6 +124,9 @@ class ReorderResponse(BaseModel):
     total_suggestions: int
     urgent_count: int
     suggestions: List[ReorderSuggestion]
+    service_level: float = 0.95
+    review_days: int = 7
+    purchase_orders: List[PurchaseOrderDraft] = []
 
 
 # ===== LOW-STOCK RISK =====
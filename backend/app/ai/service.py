@@ -1,44 +1,78 @@
 """AI service - Core business logic for all AI features"""
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import List, Optional
 from decimal import Decimal
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
+from shared.config import get_settings
 from shared.models import (
-    Order, OrderItem, Inventory, Product, Shop
+    Inventory, Product, Shop
 )
 from .schemas import (
     DailyForecast, ProductForecast, ForecastResponse,
-    ReorderSuggestion, ReorderResponse,
+    ModelAccuracy, ForecastAccuracyResponse,
+    ReorderSuggestion, ReorderResponse, PurchaseOrderLine, PurchaseOrderDraft,
     StockRisk, LowStockRiskResponse,
     AnomalyEvent, AnomalyDetectionResponse
 )
 from .utils import (
-    calculate_moving_average, linear_regression_forecast,
-    calculate_daily_velocity, calculate_days_stock_left,
-    calculate_reorder_quantity, detect_stock_anomalies,
-    get_anomaly_causes, classify_stock_risk, forecast_confidence,
-    get_date_range_string, get_7_days_ago, get_14_days_ago
+    calculate_moving_average,
+    calculate_daily_velocity, detect_stock_anomalies,
+    get_anomaly_causes, forecast_confidence,
+    get_date_range_string, get_7_days_ago
 )
+from .forecasting import (
+    load_sales_matrix, pivot_daily, units_sold_since, moving_averages
+)
+from .forecast_models import (
+    AUTO_MODEL, FORECAST_MODELS, HORIZON, backtest, forecast_products,
+    history_days_for
+)
+from .anomaly import (
+    load_unexplained_movements, rolling_scores, loss_severities
+)
+from .risk import (
+    RISK_LEVELS, load_stock_levels, days_until_minimum, classify_risks
+)
+from .reorder import (
+    load_reorder_items, demand_deviations, plan_orders, service_level_z
+)
+
+settings = get_settings()
 
 
 class DemandForecastingService:
-    """Service for demand forecasting using moving average and linear regression"""
+    """Service for demand forecasting with the shop's selected model (forecast_models.py)"""
 
     def __init__(self, db: Session):
         self.db = db
 
-    def get_product_forecast(self, product_id: int, shop_id: int) -> Optional[ProductForecast]:
+    def get_forecast_model(self, shop_id: int) -> str:
+        """The shop's forecasting model (Settings.FORECAST_MODEL when unset)"""
+        shop = self.db.get(Shop, shop_id)
+        model = shop.forecast_model if shop is not None else None
+        if model != AUTO_MODEL and model not in FORECAST_MODELS:
+            model = settings.FORECAST_MODEL
+        return model
+
+    def get_product_forecast(
+        self,
+        product_id: int,
+        shop_id: int,
+        as_of: Optional[datetime] = None,
+    ) -> Optional[ProductForecast]:
         """
         Generate 7-day demand forecast for a product.
 
         Algorithm:
-        1. Fetch last 7-14 days of sales data for product in this shop
+        1. Fetch the sales history the shop's forecast model needs
         2. Calculate moving average (baseline)
-        3. Apply linear regression for trend
-        4. Generate 7-day forecast
-        5. Calculate confidence based on data quality
+        3. Forecast the next 7 days with the model
+        4. Calculate confidence based on data quality
+
+        Args:
+            as_of: Forecast as if today were this day (backtests; default now)
 
         Returns: ProductForecast or None if insufficient data
         """
@@ -53,11 +87,14 @@ class DemandForecastingService:
         ).first()
         current_stock = inventory.quantity if inventory else 0
 
-        # Fetch historical sales (last 14 days)
-        two_weeks_ago = get_14_days_ago()
-        daily_sales = self._get_daily_sales_by_product(
-            product_id, shop_id, two_weeks_ago, datetime.now()
-        )
+        # Fetch historical sales (as far back as the model reads)
+        model = self.get_forecast_model(shop_id)
+        today = as_of or datetime.now()
+        sales = load_sales_matrix(
+            self.db, shop_id,
+            today - timedelta(days=history_days_for(model) - 1), today,
+            product_ids=[product_id])
+        daily_sales = [int(qty) for qty in sales.quantities[0]]
 
         if not daily_sales:
             # No sales history - use stock buffer
@@ -65,13 +102,13 @@ class DemandForecastingService:
                 product_id=product_id,
                 product_name=product.name,
                 forecast_period=get_date_range_string(
-                    datetime.now(), datetime.now() + timedelta(days=7)
+                    today, today + timedelta(days=7)
                 ),
                 current_stock=current_stock,
                 historical_daily_avg=0.0,
                 forecasts=[
                     DailyForecast(
-                        date=(datetime.now() + timedelta(days=i)
+                        date=(today + timedelta(days=i)
                               ).strftime('%Y-%m-%d'),
                         predicted_quantity=0,
                         confidence=0.5,
@@ -86,20 +123,20 @@ class DemandForecastingService:
         daily_avg = calculate_moving_average(daily_sales, window=7)
         confidence = forecast_confidence(len(daily_sales))
 
-        # Generate forecast using linear regression
-        forecast_quantities = linear_regression_forecast(
-            daily_sales, days_ahead=7)
+        # Generate forecast with the shop's model
+        predicted, methods = forecast_products(
+            sales.quantities, sales.start_date, model, horizon=HORIZON)
+        forecast_quantities = predicted[0].tolist()
 
         # Create daily forecasts
         forecasts = []
-        today = datetime.now()
         for i, qty in enumerate(forecast_quantities):
             forecast_date = today + timedelta(days=i+1)
             forecasts.append(DailyForecast(
                 date=forecast_date.strftime('%Y-%m-%d'),
                 predicted_quantity=qty,
                 confidence=confidence,
-                method="linear_regression"
+                method=methods[0]
             ))
 
         return ProductForecast(
@@ -113,177 +150,243 @@ class DemandForecastingService:
             total_predicted_7day=sum(forecast_quantities)
         )
 
-    def forecast_all_products(self, shop_id: int) -> ForecastResponse:
-        """Generate 7-day forecast for all active products in shop"""
-        # Get all products sold in this shop (last 14 days)
-        products = self.db.query(Product).join(
-            OrderItem
-        ).join(
-            Order
-        ).filter(
-            Order.shop_id == shop_id,
-            Order.order_date >= get_14_days_ago(),
-            Order.order_status.in_(["DELIVERED", "PLACED"])
-        ).distinct().all()
+    def forecast_all_products(
+        self,
+        shop_id: int,
+        model: Optional[str] = None,
+        as_of: Optional[datetime] = None,
+    ) -> ForecastResponse:
+        """Generate 7-day forecast for all products sold in the model's history
+
+        All products are forecast at once: a single (product, day, qty)
+        aggregate pivoted into a matrix (see forecasting.py), plus one query
+        each for names and stock - not one sales query per product.
+
+        Args:
+            model: Forecast model name or 'auto' (default: the shop's model)
+            as_of: Forecast as if today were this day (backtests; default now)
+        """
+        model = model or self.get_forecast_model(shop_id)
+        today = as_of or datetime.now()
+        sales = load_sales_matrix(
+            self.db, shop_id,
+            today - timedelta(days=history_days_for(model) - 1), today)
+        product_ids = sales.product_ids
+
+        names = dict(self.db.query(Product.id, Product.name).filter(
+            Product.id.in_(product_ids)
+        ).all()) if product_ids else {}
+
+        # First inventory row per product, as get_product_forecast reads it
+        stock = {}
+        if product_ids:
+            for product_id, quantity in self.db.query(
+                Inventory.product_id, Inventory.quantity
+            ).filter(
+                Inventory.shop_id == shop_id,
+                Inventory.product_id.in_(product_ids)
+            ).order_by(Inventory.id):
+                stock.setdefault(product_id, quantity)
+
+        averages = moving_averages(sales.quantities, window=7)
+        predicted, methods = forecast_products(
+            sales.quantities, sales.start_date, model, horizon=HORIZON)
+        confidence = forecast_confidence(sales.quantities.shape[1])
+        dates = [(today + timedelta(days=i + 1)).strftime('%Y-%m-%d')
+                 for i in range(7)]
+        forecast_period = get_date_range_string(
+            today, today + timedelta(days=7))
 
         forecasts = []
-        for product in products:
-            forecast = self.get_product_forecast(product.id, shop_id)
-            if forecast:
-                forecasts.append(forecast)
+        for row, product_id in enumerate(product_ids):
+            if product_id not in names:
+                continue
+            quantities = predicted[row].tolist()
+            forecasts.append(ProductForecast(
+                product_id=product_id,
+                product_name=names[product_id],
+                forecast_period=forecast_period,
+                current_stock=stock.get(product_id, 0),
+                historical_daily_avg=round(float(averages[row]), 2),
+                forecasts=[
+                    DailyForecast(
+                        date=forecast_date,
+                        predicted_quantity=qty,
+                        confidence=confidence,
+                        method=methods[row]
+                    )
+                    for forecast_date, qty in zip(dates, quantities)
+                ],
+                total_predicted_7day=sum(quantities)
+            ))
 
         return ForecastResponse(
             shop_id=shop_id,
-            generated_at=datetime.now(),
-            forecast_start_date=(
-                datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'),
+            generated_at=today,
+            forecast_start_date=dates[0],
             total_products_forecasted=len(forecasts),
             products=forecasts
         )
 
-    def _get_daily_sales_by_product(
-        self, product_id: int, shop_id: int,
-        start_date: datetime, end_date: datetime
-    ) -> List[int]:
-        """
-        Fetch daily sales quantities for a product in a shop.
+    def get_forecast_accuracy(self, shop_id: int) -> ForecastAccuracyResponse:
+        """Rolling backtest of every forecast model on the shop's sales
 
-        Returns list of quantities, one per day (ordered by date)
+        Each of the last weeks is forecast from the history before it;
+        WAPE / MAPE compare the forecasts with what sold.
         """
-        # Get all sales in date range
-        sales_by_date = self.db.query(
-            func.date(Order.order_date).label('sale_date'),
-            func.sum(OrderItem.quantity).label('total_qty')
-        ).join(
-            OrderItem
-        ).filter(
-            OrderItem.product_id == product_id,
-            Order.shop_id == shop_id,
-            Order.order_date >= start_date,
-            Order.order_date <= end_date,
-            Order.order_status.in_(["DELIVERED", "PLACED"])
-        ).group_by(
-            func.date(Order.order_date)
-        ).order_by(
-            func.date(Order.order_date)
-        ).all()
-
-        # Fill missing dates with 0
-        result = []
-        current_date = start_date.date()
-        end_date_only = end_date.date()
-        sales_dict = {row[0]: row[1] or 0 for row in sales_by_date}
-
-        while current_date <= end_date_only:
-            result.append(sales_dict.get(current_date, 0))
-            current_date += timedelta(days=1)
-
-        return result
+        today = datetime.now()
+        sales = load_sales_matrix(
+            self.db, shop_id,
+            today - timedelta(days=history_days_for(AUTO_MODEL) - 1), today)
+        result = backtest(sales.quantities, sales.start_date, horizon=HORIZON)
+        best = np.bincount(result.best_models(), minlength=len(result.models))
+        wape, mape = result.wape(), result.mape()
+
+        return ForecastAccuracyResponse(
+            shop_id=shop_id,
+            generated_at=today,
+            selected_model=self.get_forecast_model(shop_id),
+            horizon_days=HORIZON,
+            backtest_origins=result.origins,
+            products_evaluated=len(sales.product_ids),
+            models=[
+                ModelAccuracy(
+                    model=name,
+                    description=FORECAST_MODELS[name].description,
+                    wape=round(float(wape[m]), 2),
+                    mape=round(float(mape[m]), 2),
+                    products_best=int(best[m])
+                )
+                for m, name in enumerate(result.models)
+            ]
+        )
 
 
 class ReorderSuggestionService:
-    """Service for generating reorder suggestions based on stock velocity"""
+    """Service for reorder suggestions and supplier purchase order drafts"""
 
     def __init__(self, db: Session):
         self.db = db
         self.forecast_service = DemandForecastingService(db)
 
-    def get_reorder_suggestions(self, shop_id: int) -> ReorderResponse:
+    def get_reorder_suggestions(
+        self,
+        shop_id: int,
+        as_of: Optional[datetime] = None,
+    ) -> ReorderResponse:
         """
         Generate reorder suggestions for all products.
 
-        Algorithm:
-        1. For each product in shop:
-           a. Get current stock
-           b. Calculate daily sales velocity (last 7 days)
-           c. Calculate days of stock left
-           d. Get 7-day forecast
-           e. Calculate optimal reorder quantity
-           f. Mark as URGENT if stock < 3 days
+        Algorithm (one pass over the shop's SKUs, see reorder.py):
+        1. Load stock, reorder settings and supplier lead times (one query)
+        2. Load daily sales of every product (one query)
+        3. Forecast demand over the longest lead time + review period with
+           the shop's forecast model
+        4. Size safety stock from the demand deviation and service level
+        5. Order up to lead-time + review-period demand + safety stock
+        6. Group the orders into one purchase order draft per supplier
+        7. Mark urgent if stock is below the reorder point
+
+        Args:
+            as_of: Suggest as if today were this day (backtests; default now)
 
         Returns: ReorderResponse with all suggestions
         """
-        # Get all active products in shop
-        products = self.db.query(Product).join(
-            Inventory
-        ).filter(
-            Inventory.shop_id == shop_id
-        ).all()
-
-        suggestions = []
-        urgent_count = 0
-
-        for product in products:
-            suggestion = self._suggest_reorder_for_product(product.id, shop_id)
-            if suggestion:
-                suggestions.append(suggestion)
-                if suggestion.urgent:
-                    urgent_count += 1
+        today = as_of or datetime.now()
+        review_days = settings.REORDER_REVIEW_DAYS
+        items = load_reorder_items(self.db, shop_id, settings.REORDER_LEAD_TIME_DAYS)
+        if not items.product_ids:
+            return ReorderResponse(
+                shop_id=shop_id, generated_at=today, total_suggestions=0,
+                urgent_count=0, suggestions=[],
+                service_level=settings.REORDER_SERVICE_LEVEL,
+                review_days=review_days
+            )
+
+        model = self.forecast_service.get_forecast_model(shop_id)
+        history_days = max(history_days_for(model),
+                           settings.REORDER_DEMAND_DEVIATION_DAYS)
+        sales = load_sales_matrix(
+            self.db, shop_id, today - timedelta(days=history_days - 1), today,
+            product_ids=items.product_ids)
+        horizon = max(HORIZON, int(items.lead_times.max()) + review_days)
+        forecasts, _ = forecast_products(
+            sales.quantities, sales.start_date, model, horizon=horizon)
+        plan = plan_orders(
+            items, forecasts,
+            demand_deviations(sales.quantities, settings.REORDER_DEMAND_DEVIATION_DAYS),
+            review_days, service_level_z(settings.REORDER_SERVICE_LEVEL))
+
+        velocities = sales.quantities[:, -7:].sum(axis=1) / 7.0
+        days_left = days_until_minimum(
+            items.quantities, np.zeros_like(items.quantities), velocities)
+        urgent = items.quantities < plan.reorder_points
+        forecast_7day = forecasts[:, :HORIZON].sum(axis=1)
+
+        suggestions = [
+            ReorderSuggestion(
+                product_id=product_id,
+                product_name=items.product_names[row],
+                current_stock=int(items.quantities[row]),
+                daily_sales_velocity=round(float(velocities[row]), 2),
+                days_stock_left=round(float(days_left[row]), 1),
+                forecasted_7day_demand=int(forecast_7day[row]),
+                suggested_reorder_qty=int(plan.order_quantities[row]),
+                urgent=bool(urgent[row]),
+                supplier_id=items.supplier_ids[row],
+                lead_time_days=int(items.lead_times[row]),
+                safety_stock=int(plan.safety_stock[row]),
+                reorder_point=int(plan.reorder_points[row]),
+                order_up_to=int(plan.order_up_to[row])
+            )
+            for row, product_id in enumerate(items.product_ids)
+        ]
 
         # Sort by urgency
         suggestions.sort(key=lambda x: (not x.urgent, x.days_stock_left))
 
         return ReorderResponse(
             shop_id=shop_id,
-            generated_at=datetime.now(),
+            generated_at=today,
             total_suggestions=len(suggestions),
-            urgent_count=urgent_count,
-            suggestions=suggestions
+            urgent_count=int(urgent.sum()),
+            suggestions=suggestions,
+            service_level=settings.REORDER_SERVICE_LEVEL,
+            review_days=review_days,
+            purchase_orders=self._purchase_orders(items, plan, today)
         )
 
-    def _suggest_reorder_for_product(
-        self, product_id: int, shop_id: int
-    ) -> Optional[ReorderSuggestion]:
-        """Generate reorder suggestion for single product"""
-        # Get product and inventory
-        inventory = self.db.query(Inventory).filter_by(
-            product_id=product_id, shop_id=shop_id
-        ).first()
-        if not inventory:
-            return None
-
-        product = inventory.product
-        current_stock = inventory.quantity
-
-        # Calculate daily velocity (last 7 days)
-        seven_days_ago = get_7_days_ago()
-        daily_sales_by_date = self.db.query(
-            func.sum(OrderItem.quantity).label('total_qty')
-        ).join(
-            Order
-        ).filter(
-            OrderItem.product_id == product_id,
-            Order.shop_id == shop_id,
-            Order.order_date >= seven_days_ago,
-            Order.order_status.in_(["DELIVERED", "PLACED"])
-        ).scalar() or 0
-
-        daily_velocity = daily_sales_by_date / 7.0 if daily_sales_by_date > 0 else 0.0
-
-        # Get 7-day forecast
-        forecast = self.forecast_service.get_product_forecast(
-            product_id, shop_id)
-        forecasted_7day = forecast.total_predicted_7day if forecast else 0
-
-        # Calculate stock left and reorder qty
-        days_left = calculate_days_stock_left(current_stock, daily_velocity)
-        reorder_qty = calculate_reorder_quantity(
-            current_stock, daily_velocity, forecasted_7day, lead_time_days=1
-        )
-
-        # Mark urgent if < 3 days
-        urgent = days_left < 3
-
-        return ReorderSuggestion(
-            product_id=product_id,
-            product_name=product.name,
-            current_stock=current_stock,
-            daily_sales_velocity=round(daily_velocity, 2),
-            days_stock_left=round(days_left, 1),
-            forecasted_7day_demand=forecasted_7day,
-            suggested_reorder_qty=reorder_qty,
-            urgent=urgent
-        )
+    @staticmethod
+    def _purchase_orders(items, plan, today: datetime) -> List[PurchaseOrderDraft]:
+        """One draft per supplier with the products to order, unassigned last"""
+        rows_by_supplier = {}
+        for row in np.flatnonzero(plan.order_quantities).tolist():
+            rows_by_supplier.setdefault(items.supplier_ids[row], []).append(row)
+
+        drafts = []
+        for supplier_id, rows in rows_by_supplier.items():
+            lead_time = int(items.lead_times[rows].max())
+            lines = [
+                PurchaseOrderLine(
+                    product_id=items.product_ids[row],
+                    product_name=items.product_names[row],
+                    quantity=int(plan.order_quantities[row]),
+                    unit_cost=items.unit_costs[row],
+                    line_total=items.unit_costs[row] * int(plan.order_quantities[row])
+                )
+                for row in rows
+            ]
+            drafts.append(PurchaseOrderDraft(
+                supplier_id=supplier_id,
+                supplier_name=items.supplier_names[rows[0]],
+                lead_time_days=lead_time,
+                expected_delivery=(today + timedelta(days=lead_time)).strftime('%Y-%m-%d'),
+                total_quantity=sum(line.quantity for line in lines),
+                total_cost=sum((line.line_total for line in lines), Decimal("0")),
+                lines=lines
+            ))
+        drafts.sort(key=lambda d: (d.supplier_id is None, d.supplier_name or "", d.supplier_id or 0))
+        return drafts
 
 
 class SmartLowStockAlertService:
@@ -292,85 +395,68 @@ class SmartLowStockAlertService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_low_stock_risks(self, shop_id: int) -> LowStockRiskResponse:
+    def get_low_stock_risks(
+        self,
+        shop_id: int,
+        min_risk: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> LowStockRiskResponse:
         """
         Assess low-stock risk for all products.
 
         ASSUMPTION: Risk is based on time-to-minimum, not just threshold.
 
         Algorithm:
-        1. For each product:
-           a. Get current stock vs minimum
-           b. Calculate daily velocity
-           c. Calculate days until minimum at current velocity
-           d. Classify risk level
-           e. Mark if action required
-
-        Returns: LowStockRiskResponse with risk assessments
+        1. Load stock vs minimum for every product (one query)
+        2. Load 7-day units sold for every product (one query)
+        3. Compute velocity and days until minimum for all rows at once
+        4. Classify risk level and mark if action required
+
+        Args:
+            min_risk: Only return risks at this level or more urgent
+            limit: Only return the N most urgent risks
+
+        Returns: LowStockRiskResponse, most urgent first; the counts cover
+        every product whatever the filters
         """
-        inventories = self.db.query(Inventory).filter_by(shop_id=shop_id).all()
+        stock = load_stock_levels(self.db, shop_id)
+        units_sold = units_sold_since(self.db, shop_id, get_7_days_ago())
+
+        velocities = np.array(
+            [units_sold.get(product_id, 0) for product_id in stock.product_ids],
+            dtype=np.float64) / 7.0
+        days = days_until_minimum(
+            stock.quantities, stock.min_quantities, velocities)
+        levels = classify_risks(days)
+        counts = np.bincount(levels, minlength=len(RISK_LEVELS))
+
+        # Most urgent level first, then fewest days left
+        order = np.lexsort((days, levels))
+        if min_risk is not None:
+            order = order[levels[order] <= RISK_LEVELS.index(min_risk)]
+        if limit is not None:
+            order = order[:limit]
 
         risks = []
-        critical_count = 0
-        high_count = 0
-        medium_count = 0
-
-        for inventory in inventories:
-            # Get daily velocity
-            seven_days_ago = get_7_days_ago()
-            daily_sales = self.db.query(
-                func.sum(OrderItem.quantity).label('total_qty')
-            ).join(
-                Order
-            ).filter(
-                OrderItem.product_id == inventory.product_id,
-                Order.shop_id == shop_id,
-                Order.order_date >= seven_days_ago,
-                Order.order_status.in_(["DELIVERED", "PLACED"])
-            ).scalar() or 0
-
-            daily_velocity = daily_sales / 7.0
-
-            # Calculate days until minimum
-            if daily_velocity > 0:
-                stock_above_minimum = max(
-                    0, inventory.quantity - inventory.min_quantity)
-                days_until_min = stock_above_minimum / daily_velocity
-            else:
-                days_until_min = 999
-
-            # Classify risk
-            risk_level = classify_stock_risk(days_until_min)
-
-            if risk_level == "CRITICAL":
-                critical_count += 1
-            elif risk_level == "HIGH":
-                high_count += 1
-            elif risk_level == "MEDIUM":
-                medium_count += 1
-
-            risk = StockRisk(
-                product_id=inventory.product_id,
-                product_name=inventory.product.name,
-                current_stock=inventory.quantity,
-                min_stock_level=inventory.min_quantity,
-                daily_velocity=round(daily_velocity, 2),
-                days_until_minimum=round(days_until_min, 1),
+        for i in order.tolist():
+            risk_level = RISK_LEVELS[levels[i]]
+            risks.append(StockRisk(
+                product_id=stock.product_ids[i],
+                product_name=stock.product_names[i],
+                current_stock=int(stock.quantities[i]),
+                min_stock_level=int(stock.min_quantities[i]),
+                daily_velocity=round(float(velocities[i]), 2),
+                days_until_minimum=round(float(days[i]), 1),
                 risk_level=risk_level,
                 action_required=risk_level in ["CRITICAL", "HIGH"]
-            )
-            risks.append(risk)
-
-        # Sort by risk level
-        risk_order = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}
-        risks.sort(key=lambda x: risk_order[x.risk_level])
+            ))
 
         return LowStockRiskResponse(
             shop_id=shop_id,
             generated_at=datetime.now(),
-            critical_count=critical_count,
-            high_risk_count=high_count,
-            medium_risk_count=medium_count,
+            critical_count=int(counts[0]),
+            high_risk_count=int(counts[1]),
+            medium_risk_count=int(counts[2]),
             risks=risks
         )
 
@@ -382,22 +468,27 @@ class AnomalyDetectionService:
         self.db = db
 
     def detect_anomalies(
-        self, shop_id: int, days_back: int = 7
+        self,
+        shop_id: int,
+        days_back: int = 7,
+        window: int = 14,
+        method: str = "mad",
+        threshold: float = 3.5,
     ) -> AnomalyDetectionResponse:
         """
-        Detect stock anomalies (shrinkage, theft, adjustments).
+        Detect stock anomalies (shrinkage, theft, adjustments) and unusual sales.
 
         Algorithm:
-        1. For last N days:
-           a. Get expected stock change (sales recorded)
-           b. Get actual stock change (from inventory snapshots or ledger)
-           c. Calculate deviation
-           d. Classify severity
-           e. Suggest causes
-
-        Currently using a simplified approach:
-        - No inventory snapshots = use order data only
-        - Flag large discrepancies vs. expected sales
+        1. Load daily sales for the period plus a `window`-day baseline
+           (one rollup query) and unexplained stock movements (one query)
+        2. Score each product-day against its previous `window` days
+           (robust z-score via median/MAD, or mean/std z-score)
+        3. Flag sales spikes (against the usual size of a day's sales, so
+           intermittent sellers are judged on the days they sell) and
+           drops (against every day) beyond `threshold`
+        4. Flag days whose adjustment/damage losses exceed 10% of the
+           day's sales (expected vs. actual stock change)
+        5. Load stock details for flagged products only (one query)
 
         Returns: AnomalyDetectionResponse
         """
@@ -406,68 +497,102 @@ class AnomalyDetectionService:
         period_start = today - timedelta(days=days_back)
         total_loss = Decimal('0')
 
-        # Get all order items from period
-        orders_in_period = self.db.query(Order).filter(
-            Order.shop_id == shop_id,
-            Order.order_date >= period_start,
-            Order.order_status.in_(["DELIVERED", "PLACED"])
-        ).all()
-
-        # Group by product to find anomalies
-        product_sales: Dict[int, int] = {}
-        for order in orders_in_period:
-            for item in order.order_items:
-                product_sales[item.product_id] = product_sales.get(
-                    item.product_id, 0) + item.quantity
-
-        # For each product, check if expected matches actual
-        # (Simplified: if no recent sales but stock missing = anomaly)
-        for product_id, total_sales in product_sales.items():
-            inventory = self.db.query(Inventory).filter_by(
-                product_id=product_id, shop_id=shop_id
-            ).first()
-
-            if not inventory:
+        sales = load_sales_matrix(
+            self.db, shop_id, period_start - timedelta(days=window), today)
+        movements = load_unexplained_movements(
+            self.db, shop_id, period_start.date(), today.date())
+
+        # Products that sold or moved, with the sales padded to match
+        product_ids = sorted(
+            set(sales.product_ids) | {row[0] for row in movements})
+        position = {product_id: i for i, product_id in enumerate(product_ids)}
+        quantities = np.zeros((len(product_ids), sales.quantities.shape[1]))
+        quantities[[position[p] for p in sales.product_ids]] = sales.quantities
+
+        # Spikes against the usual demand size, drops against every day
+        sizes, spike_scores = rolling_scores(
+            quantities, window, method, sizes_only=True)
+        baselines, drop_scores = rolling_scores(quantities, window, method)
+        observed = quantities[:, window:]
+        period_days = observed.shape[1]
+        losses = np.maximum(0, -pivot_daily(
+            movements, product_ids, period_start.date(), period_days))
+        severities = loss_severities(losses, observed)
+
+        spikes = spike_scores > threshold
+        drops = drop_scores < -threshold
+        # Today is still selling: too early to call its sales a drop
+        drops[:, -1] = False
+        flagged = spikes | drops | (severities != "")
+        flagged_products = [product_ids[i]
+                            for i in np.flatnonzero(flagged.any(axis=1))]
+
+        stock = {}
+        if flagged_products:
+            stock = {
+                row[0]: row
+                for row in self.db.query(
+                    Inventory.product_id, Product.name, Inventory.quantity,
+                    Inventory.min_quantity, Inventory.cost_price
+                ).join(
+                    Product, Product.id == Inventory.product_id
+                ).filter(
+                    Inventory.shop_id == shop_id,
+                    Inventory.product_id.in_(flagged_products)
+                ).order_by(Inventory.id.desc())
+            }
+
+        first_day = period_start.date()
+        for i, day in zip(*np.nonzero(flagged)):
+            if product_ids[i] not in stock:
                 continue
-
-            product = inventory.product
-
-            # Check for patterns
-            daily_avg = total_sales / max(days_back, 1)
-
-            # Get recent orders for this product
-            recent_orders = [
-                (o.order_date.date(), sum(
-                    item.quantity for item in o.order_items
-                    if item.product_id == product_id
+            product_id, product_name, current_qty, min_qty, cost_price = \
+                stock[product_ids[i]]
+            event_date = str(first_day + timedelta(days=int(day)))
+            actual = int(observed[i, day])
+
+            if spikes[i, day] or drops[i, day]:
+                if spikes[i, day]:
+                    expected = float(sizes[i, day])
+                    severity = "HIGH" if spike_scores[i, day] >= 2 * threshold else "MEDIUM"
+                    causes = ["Bulk order", "High demand day", "Promotional sales"]
+                else:
+                    expected = float(baselines[i, day])
+                    severity = "LOW"
+                    causes = ["Stockout or product not on shelf",
+                              "Unrecorded sales", "Demand shift"]
+                anomalies.append(AnomalyEvent(
+                    date=event_date,
+                    product_id=product_id,
+                    product_name=product_name,
+                    expected_stock_change=int(round(expected)),
+                    actual_stock_change=actual,
+                    deviation=actual - int(round(expected)),
+                    deviation_pct=((actual - expected) / max(expected, 1)) * 100,
+                    severity=severity,
+                    possible_causes=causes
                 ))
-                for o in orders_in_period
-                if any(item.product_id == product_id for item in o.order_items)
-            ]
 
-            # Flag unusual days
-            for order_date, daily_qty in recent_orders:
-                # Check if spike or drought
-                if daily_qty > daily_avg * 3:
-                    # Unusual spike in sales
-                    anomaly = AnomalyEvent(
-                        date=str(order_date),
-                        product_id=product_id,
-                        product_name=product.name,
-                        expected_stock_change=int(daily_avg),
-                        actual_stock_change=daily_qty,
-                        deviation=daily_qty - int(daily_avg),
-                        deviation_pct=((daily_qty - daily_avg) /
-                                       max(daily_avg, 1)) * 100,
-                        severity="MEDIUM",
-                        possible_causes=["Bulk order",
-                                         "High demand day", "Promotional sales"]
-                    )
-                    anomalies.append(anomaly)
+            if severities[i, day]:
+                loss = int(losses[i, day])
+                anomalies.append(AnomalyEvent(
+                    date=event_date,
+                    product_id=product_id,
+                    product_name=product_name,
+                    expected_stock_change=-actual,
+                    actual_stock_change=-(actual + loss),
+                    deviation=loss,
+                    deviation_pct=loss / max(actual, 1) * 100,
+                    severity=str(severities[i, day]),
+                    possible_causes=get_anomaly_causes(
+                        loss, float(baselines[i, day]),
+                        current_qty or 0, min_qty or 0)
+                ))
+                total_loss += Decimal(str(cost_price or 0)) * loss
 
         # Sort by severity
         severity_order = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}
-        anomalies.sort(key=lambda x: severity_order[x.severity])
+        anomalies.sort(key=lambda x: (severity_order[x.severity], x.date))
 
         critical_count = sum(1 for a in anomalies if a.severity == "CRITICAL")
 
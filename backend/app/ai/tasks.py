@@ -0,0 +1,37 @@
+"""Celery path for the AI insights runner (AI_INSIGHTS_RUNNER=celery)
+
+Usage:
+    celery -A app.ai.tasks worker --beat --loglevel=info
+
+One beat schedules the refresh for the whole deployment, instead of every
+API worker running its own asyncio loop. Stale entries served by the API
+are refreshed by these workers too.
+"""
+from typing import Any, Dict, Optional
+
+from celery import Celery
+
+from shared.config import get_settings
+from .insights import refresh_all_shops, revalidate
+
+settings = get_settings()
+
+celery_app = Celery("smartkirana", broker=settings.REDIS_URL)
+celery_app.conf.beat_schedule = {
+    "refresh-ai-insights": {
+        "task": "ai.refresh_ai_insights",
+        "schedule": float(settings.AI_INSIGHTS_REFRESH_SECONDS),
+    },
+}
+
+
+@celery_app.task(name="ai.refresh_ai_insights", ignore_result=True)
+def refresh_ai_insights() -> int:
+    """Refresh the insights of every active shop"""
+    return refresh_all_shops()
+
+
+@celery_app.task(name="ai.refresh_insight", ignore_result=True)
+def refresh_insight(shop_id: int, kind: str, params: Optional[Dict[str, Any]] = None) -> None:
+    """Refresh one stale entry"""
+    revalidate(shop_id, kind, params)
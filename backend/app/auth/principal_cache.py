@@ -0,0 +1,131 @@
+"""In-process cache of authenticated principals (users behind JWTs)"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from shared.config import get_settings
+from shared.models import User
+
+settings = get_settings()
+
+# Secrets are never cached; if a handler reads them they lazy-load from the DB
+UNCACHED_COLUMNS = {
+    "password_hash", "otp_secret", "otp_code", "otp_expiry", "otp_attempts"
+}
+
+
+class PrincipalCache:
+    """Thread-safe TTL + LRU map of (user_id, token_version) -> user columns
+
+    Entries are keyed by the token version the JWT was issued with, so a
+    bumped version (deactivation, role change, password reset) can never be
+    served from the cache. Invalidation is immediate in this process; other
+    worker processes converge within the TTL.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, token_version: int) -> Optional[Dict[str, Any]]:
+        """Return cached column values, or None on miss/expiry"""
+        key = (user_id, token_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return values
+
+    def put(self, user_id: int, token_version: int, values: Dict[str, Any]) -> None:
+        """Cache column values for a user/token version"""
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, token_version)] = (
+                time.monotonic() + self.ttl_seconds, values)
+            self._entries.move_to_end((user_id, token_version))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop every cached version of a user"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def _snapshot(user: User) -> Dict[str, Any]:
+    """Column values safe to keep in memory between requests"""
+    return {
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(User).column_attrs
+        if attr.key not in UNCACHED_COLUMNS
+    }
+
+
+def load_principal(db: Session, user_id: int, token_version: int) -> Optional[User]:
+    """Resolve the active user for a token, hitting the DB only on cache miss
+
+    Returns: a User attached to `db`, or None if the user is missing,
+    inactive or the token version is stale
+    """
+    values = principal_cache.get(user_id, token_version)
+    if values is not None:
+        # Rebuild a persistent instance without a SELECT
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None or not user.is_active:
+        return None
+    if (user.token_version or 0) != token_version:
+        return None
+
+    principal_cache.put(user_id, token_version, _snapshot(user))
+    return user
+
+
+def revoke_user_tokens(user: User) -> None:
+    """Invalidate every token issued to `user` (bumps its token version)"""
+    user.token_version = (user.token_version or 0) + 1
+    principal_cache.invalidate(user.id)
+
+
+def _revoke_on_change(target: User, value, oldvalue, initiator):
+    """Bump token version when a persistent user's credentials/access change"""
+    state = inspect(target)
+    if not state.persistent or value == oldvalue:
+        return
+    revoke_user_tokens(target)
+
+
+def _invalidate_on_update(mapper, connection, target: User):
+    """Any flushed change to a user (e.g. profile edits) drops its entries"""
+    principal_cache.invalidate(target.id)
+
+
+for _attribute in (User.is_active, User.role, User.password_hash):
+    event.listen(_attribute, "set", _revoke_on_change)
+event.listen(User, "after_update", _invalidate_on_update)
@@ -73,7 +73,8 @@ def login(
         data={
             "sub": str(user.id),
             "email": user.email,
-            "role": user.role.value
+            "role": user.role.value,
+            "ver": user.token_version or 0
         },
         expires_delta=access_token_expires
     )
@@ -48,6 +48,7 @@ class TokenData(BaseModel):
     sub: str  # user_id
     email: str
     role: str
+    ver: int = 0  # user token_version at issue time
     exp: Optional[int] = None
 
 
@@ -10,7 +10,12 @@ import os
 
 from app.auth.models import User
 from app.auth.schemas import TokenData
+from app.auth.principal_cache import load_principal
+from shared.config import get_settings
 from shared.database import get_db
+from shared.password_hasher import PasswordHasher
+
+settings = get_settings()
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -21,9 +26,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__rounds=12
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS
 )
 
+# Use from async handlers: hashing runs on a bounded worker pool
+password_hasher = PasswordHasher(pwd_context)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
@@ -66,8 +74,11 @@ def verify_token(token: str) -> TokenData:
 
         if user_id is None or email is None or role is None:
             raise credentials_exception
+        if not str(user_id).isdigit():
+            raise credentials_exception
 
-        token_data = TokenData(sub=user_id, email=email, role=role)
+        token_data = TokenData(sub=user_id, email=email, role=role,
+                              ver=payload.get("ver", 0))
     except JWTError:
         raise credentials_exception
 
@@ -78,11 +89,16 @@ async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> User:
-    """Get current authenticated user from token"""
+    """Get current authenticated user from token
+
+    The user is served from the in-process principal cache when the token's
+    (user id, token version) was seen recently, so most requests skip the
+    users-table lookup.
+    """
     token_data = verify_token(token)
 
-    user = db.query(User).filter(User.id == token_data.sub).first()
-    if user is None or not user.is_active:
+    user = load_principal(db, int(token_data.sub), token_data.ver)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive"
@@ -1,11 +1,18 @@
-"""Business logic for authentication"""
+"""Business logic for authentication
+
+The handlers are sync (they use the sync Session on the threadpool); the
+password hashing itself is handed to the async hasher's bounded pool
+through anyio.from_thread, so it keeps its 429 back-pressure.
+"""
+from anyio import from_thread
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from uuid import UUID
 
 from shared.models import User, RoleEnum
 from app.auth.schemas import UserCreate, UserResponse
-from app.auth.security import hash_password, verify_password
+from app.auth.security import password_hasher
+from shared.password_hasher import save_rehashed_password
 
 
 class AuthService:
@@ -13,7 +20,7 @@ class AuthService:
 
     @staticmethod
     def create_user(db: Session, user_create: UserCreate) -> User:
-        """Create a new user"""
+        """Create a new user (call from a threadpool worker)"""
         # Check if user already exists
         existing_email = db.query(User).filter(
             User.email == user_create.email).first()
@@ -32,7 +39,7 @@ class AuthService:
             )
 
         # Create user with shop_id=1 (default admin shop)
-        password_hash = hash_password(user_create.password)
+        password_hash = from_thread.run(password_hasher.hash, user_create.password)
         db_user = User(
             name=user_create.name,
             email=user_create.email,
@@ -49,10 +56,16 @@ class AuthService:
 
     @staticmethod
     def authenticate_user(db: Session, email: str, password: str) -> User:
-        """Authenticate user by email and password"""
+        """Authenticate user by email and password (call from a threadpool worker)
+
+        A hash made with an outdated scheme or cost is replaced on success.
+        """
         user = db.query(User).filter(User.email == email).first()
 
-        if not user or not verify_password(password, user.password_hash):
+        valid, new_hash = from_thread.run(
+            password_hasher.verify_and_update,
+            password, user.password_hash if user else None)
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
@@ -64,6 +77,10 @@ class AuthService:
                 detail="User account is inactive"
             )
 
+        if new_hash:
+            save_rehashed_password(db, user, new_hash)
+            db.commit()
+
         return user
 
     @staticmethod
@@ -0,0 +1 @@
+# Cart module
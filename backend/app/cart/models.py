@@ -0,0 +1,4 @@
+"""Cart models - Import from shared.models to avoid duplication"""
+from shared.models import Cart, CartItem
+
+__all__ = ["Cart", "CartItem"]
@@ -0,0 +1,65 @@
+"""Cart service - checkout revalidation against current products"""
+from decimal import Decimal
+from typing import List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cart.store import CartStore
+from shared.models import Product
+
+
+class CartService:
+    """Business logic on top of a CartStore"""
+
+    @staticmethod
+    async def revalidate(
+        db: AsyncSession,
+        store: CartStore,
+        cart_key: str,
+    ) -> Tuple[bool, str, List[dict]]:
+        """Check every cart line against the products table in one query
+
+        Prices that changed since the item was added are written back to the
+        cart, and products that are gone or inactive are removed, so the
+        customer sees (and confirms) what they will actually pay.
+
+        Returns: (success, message, lines) - each line carries the current
+        price and its Product; success is False if anything changed or a
+        line cannot be fulfilled
+        """
+        lines = await store.get_lines(cart_key)
+        if not lines:
+            return False, "Cart is empty", []
+
+        products = {
+            product.id: product
+            for product in (await db.scalars(
+                select(Product).where(Product.id.in_(list(lines)))
+            )).all()
+        }
+
+        problems = []
+        repriced = {}
+        checked = []
+        for product_id, line in lines.items():
+            product = products.get(product_id)
+            if product is None or product.is_active is False:
+                problems.append(f"{line['name']} is no longer available")
+                await store.remove_item(cart_key, product_id)
+                continue
+
+            price = Decimal(str(product.selling_price or 0))
+            if price != line["price"]:
+                repriced[product_id] = price
+                problems.append(f"{product.name} is now {price:.2f}")
+            if (product.current_stock or 0) < line["quantity"]:
+                problems.append(f"{product.name} not enough stock")
+
+            checked.append({**line, "price": price, "product": product})
+
+        if repriced:
+            await store.set_prices(cart_key, repriced)
+        if problems:
+            return False, "; ".join(problems), checked
+        return True, "Cart is up to date", checked
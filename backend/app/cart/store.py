@@ -0,0 +1,326 @@
+"""Cart storage backends - database tables or Redis, keyed by browser session"""
+import json
+import secrets
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Optional
+
+from fastapi import Depends
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from app.cart.models import Cart, CartItem
+from shared.config import get_settings
+from shared.database import get_async_db
+
+settings = get_settings()
+
+CART_SESSION_KEY = "cart_key"
+
+
+def get_cart_key(request: Request, create: bool = True) -> Optional[str]:
+    """Cart key stored in the signed session cookie
+
+    The key only identifies the cart; its contents live in the store, so any
+    worker can serve the session (no sticky sessions needed).
+    """
+    cart_key = request.session.get(CART_SESSION_KEY)
+    if cart_key is None and create:
+        cart_key = secrets.token_urlsafe(24)
+        request.session[CART_SESSION_KEY] = cart_key
+    return cart_key
+
+
+class CartStore(ABC):
+    """Cart operations shared by every backend
+
+    Lines are returned as {product_id: {"id", "name", "price", "quantity"}},
+    with the price as a Decimal. Every write pushes the cart's expiry
+    CART_TTL_MINUTES into the future; idle carts are evicted after that.
+    """
+
+    @abstractmethod
+    async def get_lines(self, cart_key: str) -> Dict[int, dict]:
+        """All lines of an unexpired cart (empty if none)"""
+
+    @abstractmethod
+    async def add_item(self, cart_key: str, product_id: int, name: str,
+                       price: Decimal, quantity: int) -> None:
+        """Add `quantity` of a product (keeps the price of an existing line)"""
+
+    @abstractmethod
+    async def set_quantity(self, cart_key: str, product_id: int, quantity: int) -> None:
+        """Change the quantity of an existing line; <= 0 removes it"""
+
+    @abstractmethod
+    async def remove_item(self, cart_key: str, product_id: int) -> None:
+        """Drop one line"""
+
+    @abstractmethod
+    async def set_prices(self, cart_key: str, prices: Dict[int, Decimal]) -> None:
+        """Store revalidated prices for existing lines"""
+
+    @abstractmethod
+    async def count(self, cart_key: Optional[str]) -> int:
+        """Number of lines in the cart, without reading them (header badge)"""
+
+    @abstractmethod
+    async def clear(self, cart_key: str) -> None:
+        """Delete the cart and its lines"""
+
+
+# ===== DATABASE BACKEND =====
+
+class DatabaseCartStore(CartStore):
+    """Carts in the `carts` / `cart_items` tables (writes commit immediately)
+
+    `carts.line_count` is maintained alongside the items, so the badge count
+    is a primary-key lookup. Expired carts are ignored on read, dropped on
+    the next write and removed in bulk by `purge_expired`.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _drop(self, cart_key: str) -> None:
+        await self.db.execute(delete(CartItem).where(CartItem.cart_key == cart_key))
+        await self.db.execute(delete(Cart).where(Cart.cart_key == cart_key))
+
+    async def _touch(self, cart_key: str) -> None:
+        """Extend a live cart's expiry, or start a new (empty) cart"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(minutes=settings.CART_TTL_MINUTES)
+        result = await self.db.execute(
+            update(Cart)
+            .where(Cart.cart_key == cart_key, Cart.expires_at > now)
+            .values(expires_at=expires_at, updated_at=now)
+        )
+        if result.rowcount:
+            return
+
+        await self._drop(cart_key)
+        try:
+            async with self.db.begin_nested():
+                await self.db.execute(insert(Cart).values(
+                    cart_key=cart_key, line_count=0, expires_at=expires_at,
+                    created_at=now, updated_at=now))
+        except IntegrityError:
+            # Another worker started this cart first
+            pass
+
+    async def get_lines(self, cart_key: str) -> Dict[int, dict]:
+        rows = await self.db.execute(
+            select(CartItem)
+            .join(Cart, Cart.cart_key == CartItem.cart_key)
+            .where(CartItem.cart_key == cart_key,
+                   Cart.expires_at > datetime.utcnow())
+            .order_by(CartItem.id)
+        )
+        return {
+            item.product_id: {
+                "id": item.product_id,
+                "name": item.product_name,
+                "price": Decimal(str(item.unit_price)),
+                "quantity": item.quantity,
+            }
+            for item in rows.scalars()
+        }
+
+    async def add_item(self, cart_key: str, product_id: int, name: str,
+                       price: Decimal, quantity: int) -> None:
+        await self._touch(cart_key)
+        line = (CartItem.cart_key == cart_key) & (CartItem.product_id == product_id)
+        result = await self.db.execute(
+            update(CartItem).where(line)
+            .values(quantity=CartItem.quantity + quantity))
+        if not result.rowcount:
+            try:
+                async with self.db.begin_nested():
+                    await self.db.execute(insert(CartItem).values(
+                        cart_key=cart_key, product_id=product_id,
+                        product_name=name, unit_price=price, quantity=quantity,
+                        created_at=datetime.utcnow()))
+                    await self.db.execute(
+                        update(Cart).where(Cart.cart_key == cart_key)
+                        .values(line_count=Cart.line_count + 1))
+            except IntegrityError:
+                # Same product added concurrently; add onto that line
+                await self.db.execute(
+                    update(CartItem).where(line)
+                    .values(quantity=CartItem.quantity + quantity))
+        await self.db.commit()
+
+    async def set_quantity(self, cart_key: str, product_id: int, quantity: int) -> None:
+        if quantity <= 0:
+            return await self.remove_item(cart_key, product_id)
+        await self._touch(cart_key)
+        await self.db.execute(
+            update(CartItem)
+            .where(CartItem.cart_key == cart_key, CartItem.product_id == product_id)
+            .values(quantity=quantity))
+        await self.db.commit()
+
+    async def remove_item(self, cart_key: str, product_id: int) -> None:
+        result = await self.db.execute(
+            delete(CartItem)
+            .where(CartItem.cart_key == cart_key, CartItem.product_id == product_id))
+        if result.rowcount:
+            await self.db.execute(
+                update(Cart).where(Cart.cart_key == cart_key)
+                .values(line_count=Cart.line_count - result.rowcount))
+        await self.db.commit()
+
+    async def set_prices(self, cart_key: str, prices: Dict[int, Decimal]) -> None:
+        for product_id, price in prices.items():
+            await self.db.execute(
+                update(CartItem)
+                .where(CartItem.cart_key == cart_key, CartItem.product_id == product_id)
+                .values(unit_price=price))
+        await self.db.commit()
+
+    async def count(self, cart_key: Optional[str]) -> int:
+        if not cart_key:
+            return 0
+        line_count = await self.db.scalar(
+            select(Cart.line_count)
+            .where(Cart.cart_key == cart_key, Cart.expires_at > datetime.utcnow()))
+        return line_count or 0
+
+    async def clear(self, cart_key: str) -> None:
+        await self._drop(cart_key)
+        await self.db.commit()
+
+    @staticmethod
+    async def purge_expired(db: AsyncSession) -> int:
+        """Delete carts past their expiry (and their items); commits"""
+        expired = select(Cart.cart_key).where(Cart.expires_at <= datetime.utcnow())
+        await db.execute(delete(CartItem).where(CartItem.cart_key.in_(expired)))
+        result = await db.execute(delete(Cart).where(Cart.cart_key.in_(expired)))
+        await db.commit()
+        return result.rowcount
+
+
+# ===== REDIS BACKEND =====
+
+class RedisCartStore(CartStore):
+    """Carts as two Redis hashes per session, both expiring after the TTL
+
+    cart:{key}:qty   product_id -> quantity (HINCRBY, HLEN for the count)
+    cart:{key}:info  product_id -> {"name", "price"} as JSON
+    """
+
+    def __init__(self, client):
+        self.redis = client
+
+    @staticmethod
+    def _keys(cart_key: str):
+        return f"cart:{cart_key}:qty", f"cart:{cart_key}:info"
+
+    async def _write(self, cart_key: str, *commands) -> None:
+        """Run (method, args) commands and refresh the TTL atomically"""
+        ttl = settings.CART_TTL_MINUTES * 60
+        qty_key, info_key = self._keys(cart_key)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for method, args in commands:
+                getattr(pipe, method)(*args)
+            pipe.expire(qty_key, ttl)
+            pipe.expire(info_key, ttl)
+            await pipe.execute()
+
+    async def get_lines(self, cart_key: str) -> Dict[int, dict]:
+        qty_key, info_key = self._keys(cart_key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(qty_key)
+            pipe.hgetall(info_key)
+            quantities, info = await pipe.execute()
+
+        lines = {}
+        for field, quantity in quantities.items():
+            if field not in info:
+                continue
+            details = json.loads(info[field])
+            product_id = int(field)
+            lines[product_id] = {
+                "id": product_id,
+                "name": details["name"],
+                "price": Decimal(details["price"]),
+                "quantity": int(quantity),
+            }
+        return dict(sorted(lines.items()))
+
+    async def add_item(self, cart_key: str, product_id: int, name: str,
+                       price: Decimal, quantity: int) -> None:
+        qty_key, info_key = self._keys(cart_key)
+        details = json.dumps({"name": name, "price": str(price)})
+        await self._write(
+            cart_key,
+            ("hincrby", (qty_key, product_id, quantity)),
+            ("hsetnx", (info_key, product_id, details)),
+        )
+
+    async def set_quantity(self, cart_key: str, product_id: int, quantity: int) -> None:
+        if quantity <= 0:
+            return await self.remove_item(cart_key, product_id)
+        qty_key, _ = self._keys(cart_key)
+        if await self.redis.hexists(qty_key, product_id):
+            await self._write(cart_key, ("hset", (qty_key, product_id, quantity)))
+
+    async def remove_item(self, cart_key: str, product_id: int) -> None:
+        qty_key, info_key = self._keys(cart_key)
+        await self._write(
+            cart_key,
+            ("hdel", (qty_key, product_id)),
+            ("hdel", (info_key, product_id)),
+        )
+
+    async def set_prices(self, cart_key: str, prices: Dict[int, Decimal]) -> None:
+        if not prices:
+            return
+        _, info_key = self._keys(cart_key)
+        current = await self.redis.hmget(info_key, list(prices))
+        mapping = {}
+        for (product_id, price), raw in zip(prices.items(), current):
+            if raw is not None:
+                mapping[product_id] = json.dumps(
+                    {**json.loads(raw), "price": str(price)})
+        if mapping:
+            await self._write(cart_key, *(
+                ("hset", (info_key, product_id, details))
+                for product_id, details in mapping.items()))
+
+    async def count(self, cart_key: Optional[str]) -> int:
+        if not cart_key:
+            return 0
+        qty_key, _ = self._keys(cart_key)
+        return await self.redis.hlen(qty_key)
+
+    async def clear(self, cart_key: str) -> None:
+        await self.redis.delete(*self._keys(cart_key))
+
+
+_redis_client = None
+
+
+def get_redis_client():
+    """Process-wide Redis client for the cart store (created on first use)"""
+    global _redis_client
+    if _redis_client is None:
+        if settings.CART_BACKEND == "fakeredis":
+            # Local stand-in only: one in-memory server per process
+            from fakeredis import aioredis
+            _redis_client = aioredis.FakeRedis(decode_responses=True)
+        else:
+            import redis.asyncio as redis
+            _redis_client = redis.from_url(
+                settings.REDIS_URL, decode_responses=True)
+    return _redis_client
+
+
+async def get_cart_store(db: AsyncSession = Depends(get_async_db)) -> CartStore:
+    """Dependency - the cart store selected by Settings.CART_BACKEND"""
+    if settings.CART_BACKEND in ("redis", "fakeredis"):
+        return RedisCartStore(get_redis_client())
+    return DatabaseCartStore(db)
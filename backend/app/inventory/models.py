@@ -1,6 +1,6 @@
 """Inventory models - import from shared models"""
 # Inventory model is defined in shared.models.Inventory to avoid duplication
 # This module is kept for organization purposes
-from shared.models import Inventory
+from shared.models import Inventory, StockReservation
 
-__all__ = ["Inventory"]
+__all__ = ["Inventory", "StockReservation"]
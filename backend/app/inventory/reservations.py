@@ -0,0 +1,284 @@
+"""Stock reservation service - race-free stock decrements and cart holds"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, insert, update
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.inventory.models import Inventory, StockReservation
+from shared.models import Product
+from shared.config import get_settings
+
+settings = get_settings()
+
+
+class StockReservationService:
+    """Atomic stock decrements and TTL-bound holds on inventory rows
+
+    Every write is a conditional `UPDATE ... SET quantity = quantity - :q
+    WHERE quantity >= :q`, so two concurrent checkouts can never both take
+    the last units. Rows are locked in ascending inventory id order
+    (`SELECT ... FOR UPDATE` where the database supports it) so concurrent
+    baskets cannot deadlock on each other.
+
+    Methods here do not commit unless stated; callers own the transaction
+    and must roll back when a decrement reports failure.
+    """
+
+    @staticmethod
+    def lock_inventory_rows(
+        db: Session,
+        shop_id: int,
+        product_ids: List[int],
+    ) -> Dict[int, Inventory]:
+        """Load (and lock, on PostgreSQL) the first inventory row per product
+
+        Rows already in the session are overwritten with the database values,
+        since the conditional updates below bypass the identity map.
+
+        Returns: {product_id: inventory}
+        """
+        rows = db.query(Inventory).filter(
+            and_(
+                Inventory.shop_id == shop_id,
+                Inventory.product_id.in_(sorted(set(product_ids)))
+            )
+        ).order_by(Inventory.id).with_for_update().populate_existing().all()
+
+        inventory_by_product: Dict[int, Inventory] = {}
+        for inventory in rows:
+            inventory_by_product.setdefault(inventory.product_id, inventory)
+        return inventory_by_product
+
+    @staticmethod
+    def decrement_stock(db: Session, quantities: Dict[int, int]) -> bool:
+        """Atomically take stock from inventory rows
+
+        Args:
+            quantities: {inventory_id: quantity_to_take}
+
+        Returns:
+            True if every row had enough stock. On False nothing useful was
+            written and the caller must roll back.
+        """
+        quantities = {k: v for k, v in quantities.items() if v > 0}
+        if not quantities:
+            return True
+
+        delta = case(quantities, value=Inventory.id)
+        result = db.execute(
+            update(Inventory)
+            .where(
+                Inventory.id.in_(sorted(quantities)),
+                Inventory.quantity >= delta
+            )
+            .values(quantity=Inventory.quantity - delta,
+                    last_updated=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == len(quantities)
+
+    @staticmethod
+    def decrement_product_stock(db: Session, quantities: Dict[int, int]) -> bool:
+        """Atomically take storefront stock (products.current_stock)
+
+        Args:
+            quantities: {product_id: quantity_to_take}
+
+        Returns:
+            True if every product had enough stock. On False the caller must
+            roll back.
+        """
+        quantities = {k: v for k, v in quantities.items() if v > 0}
+        if not quantities:
+            return True
+
+        delta = case(quantities, value=Product.id)
+        result = db.execute(
+            update(Product)
+            .where(
+                Product.id.in_(sorted(quantities)),
+                Product.current_stock >= delta
+            )
+            .values(current_stock=Product.current_stock - delta)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == len(quantities)
+
+    @staticmethod
+    def increment_stock(db: Session, quantities: Dict[int, int]) -> None:
+        """Atomically return stock to inventory rows ({inventory_id: quantity})"""
+        quantities = {k: v for k, v in quantities.items() if v > 0}
+        if not quantities:
+            return
+
+        delta = case(quantities, value=Inventory.id)
+        db.execute(
+            update(Inventory)
+            .where(Inventory.id.in_(sorted(quantities)))
+            .values(quantity=Inventory.quantity + delta,
+                    last_updated=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    # ===== CART HOLDS =====
+
+    @staticmethod
+    def hold_stock(
+        db: Session,
+        shop_id: int,
+        hold_key: str,
+        items: List[Tuple[int, int]],  # [(product_id, quantity), ...]
+        ttl_minutes: Optional[int] = None,
+    ) -> Tuple[bool, str]:
+        """Reserve stock for a cart until it expires, then commit
+
+        Returns: (success, message)
+        """
+        requested: Dict[int, int] = {}
+        for product_id, quantity in items:
+            requested[product_id] = requested.get(product_id, 0) + quantity
+
+        inventory = StockReservationService.lock_inventory_rows(
+            db, shop_id, list(requested))
+
+        missing = [pid for pid in requested if pid not in inventory]
+        if missing:
+            db.rollback()
+            return False, f"Product {missing[0]} not available in inventory"
+
+        if not StockReservationService.decrement_stock(
+            db, {inventory[pid].id: qty for pid, qty in requested.items()}
+        ):
+            db.rollback()
+            return False, "Insufficient stock to reserve cart items"
+
+        # Clients may ask for shorter holds, never longer than the server's
+        ttl = min(ttl_minutes or settings.STOCK_RESERVATION_TTL_MINUTES,
+                  settings.STOCK_RESERVATION_TTL_MINUTES)
+        expires_at = datetime.utcnow() + timedelta(minutes=ttl)
+        db.execute(insert(StockReservation), [
+            {
+                "shop_id": shop_id,
+                "product_id": product_id,
+                "inventory_id": inventory[product_id].id,
+                "hold_key": hold_key,
+                "quantity": quantity,
+                "status": "held",
+                "expires_at": expires_at,
+            }
+            for product_id, quantity in requested.items()
+        ])
+        db.commit()
+        return True, f"Stock reserved until {expires_at.isoformat()}"
+
+    @staticmethod
+    def _close_holds(db: Session, holds: List[StockReservation], status: str) -> bool:
+        """Move holds out of 'held'; False if another transaction got there first"""
+        if not holds:
+            return True
+        result = db.execute(
+            update(StockReservation)
+            .where(
+                StockReservation.id.in_([h.id for h in holds]),
+                StockReservation.status == "held"
+            )
+            .values(status=status, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == len(holds)
+
+    @staticmethod
+    def _release(db: Session, holds: List[StockReservation]) -> bool:
+        """Close holds as released and put their stock back"""
+        if not StockReservationService._close_holds(db, holds, "released"):
+            return False
+        by_inventory: Dict[int, int] = {}
+        for hold in holds:
+            by_inventory[hold.inventory_id] = by_inventory.get(
+                hold.inventory_id, 0) + hold.quantity
+        StockReservationService.increment_stock(db, by_inventory)
+        return True
+
+    @staticmethod
+    def _active_holds(db: Session, shop_id: int, hold_key: str) -> List[StockReservation]:
+        return db.query(StockReservation).filter(
+            and_(
+                StockReservation.shop_id == shop_id,
+                StockReservation.hold_key == hold_key,
+                StockReservation.status == "held"
+            )
+        ).order_by(StockReservation.id).with_for_update().all()
+
+    @staticmethod
+    def consume_hold(
+        db: Session,
+        shop_id: int,
+        hold_key: str,
+        requested: Dict[int, int],
+    ) -> Optional[Dict[int, int]]:
+        """Apply a cart's unexpired holds to an order (does not commit)
+
+        Held units up to the requested quantity count as already deducted;
+        anything held beyond that, and any expired hold, goes back to stock.
+
+        Args:
+            requested: {product_id: quantity} the order needs
+
+        Returns: {product_id: quantity} covered by the holds, or None if a
+        concurrent checkout/expiry touched the same holds (roll back and retry)
+        """
+        now = datetime.utcnow()
+        holds = StockReservationService._active_holds(db, shop_id, hold_key)
+        live = [h for h in holds if h.expires_at > now]
+        expired = [h for h in holds if h.expires_at <= now]
+
+        if not StockReservationService._release(db, expired):
+            return None
+        if not StockReservationService._close_holds(db, live, "consumed"):
+            return None
+
+        covered: Dict[int, int] = {}
+        surplus: Dict[int, int] = {}
+        for hold in live:
+            needed = requested.get(hold.product_id, 0) - \
+                covered.get(hold.product_id, 0)
+            taken = min(hold.quantity, max(needed, 0))
+            covered[hold.product_id] = covered.get(hold.product_id, 0) + taken
+            if hold.quantity > taken:
+                surplus[hold.inventory_id] = surplus.get(
+                    hold.inventory_id, 0) + hold.quantity - taken
+
+        StockReservationService.increment_stock(db, surplus)
+        return covered
+
+    @staticmethod
+    def release_hold(db: Session, shop_id: int, hold_key: str) -> int:
+        """Return a cart's held stock to inventory and commit
+
+        Returns: number of holds released
+        """
+        holds = StockReservationService._active_holds(db, shop_id, hold_key)
+        if not StockReservationService._release(db, holds):
+            db.rollback()
+            return 0
+        db.commit()
+        return len(holds)
+
+    @staticmethod
+    def expire_holds(db: Session, now: Optional[datetime] = None) -> int:
+        """Release every hold past its TTL and commit
+
+        Returns: number of holds released
+        """
+        now = now or datetime.utcnow()
+        holds = db.query(StockReservation).filter(
+            and_(
+                StockReservation.status == "held",
+                StockReservation.expires_at <= now
+            )
+        ).order_by(StockReservation.id).with_for_update().all()
+        if not StockReservationService._release(db, holds):
+            db.rollback()
+            return 0
+        db.commit()
+        return len(holds)
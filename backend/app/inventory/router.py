@@ -2,7 +2,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from decimal import Decimal
+from typing import Optional
 from shared.database import get_db
+from shared.pagination import wants_total
 from shared.models import User, RoleEnum
 from app.auth.security import get_current_user
 from app.inventory.schemas import (
@@ -109,6 +111,10 @@ def get_shop_inventory(
     shop_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page (replaces skip)"),
+    include_total: Optional[bool] = Query(
+        None, description="Count inventory rows (default: only without a cursor)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -132,7 +138,9 @@ def get_shop_inventory(
     # Verify access
     InventoryService.verify_shop_access(db, shop_id, current_user.id)
 
-    result = InventoryService.get_shop_inventory(db, shop_id, skip, limit)
+    result = InventoryService.get_shop_inventory(
+        db, shop_id, skip, limit,
+        cursor=cursor, with_total=wants_total(include_total, cursor))
 
     # Build response with product names
     items_with_details = []
@@ -164,6 +172,7 @@ def get_shop_inventory(
         "total": result["total"],
         "skip": result["skip"],
         "limit": result["limit"],
+        "next_cursor": result["next_cursor"],
         "summary": result["summary"]
     }
 
@@ -7,6 +7,8 @@ from shared.models import Shop, Product, User, RoleEnum
 from fastapi import HTTPException, status
 from datetime import datetime
 from decimal import Decimal
+from typing import Optional
+from shared.pagination import keyset_paginate
 
 
 class InventoryService:
@@ -124,8 +126,15 @@ class InventoryService:
         return inventory
 
     @staticmethod
-    def get_shop_inventory(db: Session, shop_id: int, skip: int = 0, limit: int = 20):
-        """Get all inventory items for a shop"""
+    def get_shop_inventory(
+        db: Session,
+        shop_id: int,
+        skip: int = 0,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        with_total: bool = True,
+    ):
+        """Get a page of inventory items for a shop (by id; cursor or skip)"""
         # Verify shop exists
         shop = db.query(Shop).filter(Shop.id == shop_id).first()
         if not shop:
@@ -135,12 +144,10 @@ class InventoryService:
             )
 
         # Get inventory items
-        items = db.query(Inventory).filter(
-            Inventory.shop_id == shop_id
-        ).offset(skip).limit(limit).all()
-
-        total = db.query(Inventory).filter(
-            Inventory.shop_id == shop_id).count()
+        items, next_cursor, total = keyset_paginate(
+            db.query(Inventory).filter(Inventory.shop_id == shop_id),
+            (Inventory.id,), limit,
+            cursor=cursor, skip=skip, with_total=with_total)
 
         # Calculate statistics
         total_items = len(items)
@@ -159,6 +166,7 @@ class InventoryService:
             "total": total,
             "skip": skip,
             "limit": limit,
+            "next_cursor": next_cursor,
             "summary": {
                 "total_products": total_items,
                 "in_stock": in_stock,
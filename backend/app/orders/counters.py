@@ -0,0 +1,165 @@
+"""Per-shop order counters - O(1) order dashboard statistics"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from shared.models import Order, ShopOrderCounter, OrderStatusEnum
+
+
+class OrderCounterService:
+    """Incrementally maintained order count and amount per shop and status
+
+    `record_transition` is called in the same transaction as every order
+    insert or status change, so the counters commit (or roll back) with the
+    order. A shop's counters are seeded from one GROUP BY over its orders the
+    first time it records a transition; `rebuild` does the same on demand
+    (e.g. after orders were written by code that does not record transitions).
+    """
+
+    @staticmethod
+    def aggregate_by_status(
+        db: Session,
+        shop_id: int,
+    ) -> Dict[OrderStatusEnum, Tuple[int, Decimal]]:
+        """Count and sum orders per status in one GROUP BY query
+
+        Returns: {status: (order_count, total_amount)}
+        """
+        rows = db.query(
+            Order.order_status,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total_amount), 0)
+        ).filter(
+            Order.shop_id == shop_id
+        ).group_by(Order.order_status).all()
+
+        return {
+            status: (count, Decimal(str(amount)))
+            for status, count, amount in rows
+            if status is not None
+        }
+
+    @staticmethod
+    def get_counters(
+        db: Session,
+        shop_id: int,
+    ) -> Optional[Dict[OrderStatusEnum, Tuple[int, Decimal]]]:
+        """Read a shop's counters
+
+        Returns: {status: (order_count, total_amount)}, or None if the shop
+        has not been seeded yet
+        """
+        rows = db.query(ShopOrderCounter).filter(
+            ShopOrderCounter.shop_id == shop_id
+        ).all()
+        if not rows:
+            return None
+
+        return {
+            row.order_status: (row.order_count, Decimal(str(row.total_amount)))
+            for row in rows
+        }
+
+    @staticmethod
+    def rebuild(db: Session, shop_id: int) -> None:
+        """Replace a shop's counters with a fresh aggregate (does not commit)"""
+        db.query(ShopOrderCounter).filter(
+            ShopOrderCounter.shop_id == shop_id
+        ).delete(synchronize_session=False)
+        OrderCounterService._seed(db, shop_id)
+
+    @staticmethod
+    def _seed(db: Session, shop_id: int) -> None:
+        """Insert one counter row per status from the current orders"""
+        totals = OrderCounterService.aggregate_by_status(db, shop_id)
+        now = datetime.utcnow()
+        db.execute(insert(ShopOrderCounter), [
+            {
+                "shop_id": shop_id,
+                "order_status": status,
+                "order_count": totals.get(status, (0, 0))[0],
+                "total_amount": totals.get(status, (0, Decimal("0")))[1],
+                "updated_at": now,
+            }
+            for status in OrderStatusEnum
+        ])
+
+    @staticmethod
+    def record_transition(
+        db: Session,
+        shop_id: int,
+        old_status: Optional[OrderStatusEnum],
+        new_status: OrderStatusEnum,
+        amount: Decimal,
+    ) -> None:
+        """Move one order between status counters (does not commit)
+
+        Call after the order change has been flushed. `old_status` is None
+        for a new order.
+        """
+        OrderCounterService.record_transitions(
+            db, shop_id, {old_status: (1, amount)}, new_status)
+
+    @staticmethod
+    def record_transitions(
+        db: Session,
+        shop_id: int,
+        moves: Dict[Optional[OrderStatusEnum], Tuple[int, Decimal]],
+        new_status: OrderStatusEnum,
+    ) -> None:
+        """Move many orders into one status (does not commit)
+
+        Args:
+            moves: {old_status: (order_count, total_amount)} of the orders
+                moved; old_status None for new orders
+
+        One UPDATE per status touched. Call after the changes have been
+        flushed.
+        """
+        count = sum(order_count for order_count, _ in moves.values())
+        amount = sum((Decimal(str(total or 0)) for _, total in moves.values()),
+                     Decimal("0"))
+        if not count:
+            return
+        if OrderCounterService._bump(db, shop_id, new_status, count, amount):
+            for old_status, (order_count, total) in moves.items():
+                if old_status is not None and order_count:
+                    OrderCounterService._bump(
+                        db, shop_id, old_status, -order_count,
+                        -Decimal(str(total or 0)))
+            return
+
+        # Shop not seeded yet: the aggregate already includes the flushed
+        # changes. If another transaction seeded it first, apply the deltas.
+        try:
+            with db.begin_nested():
+                OrderCounterService._seed(db, shop_id)
+        except IntegrityError:
+            OrderCounterService.record_transitions(db, shop_id, moves, new_status)
+
+    @staticmethod
+    def _bump(
+        db: Session,
+        shop_id: int,
+        status: OrderStatusEnum,
+        count_delta: int,
+        amount_delta: Decimal,
+    ) -> bool:
+        """Add to one counter row; False if the shop has no counter rows"""
+        result = db.execute(
+            update(ShopOrderCounter)
+            .where(and_(
+                ShopOrderCounter.shop_id == shop_id,
+                ShopOrderCounter.order_status == status
+            ))
+            .values(
+                order_count=ShopOrderCounter.order_count + count_delta,
+                total_amount=ShopOrderCounter.total_amount + amount_delta,
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
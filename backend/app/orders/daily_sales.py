@@ -0,0 +1,288 @@
+"""Daily product sales rollup - analytics cost scales with days x SKUs, not order lines"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, insert
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from shared.database import upsert_for
+from shared.models import (
+    DailyProductSales, Inventory, Order, OrderItem, OrderStatusEnum
+)
+
+# Additive columns of a rollup row
+ORDERED_MEASURES = ("ordered_qty", "ordered_amount")
+DELIVERED_MEASURES = ("delivered_qty", "revenue", "cost", "tax")
+MEASURES = ORDERED_MEASURES + DELIVERED_MEASURES
+
+RollupKey = Tuple[int, date]  # (product_id, sale_date)
+
+
+def as_date(value) -> date:
+    """Day of a func.date() result (a date on PostgreSQL, an ISO string on SQLite)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class DailySalesService:
+    """Incrementally maintained daily_product_sales rows
+
+    `record_transition` is called in the same transaction as every order
+    insert, so the rollup commits (or rolls back) with the order; status
+    changes are applied from their order events, in the transaction that
+    marks the events processed (app.orders.events). `rebuild` recomputes a
+    shop (or a range of days) from its orders: the backfill for existing
+    data (scripts/backfill_daily_sales.py), and the repair after orders
+    were written by code that does not record transitions. Drain pending
+    order events first, or the rebuilt rows will count them twice.
+    """
+
+    @staticmethod
+    def record_transition(
+        db: Session,
+        order: Order,
+        old_status: Optional[OrderStatusEnum],
+        new_status: OrderStatusEnum,
+    ) -> None:
+        """Apply one order's status change to the rollup (does not commit)
+
+        Call after the order and its items have been flushed. `old_status`
+        is None for a new order.
+        """
+        DailySalesService.record_transitions(
+            db, order.shop_id, [(order, old_status, new_status)])
+
+    @staticmethod
+    def record_transitions(
+        db: Session,
+        shop_id: int,
+        changes: List[Tuple[Order, Optional[OrderStatusEnum], OrderStatusEnum]],
+    ) -> None:
+        """Apply many orders' status changes to the rollup (does not commit)
+
+        Args:
+            changes: [(order, old_status, new_status), ...] of one shop
+
+        One query for the lines of every order that moves in or out of the
+        rollup, one for costs of lines without a captured cost, one upsert.
+        """
+        cancelled = OrderStatusEnum.CANCELLED
+        delivered = OrderStatusEnum.DELIVERED
+
+        signs: Dict[int, Tuple[Order, int, int]] = {}
+        for order, old_status, new_status in changes:
+            ordered_sign = 0
+            if old_status is None and new_status != cancelled:
+                ordered_sign = 1
+            elif new_status == cancelled and old_status not in (None, cancelled):
+                ordered_sign = -1
+
+            delivered_sign = 0
+            if new_status == delivered and old_status != delivered:
+                delivered_sign = 1
+            elif old_status == delivered and new_status != delivered:
+                delivered_sign = -1
+
+            if ordered_sign or delivered_sign:
+                signs[order.id] = (order, ordered_sign, delivered_sign)
+        if not signs:
+            return
+
+        lines = db.query(
+            OrderItem.order_id,
+            OrderItem.product_id,
+            OrderItem.quantity,
+            OrderItem.line_total,
+            OrderItem.gst_amount,
+            OrderItem.unit_cost
+        ).filter(OrderItem.order_id.in_(list(signs))).all()
+        if not lines:
+            return
+
+        # Cost captured at sale; current inventory cost for older lines
+        unit_costs = DailySalesService.unit_costs(
+            db, shop_id, {line[1] for line in lines
+                          if line[5] is None and signs[line[0]][2]})
+
+        deltas: Dict[RollupKey, Dict[str, Decimal]] = {}
+        now = datetime.utcnow()
+        for order_id, product_id, quantity, line_total, gst_amount, unit_cost in lines:
+            order, ordered_sign, delivered_sign = signs[order_id]
+            if ordered_sign:
+                day = (order.order_date or now).date()
+                row = DailySalesService._row(deltas, product_id, day)
+                row["ordered_qty"] += ordered_sign * quantity
+                row["ordered_amount"] += ordered_sign * Decimal(str(line_total or 0))
+
+            if delivered_sign:
+                day = (order.delivery_date or now).date()
+                if unit_cost is None:
+                    unit_cost = unit_costs.get(product_id, Decimal("0"))
+                row = DailySalesService._row(deltas, product_id, day)
+                row["delivered_qty"] += delivered_sign * quantity
+                row["revenue"] += delivered_sign * Decimal(str(line_total or 0))
+                row["tax"] += delivered_sign * Decimal(str(gst_amount or 0))
+                row["cost"] += delivered_sign * Decimal(str(unit_cost)) * quantity
+
+        DailySalesService._add(db, shop_id, deltas)
+
+    @staticmethod
+    def rebuild(
+        db: Session,
+        shop_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> int:
+        """Recompute a shop's rollup rows from its orders (does not commit)
+
+        Only days from `start` to `end` (inclusive, either open) are
+        replaced. Two GROUP BY queries, one over order dates and one over
+        delivery dates.
+
+        Returns: number of rows written
+        """
+        in_range = [DailyProductSales.shop_id == shop_id]
+        if start is not None:
+            in_range.append(DailyProductSales.sale_date >= start)
+        if end is not None:
+            in_range.append(DailyProductSales.sale_date <= end)
+        db.query(DailyProductSales).filter(
+            and_(*in_range)
+        ).delete(synchronize_session=False)
+
+        deltas: Dict[RollupKey, Dict[str, Decimal]] = {}
+
+        order_day = func.date(Order.order_date)
+        ordered = db.query(
+            OrderItem.product_id,
+            order_day,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.line_total)
+        ).join(
+            Order, Order.id == OrderItem.order_id
+        ).filter(
+            Order.shop_id == shop_id,
+            Order.order_status.isnot(None),
+            Order.order_status != OrderStatusEnum.CANCELLED,
+            *DailySalesService._day_bounds(Order.order_date, start, end)
+        ).group_by(OrderItem.product_id, order_day)
+        for product_id, day, quantity, amount in ordered:
+            row = DailySalesService._row(deltas, product_id, as_date(day))
+            row["ordered_qty"] += quantity or 0
+            row["ordered_amount"] += Decimal(str(amount or 0))
+
+        delivery_day = func.date(Order.delivery_date)
+        delivered = db.query(
+            OrderItem.product_id,
+            delivery_day,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.line_total),
+            func.sum(func.coalesce(OrderItem.gst_amount, 0)),
+            func.sum(OrderItem.quantity * OrderItem.unit_cost),
+            func.sum(case((OrderItem.unit_cost.is_(None), OrderItem.quantity), else_=0))
+        ).join(
+            Order, Order.id == OrderItem.order_id
+        ).filter(
+            Order.shop_id == shop_id,
+            Order.order_status == OrderStatusEnum.DELIVERED,
+            Order.delivery_date.isnot(None),
+            *DailySalesService._day_bounds(Order.delivery_date, start, end)
+        ).group_by(OrderItem.product_id, delivery_day).all()
+        # Cost captured at sale; current inventory cost for older lines
+        unit_costs = DailySalesService.unit_costs(
+            db, shop_id, {row[0] for row in delivered if row[6]})
+        for product_id, day, quantity, amount, tax, cost, uncosted in delivered:
+            row = DailySalesService._row(deltas, product_id, as_date(day))
+            row["delivered_qty"] += quantity or 0
+            row["revenue"] += Decimal(str(amount or 0))
+            row["tax"] += Decimal(str(tax or 0))
+            row["cost"] += Decimal(str(cost or 0)) + \
+                unit_costs.get(product_id, Decimal("0")) * (uncosted or 0)
+
+        if deltas:
+            now = datetime.utcnow()
+            db.execute(insert(DailyProductSales), [
+                {"shop_id": shop_id, "product_id": product_id,
+                 "sale_date": day, "updated_at": now, **measures}
+                for (product_id, day), measures in deltas.items()
+            ])
+        return len(deltas)
+
+    @staticmethod
+    def unit_costs(
+        db: Session,
+        shop_id: int,
+        product_ids: Iterable[int],
+    ) -> Dict[int, Decimal]:
+        """Inventory cost price per product, in one query
+
+        The cost of order lines placed before unit_cost was captured.
+        Products without an inventory row are left out (cost 0), as in the
+        P&L report.
+        """
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        rows = db.query(Inventory.product_id, Inventory.cost_price).filter(
+            Inventory.shop_id == shop_id,
+            Inventory.product_id.in_(product_ids)
+        ).order_by(Inventory.id).all()
+
+        costs: Dict[int, Decimal] = {}
+        for product_id, cost_price in rows:
+            costs.setdefault(product_id, Decimal(str(cost_price or 0)))
+        return costs
+
+    @staticmethod
+    def _day_bounds(column, start: Optional[date], end: Optional[date]) -> list:
+        """Filters keeping `column` on days start..end (inclusive)"""
+        bounds = []
+        if start is not None:
+            bounds.append(column >= datetime.combine(start, datetime.min.time()))
+        if end is not None:
+            bounds.append(column < datetime.combine(
+                end + timedelta(days=1), datetime.min.time()))
+        return bounds
+
+    @staticmethod
+    def _row(
+        deltas: Dict[RollupKey, Dict[str, Decimal]],
+        product_id: int,
+        day: date,
+    ) -> Dict[str, Decimal]:
+        """Zeroed measures for a (product, day), created on first use"""
+        row = deltas.get((product_id, day))
+        if row is None:
+            row = {column: 0 if column.endswith("_qty") else Decimal("0")
+                   for column in MEASURES}
+            deltas[(product_id, day)] = row
+        return row
+
+    @staticmethod
+    def _add(
+        db: Session,
+        shop_id: int,
+        deltas: Dict[RollupKey, Dict[str, Decimal]],
+    ) -> None:
+        """Add deltas to rollup rows, inserting missing ones (one upsert)"""
+        if not deltas:
+            return
+        table = DailyProductSales.__table__
+        stmt = upsert_for(db.get_bind().dialect.name)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.shop_id, table.c.product_id, table.c.sale_date],
+            set_={
+                **{column: table.c[column] + stmt.excluded[column]
+                   for column in MEASURES},
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        now = datetime.utcnow()
+        db.execute(stmt, [
+            {"shop_id": shop_id, "product_id": product_id,
+             "sale_date": day, "updated_at": now, **measures}
+            for (product_id, day), measures in deltas.items()
+        ])
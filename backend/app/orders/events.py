@@ -0,0 +1,307 @@
+"""Order events - transactional outbox for order status side effects
+
+Status changes write one order_events row per order in the order's own
+transaction (`OrderEventService.record`); the order API returns without
+touching the rollup or the books. The dispatcher then, in one transaction
+per batch, claims due events (a conditional UPDATE marking them processed)
+and runs every handler of ORDER_EVENT_HANDLERS, so each event's effects
+commit exactly once, however many dispatchers run. A failing batch is
+retried event by event; failing events are rescheduled with exponential
+backoff.
+
+Events carry the old and new status, so handlers do not depend on the
+order's current state or on the order events are applied in.
+
+Runners (ORDER_EVENTS_RUNNER): an asyncio loop in each API worker, or
+Celery beat (app.orders.tasks).
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from shared.config import get_settings
+from shared.database import SessionLocal
+from shared.models import (
+    AIInsight, LedgerEntry, Order, OrderEvent, OrderStatusEnum, User
+)
+from app.orders.daily_sales import DailySalesService
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+STATUS_CHANGED = "order.status_changed"
+
+# Statuses whose changes move the daily sales rollup (and so AI insights)
+ROLLUP_STATUSES = (OrderStatusEnum.DELIVERED, OrderStatusEnum.CANCELLED)
+
+# Dispatcher telemetry for this process (lag_metrics)
+dispatch_stats = {
+    "last_dispatch_at": None,
+    "last_dispatch_lag_seconds": None,
+    "dispatched": 0,
+    "failed": 0,
+}
+
+
+# ===== HANDLERS =====
+
+def apply_to_daily_sales(db: Session, events: List[OrderEvent], orders: Dict[int, Order]) -> None:
+    """Apply the status changes to the daily sales rollup"""
+    by_shop: Dict[int, list] = {}
+    for event in events:
+        by_shop.setdefault(event.shop_id, []).append(
+            (orders[event.order_id], event.old_status, event.new_status))
+    for shop_id, changes in by_shop.items():
+        DailySalesService.record_transitions(db, shop_id, changes)
+
+
+def post_to_accounting(db: Session, events: List[OrderEvent], orders: Dict[int, Order]) -> None:
+    """Post deliveries in bulk; reverse the entries of cancelled posted orders"""
+    from app.accounting.service import AccountingService
+
+    actors = {
+        user.id: user for user in db.query(User).filter(
+            User.id.in_({event.actor_id for event in events}))
+    }
+
+    deliveries: Dict[Tuple[int, int], List[Order]] = {}
+    cancelled: Dict[int, OrderEvent] = {}
+    for event in events:
+        if event.new_status == OrderStatusEnum.DELIVERED:
+            deliveries.setdefault((event.shop_id, event.actor_id), []).append(
+                orders[event.order_id])
+        elif event.new_status == OrderStatusEnum.CANCELLED:
+            cancelled[event.order_id] = event
+
+    for (_, actor_id), delivered in deliveries.items():
+        # Skips orders already posted (e.g. by process_order_delivery)
+        AccountingService.post_deliveries(delivered, db, actors[actor_id])
+
+    if cancelled:
+        # Posted and not yet reversed (e.g. by reverse_accounting_entries)
+        entry_types: Dict[int, set] = {}
+        for order_id, reference_type in db.query(
+            LedgerEntry.reference_id, LedgerEntry.reference_type
+        ).filter(
+            and_(
+                LedgerEntry.reference_type.in_(("order", "order_reversal")),
+                LedgerEntry.reference_id.in_(list(cancelled))
+            )
+        ):
+            entry_types.setdefault(order_id, set()).add(reference_type)
+        for order_id, types in entry_types.items():
+            if "order_reversal" in types:
+                continue
+            AccountingService.reverse_order_entries(
+                orders[order_id], db, actors[cancelled[order_id].actor_id])
+
+
+def invalidate_insights(db: Session, events: List[OrderEvent], orders: Dict[int, Order]) -> None:
+    """Mark cached AI insights of shops with new sales for revalidation
+
+    The next request serves the cached payload and refreshes it in the
+    background (stale-while-revalidate), instead of waiting out
+    AI_INSIGHTS_MAX_AGE_SECONDS.
+    """
+    shop_ids = {event.shop_id for event in events if event.new_status in ROLLUP_STATUSES}
+    if not shop_ids:
+        return
+    stale_at = datetime.utcnow() - timedelta(seconds=settings.AI_INSIGHTS_MAX_AGE_SECONDS + 1)
+    db.execute(
+        update(AIInsight)
+        .where(AIInsight.shop_id.in_(shop_ids), AIInsight.checked_at > stale_at)
+        .values(checked_at=stale_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Applied in this order, in the transaction that marks the events processed
+ORDER_EVENT_HANDLERS: Dict[str, Callable[[Session, List[OrderEvent], Dict[int, Order]], None]] = {
+    "daily_sales": apply_to_daily_sales,
+    "accounting": post_to_accounting,
+    "ai_insights": invalidate_insights,
+}
+
+
+# ===== OUTBOX =====
+
+class OrderEventService:
+    """Record, dispatch and monitor order events"""
+
+    @staticmethod
+    def record(
+        db: Session,
+        shop_id: int,
+        changes: List[Tuple[int, Optional[OrderStatusEnum]]],
+        new_status: OrderStatusEnum,
+        actor_id: int,
+    ) -> None:
+        """Write one event per status change (one INSERT, does not commit)
+
+        Args:
+            changes: [(order_id, old_status), ...] of one shop
+        """
+        if not changes:
+            return
+        now = datetime.utcnow()
+        db.execute(insert(OrderEvent), [
+            {
+                "shop_id": shop_id,
+                "order_id": order_id,
+                "event_type": STATUS_CHANGED,
+                "old_status": old_status,
+                "new_status": new_status,
+                "actor_id": actor_id,
+                "created_at": now,
+                "available_at": now,
+                "attempts": 0,
+            }
+            for order_id, old_status in changes
+        ])
+
+    @staticmethod
+    def dispatch_pending(db: Session, batch_size: Optional[int] = None) -> int:
+        """Apply due events, oldest first, until none are left (commits)
+
+        Returns: number of events processed
+        """
+        batch_size = batch_size or settings.ORDER_EVENTS_BATCH_SIZE
+        processed = 0
+        while True:
+            events = OrderEventService._claim(db, batch_size)
+            if not events:
+                break
+            event_ids = [event.id for event in events]
+            try:
+                OrderEventService._apply(db, events)
+                db.commit()
+                processed += len(event_ids)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Order event batch failed, retrying one by one: {str(e)}")
+                for event_id in event_ids:
+                    processed += OrderEventService._dispatch_one(db, event_id)
+            if len(event_ids) < batch_size:
+                break
+        return processed
+
+    @staticmethod
+    def lag_metrics(db: Session) -> dict:
+        """Outbox backlog (one query) plus this process's dispatcher telemetry
+
+        pending counts due and backed-off events; failed ones exhausted
+        ORDER_EVENTS_MAX_ATTEMPTS and wait for a manual replay (reset
+        attempts).
+        """
+        now = datetime.utcnow()
+        max_attempts = settings.ORDER_EVENTS_MAX_ATTEMPTS
+        exhausted = OrderEvent.attempts >= max_attempts
+        pending, retrying, failed, oldest = db.query(
+            func.count(OrderEvent.id).filter(~exhausted),
+            func.count(OrderEvent.id).filter(~exhausted, OrderEvent.attempts > 0),
+            func.count(OrderEvent.id).filter(exhausted),
+            func.min(OrderEvent.created_at).filter(~exhausted),
+        ).filter(OrderEvent.processed_at.is_(None)).one()
+
+        return {
+            "pending": pending,
+            "retrying": retrying,
+            "failed": failed,
+            "oldest_pending_age_seconds": (
+                round((now - oldest).total_seconds(), 3) if oldest else 0.0),
+            **dispatch_stats,
+        }
+
+    @staticmethod
+    def _claim(db: Session, limit: int, event_id: Optional[int] = None) -> List[OrderEvent]:
+        """Claim due events by marking them processed in this transaction
+
+        One conditional UPDATE ... RETURNING: an event is claimed only while
+        processed_at is still NULL, so two dispatchers never both apply it
+        (PostgreSQL re-checks the condition on rows another transaction
+        changed; SQLite runs the statement under its write lock). SKIP
+        LOCKED lets PostgreSQL dispatchers share the backlog. A rollback
+        releases the claim with the handlers' effects.
+        """
+        due = select(OrderEvent.id).where(
+            OrderEvent.processed_at.is_(None),
+            OrderEvent.available_at <= datetime.utcnow(),
+            OrderEvent.attempts < settings.ORDER_EVENTS_MAX_ATTEMPTS
+        )
+        if event_id is not None:
+            due = due.where(OrderEvent.id == event_id)
+        due = due.order_by(OrderEvent.id).limit(limit).with_for_update(skip_locked=True)
+
+        claimed = db.scalars(
+            update(OrderEvent)
+            .where(OrderEvent.id.in_(due.scalar_subquery()), OrderEvent.processed_at.is_(None))
+            .values(processed_at=datetime.utcnow(), last_error=None)
+            .returning(OrderEvent)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        ).all()
+        return sorted(claimed, key=lambda event: event.id)
+
+    @staticmethod
+    def _apply(db: Session, events: List[OrderEvent]) -> None:
+        """Run every handler on claimed events (does not commit)"""
+        orders = {
+            order.id: order for order in db.query(Order).filter(
+                Order.id.in_({event.order_id for event in events}))
+        }
+        for handler in ORDER_EVENT_HANDLERS.values():
+            handler(db, events, orders)
+
+        now = datetime.utcnow()
+        dispatch_stats["last_dispatch_at"] = now
+        dispatch_stats["last_dispatch_lag_seconds"] = round(
+            (now - min(event.created_at for event in events)).total_seconds(), 3)
+        dispatch_stats["dispatched"] += len(events)
+
+    @staticmethod
+    def _dispatch_one(db: Session, event_id: int) -> int:
+        """Apply one event, or reschedule it with backoff; returns 1 if applied"""
+        try:
+            events = OrderEventService._claim(db, 1, event_id)
+            if not events:
+                return 0
+            OrderEventService._apply(db, events)
+            db.commit()
+            return 1
+        except Exception as e:
+            db.rollback()
+            OrderEventService._reschedule(db, event_id, str(e))
+            return 0
+
+    @staticmethod
+    def _reschedule(db: Session, event_id: int, error: str) -> None:
+        event = db.get(OrderEvent, event_id)
+        if event is None:
+            return
+        event.attempts += 1
+        delay = min(settings.ORDER_EVENTS_RETRY_SECONDS * 2 ** (event.attempts - 1),
+                    settings.ORDER_EVENTS_RETRY_MAX_SECONDS)
+        event.available_at = datetime.utcnow() + timedelta(seconds=delay)
+        event.last_error = error[:1000]
+        db.commit()
+        dispatch_stats["failed"] += 1
+        if event.attempts >= settings.ORDER_EVENTS_MAX_ATTEMPTS:
+            logger.error(f"Order event {event_id} failed {event.attempts} times, giving up: {error}")
+        else:
+            logger.warning(f"Order event {event_id} failed, retrying in {delay}s: {error}")
+
+
+# ===== JOB RUNNER =====
+
+def dispatch_order_events(session_factory: Callable[[], Session] = SessionLocal) -> int:
+    """Drain the outbox once (runs in a worker thread or a Celery worker)
+
+    Returns: number of events processed
+    """
+    db = session_factory()
+    try:
+        return OrderEventService.dispatch_pending(db)
+    finally:
+        db.close()
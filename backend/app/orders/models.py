@@ -1,4 +1,5 @@
 """Order models - Import from shared.models to avoid duplication"""
-from shared.models import Order, OrderItem
+from shared.models import Order, OrderItem, ShopOrderCounter, DailyProductSales, OrderEvent
 
-__all__ = ["Order", "OrderItem"]
+__all__ = ["Order", "OrderItem", "ShopOrderCounter", "DailyProductSales",
+           "OrderEvent"]
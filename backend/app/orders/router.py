@@ -4,14 +4,18 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from shared.database import get_db
+from shared.pagination import wants_total
+from shared.instrumentation import query_budget
 from app.auth.security import get_current_user
 from shared.models import User, RoleEnum, OrderStatusEnum
 from app.orders.schemas import (
     OrderCreateRequest, OrderStatusUpdate, OrderResponse,
-    OrderDetailResponse, OrderListResponse, OrderDashboard
+    OrderDetailResponse, OrderListResponse, OrderDashboard,
+    CartHoldRequest, CartHoldResponse, OrderBatchStatusUpdate,
+    OrderBatchStatusResponse
 )
 from app.orders.service import OrderService
-from app.accounting.service import AccountingService
+from app.inventory.reservations import StockReservationService
 
 router = APIRouter(
     prefix="/api/v1/orders",
@@ -83,6 +87,63 @@ def create_order(
     return order
 
 
+# ===== CART HOLDS =====
+
+@router.post(
+    "/shops/{shop_id}/holds",
+    response_model=CartHoldResponse,
+    status_code=201,
+    summary="Hold Cart Stock",
+    description="Reserve stock for a cart until it is checked out (pass hold_key as the order's reservation_key) or the hold expires."
+)
+def hold_cart_stock(
+    shop_id: int,
+    request: CartHoldRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_order_create_access),
+):
+    """Reserve cart stock so it cannot be sold to another checkout"""
+    access_ok, access_msg = OrderService.verify_shop_access(user, shop_id, db)
+    if not access_ok:
+        raise HTTPException(status_code=403, detail=access_msg)
+
+    success, message = StockReservationService.hold_stock(
+        db, shop_id, request.hold_key,
+        [(item.product_id, item.quantity) for item in request.items],
+        ttl_minutes=request.ttl_minutes,
+    )
+    if not success:
+        status_code = 409 if "insufficient" in message.lower() else 404
+        raise HTTPException(status_code=status_code, detail=message)
+
+    return CartHoldResponse(hold_key=request.hold_key, message=message)
+
+
+@router.delete(
+    "/shops/{shop_id}/holds/{hold_key}",
+    response_model=CartHoldResponse,
+    summary="Release Cart Stock",
+    description="Return a cart's held stock to inventory (e.g. cart abandoned or emptied)."
+)
+def release_cart_stock(
+    shop_id: int,
+    hold_key: str,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_order_create_access),
+):
+    """Release every active hold for a cart"""
+    access_ok, access_msg = OrderService.verify_shop_access(user, shop_id, db)
+    if not access_ok:
+        raise HTTPException(status_code=403, detail=access_msg)
+
+    released = StockReservationService.release_hold(db, shop_id, hold_key)
+    return CartHoldResponse(
+        hold_key=hold_key,
+        message=f"Released {released} hold(s)",
+        released=released,
+    )
+
+
 # ===== ORDER RETRIEVAL =====
 
 @router.get(
@@ -91,6 +152,7 @@ def create_order(
     summary="Get Order Details",
     description="Retrieve specific order details. Customers view own orders, staff/owners view shop orders, admins view all."
 )
+@query_budget(5)
 def get_order(
     shop_id: int,
     order_id: int,
@@ -127,12 +189,17 @@ def get_order(
     summary="List Orders",
     description="List orders with pagination and optional status filter. Staff/owners view shop orders, admins view all."
 )
+@query_budget(6)
 def list_orders(
     shop_id: int,
     skip: int = Query(0, ge=0, description="Skip records"),
     limit: int = Query(20, ge=1, le=100, description="Limit records"),
     status: Optional[OrderStatusEnum] = Query(
         None, description="Filter by order status"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page (replaces skip)"),
+    include_total: Optional[bool] = Query(
+        None, description="Count matching orders (default: only without a cursor)"),
     db: Session = Depends(get_db),
     user: User = Depends(require_order_manage_access),
 ):
@@ -142,15 +209,17 @@ def list_orders(
     if not access_ok:
         raise HTTPException(status_code=403, detail=msg)
 
-    orders, total = OrderService.list_orders(
-        db, shop_id, skip=skip, limit=limit, status=status
+    orders, total, next_cursor = OrderService.list_orders(
+        db, shop_id, skip=skip, limit=limit, status=status,
+        cursor=cursor, with_total=wants_total(include_total, cursor)
     )
 
     return OrderListResponse(
         orders=orders,
         total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
 
 
@@ -160,9 +229,14 @@ def list_orders(
     summary="Get My Orders",
     description="Customers retrieve their own orders"
 )
+@query_budget(6)
 def get_my_orders(
     skip: int = Query(0, ge=0, description="Skip records"),
     limit: int = Query(20, ge=1, le=100, description="Limit records"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page (replaces skip)"),
+    include_total: Optional[bool] = Query(
+        None, description="Count matching orders (default: only without a cursor)"),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
@@ -173,15 +247,17 @@ def get_my_orders(
             detail="Only customers can use this endpoint"
         )
 
-    orders, total = OrderService.list_customer_orders(
-        db, user.shop_id, user.id, skip=skip, limit=limit
+    orders, total, next_cursor = OrderService.list_customer_orders(
+        db, user.shop_id, user.id, skip=skip, limit=limit,
+        cursor=cursor, with_total=wants_total(include_total, cursor)
     )
 
     return OrderListResponse(
         orders=orders,
         total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
 
 
@@ -193,6 +269,7 @@ def get_my_orders(
     summary="Update Order Status",
     description="Update order status through lifecycle: PLACED → ACCEPTED → PACKED → OUT_FOR_DELIVERY → DELIVERED"
 )
+@query_budget(10)
 def update_order_status(
     shop_id: int,
     order_id: int,
@@ -200,7 +277,11 @@ def update_order_status(
     db: Session = Depends(get_db),
     user: User = Depends(require_order_manage_access),
 ):
-    """Update order status with validation and automatic accounting"""
+    """Update order status with validation
+
+    Accounting entries and the sales rollup follow from the order event
+    recorded with the change (app.orders.events).
+    """
     success, message, order = OrderService.update_order_status(
         db, shop_id, order_id, request, user
     )
@@ -209,37 +290,41 @@ def update_order_status(
         status_code = 404 if "not found" in message.lower() else 400
         raise HTTPException(status_code=status_code, detail=message)
 
-    # PHASE F: Hook accounting service when order is DELIVERED
-    if order.order_status == OrderStatusEnum.DELIVERED:
-        try:
-            # Create automatic accounting entries
-            accounting_ok = AccountingService.process_order_delivery(
-                order, db, user
-            )
-            if not accounting_ok:
-                # Log but don't fail - accounting is secondary to order management
-                pass
-        except Exception as e:
-            # Log accounting error but don't fail order update
-            pass
-
-    # PHASE F: Hook accounting service when order is CANCELLED
-    if order.order_status == OrderStatusEnum.CANCELLED:
-        try:
-            # Reverse accounting entries
-            accounting_ok = AccountingService.reverse_accounting_entries(
-                order, db, user
-            )
-            if not accounting_ok:
-                # Log but don't fail
-                pass
-        except Exception as e:
-            # Log but don't fail
-            pass
-
     return order
 
 
+@router.post(
+    "/shops/{shop_id}/status-batch",
+    response_model=OrderBatchStatusResponse,
+    summary="Batch Update Order Status",
+    description="Move up to 1000 orders to one status in a single transaction, with per-order results"
+)
+@query_budget(12)
+def update_order_statuses(
+    shop_id: int,
+    request: OrderBatchStatusUpdate,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_order_manage_access),
+):
+    """Batch status update; one order event per updated order"""
+    success, message, results = OrderService.update_order_statuses(
+        db, shop_id, request.order_ids,
+        OrderStatusUpdate(new_status=request.new_status, notes=request.notes),
+        user
+    )
+
+    if not results:
+        raise HTTPException(status_code=403, detail=message)
+
+    updated = sum(1 for result in results if result["success"])
+    return OrderBatchStatusResponse(
+        requested=len(results),
+        updated=updated,
+        failed=len(results) - updated,
+        results=results
+    )
+
+
 # ===== DASHBOARD & ANALYTICS =====
 
 @router.get(
@@ -5,6 +5,10 @@ from decimal import Decimal
 from datetime import datetime
 from enum import Enum
 
+from shared.config import get_settings
+
+settings = get_settings()
+
 
 class OrderStatusEnum(str, Enum):
     """Order status values"""
@@ -65,6 +69,9 @@ class OrderCreateRequest(OrderBase):
     is_credit_sale: bool = Field(
         False, description="Whether this is a credit sale")
     credit_duration_days: Optional[int] = Field(None, ge=1, le=365)
+    reservation_key: Optional[str] = Field(
+        None, max_length=100,
+        description="Cart hold key whose reserved stock this order consumes")
 
     @field_validator("items")
     @classmethod
@@ -75,12 +82,60 @@ class OrderCreateRequest(OrderBase):
         return v
 
 
+# ===== CART HOLD SCHEMAS =====
+
+class CartHoldItem(BaseModel):
+    """Product and quantity to reserve for a cart"""
+    product_id: int = Field(..., gt=0, description="Product ID")
+    quantity: int = Field(..., gt=0, description="Quantity (must be positive)")
+
+
+class CartHoldRequest(BaseModel):
+    """Reserve stock for a cart until checkout or expiry"""
+    hold_key: str = Field(..., min_length=1, max_length=100,
+                          description="Cart key, passed later as the order's reservation_key")
+    items: List[CartHoldItem] = Field(..., min_length=1)
+    ttl_minutes: Optional[int] = Field(
+        None, ge=1, le=settings.STOCK_RESERVATION_TTL_MINUTES,
+        description="Hold lifetime, at most STOCK_RESERVATION_TTL_MINUTES")
+
+
+class CartHoldResponse(BaseModel):
+    """Cart hold result"""
+    hold_key: str
+    message: str
+    released: int = 0
+
+
 class OrderStatusUpdate(BaseModel):
     """Update order status request"""
     new_status: OrderStatusEnum = Field(..., description="New order status")
     notes: Optional[str] = None
 
 
+class OrderBatchStatusUpdate(BaseModel):
+    """Move many orders of a shop to one status"""
+    order_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    new_status: OrderStatusEnum = Field(..., description="New order status")
+    notes: Optional[str] = None
+
+
+class OrderBatchStatusResult(BaseModel):
+    """Outcome for one order of a batch status update"""
+    order_id: int
+    success: bool
+    message: str
+    order_status: Optional[OrderStatusEnum] = None  # status after the batch
+
+
+class OrderBatchStatusResponse(BaseModel):
+    """Per-order results of a batch status update"""
+    requested: int
+    updated: int
+    failed: int
+    results: List[OrderBatchStatusResult]
+
+
 class OrderResponse(OrderBase):
     """Order response with full details"""
     id: int
@@ -120,11 +175,16 @@ class OrderDetailResponse(OrderResponse):
 
 
 class OrderListResponse(BaseModel):
-    """List orders response with pagination"""
+    """List orders response with pagination
+
+    `total` is only counted when requested (always for skip/limit paging);
+    `next_cursor` is None on the last page.
+    """
     orders: List[OrderResponse]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 class OrderSummary(BaseModel):
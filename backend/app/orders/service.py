@@ -1,22 +1,42 @@
 """Order management service - Business logic for order operations"""
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, desc, func, insert, update
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import random
 import string
 
 from shared.models import Order, OrderItem, Product, Inventory, Shop, User
 from shared.models import OrderStatusEnum, RoleEnum
+from shared.config import get_settings
+from shared.pagination import keyset_paginate
+from app.inventory.reservations import StockReservationService
+from app.orders.counters import OrderCounterService
+from app.orders.daily_sales import DailySalesService
+from app.orders.events import OrderEventService
 from app.orders.schemas import (
-    OrderCreateRequest, OrderStatusUpdate, OrderResponse, OrderListResponse
+    OrderCreateRequest, OrderItemCreate, OrderStatusUpdate, OrderResponse,
+    OrderListResponse
 )
 
+settings = get_settings()
+
 
 class OrderService:
     """Service for order management operations"""
 
+    # Allowed status changes; DELIVERED and CANCELLED are final
+    VALID_TRANSITIONS = {
+        OrderStatusEnum.PLACED: [OrderStatusEnum.ACCEPTED, OrderStatusEnum.CANCELLED],
+        OrderStatusEnum.ACCEPTED: [OrderStatusEnum.PACKED, OrderStatusEnum.CANCELLED],
+        OrderStatusEnum.PACKED: [OrderStatusEnum.OUT_FOR_DELIVERY, OrderStatusEnum.CANCELLED],
+        OrderStatusEnum.OUT_FOR_DELIVERY: [OrderStatusEnum.DELIVERED, OrderStatusEnum.CANCELLED],
+        OrderStatusEnum.DELIVERED: [],  # Final state
+        OrderStatusEnum.CANCELLED: [],  # Final state
+    }
+
     @staticmethod
     def generate_order_number(shop_id: int) -> str:
         """Generate unique order number"""
@@ -86,25 +106,25 @@ class OrderService:
         shop_id: int,
         items: List[Tuple[int, int]],  # [(product_id, quantity), ...]
     ) -> Tuple[bool, str]:
-        """Deduct inventory for all items
+        """Deduct inventory for all items with conditional (race-free) updates
 
         Returns: (success, message)
         """
         try:
-            for product_id, quantity in items:
-                inventory = db.query(Inventory).filter(
-                    and_(
-                        Inventory.shop_id == shop_id,
-                        Inventory.product_id == product_id
-                    )
-                ).first()
+            requested = OrderService._sum_quantities(items)
+            inventory = StockReservationService.lock_inventory_rows(
+                db, shop_id, list(requested))
 
-                if not inventory or inventory.quantity < quantity:
+            for product_id in requested:
+                if product_id not in inventory:
+                    db.rollback()
                     return False, f"Inventory deduction failed for product {product_id}"
 
-                # Deduct from inventory
-                inventory.quantity -= quantity
-                inventory.last_updated = datetime.utcnow()
+            if not StockReservationService.decrement_stock(
+                db, {inventory[pid].id: qty for pid, qty in requested.items()}
+            ):
+                db.rollback()
+                return False, "Inventory deduction failed: insufficient stock"
 
             db.commit()
             return True, "Inventory deducted successfully"
@@ -123,17 +143,15 @@ class OrderService:
         Returns: success
         """
         try:
-            for product_id, quantity in items:
-                inventory = db.query(Inventory).filter(
-                    and_(
-                        Inventory.shop_id == shop_id,
-                        Inventory.product_id == product_id
-                    )
-                ).first()
-
-                if inventory:
-                    inventory.quantity += quantity
-                    inventory.last_updated = datetime.utcnow()
+            requested = OrderService._sum_quantities(items)
+            inventory = StockReservationService.lock_inventory_rows(
+                db, shop_id, list(requested))
+
+            StockReservationService.increment_stock(
+                db,
+                {inventory[pid].id: qty for pid, qty in requested.items()
+                 if pid in inventory}
+            )
 
             db.commit()
             return True
@@ -141,6 +159,14 @@ class OrderService:
             db.rollback()
             return False
 
+    @staticmethod
+    def _sum_quantities(items: List[Tuple[int, int]]) -> Dict[int, int]:
+        """Collapse [(product_id, quantity), ...] into {product_id: total}"""
+        totals: Dict[int, int] = {}
+        for product_id, quantity in items:
+            totals[product_id] = totals.get(product_id, 0) + quantity
+        return totals
+
     @staticmethod
     def calculate_order_totals(
         db: Session,
@@ -175,6 +201,98 @@ class OrderService:
         total = subtotal + tax_amount
         return subtotal, tax_amount, total
 
+    @staticmethod
+    def load_basket(
+        db: Session,
+        shop_id: int,
+        product_ids: List[int],
+    ) -> Tuple[Dict[int, Product], Dict[int, Inventory]]:
+        """Load products and shop inventory for a basket in two IN (...) queries
+
+        Inventory rows are locked in id order (FOR UPDATE on PostgreSQL)
+        until the caller commits or rolls back.
+
+        Returns: (products_by_id, inventory_by_product_id)
+        """
+        products = db.query(Product).filter(
+            Product.id.in_(sorted(set(product_ids)))
+        ).all()
+
+        inventory_by_product = StockReservationService.lock_inventory_rows(
+            db, shop_id, product_ids)
+
+        return {product.id: product for product in products}, inventory_by_product
+
+    @staticmethod
+    def check_basket_stock(
+        requested: Dict[int, int],
+        products: Dict[int, Product],
+        inventory: Dict[int, Inventory],
+    ) -> Tuple[bool, str, Optional[str]]:
+        """Validate a loaded basket against inventory without touching the DB
+
+        Returns: (success, message, error_product_name)
+        """
+        for product_id, quantity in requested.items():
+            product = products.get(product_id)
+            product_name = product.name if product else f"Product {product_id}"
+            stock = inventory.get(product_id)
+
+            if not stock:
+                return False, f"Product {product_name} not available in inventory", product_name
+
+            if stock.quantity < quantity:
+                return False, f"Insufficient stock for {product_name}. Available: {stock.quantity}, Requested: {quantity}", product_name
+
+        return True, "All items available", None
+
+    @staticmethod
+    def build_order_items(
+        shop_id: int,
+        items: List[OrderItemCreate],
+        products: Dict[int, Product],
+        inventory: Optional[Dict[int, Inventory]] = None,
+    ) -> Tuple[List[dict], Decimal, Decimal, Decimal]:
+        """Build order_items rows and compute totals and GST in memory
+
+        Rows are plain dicts so they can be written with one executemany
+        INSERT once the order id is known. Each line captures its unit cost
+        (inventory cost price, else the product's) for cost-at-sale COGS.
+
+        Returns: (item_rows, subtotal, tax_amount, total)
+        """
+        subtotal = Decimal("0.00")
+        tax_amount = Decimal("0.00")
+        item_rows = []
+
+        for item in items:
+            product = products[item.product_id]
+            gst_rate = product.gst_rate or Decimal("0")
+            stock = (inventory or {}).get(item.product_id)
+            unit_cost = stock.cost_price if stock is not None else None
+            if unit_cost is None:
+                unit_cost = product.cost_price
+
+            line_total = item.unit_price * item.quantity
+            gst_amount = line_total * (Decimal(str(gst_rate)) / Decimal("100"))
+
+            subtotal += line_total
+            tax_amount += gst_amount
+
+            item_rows.append({
+                "product_id": item.product_id,
+                "shop_id": shop_id,
+                "product_name": product.name,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "unit_cost": unit_cost,
+                "gst_rate": gst_rate,
+                "gst_amount": gst_amount,
+                "line_total": line_total,
+            })
+
+        return item_rows, subtotal, tax_amount, subtotal + tax_amount
+
     @staticmethod
     def create_order(
         db: Session,
@@ -184,6 +302,13 @@ class OrderService:
     ) -> Tuple[bool, str, Optional[Order]]:
         """Create new order with inventory deduction
 
+        The whole basket is loaded with two IN (...) queries, totals and GST
+        are computed in memory, and the stock deduction, order and items are
+        written in one transaction (items via a single executemany INSERT).
+        Stock is taken with a conditional UPDATE so concurrent checkouts
+        cannot oversell; units held for `request.reservation_key` are used
+        first.
+
         Returns: (success, message, order_object)
         """
         # Verify access
@@ -192,47 +317,60 @@ class OrderService:
         if not access_ok:
             return False, access_msg, None
 
-        # Prepare items list for validation
-        items_for_validation = [(item.product_id, item.quantity)
-                                for item in request.items]
+        # Aggregate quantities so repeated lines are checked against one stock row
+        requested = OrderService._sum_quantities(
+            [(item.product_id, item.quantity) for item in request.items])
+
+        # Units already held for this cart are deducted; take only the rest.
+        # Holds are settled before the basket is loaded so expired or surplus
+        # units they return to stock are visible to the check below.
+        held: Dict[int, int] = {}
+        if request.reservation_key:
+            held = StockReservationService.consume_hold(
+                db, shop_id, request.reservation_key, requested)
+            if held is None:
+                db.rollback()
+                return False, "Cart reservation changed during checkout, please retry", None
+        to_take = {pid: qty - held.get(pid, 0)
+                   for pid, qty in requested.items()}
+
+        products, inventory = OrderService.load_basket(
+            db, shop_id, list(requested))
 
         # Validate inventory availability
-        inv_ok, inv_msg, error_product = OrderService.validate_inventory_availability(
-            db, shop_id, items_for_validation
+        inv_ok, inv_msg, error_product = OrderService.check_basket_stock(
+            to_take, products, inventory
         )
         if not inv_ok:
+            db.rollback()
             return False, inv_msg, None
 
-        # Prepare items data for total calculation
-        items_data = [
-            {
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-                "unit_price": item.unit_price
-            }
-            for item in request.items
-        ]
-
-        # Calculate totals
-        subtotal, tax_amount, total_amount = OrderService.calculate_order_totals(
-            db, shop_id, items_data
-        )
-
-        # Deduct inventory
-        deduct_ok, deduct_msg = OrderService.deduct_inventory(
-            db, shop_id, items_for_validation)
-        if not deduct_ok:
-            return False, deduct_msg, None
+        for product_id in requested:
+            if product_id not in products:
+                db.rollback()
+                return False, f"Product {product_id} not found", None
 
-        # Create order
         try:
+            item_rows, subtotal, tax_amount, total_amount = OrderService.build_order_items(
+                shop_id, request.items, products, inventory
+            )
+
+            # Conditional decrement - fails instead of overselling if another
+            # checkout took the stock since it was read
+            if not StockReservationService.decrement_stock(
+                db, {inventory[pid].id: qty for pid, qty in to_take.items()}
+            ):
+                db.rollback()
+                return False, "Insufficient stock after a concurrent checkout, please retry", None
+
+            now = datetime.utcnow()
             order_number = OrderService.generate_order_number(shop_id)
 
             order = Order(
                 shop_id=shop_id,
                 customer_id=request.customer_id,
                 order_number=order_number,
-                order_date=datetime.utcnow(),
+                order_date=now,
                 subtotal=subtotal,
                 tax_amount=tax_amount,
                 total_amount=total_amount,
@@ -249,34 +387,14 @@ class OrderService:
             db.add(order)
             db.flush()  # Get order ID without committing
 
-            # Create order items
-            for item in request.items:
-                product = db.query(Product).filter(
-                    Product.id == item.product_id
-                ).first()
+            for row in item_rows:
+                row["order_id"] = order.id
+            db.execute(insert(OrderItem), item_rows)
 
-                if not product:
-                    db.rollback()
-                    OrderService.restore_inventory(
-                        db, shop_id, items_for_validation)
-                    return False, f"Product {item.product_id} not found", None
-
-                line_total = item.unit_price * item.quantity
-                gst_amount = line_total * \
-                    (Decimal(str(product.gst_rate or 0)) / Decimal("100"))
-
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=item.product_id,
-                    shop_id=shop_id,
-                    product_name=product.name,
-                    quantity=item.quantity,
-                    unit_price=item.unit_price,
-                    gst_rate=product.gst_rate or Decimal("0"),
-                    gst_amount=gst_amount,
-                    line_total=line_total,
-                )
-                db.add(order_item)
+            OrderCounterService.record_transition(
+                db, shop_id, None, OrderStatusEnum.PLACED, total_amount)
+            DailySalesService.record_transition(
+                db, order, None, OrderStatusEnum.PLACED)
 
             db.commit()
             db.refresh(order)
@@ -285,7 +403,6 @@ class OrderService:
 
         except Exception as e:
             db.rollback()
-            OrderService.restore_inventory(db, shop_id, items_for_validation)
             return False, f"Error creating order: {str(e)}", None
 
     @staticmethod
@@ -305,21 +422,28 @@ class OrderService:
         skip: int = 0,
         limit: int = 20,
         status: Optional[OrderStatusEnum] = None,
-    ) -> Tuple[List[Order], int]:
-        """List orders for shop with optional filtering
+        cursor: Optional[str] = None,
+        with_total: bool = True,
+    ) -> Tuple[List[Order], Optional[int], Optional[str]]:
+        """List orders for shop with optional filtering, newest first
+
+        Pass the previous page's `next_cursor` to seek along idx_orders_date
+        instead of OFFSET-scanning; `skip` still works without a cursor.
 
-        Returns: (orders_list, total_count)
+        Returns: (orders_list, total_count or None, next_cursor)
         """
-        query = db.query(Order).filter(Order.shop_id == shop_id)
+        # Items of the whole page in one query (OrderResponse lists them)
+        query = db.query(Order).options(selectinload(Order.items)).filter(
+            Order.shop_id == shop_id)
 
         if status:
             query = query.filter(Order.order_status == status)
 
-        total = query.count()
-        orders = query.order_by(desc(Order.order_date)).offset(
-            skip).limit(limit).all()
+        orders, next_cursor, total = keyset_paginate(
+            query, (Order.order_date, Order.id), limit,
+            cursor=cursor, descending=True, skip=skip, with_total=with_total)
 
-        return orders, total
+        return orders, total, next_cursor
 
     @staticmethod
     def list_customer_orders(
@@ -328,20 +452,25 @@ class OrderService:
         customer_id: int,
         skip: int = 0,
         limit: int = 20,
-    ) -> Tuple[List[Order], int]:
-        """List orders for specific customer"""
-        query = db.query(Order).filter(
+        cursor: Optional[str] = None,
+        with_total: bool = True,
+    ) -> Tuple[List[Order], Optional[int], Optional[str]]:
+        """List orders for specific customer, newest first
+
+        Returns: (orders_list, total_count or None, next_cursor)
+        """
+        query = db.query(Order).options(selectinload(Order.items)).filter(
             and_(
                 Order.shop_id == shop_id,
                 Order.customer_id == customer_id
             )
         )
 
-        total = query.count()
-        orders = query.order_by(desc(Order.order_date)).offset(
-            skip).limit(limit).all()
+        orders, next_cursor, total = keyset_paginate(
+            query, (Order.order_date, Order.id), limit,
+            cursor=cursor, descending=True, skip=skip, with_total=with_total)
 
-        return orders, total
+        return orders, total, next_cursor
 
     @staticmethod
     def update_order_status(
@@ -368,17 +497,7 @@ class OrderService:
         current_status = order.order_status
         new_status = update_request.new_status
 
-        # Define valid transitions
-        valid_transitions = {
-            OrderStatusEnum.PLACED: [OrderStatusEnum.ACCEPTED, OrderStatusEnum.CANCELLED],
-            OrderStatusEnum.ACCEPTED: [OrderStatusEnum.PACKED, OrderStatusEnum.CANCELLED],
-            OrderStatusEnum.PACKED: [OrderStatusEnum.OUT_FOR_DELIVERY, OrderStatusEnum.CANCELLED],
-            OrderStatusEnum.OUT_FOR_DELIVERY: [OrderStatusEnum.DELIVERED, OrderStatusEnum.CANCELLED],
-            OrderStatusEnum.DELIVERED: [],  # Final state
-            OrderStatusEnum.CANCELLED: [],  # Final state
-        }
-
-        if new_status not in valid_transitions.get(current_status, []):
+        if new_status not in OrderService.VALID_TRANSITIONS.get(current_status, []):
             return False, f"Cannot transition from {current_status} to {new_status}", order
 
         try:
@@ -402,6 +521,13 @@ class OrderService:
             if new_status == OrderStatusEnum.DELIVERED:
                 order.delivery_date = datetime.utcnow()
 
+            db.flush()
+            OrderCounterService.record_transition(
+                db, shop_id, current_status, new_status, order.total_amount)
+            # Rollup and accounting follow from the event (app.orders.events)
+            OrderEventService.record(
+                db, shop_id, [(order.id, current_status)], new_status, user.id)
+
             db.commit()
             db.refresh(order)
 
@@ -411,40 +537,162 @@ class OrderService:
             db.rollback()
             return False, f"Error updating order status: {str(e)}", order
 
+    @staticmethod
+    def update_order_statuses(
+        db: Session,
+        shop_id: int,
+        order_ids: List[int],
+        update_request: OrderStatusUpdate,
+        user: User,
+    ) -> Tuple[bool, str, List[dict]]:
+        """Move many orders to one status in a single transaction
+
+        Orders are loaded (and locked, on PostgreSQL) in one query and
+        checked against VALID_TRANSITIONS; invalid or missing ones are
+        reported and skipped. Then, for the valid ones:
+        - cancellations return stock with one set-based inventory UPDATE
+        - the orders are updated with one set-based UPDATE
+        - counters get one update for the batch
+        - one order event per order is inserted in bulk; the dispatcher
+          (app.orders.events) updates the rollup and posts the deliveries'
+          ledger, GST and cash book entries from them
+        All of it commits once; on an error nothing is applied.
+
+        Returns: (success, message, results) with one
+        {order_id, success, message, order_status} per requested order
+        """
+        access_ok, _ = OrderService.verify_shop_access(user, shop_id, db)
+        if not access_ok and user.role != RoleEnum.ADMIN:
+            return False, "Unauthorized to update order status", []
+
+        new_status = update_request.new_status
+        requested = list(dict.fromkeys(order_ids))
+        orders = {
+            order.id: order
+            for order in db.query(Order).filter(
+                and_(
+                    Order.shop_id == shop_id,
+                    Order.id.in_(requested)
+                )
+            ).order_by(Order.id).with_for_update().populate_existing()
+        }
+
+        results: Dict[int, dict] = {}
+        changes: List[Tuple[Order, OrderStatusEnum]] = []
+        for order_id in requested:
+            order = orders.get(order_id)
+            if order is None:
+                results[order_id] = {"order_id": order_id, "success": False,
+                                     "message": f"Order {order_id} not found",
+                                     "order_status": None}
+            elif new_status not in OrderService.VALID_TRANSITIONS.get(order.order_status, []):
+                results[order_id] = {
+                    "order_id": order_id, "success": False,
+                    "message": f"Cannot transition from {order.order_status} to {new_status}",
+                    "order_status": order.order_status}
+            else:
+                changes.append((order, order.order_status))
+
+        # Ids are read now: the commit expires the loaded orders
+        changed_ids = [order.id for order, _ in changes]
+        if changes:
+            try:
+                now = datetime.utcnow()
+                if new_status == OrderStatusEnum.CANCELLED:
+                    # Restore inventory of every cancelled order at once
+                    lines = db.query(OrderItem.product_id, OrderItem.quantity).filter(
+                        OrderItem.order_id.in_(changed_ids)
+                    ).all()
+                    returned = OrderService._sum_quantities(lines)
+                    inventory = StockReservationService.lock_inventory_rows(
+                        db, shop_id, list(returned))
+                    StockReservationService.increment_stock(
+                        db,
+                        {inventory[pid].id: qty for pid, qty in returned.items()
+                         if pid in inventory}
+                    )
+
+                # One UPDATE for the whole batch; the loaded orders are
+                # brought in line without reloading them
+                values = {"order_status": new_status, "updated_at": now}
+                if new_status == OrderStatusEnum.DELIVERED:
+                    values["delivery_date"] = now
+                if update_request.notes:
+                    values["notes"] = func.coalesce(Order.notes, "") + (
+                        f"\n[{now.isoformat()}] {update_request.notes}")
+                db.execute(
+                    update(Order)
+                    .where(Order.id.in_(changed_ids))
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+
+                moves: Dict[OrderStatusEnum, Tuple[int, Decimal]] = {}
+                for order, old_status in changes:
+                    for key, value in values.items():
+                        if key == "notes":
+                            db.expire(order, ["notes"])
+                        else:
+                            set_committed_value(order, key, value)
+                    count, amount = moves.get(old_status, (0, Decimal("0")))
+                    moves[old_status] = (count + 1, amount + Decimal(str(order.total_amount or 0)))
+
+                OrderCounterService.record_transitions(db, shop_id, moves, new_status)
+                OrderEventService.record(
+                    db, shop_id, [(order.id, old_status) for order, old_status in changes],
+                    new_status, user.id)
+
+                db.commit()
+
+            except Exception as e:
+                db.rollback()
+                message = f"Error updating order status: {str(e)}"
+                for order_id in changed_ids:
+                    results[order_id] = {"order_id": order_id, "success": False,
+                                         "message": message, "order_status": None}
+                changed_ids = []
+
+        for order_id in changed_ids:
+            results[order_id] = {"order_id": order_id, "success": True,
+                                 "message": f"Order status updated to {new_status}",
+                                 "order_status": new_status}
+
+        updated = sum(1 for result in results.values() if result["success"])
+        return (updated > 0 or not requested,
+                f"{updated} of {len(requested)} orders updated to {new_status}",
+                [results[order_id] for order_id in requested])
+
     @staticmethod
     def get_order_dashboard(
         db: Session,
         shop_id: int,
     ) -> dict:
-        """Get order dashboard statistics"""
-        query = db.query(Order).filter(Order.shop_id == shop_id)
-
-        total_orders = query.count()
-        placed_orders = query.filter(
-            Order.order_status == OrderStatusEnum.PLACED).count()
-        accepted_orders = query.filter(
-            Order.order_status == OrderStatusEnum.ACCEPTED).count()
-        packed_orders = query.filter(
-            Order.order_status == OrderStatusEnum.PACKED).count()
-        out_for_delivery_orders = query.filter(
-            Order.order_status == OrderStatusEnum.OUT_FOR_DELIVERY
-        ).count()
-        delivered_orders = query.filter(
-            Order.order_status == OrderStatusEnum.DELIVERED).count()
-        cancelled_orders = query.filter(
-            Order.order_status == OrderStatusEnum.CANCELLED).count()
-
-        # Calculate revenue from delivered orders
-        delivered_query = db.query(Order).filter(
-            and_(
-                Order.shop_id == shop_id,
-                Order.order_status == OrderStatusEnum.DELIVERED
-            )
-        )
+        """Get order dashboard statistics
 
-        total_revenue = Decimal("0.00")
-        for order in delivered_query:
-            total_revenue += order.total_amount
+        Status counts and delivered revenue come from the shop's order
+        counters when ORDER_DASHBOARD_COUNTERS_ENABLED is set (and the shop
+        has been seeded), otherwise from one GROUP BY order_status query.
+        """
+        totals = None
+        if settings.ORDER_DASHBOARD_COUNTERS_ENABLED:
+            totals = OrderCounterService.get_counters(db, shop_id)
+        if totals is None:
+            totals = OrderCounterService.aggregate_by_status(db, shop_id)
+
+        def count(status: OrderStatusEnum) -> int:
+            return totals.get(status, (0, Decimal("0.00")))[0]
+
+        total_orders = sum(order_count for order_count, _ in totals.values())
+        placed_orders = count(OrderStatusEnum.PLACED)
+        accepted_orders = count(OrderStatusEnum.ACCEPTED)
+        packed_orders = count(OrderStatusEnum.PACKED)
+        out_for_delivery_orders = count(OrderStatusEnum.OUT_FOR_DELIVERY)
+        delivered_orders = count(OrderStatusEnum.DELIVERED)
+        cancelled_orders = count(OrderStatusEnum.CANCELLED)
+
+        # Revenue from delivered orders
+        total_revenue = totals.get(
+            OrderStatusEnum.DELIVERED, (0, Decimal("0.00")))[1]
 
         average_order_value = (
             total_revenue /
@@ -0,0 +1,28 @@
+"""Celery path for the order event dispatcher (ORDER_EVENTS_RUNNER=celery)
+
+Usage:
+    celery -A app.orders.tasks worker --beat --loglevel=info
+
+Beat drains the outbox every ORDER_EVENTS_POLL_SECONDS; several workers
+can run it at once, as claims skip events locked by another dispatcher.
+"""
+from celery import Celery
+
+from shared.config import get_settings
+from .events import dispatch_order_events
+
+settings = get_settings()
+
+celery_app = Celery("smartkirana-orders", broker=settings.REDIS_URL)
+celery_app.conf.beat_schedule = {
+    "dispatch-order-events": {
+        "task": "orders.dispatch_order_events",
+        "schedule": float(settings.ORDER_EVENTS_POLL_SECONDS),
+    },
+}
+
+
+@celery_app.task(name="orders.dispatch_order_events", ignore_result=True)
+def dispatch_events() -> int:
+    """Apply every due order event"""
+    return dispatch_order_events()
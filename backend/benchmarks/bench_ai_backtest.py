@@ -0,0 +1,306 @@
+"""Backtest: forecast accuracy and reorder outcomes on synthetic shop histories
+
+Usage:
+    python -m benchmarks.bench_ai_backtest [--shops 3] [--skus 200] [--days 182]
+        [--origins 8] [--models linear_regression holt_winters auto ...]
+        [--seed 7] [--json results.json] [--db URL]
+
+Each shop gets a seeded daily demand history per SKU: base level, linear
+trend, a weekday profile, a month-start (salary day) uplift, promotions
+(a 3-7 day lift followed by a dip) and intermittent sellers. The demand
+is written as one delivered order per shop and day and rolled up with
+DailySalesService.rebuild, the same path production data takes.
+
+The last `--origins` weeks are replayed with rolling origins. At each
+origin, DemandForecastingService and ReorderSuggestionService run "as of"
+that day and see only the history before it.
+- Accuracy: the 7-day forecasts against the demand that followed (WAPE,
+  MAPE over days that sold, bias)
+- Reorder: a simulated stock position starts at two weeks of demand.
+  Suggested quantities are ordered weekly and arrive after
+  LEAD_TIME_DAYS; demand is served from stock. Reported: stockout rate
+  (SKU-days with unmet demand), fill rate, and overstock cost (holding
+  cost of stock beyond the next week's demand)
+- Cost: wall time and queries per SKU for each service call
+
+Runs offline on in-memory SQLite by default. The same seed gives the
+same histories, so runs before and after an algorithm change compare
+directly (--json writes the results).
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import update
+
+from benchmarks.common import QueryCounter, make_session_factory, seed_shop
+
+from shared.models import Inventory, Order, OrderItem, OrderStatusEnum, Shop
+from app.ai.forecast_models import AUTO_MODEL, FORECAST_MODELS, HORIZON
+from app.ai.service import DemandForecastingService, ReorderSuggestionService
+from app.orders.daily_sales import DailySalesService
+
+# Reorder simulation
+LEAD_TIME_DAYS = 1  # Settings.REORDER_LEAD_TIME_DAYS: bench products have no supplier
+INITIAL_COVER_DAYS = 14
+HOLDING_RATE_PER_DAY = 0.001  # of cost price: capital, space, spoilage
+UNIT_COST = 8.0  # benchmarks.common.seed_shop cost price
+
+
+# ===== SYNTHETIC DEMAND =====
+
+def generate_demand(rng: np.random.Generator, skus: int, start: date, days: int) -> np.ndarray:
+    """Daily demand of `skus` products from `start`: (skus, days) int array"""
+    t = np.arange(days)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    weekdays = np.array([day.weekday() for day in dates])
+    month_start = np.array([day.day <= 5 for day in dates])
+
+    base = rng.lognormal(mean=1.2, sigma=0.9, size=skus)
+    growth = rng.uniform(-0.3, 0.5, size=skus)  # change over the whole period
+    trend = 1 + growth[:, None] * t / days
+
+    shop_profile = np.array([0.9, 0.85, 0.9, 1.0, 1.1, 1.35, 1.3])
+    profile = shop_profile * rng.uniform(0.85, 1.15, size=(skus, 7))
+    weekly = profile[:, weekdays]
+
+    uplift = rng.uniform(1.0, 1.6, size=skus)
+    salary = np.where(month_start, uplift[:, None], 1.0)
+
+    promo = np.ones((skus, days))
+    for sku in range(skus):
+        for _ in range(rng.poisson(days / 60)):
+            begin, length = rng.integers(0, days), rng.integers(3, 8)
+            promo[sku, begin:begin + length] *= rng.uniform(1.5, 3.0)
+            promo[sku, begin + length:begin + length + 3] *= 0.7
+
+    rates = base[:, None] * trend * weekly * salary * promo
+    demand = rng.poisson(rates)
+
+    # A quarter of the SKUs sell on few days, in bigger baskets
+    intermittent = rng.random(skus) < 0.25
+    selling = rng.random((skus, days)) < rng.uniform(0.1, 0.4, size=(skus, 1))
+    lumps = rng.poisson(rates * 4) + 1
+    demand[intermittent] = np.where(selling, lumps, 0)[intermittent]
+    return demand
+
+
+def seed_orders(db, shop, owner, products, demand: np.ndarray, start: date) -> None:
+    """One delivered order per day carrying that day's demand, then the rollup"""
+    db.flush()
+    for day in range(demand.shape[1]):
+        sold = np.nonzero(demand[:, day])[0]
+        if not len(sold):
+            continue
+        order_date = datetime.combine(start + timedelta(days=day), datetime.min.time())
+        order = Order(
+            shop_id=shop.id, order_number=f"BT-{shop.id}-{day}",
+            order_date=order_date + timedelta(hours=12),
+            subtotal=Decimal("0"), total_amount=Decimal("0"),
+            order_status=OrderStatusEnum.DELIVERED, created_by=owner.id,
+        )
+        db.add(order)
+        db.flush()
+        db.bulk_insert_mappings(OrderItem, [
+            {"order_id": order.id, "product_id": products[i].id,
+             "shop_id": shop.id, "product_name": products[i].name,
+             "quantity": int(demand[i, day]), "unit_price": 10,
+             "line_total": 10 * int(demand[i, day])}
+            for i in sold.tolist()
+        ])
+    DailySalesService.rebuild(db, shop.id)
+    db.commit()
+
+
+# ===== REPLAY =====
+
+class ShopHistory:
+    def __init__(self, shop_id, product_ids, inventory_ids, demand, start):
+        self.shop_id = shop_id
+        self.product_ids = product_ids
+        self.inventory_ids = inventory_ids
+        self.demand = demand
+        self.start = start
+
+
+def origin_days(days: int, origins: int):
+    """Day indexes of the rolling origins (last known day), a week apart"""
+    last = days - 1 - HORIZON
+    return [last - 7 * k for k in reversed(range(origins))]
+
+
+def as_of(history: ShopHistory, day: int) -> datetime:
+    return datetime.combine(history.start + timedelta(days=day), datetime.min.time())
+
+
+def replay_forecasts(db, counter, history: ShopHistory, model: str, origins, totals) -> None:
+    service = DemandForecastingService(db)
+    row_of = {product_id: i for i, product_id in enumerate(history.product_ids)}
+    for day in origins:
+        with counter.track():
+            counter.count = 0
+            start = time.perf_counter()
+            report = service.forecast_all_products(
+                history.shop_id, model=model, as_of=as_of(history, day))
+            totals["forecast_seconds"] += time.perf_counter() - start
+            totals["forecast_queries"] += counter.count
+        totals["forecast_calls"] += 1
+
+        predicted = np.zeros((len(row_of), HORIZON))
+        for product in report.products:
+            predicted[row_of[product.product_id]] = [
+                d.predicted_quantity for d in product.forecasts]
+        actual = history.demand[:, day + 1:day + 1 + HORIZON]
+        errors = predicted - actual
+        sold = actual > 0
+        totals["abs_error"] += np.abs(errors).sum()
+        totals["error"] += errors.sum()
+        totals["actual"] += actual.sum()
+        totals["ape"] += (np.abs(errors[sold]) / actual[sold]).sum()
+        totals["sold_days"] += int(sold.sum())
+
+
+def replay_reorders(db, counter, history: ShopHistory, model: str, origins, totals) -> None:
+    db.execute(update(Shop).where(Shop.id == history.shop_id).values(
+        forecast_model=model))
+    db.commit()
+    service = ReorderSuggestionService(db)
+    demand = history.demand
+    row_of = {product_id: i for i, product_id in enumerate(history.product_ids)}
+    first = origins[0]
+    stock = np.rint(demand[:, max(0, first - INITIAL_COVER_DAYS):first].mean(axis=1)
+                    * INITIAL_COVER_DAYS).astype(np.int64)
+
+    for day in origins:
+        db.execute(update(Inventory), [
+            {"id": inventory_id, "quantity": int(quantity)}
+            for inventory_id, quantity in zip(history.inventory_ids, stock.tolist())
+        ])
+        db.commit()
+        with counter.track():
+            counter.count = 0
+            start = time.perf_counter()
+            report = service.get_reorder_suggestions(
+                history.shop_id, as_of=as_of(history, day))
+            totals["reorder_seconds"] += time.perf_counter() - start
+            totals["reorder_queries"] += counter.count
+        totals["reorder_calls"] += 1
+
+        ordered = np.zeros(len(stock), dtype=np.int64)
+        for suggestion in report.suggestions:
+            ordered[row_of[suggestion.product_id]] = suggestion.suggested_reorder_qty
+
+        for offset in range(1, 8):
+            current = day + offset
+            if offset == LEAD_TIME_DAYS:
+                stock += ordered
+            wanted = demand[:, current]
+            served = np.minimum(stock, wanted)
+            stock -= served
+            totals["sku_days"] += len(stock)
+            totals["stockout_days"] += int((wanted > served).sum())
+            totals["demand_units"] += int(wanted.sum())
+            totals["served_units"] += int(served.sum())
+            cover = demand[:, current + 1:current + 1 + 7].sum(axis=1)
+            excess = np.maximum(0, stock - cover)
+            totals["overstock_cost"] += excess.sum() * UNIT_COST * HOLDING_RATE_PER_DAY
+
+
+def run(shops: int, skus: int, days: int, origins: int, models, seed: int,
+        url: str, json_path=None):
+    engine, SessionFactory = make_session_factory(url)
+    counter = QueryCounter(engine)
+    rng = np.random.default_rng(seed)
+    start = date.today() - timedelta(days=days)
+    db = SessionFactory()
+
+    seed_start = time.perf_counter()
+    histories = []
+    for shop_no in range(1, shops + 1):
+        shop, owner, products = seed_shop(db, skus, shop_no=shop_no)
+        demand = generate_demand(rng, skus, start, days)
+        seed_orders(db, shop, owner, products, demand, start)
+        inventory_ids = dict(db.query(Inventory.product_id, Inventory.id).filter(
+            Inventory.shop_id == shop.id))
+        product_ids = [product.id for product in products]
+        histories.append(ShopHistory(
+            shop.id, product_ids, [inventory_ids[i] for i in product_ids],
+            demand, start))
+    print(f"Seeded {shops} shop(s) x {skus} SKUs x {days} days "
+          f"in {time.perf_counter() - seed_start:.1f}s; "
+          f"{origins} weekly origins, {HORIZON}-day horizon\n")
+
+    replay = origin_days(days, origins)
+    results = []
+    print(f"{'model':>18}{'wape%':>8}{'mape%':>8}{'bias%':>8}"
+          f"{'stockout%':>11}{'fill%':>8}{'overstock':>11}"
+          f"{'fc ms/sku':>11}{'fc q/sku':>10}{'ro ms/sku':>11}{'ro q/sku':>10}")
+    for model in models:
+        totals = dict.fromkeys([
+            "abs_error", "error", "actual", "ape", "sold_days",
+            "forecast_seconds", "forecast_queries", "forecast_calls",
+            "reorder_seconds", "reorder_queries", "reorder_calls",
+            "sku_days", "stockout_days", "demand_units", "served_units",
+            "overstock_cost"], 0)
+        for history in histories:
+            replay_forecasts(db, counter, history, model, replay, totals)
+            replay_reorders(db, counter, history, model, replay, totals)
+
+        calls_skus = totals["forecast_calls"] * skus
+        reorder_skus = totals["reorder_calls"] * skus
+        result = {
+            "model": model,
+            "wape_pct": 100 * totals["abs_error"] / max(totals["actual"], 1),
+            "mape_pct": 100 * totals["ape"] / max(totals["sold_days"], 1),
+            "bias_pct": 100 * totals["error"] / max(totals["actual"], 1),
+            "stockout_pct": 100 * totals["stockout_days"] / max(totals["sku_days"], 1),
+            "fill_pct": 100 * totals["served_units"] / max(totals["demand_units"], 1),
+            "overstock_cost": totals["overstock_cost"],
+            "forecast_ms_per_sku": 1000 * totals["forecast_seconds"] / calls_skus,
+            "forecast_queries_per_sku": totals["forecast_queries"] / calls_skus,
+            "reorder_ms_per_sku": 1000 * totals["reorder_seconds"] / reorder_skus,
+            "reorder_queries_per_sku": totals["reorder_queries"] / reorder_skus,
+        }
+        results.append(result)
+        print(f"{model:>18}{result['wape_pct']:>8.1f}{result['mape_pct']:>8.1f}"
+              f"{result['bias_pct']:>8.1f}{result['stockout_pct']:>11.2f}"
+              f"{result['fill_pct']:>8.1f}{result['overstock_cost']:>11.0f}"
+              f"{result['forecast_ms_per_sku']:>11.3f}"
+              f"{result['forecast_queries_per_sku']:>10.3f}"
+              f"{result['reorder_ms_per_sku']:>11.3f}"
+              f"{result['reorder_queries_per_sku']:>10.3f}")
+
+    db.close()
+    engine.dispose()
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"shops": shops, "skus": skus, "days": days,
+                       "origins": origins, "seed": seed, "results": results},
+                      f, indent=2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shops", type=int, default=3)
+    parser.add_argument("--skus", type=int, default=200, help="SKUs per shop")
+    parser.add_argument("--days", type=int, default=182, help="Days of history")
+    parser.add_argument("--origins", type=int, default=8,
+                        help="Weekly rolling origins to replay")
+    parser.add_argument("--models", nargs="+",
+                        default=[*FORECAST_MODELS, AUTO_MODEL],
+                        choices=[*FORECAST_MODELS, AUTO_MODEL])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.shops, args.skus, args.days, args.origins, args.models,
+        args.seed, args.db, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark: anomaly detection over long windows on large shops
+
+Usage:
+    python -m benchmarks.bench_anomaly [--skus 1000 5000] [--fill 0.3 1.0] [--days-back 30 90] [--window 14] [--db URL]
+
+Each shop has daily_product_sales rows for a `fill` share of its SKU-days
+(1.0: every SKU sells every day, the worst case) and a manual stock
+adjustment for 1% of SKUs.
+The old detector could not be timed: it loaded every order of the window
+and rescanned them per product, and crashed on Order.order_items.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import QueryCounter, make_session_factory, seed_shop
+
+from shared.models import DailyProductSales, StockMovement
+from app.ai.service import AnomalyDetectionService
+
+
+def seed_history(db, shop, owner, products, days: int, fill: float = 1.0) -> None:
+    rng = random.Random(shop.id)
+    today = datetime.now()
+    rows = []
+    for back in range(days):
+        day = (today - timedelta(days=back)).date()
+        for product in products:
+            if rng.random() >= fill:
+                continue
+            quantity = rng.randint(5, 15)
+            rows.append({"shop_id": shop.id, "product_id": product.id,
+                         "sale_date": day, "ordered_qty": quantity,
+                         "ordered_amount": 10 * quantity})
+    db.bulk_insert_mappings(DailyProductSales, rows)
+    db.bulk_insert_mappings(StockMovement, [
+        {"shop_id": shop.id, "product_id": product.id,
+         "movement_type": "adjustment", "quantity": -rng.randint(1, 10),
+         "reference_type": "manual", "moved_by": owner.id,
+         "created_at": today - timedelta(days=rng.randint(0, days - 1))}
+        for product in rng.sample(products, max(1, len(products) // 100))
+    ])
+    db.commit()
+
+
+def run(sku_counts, fills, days_back_values, window: int, url: str):
+    engine, SessionFactory = make_session_factory(url)
+    counter = QueryCounter(engine)
+
+    print(f"{'skus':>7}{'fill':>6}{'days':>6}{'queries':>9}"
+          f"{'anomalies':>11}{'seconds':>9}")
+    cases = [(skus, fill) for skus in sku_counts for fill in fills]
+    for shop_no, (skus, fill) in enumerate(cases, start=1):
+        db = SessionFactory()
+        shop, owner, products = seed_shop(db, skus, shop_no=shop_no)
+        seed_history(db, shop, owner, products,
+                     max(days_back_values) + window + 1, fill)
+        shop_id, service = shop.id, AnomalyDetectionService(db)
+
+        for days_back in days_back_values:
+            with counter.track():
+                counter.count = 0
+                start = time.perf_counter()
+                report = service.detect_anomalies(
+                    shop_id, days_back=days_back, window=window)
+                elapsed = time.perf_counter() - start
+            print(f"{skus:>7}{fill:>6}{days_back:>6}{counter.count:>9}"
+                  f"{report.total_anomalies:>11}{elapsed:>9.2f}")
+        db.close()
+
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--fill", type=float, nargs="+", default=[0.3, 1.0],
+                        help="Share of SKU-days with sales")
+    parser.add_argument("--days-back", type=int, nargs="+", default=[30, 90])
+    parser.add_argument("--window", type=int, default=14)
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.skus, args.fill, args.days_back, args.window, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Benchmark concurrent page loads on one worker: sync Session vs AsyncSession
+
+Usage:
+    python -m benchmarks.bench_async_pages [--requests 400] [--concurrency 20]
+                                           [--latency-ms 5]
+
+Both modes serve /admin/products from a single event loop (one uvicorn
+worker) with `--concurrency` requests in flight. "sync" is the handler as it
+was before the port: an `async def` route querying through the synchronous
+Session, so every statement blocks the loop and page loads serialize.
+"async" is the ported admin router on get_async_db. SQLite answers in
+microseconds, so `--latency-ms` adds a round trip per statement in the thread
+that waits on the database, as a networked PostgreSQL would.
+
+Both pools hold `--concurrency` connections. A smaller sync pool deadlocks:
+the blocked loop waits for a connection that only get_db's teardown, which
+needs the loop, would return.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.common import make_session_factory, percentile, seed_shop
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.responses import HTMLResponse
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.requests import Request
+
+import admin_router
+from shared.database import get_async_db, get_db
+from shared.models import Product
+
+PAGE_PATH = "/admin/products"
+
+
+def add_round_trip_latency(sync_engine, latency_ms: float) -> None:
+    """Sleep `latency_ms` per statement in the thread that executes it"""
+    delay = latency_ms / 1000
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        def wait(statement):
+            time.sleep(delay)
+
+        if hasattr(dbapi_connection, "await_"):
+            # aiosqlite: the callback runs on its worker thread, not the loop
+            dbapi_connection.await_(
+                dbapi_connection._connection.set_trace_callback(wait))
+        else:
+            dbapi_connection.set_trace_callback(wait)
+
+
+def build_sync_app(SessionFactory) -> FastAPI:
+    app = FastAPI()
+
+    @app.get(PAGE_PATH, response_class=HTMLResponse)
+    async def admin_products(request: Request, db: Session = Depends(get_db)):
+        """admin_router.admin_products before the async port"""
+        products = db.query(Product).limit(100).all()
+        inventory_value = sum(
+            float(p.current_stock or 0) * float(p.cost_price)
+            for p in products if p.cost_price)
+        categories = {p.category for p in products if p.category}
+        return admin_router.templates.TemplateResponse("admin/products.html", {
+            "request": request,
+            "products": products,
+            "total_products": len(products),
+            "inventory_value": round(inventory_value, 2),
+            "categories_count": len(categories),
+            "cart_count": 0
+        })
+
+    def override_get_db():
+        db = SessionFactory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+def build_async_app(AsyncSessionFactory) -> FastAPI:
+    app = FastAPI()
+    app.include_router(admin_router.router)
+
+    async def override_get_async_db():
+        async with AsyncSessionFactory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return app
+
+
+async def load_pages(app: FastAPI, requests: int, concurrency: int):
+    """Fetch the page `requests` times, `concurrency` at a time
+
+    Returns: (elapsed_seconds, per-request latencies in ms)
+    """
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def fetch():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(PAGE_PATH)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+
+        await fetch()  # warm up
+        latencies.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+async def run(requests: int, concurrency: int, latency_ms: float, products: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed_engine, SeedSession = make_session_factory(f"sqlite:///{path}")
+        db = SeedSession()
+        seed_shop(db, products)
+        db.close()
+        seed_engine.dispose()
+
+        engine = create_engine(
+            f"sqlite:///{path}", connect_args={"check_same_thread": False},
+            pool_size=concurrency, max_overflow=0)
+        SessionFactory = sessionmaker(
+            autocommit=False, autoflush=False, bind=engine)
+
+        async_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool,
+            pool_size=concurrency, max_overflow=0)
+        AsyncSessionFactory = async_sessionmaker(
+            async_engine, autoflush=False, expire_on_commit=False)
+        if latency_ms:
+            add_round_trip_latency(engine, latency_ms)
+            add_round_trip_latency(async_engine.sync_engine, latency_ms)
+
+        results = {}
+        for label, app in (("sync", build_sync_app(SessionFactory)),
+                           ("async", build_async_app(AsyncSessionFactory))):
+            elapsed, latencies = await load_pages(app, requests, concurrency)
+            results[label] = (requests / elapsed, percentile(latencies, 50),
+                              percentile(latencies, 95))
+
+        await async_engine.dispose()
+        engine.dispose()
+
+    print(f"{requests} page loads, {concurrency} concurrent, "
+          f"{latency_ms:g} ms per statement")
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, (throughput, p50, p95) in results.items():
+        print(f"{label:<8}{throughput:>10.0f}{p50:>10.1f}{p95:>10.1f}")
+    print(f"throughput gain: {results['async'][0] / results['sync'][0]:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=5.0,
+                        help="Simulated round trip per statement (0 = raw SQLite)")
+    parser.add_argument("--products", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency_ms,
+                    args.products))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark authenticated request throughput with and without the principal cache
+
+Usage:
+    python -m benchmarks.bench_auth_principal [--requests 2000] [--db URL]
+
+Drives an in-process endpoint that only depends on get_current_user and
+reports requests per second and statements per request. "uncached" disables
+the principal cache, which is how get_current_user behaved before (one users
+lookup per request). In-memory SQLite makes that lookup unusually cheap; the
+gain grows with real database round-trip latency.
+"""
+import argparse
+import time
+
+from benchmarks.common import QueryCounter, make_session_factory, seed_shop
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from shared.database import get_db
+from shared.models import User
+from app.auth.principal_cache import principal_cache
+from app.auth.security import create_access_token, get_current_user
+
+PROBE_PATH = "/bench/whoami"
+
+
+def build_client(SessionFactory) -> TestClient:
+    app = FastAPI()
+
+    @app.get(PROBE_PATH)
+    def whoami(current_user: User = Depends(get_current_user)):
+        return {"id": current_user.id, "role": current_user.role.value,
+                "shop_id": current_user.shop_id}
+
+    def override_get_db():
+        db = SessionFactory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+def measure(client: TestClient, counter: QueryCounter, headers: dict, requests: int):
+    """Time `requests` probe calls; returns (elapsed_seconds, statements)"""
+    with counter.track():
+        counter.count = 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = client.get(PROBE_PATH, headers=headers)
+            assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - start
+    return elapsed, counter.count
+
+
+def run(requests: int, url: str):
+    engine, SessionFactory = make_session_factory(url)
+    db = SessionFactory()
+    _, owner, _ = seed_shop(db, 1)
+    owner.email = "owner@bench.local"
+    db.commit()
+    token = create_access_token({
+        "sub": str(owner.id),
+        "email": owner.email,
+        "role": owner.role.value,
+        "ver": owner.token_version,
+    })
+    db.close()
+
+    headers = {"Authorization": f"Bearer {token}"}
+    client = build_client(SessionFactory)
+    counter = QueryCounter(engine)
+    max_size = principal_cache.max_size
+
+    modes = (("uncached", 0), ("cached", max_size or 10000))
+    totals = {label: [0.0, 0] for label, _ in modes}
+    batch = 100
+    try:
+        client.get(PROBE_PATH, headers=headers)  # warm up
+        # Alternate small batches so drift in the test client affects both
+        for _ in range(max(1, requests // batch)):
+            for label, size in modes:
+                principal_cache.clear()
+                principal_cache.max_size = size
+                elapsed, statements = measure(client, counter, headers, batch)
+                totals[label][0] += elapsed
+                totals[label][1] += statements
+    finally:
+        principal_cache.max_size = max_size
+        principal_cache.clear()
+
+    done = max(1, requests // batch) * batch
+    results = {
+        label: (done / elapsed, statements / done)
+        for label, (elapsed, statements) in totals.items()
+    }
+
+    print(f"{'path':<10}{'req/s':>10}{'queries/req':>14}")
+    for label, (throughput, queries) in results.items():
+        print(f"{label:<10}{throughput:>10.0f}{queries:>14.2f}")
+    print(f"throughput gain: "
+          f"{results['cached'][0] / results['uncached'][0]:.2f}x")
+
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.requests, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark: bulk catalogue import/export vs one-product-per-request onboarding
+
+Usage:
+    python -m benchmarks.bench_bulk_catalogue [--skus 50000] [--legacy-skus 1000] [--db URL]
+
+The legacy path is what onboarding through POST /api/v1/products costs: a
+SKU lookup, an INSERT and a COMMIT per product. It runs on a subset and is
+reported as rows/s. The bulk import then loads the full catalogue, re-imports
+it (every row an update) and streams it back out as CSV.
+"""
+import argparse
+import io
+import time
+from decimal import Decimal
+
+from benchmarks.common import QueryCounter, make_session_factory, seed_shop
+
+from shared.models import Product
+from product_service.bulk import EXPORT_FIELDS, ProductBulkService
+
+
+def catalogue_csv(skus: int, prefix: str = "CAT") -> bytes:
+    lines = [",".join(EXPORT_FIELDS)]
+    for i in range(skus):
+        row = {
+            "name": f"Catalogue Item {i}", "sku": f"{prefix}-{i}",
+            "category": f"Category {i % 40}", "unit": "piece",
+            "cost_price": "8.00", "selling_price": "10.00", "mrp": "12.00",
+            "gst_rate": ("0", "5", "12", "18")[i % 4],
+            "hsn_code": f"{1000 + i % 50}", "current_stock": str(i % 500),
+        }
+        lines.append(",".join(row.get(field, "") for field in EXPORT_FIELDS))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def legacy_import(db, shop_id: int, payload: bytes) -> int:
+    """Per-product create: duplicate check, insert, commit"""
+    created = 0
+    for _, record, _ in ProductBulkService.read_records(io.BytesIO(payload), "csv"):
+        exists = db.query(Product).filter(
+            Product.shop_id == shop_id, Product.sku == record["sku"]).first()
+        if exists:
+            continue
+        db.add(Product(
+            shop_id=shop_id,
+            name=record["name"], sku=record["sku"],
+            category=record["category"], unit=record["unit"],
+            cost_price=Decimal(record["cost_price"]),
+            selling_price=Decimal(record["selling_price"]),
+            mrp=Decimal(record["mrp"]), gst_rate=Decimal(record["gst_rate"]),
+            hsn_code=record["hsn_code"],
+            current_stock=int(record["current_stock"]),
+        ))
+        db.commit()
+        created += 1
+    return created
+
+
+def run(skus: int, legacy_skus: int, chunk_size: int, url: str):
+    engine, SessionFactory = make_session_factory(url)
+    db = SessionFactory()
+    legacy_shop, _, _ = seed_shop(db, 0, shop_no=1)
+    bulk_shop, _, _ = seed_shop(db, 0, shop_no=2)
+    counter = QueryCounter(engine)
+
+    print(f"{'path':<16}{'rows':>8}{'queries':>10}{'seconds':>10}{'rows/s':>10}")
+
+    def report(label, rows, fn):
+        with counter.track():
+            counter.count = 0
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+        print(f"{label:<16}{rows:>8}{counter.count:>10}"
+              f"{elapsed:>10.2f}{rows / elapsed:>10.0f}")
+        return result
+
+    legacy_payload = catalogue_csv(legacy_skus, prefix="OLD")
+    report("legacy import", legacy_skus,
+           lambda: legacy_import(db, legacy_shop.id, legacy_payload))
+
+    payload = catalogue_csv(skus)
+
+    def bulk_import():
+        records = ProductBulkService.read_records(io.BytesIO(payload), "csv")
+        result = ProductBulkService.import_records(
+            db, bulk_shop.id, records, chunk_size=chunk_size)
+        assert result["failed"] == 0, result["errors"][:3]
+        return result
+
+    created = report("bulk import", skus, bulk_import)
+    assert created["created"] == skus
+    updated = report("bulk re-import", skus, bulk_import)
+    assert updated["updated"] == skus
+
+    def export():
+        return sum(len(chunk) for chunk in
+                   ProductBulkService.export_rows(db, bulk_shop.id, "csv"))
+
+    size = report("csv export", skus, export)
+    print(f"\nexport size: {size / 1024 / 1024:.1f} MiB")
+
+    db.close()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, default=50_000)
+    parser.add_argument("--legacy-skus", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.skus, args.legacy_skus, args.chunk_size, args.db)
+
+
+if __name__ == "__main__":
+    main()
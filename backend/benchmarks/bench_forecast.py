@@ -0,0 +1,114 @@
+"""Benchmark: batch demand forecast vs the per-product loop, by SKU count
+
+Usage:
+    python -m benchmarks.bench_forecast [--skus 100 1000 5000] [--legacy-max 5000] [--db URL]
+
+Each shop has 14 days of orders selling every SKU, rolled up into
+daily_product_sales. The legacy path is the old forecast_all_products:
+list the products sold, then run get_product_forecast (product, stock and
+daily-sales queries) per product.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from benchmarks.common import QueryCounter, make_session_factory, seed_shop
+
+from shared.models import Order, OrderItem, OrderStatusEnum, Product
+from app.ai.service import DemandForecastingService
+from app.orders.daily_sales import DailySalesService
+from app.ai.utils import get_14_days_ago
+
+
+def legacy_forecast_all_products(service: DemandForecastingService, shop_id: int) -> int:
+    """The pre-batching loop: one forecast (and sales query) per product"""
+    products = service.db.query(Product).join(
+        OrderItem
+    ).join(
+        Order
+    ).filter(
+        Order.shop_id == shop_id,
+        Order.order_date >= get_14_days_ago(),
+        Order.order_status.in_(["DELIVERED", "PLACED"])
+    ).distinct().all()
+
+    forecasts = []
+    for product in products:
+        forecast = service.get_product_forecast(product.id, shop_id)
+        if forecast:
+            forecasts.append(forecast)
+    return len(forecasts)
+
+
+def seed_sales(db, shop, owner, products, days: int = 14) -> None:
+    rng = random.Random(shop.id)
+    now = datetime.now()
+    for day in range(days):
+        order = Order(
+            shop_id=shop.id, order_number=f"FC-{shop.id}-{day}",
+            order_date=now - timedelta(days=day, hours=1),
+            subtotal=Decimal("0"), total_amount=Decimal("0"),
+            order_status=OrderStatusEnum.DELIVERED, created_by=owner.id,
+        )
+        db.add(order)
+        db.flush()
+        db.bulk_insert_mappings(OrderItem, [
+            {
+                "order_id": order.id, "product_id": product.id,
+                "shop_id": shop.id, "product_name": product.name,
+                "quantity": rng.randint(1, 20), "unit_price": 10,
+                "line_total": 10,
+            }
+            for product in products
+        ])
+    DailySalesService.rebuild(db, shop.id)
+    db.commit()
+
+
+def run(sku_counts, legacy_max: int, url: str):
+    engine, SessionFactory = make_session_factory(url)
+    counter = QueryCounter(engine)
+
+    print(f"{'skus':>7}{'path':>9}{'queries':>10}{'seconds':>10}{'ms/sku':>9}")
+    for shop_no, skus in enumerate(sku_counts, start=1):
+        db = SessionFactory()
+        shop, owner, products = seed_shop(db, skus, shop_no=shop_no)
+        seed_sales(db, shop, owner, products)
+        service = DemandForecastingService(db)
+
+        paths = [("batch", lambda: service.forecast_all_products(
+            shop.id).total_products_forecasted)]
+        if skus <= legacy_max:
+            paths.insert(0, ("legacy", lambda: legacy_forecast_all_products(
+                service, shop.id)))
+
+        for label, fn in paths:
+            with counter.track():
+                counter.count = 0
+                start = time.perf_counter()
+                forecasted = fn()
+                elapsed = time.perf_counter() - start
+            assert forecasted == skus, (label, forecasted)
+            print(f"{skus:>7}{label:>9}{counter.count:>10}"
+                  f"{elapsed:>10.2f}{elapsed * 1000 / skus:>9.2f}")
+        db.close()
+
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, nargs="+",
+                        default=[100, 1000, 5000])
+    parser.add_argument("--legacy-max", type=int, default=5000,
+                        help="Skip the legacy loop above this many SKUs")
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.skus, args.legacy_max, args.db)
+
+
+if __name__ == "__main__":
+    main()
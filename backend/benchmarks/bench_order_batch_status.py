@@ -0,0 +1,147 @@
+"""Benchmark: delivering and cancelling orders one by one vs in one batch
+
+Usage:
+    python -m benchmarks.bench_order_batch_status [--orders 300]
+        [--lines-per-order 4] [--skus 200] [--db URL]
+
+Seeds one shop with dispatched (OUT_FOR_DELIVERY) orders, then moves
+`--orders` of them to DELIVERED and as many to CANCELLED on each path:
+- per-order: OrderService.update_order_status per order, as the PATCH
+  status route does
+- batch: one OrderService.update_order_statuses call per status, as the
+  status-batch route does
+Both record order events; the dispatcher (OrderEventService) then applies
+the rollup and accounting side effects, timed separately.
+
+Reports queries and wall time per path for the status change and for the
+dispatch, and checks both paths leave the same ledger, cash book and GST
+rows behind.
+"""
+import argparse
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from benchmarks.common import QueryCounter, make_session_factory, seed_shop
+
+from shared.models import (
+    CashBook, GSTRecord, LedgerEntry, Order, OrderItem, OrderStatusEnum
+)
+from app.orders.counters import OrderCounterService
+from app.orders.daily_sales import DailySalesService
+from app.orders.events import OrderEventService
+from app.orders.schemas import OrderStatusUpdate
+from app.orders.service import OrderService
+
+UNIT_PRICE = Decimal("10.00")
+
+
+def seed_dispatched(db, shop, owner, products, count: int, lines_per_order: int):
+    """Bulk insert `count` dispatched orders; returns their ids"""
+    first = (db.query(func.max(Order.id)).scalar() or 0) + 1
+    now = datetime.utcnow()
+    orders, items = [], []
+    for order_id in range(first, first + count):
+        subtotal = tax = Decimal("0")
+        for k in range(lines_per_order):
+            product = products[(order_id * lines_per_order + k) % len(products)]
+            quantity = 1 + (order_id + k) % 3
+            line_total = UNIT_PRICE * quantity
+            gst_amount = line_total * product.gst_rate / 100
+            subtotal += line_total
+            tax += gst_amount
+            items.append({
+                "order_id": order_id, "product_id": product.id,
+                "shop_id": shop.id, "product_name": product.name,
+                "quantity": quantity, "unit_price": UNIT_PRICE,
+                "unit_cost": product.cost_price, "gst_rate": product.gst_rate,
+                "gst_amount": gst_amount, "line_total": line_total + gst_amount,
+            })
+        orders.append({
+            "id": order_id, "shop_id": shop.id,
+            "order_number": f"BS-{order_id}", "order_date": now,
+            "subtotal": subtotal, "tax_amount": tax,
+            "discount_amount": Decimal("0"), "total_amount": subtotal + tax,
+            "order_status": OrderStatusEnum.OUT_FOR_DELIVERY,
+            "created_by": owner.id,
+        })
+    db.bulk_insert_mappings(Order, orders)
+    db.bulk_insert_mappings(OrderItem, items)
+    db.commit()
+    return [order["id"] for order in orders]
+
+
+def per_order(db, shop_id, owner, order_ids, new_status):
+    for order_id in order_ids:
+        success, message, _ = OrderService.update_order_status(
+            db, shop_id, order_id, OrderStatusUpdate(new_status=new_status), owner)
+        assert success, message
+
+
+def batch(db, shop_id, owner, order_ids, new_status):
+    success, message, _ = OrderService.update_order_statuses(
+        db, shop_id, order_ids, OrderStatusUpdate(new_status=new_status), owner)
+    assert success, message
+
+
+def posted(db, order_ids):
+    """(ledger entries, cash entries, GST records) posted for the orders"""
+    return (
+        db.query(LedgerEntry).filter(LedgerEntry.reference_id.in_(order_ids)).count(),
+        db.query(CashBook).filter(CashBook.order_id.in_(order_ids)).count(),
+        db.query(GSTRecord).filter(GSTRecord.order_id.in_(order_ids)).count(),
+    )
+
+
+def run(count: int, lines_per_order: int, skus: int, url: str):
+    engine, SessionFactory = make_session_factory(url)
+    db = SessionFactory()
+    shop, owner, products = seed_shop(db, skus)
+    batches = {
+        (label, status): seed_dispatched(db, shop, owner, products, count, lines_per_order)
+        for label in ("per-order", "batch")
+        for status in (OrderStatusEnum.DELIVERED, OrderStatusEnum.CANCELLED)
+    }
+    OrderCounterService.rebuild(db, shop.id)
+    DailySalesService.rebuild(db, shop.id)
+    db.commit()
+    print(f"{count} orders per status and path, {lines_per_order} lines each")
+    counter = QueryCounter(engine)
+
+    print(f"{'path':<11}{'status':<11}{'queries':>10}{'ms':>10}{'ms/order':>10}"
+          f"{'dispatch q':>12}{'dispatch ms':>13}{'posted':>16}")
+    for (label, status), order_ids in batches.items():
+        move = per_order if label == "per-order" else batch
+        timings = []
+        for step in (lambda: move(db, shop.id, owner, order_ids, status),
+                     lambda: OrderEventService.dispatch_pending(db)):
+            db.expire_all()
+            with counter.track():
+                counter.count = 0
+                started = time.perf_counter()
+                step()
+                timings.append((counter.count, (time.perf_counter() - started) * 1000))
+        (queries, elapsed), (dispatch_queries, dispatch_elapsed) = timings
+        print(f"{label:<11}{status.value:<11}{queries:>10}{elapsed:>10.1f}"
+              f"{elapsed / count:>10.2f}{dispatch_queries:>12}{dispatch_elapsed:>13.1f}"
+              f"{str(posted(db, order_ids)):>16}")
+
+    db.close()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--lines-per-order", type=int, default=4)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.orders, args.lines_per_order, args.skus, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark: batched OrderService.create_order vs the per-line legacy path
+
+Usage:
+    python -m benchmarks.bench_order_create [--lines 40 80] [--runs 50] [--db URL]
+
+Reports database round trips per checkout and mean/p50/p95 latency.
+"""
+import argparse
+from datetime import datetime
+from decimal import Decimal
+
+from benchmarks.common import (
+    QueryCounter, make_session_factory, seed_shop, time_calls
+)
+from sqlalchemy import and_
+
+from shared.models import Order, OrderItem, Product, Inventory, OrderStatusEnum
+from app.orders.schemas import OrderCreateRequest, OrderItemCreate
+from app.orders.service import OrderService
+
+
+def legacy_create_order(db, shop_id, user, request):
+    """The pre-batching create_order: one query per line per step"""
+    items = [(item.product_id, item.quantity) for item in request.items]
+    OrderService.verify_shop_access(user, shop_id, db)
+    ok, msg, _ = OrderService.validate_inventory_availability(
+        db, shop_id, items)
+    if not ok:
+        return False, msg, None
+    subtotal, tax_amount, total = OrderService.calculate_order_totals(
+        db, shop_id,
+        [{"product_id": i.product_id, "quantity": i.quantity,
+          "unit_price": i.unit_price} for i in request.items]
+    )
+    # Original read-modify-write deduction, copied so the baseline stays fixed
+    for product_id, quantity in items:
+        inventory = db.query(Inventory).filter(
+            and_(
+                Inventory.shop_id == shop_id,
+                Inventory.product_id == product_id
+            )
+        ).first()
+        inventory.quantity -= quantity
+        inventory.last_updated = datetime.utcnow()
+    db.commit()
+
+    order = Order(
+        shop_id=shop_id,
+        customer_id=request.customer_id,
+        order_number=OrderService.generate_order_number(shop_id),
+        order_date=datetime.utcnow(),
+        subtotal=subtotal,
+        tax_amount=tax_amount,
+        total_amount=total,
+        order_status=OrderStatusEnum.PLACED,
+        created_by=user.id,
+        customer_name=request.customer_name,
+        customer_phone=request.customer_phone,
+        shipping_address=request.shipping_address,
+    )
+    db.add(order)
+    db.flush()
+    for item in request.items:
+        product = db.query(Product).filter(
+            Product.id == item.product_id).first()
+        line_total = item.unit_price * item.quantity
+        db.add(OrderItem(
+            order_id=order.id,
+            product_id=item.product_id,
+            shop_id=shop_id,
+            product_name=product.name,
+            quantity=item.quantity,
+            unit_price=item.unit_price,
+            gst_rate=product.gst_rate or Decimal("0"),
+            gst_amount=line_total *
+            (Decimal(str(product.gst_rate or 0)) / Decimal("100")),
+            line_total=line_total,
+        ))
+    db.commit()
+    db.refresh(order)
+    return True, "ok", order
+
+
+def build_request(products, lines: int) -> OrderCreateRequest:
+    return OrderCreateRequest(
+        customer_name="Bench Customer",
+        customer_phone="9876543210",
+        shipping_address="Bench Address",
+        items=[
+            OrderItemCreate(product_id=p.id, quantity=1,
+                            unit_price=Decimal("10.00"))
+            for p in products[:lines]
+        ],
+    )
+
+
+def run(lines_options, runs: int, url: str):
+    engine, SessionFactory = make_session_factory(url)
+    db = SessionFactory()
+    shop, owner, products = seed_shop(db, max(lines_options))
+    counter = QueryCounter(engine)
+
+    print(f"{'path':<10}{'lines':>7}{'queries':>10}"
+          f"{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for lines in lines_options:
+        request = build_request(products, lines)
+        for label, fn in (("legacy", legacy_create_order),
+                          ("batched", OrderService.create_order)):
+            with counter.track():
+                counter.count = 0
+                ok, msg, _ = fn(db, shop.id, owner, request)
+                queries = counter.count
+            assert ok, msg
+            stats = time_calls(
+                lambda: fn(db, shop.id, owner, request), runs)
+            print(f"{label:<10}{lines:>7}{queries:>10}"
+                  f"{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+                  f"{stats['p95_ms']:>10.2f}")
+
+    db.close()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[40, 80])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.lines, args.runs, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark: OFFSET vs keyset pagination of a large shop's order list
+
+Usage:
+    python -m benchmarks.bench_pagination [--orders 200000] [--limit 20] [--runs 20] [--db URL]
+
+Times OrderService.list_orders at increasing depths: skip/limit with the
+count it used to run on every page, against a cursor seek without a count.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_session_factory, seed_shop, time_calls
+
+from shared.models import Order
+from shared.pagination import encode_cursor
+from app.orders.service import OrderService
+
+
+def seed_orders(db, shop_id: int, user_id: int, count: int) -> None:
+    start = datetime(2023, 1, 1)
+    rows = [
+        {
+            "shop_id": shop_id, "order_number": f"BENCH-{i}",
+            "order_date": start + timedelta(seconds=37 * i),
+            "subtotal": 100, "total_amount": 105, "created_by": user_id,
+        }
+        for i in range(count)
+    ]
+    db.bulk_insert_mappings(Order, rows)
+    db.commit()
+
+
+def run(order_count: int, limit: int, runs: int, url: str):
+    _, SessionFactory = make_session_factory(url)
+    db = SessionFactory()
+    shop, owner, _ = seed_shop(db, 0)
+    seed_orders(db, shop.id, owner.id, order_count)
+
+    print(f"{'depth':>8}{'offset ms':>12}{'cursor ms':>12}")
+    for fraction in (0, 0.1, 0.5, 0.9):
+        skip = int(order_count * fraction)
+        # Cursor of the row just before `skip`, as a client would hold it
+        cursor = None
+        if skip:
+            boundary = db.query(Order.order_date, Order.id).filter(
+                Order.shop_id == shop.id
+            ).order_by(Order.order_date.desc(), Order.id.desc()).offset(skip - 1).first()
+            cursor = encode_cursor(list(boundary))
+
+        offset_stats = time_calls(lambda: OrderService.list_orders(
+            db, shop.id, skip=skip, limit=limit), runs)
+        cursor_stats = time_calls(lambda: OrderService.list_orders(
+            db, shop.id, limit=limit, cursor=cursor, with_total=False), runs)
+        print(f"{skip:>8}{offset_stats['mean_ms']:>12.2f}"
+              f"{cursor_stats['mean_ms']:>12.2f}")
+
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.orders, args.limit, args.runs, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Benchmark: a year of monthly P&L reports, aggregates vs the per-line loop
+
+Usage:
+    python -m benchmarks.bench_profit_loss [--orders-per-day 40]
+        [--lines-per-order 5] [--skus 200] [--legacy-months 12] [--db URL]
+
+Seeds one shop with a year of delivered orders whose lines carry the cost
+captured at sale (the cost price rises mid-year), then builds the daily
+sales rollup. Each month's P&L is computed twice:
+- legacy: load the month's orders, walk order.items and look up each
+  line's inventory cost, the loop the P&L routes used before cost capture
+- aggregate: AccountingService.get_profit_loss_report (order totals plus
+  the rollup's cost-at-sale)
+
+Reports queries and wall time per path, and the COGS each path finds: the
+legacy loop prices every unit at today's cost, not the cost it sold at.
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_
+
+from benchmarks.common import QueryCounter, make_session_factory, seed_shop
+
+from shared.models import Inventory, Order, OrderItem, OrderStatusEnum
+from app.accounting.service import AccountingService
+from app.orders.daily_sales import DailySalesService
+
+YEAR = 2024
+COST_BEFORE = Decimal("7.50")  # cost price until July
+COST_AFTER = Decimal("8.00")  # benchmarks.common.seed_shop cost price
+UNIT_PRICE = Decimal("10.00")
+
+
+def seed_year(db, shop, owner, products, orders_per_day: int, lines_per_order: int) -> int:
+    """Bulk insert a year of delivered orders and roll them up; returns line count"""
+    order_id = 0
+    lines = 0
+    day = date(YEAR, 1, 1)
+    while day.year == YEAR:
+        unit_cost = COST_BEFORE if day.month < 7 else COST_AFTER
+        orders, items = [], []
+        for n in range(orders_per_day):
+            order_id += 1
+            placed = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=8, minutes=n * 10 % 720)
+            subtotal = Decimal("0")
+            for k in range(lines_per_order):
+                product = products[(order_id * lines_per_order + k) % len(products)]
+                quantity = 1 + (order_id + k) % 3
+                line_total = UNIT_PRICE * quantity
+                subtotal += line_total
+                items.append({
+                    "order_id": order_id, "product_id": product.id,
+                    "shop_id": shop.id, "product_name": product.name,
+                    "quantity": quantity, "unit_price": UNIT_PRICE,
+                    "unit_cost": unit_cost, "gst_rate": Decimal("0"),
+                    "gst_amount": Decimal("0"), "line_total": line_total,
+                })
+            orders.append({
+                "id": order_id, "shop_id": shop.id,
+                "order_number": f"PL-{order_id}", "order_date": placed,
+                "subtotal": subtotal, "tax_amount": Decimal("0"),
+                "discount_amount": Decimal("0"), "total_amount": subtotal,
+                "order_status": OrderStatusEnum.DELIVERED,
+                "delivery_date": placed + timedelta(hours=2),
+                "created_by": owner.id,
+            })
+        db.bulk_insert_mappings(Order, orders)
+        db.bulk_insert_mappings(OrderItem, items)
+        lines += len(items)
+        day += timedelta(days=1)
+    DailySalesService.rebuild(db, shop.id)
+    db.commit()
+    return lines
+
+
+def legacy_profit_loss(db, shop_id: int, start: datetime, end: datetime):
+    """The per-order, per-line P&L loop; returns (sales, cogs)"""
+    orders = db.query(Order).filter(
+        and_(
+            Order.shop_id == shop_id,
+            Order.order_status == OrderStatusEnum.DELIVERED,
+            Order.delivery_date >= start,
+            Order.delivery_date < end
+        )
+    ).all()
+    sales = sum((order.total_amount for order in orders), Decimal("0"))
+    cogs = Decimal("0")
+    for order in orders:
+        for item in order.items:
+            cost_price = db.query(Inventory.cost_price).filter(
+                Inventory.shop_id == shop_id,
+                Inventory.product_id == item.product_id
+            ).scalar()
+            cogs += item.quantity * Decimal(str(cost_price))
+    return sales, cogs
+
+
+def month_bounds(month: int):
+    start = datetime(YEAR, month, 1)
+    end = datetime(YEAR + 1, 1, 1) if month == 12 else datetime(YEAR, month + 1, 1)
+    return start, end
+
+
+def run(orders_per_day: int, lines_per_order: int, skus: int,
+        legacy_months: int, url: str):
+    engine, SessionFactory = make_session_factory(url)
+    db = SessionFactory()
+    shop, owner, products = seed_shop(db, skus)
+    lines = seed_year(db, shop, owner, products, orders_per_day, lines_per_order)
+    print(f"{orders_per_day * 366} orders, {lines} lines in {YEAR}")
+    counter = QueryCounter(engine)
+
+    results = {}
+    for label in ("legacy", "aggregate"):
+        months = legacy_months if label == "legacy" else 12
+        sales = cogs = Decimal("0")
+        db.expire_all()
+        with counter.track():
+            counter.count = 0
+            started = time.perf_counter()
+            for month in range(1, months + 1):
+                if label == "legacy":
+                    month_sales, month_cogs = legacy_profit_loss(
+                        db, shop.id, *month_bounds(month))
+                else:
+                    report = AccountingService.get_profit_loss_report(
+                        shop.id, f"{YEAR}-{month:02d}", db)
+                    month_sales, month_cogs = report.gross_sales, report.cost_of_goods_sold
+                sales += month_sales
+                cogs += month_cogs
+            elapsed = (time.perf_counter() - started) * 1000
+        results[label] = (months, counter.count, elapsed, sales, cogs)
+
+    print(f"{'path':<11}{'months':>7}{'queries':>10}{'ms':>10}"
+          f"{'ms/month':>10}{'sales':>14}{'cogs':>14}")
+    for label, (months, queries, elapsed, sales, cogs) in results.items():
+        print(f"{label:<11}{months:>7}{queries:>10}{elapsed:>10.1f}"
+              f"{elapsed / months:>10.2f}{sales:>14}{cogs:>14}")
+
+    db.close()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders-per-day", type=int, default=40)
+    parser.add_argument("--lines-per-order", type=int, default=5)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--legacy-months", type=int, default=12,
+                        help="Months to run the slow legacy loop for")
+    parser.add_argument("--db", default="sqlite://",
+                        help="Database URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+    run(args.orders_per_day, args.lines_per_order, args.skus,
+        args.legacy_months, args.db)
+
+
+if __name__ == "__main__":
+    main()
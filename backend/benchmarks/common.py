@@ -0,0 +1,133 @@
+"""Shared helpers for benchmarks: throwaway databases, query counting, timing"""
+import os
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+# Benchmarks never want every statement echoed to stdout
+os.environ.setdefault("SQLALCHEMY_ECHO", "false")
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from shared.database import Base  # noqa: E402
+from shared.models import Shop, User, Product, Inventory, RoleEnum  # noqa: E402
+
+
+def make_session_factory(url: str = "sqlite://"):
+    """Create a fresh schema on `url` and return (engine, sessionmaker)"""
+    connect_args = {"check_same_thread": False} if url.startswith(
+        "sqlite") else {}
+    engine_kwargs = {}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # One shared connection so threads (e.g. a TestClient app) see the schema
+        engine_kwargs["poolclass"] = StaticPool
+    engine = create_engine(url, connect_args=connect_args, **engine_kwargs)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class QueryCounter:
+    """Counts statements sent to the database through an engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    @contextmanager
+    def track(self):
+        """Count statements executed inside the block"""
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute",
+                         self._on_execute)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1,
+                       int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def time_calls(fn: Callable[[], object], runs: int) -> Dict[str, float]:
+    """Call `fn` `runs` times and return latency stats in milliseconds"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+    }
+
+
+def seed_shop(db, product_count: int, stock: int = 1_000_000, shop_no: int = 1):
+    """Create a shop, its owner and `product_count` stocked products
+
+    Returns: (shop, owner, products)
+    """
+    shop = Shop(
+        name=f"Bench Shop {shop_no}",
+        email=f"bench{shop_no}@kirana.local",
+        phone="9000000000",
+        address="Bench Address",
+        city="Bench City",
+        state="Bench State",
+        pincode="100001",
+    )
+    db.add(shop)
+    db.flush()
+
+    owner = User(
+        shop_id=shop.id,
+        phone=f"98{shop_no:08d}",
+        name="Bench Owner",
+        role=RoleEnum.OWNER,
+    )
+    db.add(owner)
+
+    gst_rates = [Decimal("0"), Decimal("5"), Decimal("12"), Decimal("18")]
+    products = []
+    for i in range(product_count):
+        products.append(Product(
+            shop_id=shop.id,
+            name=f"Item {i}",
+            sku=f"SKU-{shop_no}-{i}",
+            category=f"Category {i % 12}",
+            unit="piece",
+            cost_price=Decimal("8.00"),
+            mrp=Decimal("12.00"),
+            selling_price=Decimal("10.00"),
+            gst_rate=gst_rates[i % len(gst_rates)],
+            hsn_code=f"{1000 + i % 50}",
+            current_stock=stock,
+        ))
+    db.add_all(products)
+    db.flush()
+
+    db.add_all([
+        Inventory(
+            shop_id=shop.id,
+            product_id=product.id,
+            quantity=stock,
+            min_quantity=10,
+            cost_price=product.cost_price,
+            selling_price=product.selling_price,
+        )
+        for product in products
+    ])
+    db.commit()
+    return shop, owner, products
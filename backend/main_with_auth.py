@@ -1,11 +1,20 @@
 """Main FastAPI application with Authentication & RBAC"""
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from shared.config import get_settings
-from shared.database import engine, Base
+from shared.pagination import NEXT_CURSOR_HEADER
+from shared.instrumentation import RequestInstrumentationMiddleware
+from shared.database import engine, async_engine, Base, SessionLocal, AsyncSessionLocal, database_pool_metrics
+from app.inventory.reservations import StockReservationService
+from app.cart.store import DatabaseCartStore
+from app.ai.insights import refresh_all_shops
+from app.orders.events import OrderEventService, dispatch_order_events
+from app.auth.security import password_hasher as api_password_hasher, require_role
+from shared.auth_utils import password_hasher as web_password_hasher
+import asyncio
 import logging
 import os
 
@@ -27,14 +36,14 @@ from admin_forgot_password_router import router as admin_forgot_password_router
 
 # For backward compatibility, also import old services if they exist
 try:
-    from accounting_service.routes import router as accounting_router
+    from accounting_service.routes import router as legacy_accounting_router
 except ImportError:
-    accounting_router = None
+    legacy_accounting_router = None
 
 try:
-    from inventory_service.routes import router as inventory_router
+    from inventory_service.routes import router as legacy_inventory_router
 except ImportError:
-    inventory_router = None
+    legacy_inventory_router = None
 
 try:
     from order_service.routes import router as order_router
@@ -57,6 +66,73 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def release_expired_stock_holds() -> int:
+    """Return stock from cart holds past their TTL (runs in a worker thread)"""
+    db = SessionLocal()
+    try:
+        return StockReservationService.expire_holds(db)
+    finally:
+        db.close()
+
+
+async def purge_expired_carts() -> int:
+    """Delete database carts past their TTL (Redis expires cart keys itself)"""
+    if settings.CART_BACKEND != "database":
+        return 0
+    async with AsyncSessionLocal() as db:
+        return await DatabaseCartStore.purge_expired(db)
+
+
+async def sweep_stock_holds(interval_seconds: int):
+    """Periodically release expired cart holds and purge expired carts"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            released = await asyncio.to_thread(release_expired_stock_holds)
+            if released:
+                logger.info(f"♻️ Released {released} expired stock hold(s)")
+        except Exception as e:
+            logger.error(f"Stock hold sweep failed: {str(e)}")
+        try:
+            purged = await purge_expired_carts()
+            if purged:
+                logger.info(f"🧹 Purged {purged} expired cart(s)")
+        except Exception as e:
+            logger.error(f"Cart sweep failed: {str(e)}")
+
+
+async def refresh_ai_insights(interval_seconds: int):
+    """Precompute AI insights for every active shop, then every interval
+
+    Each API worker runs its own loop; with several workers use the Celery
+    runner (one beat for the deployment) instead.
+    """
+    while True:
+        try:
+            recomputed = await asyncio.to_thread(refresh_all_shops)
+            if recomputed:
+                logger.info(f"🧠 Recomputed {recomputed} AI insight(s)")
+        except Exception as e:
+            logger.error(f"AI insights refresh failed: {str(e)}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def run_order_events(interval_seconds: float):
+    """Drain the order event outbox, then again every interval
+
+    Every API worker runs its own loop; claims skip events another
+    dispatcher holds, so loops (and Celery workers) share the backlog.
+    """
+    while True:
+        try:
+            dispatched = await asyncio.to_thread(dispatch_order_events)
+            if dispatched:
+                logger.debug(f"Dispatched {dispatched} order event(s)")
+        except Exception as e:
+            logger.error(f"Order event dispatch failed: {str(e)}")
+        await asyncio.sleep(interval_seconds)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifecycle events"""
@@ -67,7 +143,25 @@ async def lifespan(app: FastAPI):
     logger.info(f"📊 API Version: {settings.API_VERSION}")
     logger.info(f"🔐 Auth: JWT-based with Role-Based Access Control (RBAC)")
     logger.info("=" * 60)
+    hold_sweeper = asyncio.create_task(
+        sweep_stock_holds(settings.STOCK_RESERVATION_SWEEP_SECONDS))
+    insights_runner = None
+    if settings.AI_INSIGHTS_RUNNER == "asyncio":
+        insights_runner = asyncio.create_task(
+            refresh_ai_insights(settings.AI_INSIGHTS_REFRESH_SECONDS))
+    events_runner = None
+    if settings.ORDER_EVENTS_RUNNER == "asyncio":
+        events_runner = asyncio.create_task(
+            run_order_events(settings.ORDER_EVENTS_POLL_SECONDS))
     yield
+    hold_sweeper.cancel()
+    if insights_runner is not None:
+        insights_runner.cancel()
+    if events_runner is not None:
+        events_runner.cancel()
+    api_password_hasher.shutdown()
+    web_password_hasher.shutdown()
+    await async_engine.dispose()
     logger.info("🛑 SmartKirana AI Backend Shutting Down...")
 
 
@@ -89,6 +183,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Session middleware - for authentication sessions
@@ -99,15 +194,10 @@ app.add_middleware(
 )
 
 
-# ===== REQUEST LOGGING MIDDLEWARE =====
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests"""
-    logger.info(f"📨 {request.method} {request.url.path}")
-    response = await call_next(request)
-    logger.info(
-        f"📤 {request.method} {request.url.path} → {response.status_code}")
-    return response
+# ===== REQUEST INSTRUMENTATION MIDDLEWARE =====
+# One JSON log line per request with its SQL statement count and time, a
+# Server-Timing header, and declared per-route SQL budgets
+app.add_middleware(RequestInstrumentationMiddleware)
 
 
 # ===== MOUNT STATIC FILES =====
@@ -158,12 +248,13 @@ app.include_router(admin_router)
 # Customer Shop router
 app.include_router(shop_router)
 
-# Legacy routers (backward compatibility)
-if accounting_router:
-    app.include_router(accounting_router)
+# Legacy routers (backward compatibility); their paths do not overlap the
+# app.* routers above, which are registered first and win on any clash
+if legacy_accounting_router:
+    app.include_router(legacy_accounting_router)
 
-if inventory_router:
-    app.include_router(inventory_router)
+if legacy_inventory_router:
+    app.include_router(legacy_inventory_router)
 
 if order_router:
     app.include_router(order_router)
@@ -218,6 +309,38 @@ def health_check() -> dict:
     }
 
 
+@app.get(
+    "/api/health/db",
+    summary="Database Pool Metrics",
+    description="Connection pool usage (checked out, overflow, wait times) for sizing workers against max_connections. Admin only.",
+    dependencies=[Depends(require_role("admin"))]
+)
+def database_health() -> dict:
+    """Connection pool telemetry for the primary and read-replica engines"""
+    return {
+        "status": "ok",
+        "pools": database_pool_metrics(),
+    }
+
+
+@app.get(
+    "/api/health/outbox",
+    summary="Order Event Lag",
+    description="Order event backlog: pending and failed events, age of the oldest pending one and this worker's last dispatch"
+)
+def outbox_health() -> dict:
+    """Order event outbox lag metrics"""
+    db = SessionLocal()
+    try:
+        metrics = OrderEventService.lag_metrics(db)
+    finally:
+        db.close()
+    return {
+        "status": "degraded" if metrics["failed"] else "ok",
+        "order_events": metrics,
+    }
+
+
 # ===== ROOT ENDPOINT =====
 @app.get(
     "/",
@@ -123,6 +123,7 @@ class OrderService:
                 product_name=item_data["product"].name,
                 quantity=item_data["quantity"],
                 unit_price=item_data["unit_price"],
+                unit_cost=item_data["product"].cost_price,
                 gst_rate=item_data["gst_rate"],
                 gst_amount=item_data["gst_amount"],
                 line_total=item_data["line_total"]
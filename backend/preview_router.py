@@ -3,10 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
-from sqlalchemy.orm import Session
-from shared.database import get_db
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from shared.database import get_async_db
 from shared.models import Product, Order, Shop, User
-from sqlalchemy import desc
 import os
 
 # Setup templates
@@ -23,10 +23,10 @@ async def home(request: Request):
 
 
 @router.get("/preview/products", response_class=HTMLResponse)
-async def preview_products(request: Request, db: Session = Depends(get_db)):
+async def preview_products(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Preview all products"""
     try:
-        products = db.query(Product).limit(50).all()
+        products = (await db.scalars(select(Product).limit(50))).all()
         return templates.TemplateResponse(
             "products.html",
             {
@@ -44,11 +44,12 @@ async def preview_products(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/preview/orders", response_class=HTMLResponse)
-async def preview_orders(request: Request, db: Session = Depends(get_db)):
+async def preview_orders(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Preview all orders"""
     try:
-        orders = db.query(Order).order_by(
-            desc(Order.created_at)).limit(50).all()
+        orders = (await db.scalars(
+            select(Order).order_by(desc(Order.created_at)).limit(50)
+        )).all()
         return templates.TemplateResponse(
             "orders.html",
             {
@@ -66,10 +67,10 @@ async def preview_orders(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/preview/shops", response_class=HTMLResponse)
-async def preview_shops(request: Request, db: Session = Depends(get_db)):
+async def preview_shops(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Preview all shops"""
     try:
-        shops = db.query(Shop).limit(50).all()
+        shops = (await db.scalars(select(Shop).limit(50))).all()
         return templates.TemplateResponse(
             "shops.html",
             {
@@ -87,10 +88,10 @@ async def preview_shops(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/preview/users", response_class=HTMLResponse)
-async def preview_users(request: Request, db: Session = Depends(get_db)):
+async def preview_users(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Preview all users"""
     try:
-        users = db.query(User).limit(50).all()
+        users = (await db.scalars(select(User).limit(50))).all()
         return templates.TemplateResponse(
             "users.html",
             {
@@ -0,0 +1,252 @@
+"""Bulk catalogue import/export - chunked upserts and streamed exports"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from shared.database import upsert_for
+from shared.models import Product
+from product_service.schemas import ProductImportRow
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Columns written by export and accepted by import (round-trips)
+EXPORT_FIELDS = list(ProductImportRow.model_fields)
+
+MAX_REPORTED_ERRORS = 1000
+
+# (row number, raw record or None, parse error or None)
+ImportRecord = Tuple[int, Optional[dict], Optional[str]]
+
+
+class ProductBulkService:
+    """Catalogue onboarding: thousands of SKUs per request instead of one
+
+    Imports are validated row by row but written a chunk at a time: one
+    SELECT to tell new SKUs from existing ones, then executemany upserts
+    (INSERT ... ON CONFLICT (shop_id, sku) DO UPDATE) and one commit per
+    chunk. Bad rows are reported and skipped; they never abort the batch.
+    """
+
+    @staticmethod
+    def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+        """Pick csv/jsonl from an explicit choice or the file extension"""
+        if requested:
+            fmt = requested.lower()
+        elif filename and filename.lower().endswith((".jsonl", ".ndjson")):
+            fmt = "jsonl"
+        else:
+            fmt = "csv"
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}' (use csv or jsonl)")
+        return fmt
+
+    @staticmethod
+    def read_records(stream: IO[bytes], fmt: str) -> Iterator[ImportRecord]:
+        """Parse a binary CSV/JSONL stream one record at a time
+
+        Empty values are dropped so they fall back to defaults (on insert)
+        or leave the stored value alone (on update).
+        """
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        try:
+            if fmt == "csv":
+                reader = csv.DictReader(text)
+                for number, record in enumerate(reader, start=1):
+                    if None in record:
+                        yield number, None, "More values than header columns"
+                        continue
+                    yield number, {
+                        key.strip(): value.strip()
+                        for key, value in record.items()
+                        if key and value is not None and value.strip() != ""
+                    }, None
+            else:
+                number = 0
+                for line in text:
+                    if not line.strip():
+                        continue
+                    number += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        yield number, None, f"Invalid JSON: {e}"
+                        continue
+                    if not isinstance(record, dict):
+                        yield number, None, "Each line must be a JSON object"
+                        continue
+                    yield number, {
+                        key: value for key, value in record.items()
+                        if value is not None and value != ""
+                    }, None
+        finally:
+            # Leave the caller's stream open
+            text.detach()
+
+    @staticmethod
+    def import_records(
+        db: Session,
+        shop_id: int,
+        records: Iterable[ImportRecord],
+        chunk_size: int = 1000,
+    ) -> dict:
+        """Validate and upsert records in chunks (commits after each chunk)
+
+        Returns: {received, created, updated, failed, errors}
+        """
+        report = {"received": 0, "created": 0,
+                  "updated": 0, "failed": 0, "errors": []}
+        chunk: List[Tuple[int, ProductImportRow]] = []
+
+        for number, record, error in records:
+            report["received"] += 1
+            if error is None:
+                try:
+                    chunk.append(
+                        (number, ProductImportRow.model_validate(record)))
+                except ValidationError as exc:
+                    error = "; ".join(
+                        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+                        for item in exc.errors()
+                    )
+            if error is not None:
+                _record_error(report, number,
+                              record.get("sku") if record else None, error)
+                continue
+
+            if len(chunk) >= chunk_size:
+                ProductBulkService._write_chunk(db, shop_id, chunk, report)
+                chunk = []
+
+        if chunk:
+            ProductBulkService._write_chunk(db, shop_id, chunk, report)
+        return report
+
+    @staticmethod
+    def _write_chunk(
+        db: Session,
+        shop_id: int,
+        chunk: List[Tuple[int, ProductImportRow]],
+        report: dict,
+    ) -> None:
+        # A SKU repeated within the chunk: the last row wins
+        latest: Dict[str, Tuple[int, ProductImportRow]] = {}
+        for number, row in chunk:
+            if row.sku in latest:
+                _record_error(report, latest[row.sku][0], row.sku,
+                              f"Duplicate SKU; row {number} used instead")
+            latest[row.sku] = (number, row)
+        rows = list(latest.values())
+
+        existing = set(db.scalars(
+            select(Product.sku).where(
+                Product.shop_id == shop_id,
+                Product.sku.in_(list(latest))
+            )
+        ).all())
+
+        try:
+            with db.begin_nested():
+                ProductBulkService._upsert(db, shop_id, rows)
+        except DBAPIError:
+            # Find the offending rows; the rest of the chunk still lands
+            written = []
+            for number, row in rows:
+                try:
+                    with db.begin_nested():
+                        ProductBulkService._upsert(db, shop_id, [(number, row)])
+                    written.append((number, row))
+                except DBAPIError as exc:
+                    _record_error(report, number, row.sku,
+                                  str(getattr(exc, "orig", exc)).splitlines()[0])
+            rows = written
+        db.commit()
+
+        for _, row in rows:
+            if row.sku in existing:
+                report["updated"] += 1
+            else:
+                report["created"] += 1
+
+    @staticmethod
+    def _upsert(db: Session, shop_id: int, rows: List[Tuple[int, ProductImportRow]]) -> None:
+        """INSERT ... ON CONFLICT (shop_id, sku) DO UPDATE, executemany per column set
+
+        Only the columns a row actually supplied are overwritten on update;
+        re-importing a soft-deleted SKU makes it active again.
+        """
+        insert = upsert_for(db.get_bind().dialect.name)
+        now = datetime.utcnow()
+        groups: Dict[frozenset, List[dict]] = {}
+        for _, row in rows:
+            values = row.model_dump()
+            values.update(shop_id=shop_id, is_active=True,
+                          created_at=now, updated_at=now)
+            groups.setdefault(frozenset(row.model_fields_set), []).append(values)
+
+        table = Product.__table__
+        for supplied, params in groups.items():
+            stmt = insert(table)
+            updates = {name: stmt.excluded[name]
+                       for name in supplied if name != "sku"}
+            updates["is_active"] = stmt.excluded.is_active
+            updates["updated_at"] = stmt.excluded.updated_at
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[table.c.shop_id, table.c.sku],
+                    set_=updates,
+                ),
+                params,
+            )
+
+    @staticmethod
+    def export_rows(
+        db: Session,
+        shop_id: int,
+        fmt: str,
+        batch_size: int = 2000,
+    ) -> Iterator[str]:
+        """Stream a shop's active catalogue as CSV or JSONL text chunks
+
+        Rows are fetched `batch_size` at a time (a server-side cursor on
+        PostgreSQL) as plain tuples, never as ORM objects.
+        """
+        columns = [Product.__table__.c[name] for name in EXPORT_FIELDS]
+        result = db.execute(
+            select(*columns)
+            .where(Product.shop_id == shop_id, Product.is_active == True)
+            .order_by(Product.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(EXPORT_FIELDS)
+
+        for partition in result.partitions():
+            for row in partition:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(
+                        dict(zip(EXPORT_FIELDS, row)), default=str))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def _record_error(report: dict, row: int, sku: Optional[str], error: str) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": row, "sku": sku, "error": error})
@@ -1,5 +1,5 @@
 """Product management routes"""
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
@@ -7,6 +7,7 @@ from decimal import Decimal
 from datetime import datetime
 
 from shared.database import get_db
+from shared.pagination import NEXT_CURSOR_HEADER, keyset_paginate
 from shared.models import Product, User, RoleEnum
 from shared.security import verify_token
 from shared.exceptions import UnauthorizedException, NotFoundException, ConflictException
@@ -99,18 +100,23 @@ def check_owner_access(token: str, db: Session, shop_id: int):
 def list_products(
     shop_id: int,
     token: str,
+    response: Response,
     db: Session = Depends(get_db),
     category: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None)
 ):
     """
-    List products for a shop.
+    List products for a shop, by name.
 
     Filters:
     - **category**: Filter by product category
     - **is_active**: Show active/inactive products
+
+    The next page's cursor is returned in the X-Next-Cursor header; pass
+    it as `cursor` instead of `page` (absent on the last page).
     """
     user, token_data = check_auth(token, db)
 
@@ -129,8 +135,11 @@ def list_products(
         query = query.filter(Product.is_active == is_active)
 
     # Pagination
-    offset = (page - 1) * limit
-    products = query.order_by(Product.name).offset(offset).limit(limit).all()
+    products, next_cursor, _ = keyset_paginate(
+        query, (Product.name, Product.id), limit,
+        cursor=cursor, skip=(page - 1) * limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     return products
 
@@ -1,13 +1,17 @@
 """Product management routes with RBAC"""
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
 from typing import List, Optional
-from decimal import Decimal
 
 from shared.database import get_db
+from shared.pagination import NEXT_CURSOR_HEADER, keyset_paginate
 from app.auth.security import get_current_user, require_role
 from shared.models import User, Product
+from product_service.schemas import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductImportReport
+)
+from product_service.bulk import ProductBulkService
 
 router = APIRouter(
     prefix="/api/v1/products",
@@ -15,62 +19,6 @@ router = APIRouter(
 )
 
 
-# ===== SCHEMAS =====
-class ProductCreate(BaseModel):
-    """Schema for creating a product"""
-    name: str = Field(..., min_length=1, max_length=255)
-    sku: str = Field(..., min_length=1, max_length=100)
-    category: str = Field(..., min_length=1, max_length=100)
-    subcategory: Optional[str] = Field(None, max_length=100)
-    description: Optional[str] = None
-    unit: str = Field(..., min_length=1, max_length=50)
-    cost_price: Decimal = Field(..., gt=0, decimal_places=2)
-    selling_price: Decimal = Field(..., gt=0, decimal_places=2)
-    mrp: Decimal = Field(..., gt=0, decimal_places=2)
-    gst_rate: Decimal = Field(default=0, ge=0, le=100, decimal_places=2)
-    hsn_code: Optional[str] = Field(None, max_length=20)
-    current_stock: int = Field(default=0, ge=0)
-    min_stock_level: int = Field(default=10, ge=0)
-    reorder_quantity: int = Field(default=0, ge=0)
-    is_perishable: bool = Field(default=False)
-
-
-class ProductUpdate(BaseModel):
-    """Schema for updating a product"""
-    name: Optional[str] = Field(None, min_length=1, max_length=255)
-    selling_price: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
-    cost_price: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
-    mrp: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
-    gst_rate: Optional[Decimal] = Field(None, ge=0, le=100, decimal_places=2)
-    min_stock_level: Optional[int] = Field(None, ge=0)
-    is_active: Optional[bool] = None
-
-
-class ProductResponse(BaseModel):
-    """Schema for product response"""
-    id: int
-    name: str
-    sku: str
-    category: str
-    subcategory: Optional[str]
-    description: Optional[str]
-    unit: str
-    cost_price: Decimal
-    selling_price: Decimal
-    mrp: Decimal
-    gst_rate: Decimal
-    current_stock: int
-    min_stock_level: int
-    is_perishable: bool
-    is_active: bool
-    created_by: int
-    created_at: str
-    updated_at: str
-
-    class Config:
-        from_attributes = True
-
-
 # ===== ENDPOINTS =====
 
 @router.get(
@@ -81,29 +29,117 @@ class ProductResponse(BaseModel):
     description="Get all active products. Accessible to all authenticated users."
 )
 def list_products(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     category: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> List[Product]:
     """
-    List all products with pagination.
+    List all products with pagination, by ID.
 
     **Query Parameters:**
     - skip: Number of records to skip (default: 0)
     - limit: Number of records to return (default: 10, max: 100)
     - category: Filter by category (optional)
+    - cursor: X-Next-Cursor header of the previous page (replaces skip)
     """
     query = db.query(Product).filter(Product.is_active == True)
 
     if category:
         query = query.filter(Product.category == category)
 
-    products = query.offset(skip).limit(limit).all()
+    products, next_cursor, _ = keyset_paginate(
+        query, (Product.id,), limit, cursor=cursor, skip=skip)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return products
 
 
+# ===== BULK IMPORT / EXPORT =====
+
+def _target_shop(current_user: User, shop_id: Optional[int]) -> int:
+    """Shop a bulk operation applies to: your own, or any shop for ADMIN"""
+    user_role = current_user.role.value if hasattr(
+        current_user.role, 'value') else str(current_user.role)
+    if shop_id is None or shop_id == current_user.shop_id:
+        if current_user.shop_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="shop_id is required"
+            )
+        return current_user.shop_id
+    if user_role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only ADMIN can manage another shop's catalogue"
+        )
+    return shop_id
+
+
+@router.post(
+    "/import",
+    response_model=ProductImportReport,
+    status_code=status.HTTP_200_OK,
+    summary="Bulk import products",
+    description="Create or update products from a CSV or JSONL file. Only OWNER and ADMIN roles can import."
+)
+def import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    shop_id: Optional[int] = Query(None, description="Target shop (ADMIN only)"),
+    chunk_size: int = Query(1000, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("owner", "admin"))
+) -> dict:
+    """
+    Bulk import products, upserting on (shop, SKU).
+
+    **Required Role:** SHOP_OWNER or ADMIN
+
+    The file is read as a stream and written in chunks of `chunk_size`
+    rows. Invalid rows are reported in `errors` (row numbers start at 1)
+    and skipped; the rest of the file is still imported. Columns match
+    `GET /export`, so an export can be edited and imported back.
+    """
+    target_shop = _target_shop(current_user, shop_id)
+    fmt = ProductBulkService.detect_format(file.filename, format)
+    records = ProductBulkService.read_records(file.file, fmt)
+    return ProductBulkService.import_records(
+        db, target_shop, records, chunk_size=chunk_size)
+
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    summary="Export the product catalogue",
+    description="Stream all active products as CSV or JSONL. Only OWNER and ADMIN roles can export."
+)
+def export_products(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    shop_id: Optional[int] = Query(None, description="Target shop (ADMIN only)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("owner", "admin"))
+) -> StreamingResponse:
+    """
+    Export the catalogue in the bulk import format.
+
+    **Required Role:** SHOP_OWNER or ADMIN
+    """
+    target_shop = _target_shop(current_user, shop_id)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    # The session stays open until the response has been streamed
+    return StreamingResponse(
+        ProductBulkService.export_rows(db, target_shop, format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="products-{target_shop}.{format}"'
+        }
+    )
+
+
 @router.get(
     "/{product_id}",
     response_model=ProductResponse,
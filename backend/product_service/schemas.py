@@ -0,0 +1,82 @@
+"""Pydantic schemas for product management and bulk catalogue import"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from decimal import Decimal
+
+
+class ProductCreate(BaseModel):
+    """Schema for creating a product"""
+    name: str = Field(..., min_length=1, max_length=255)
+    sku: str = Field(..., min_length=1, max_length=100)
+    category: str = Field(..., min_length=1, max_length=100)
+    subcategory: Optional[str] = Field(None, max_length=100)
+    description: Optional[str] = None
+    unit: str = Field(..., min_length=1, max_length=50)
+    cost_price: Decimal = Field(..., gt=0, decimal_places=2)
+    selling_price: Decimal = Field(..., gt=0, decimal_places=2)
+    mrp: Decimal = Field(..., gt=0, decimal_places=2)
+    gst_rate: Decimal = Field(default=0, ge=0, le=100, decimal_places=2)
+    hsn_code: Optional[str] = Field(None, max_length=20)
+    current_stock: int = Field(default=0, ge=0)
+    min_stock_level: int = Field(default=10, ge=0)
+    reorder_quantity: int = Field(default=0, ge=0)
+    is_perishable: bool = Field(default=False)
+
+
+class ProductUpdate(BaseModel):
+    """Schema for updating a product"""
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    selling_price: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
+    cost_price: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
+    mrp: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
+    gst_rate: Optional[Decimal] = Field(None, ge=0, le=100, decimal_places=2)
+    min_stock_level: Optional[int] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+
+class ProductResponse(BaseModel):
+    """Schema for product response"""
+    id: int
+    name: str
+    sku: str
+    category: str
+    subcategory: Optional[str]
+    description: Optional[str]
+    unit: str
+    cost_price: Decimal
+    selling_price: Decimal
+    mrp: Decimal
+    gst_rate: Decimal
+    current_stock: int
+    min_stock_level: int
+    is_perishable: bool
+    is_active: bool
+    created_by: int
+    created_at: str
+    updated_at: str
+
+    class Config:
+        from_attributes = True
+
+
+# ===== BULK IMPORT =====
+class ProductImportRow(ProductCreate):
+    """One catalogue row from a CSV/JSONL import (same fields as ProductCreate)"""
+    gst_rate: Decimal = Field(default=Decimal("0"), ge=0, le=100, decimal_places=2)
+    hsn_code: Optional[str] = Field(None, max_length=8)
+
+
+class ProductImportError(BaseModel):
+    """A row that was skipped, with the reason"""
+    row: int
+    sku: Optional[str] = None
+    error: str
+
+
+class ProductImportReport(BaseModel):
+    """Outcome of a bulk import; errors lists at most the first 1000 failures"""
+    received: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[ProductImportError]
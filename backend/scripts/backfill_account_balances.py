@@ -0,0 +1,66 @@
+"""Backfill account balance snapshots from existing ledger and cash book entries
+
+Usage:
+    python -m scripts.backfill_account_balances              # every shop, open period
+    python -m scripts.backfill_account_balances --shop-id 1
+    python -m scripts.backfill_account_balances --all-history
+    python -m scripts.backfill_account_balances --start 2024-04-01
+
+Run once after deploying the snapshots, and again after entries were
+removed with bulk deletes (which bypass the posting events). By default
+only days after each shop's latest period close are recomputed. Each shop
+is rebuilt and committed on its own, so the command can be re-run safely.
+"""
+import argparse
+import sys
+from datetime import date
+
+from shared.database import Base, SessionLocal, engine
+from shared.models import Shop
+from app.accounting.balances import AccountBalanceService
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shop-id", type=int,
+                        help="Only this shop (default: every shop)")
+    range_group = parser.add_mutually_exclusive_group()
+    range_group.add_argument("--start", type=date.fromisoformat,
+                             help="Recompute from this day (YYYY-MM-DD)")
+    range_group.add_argument("--all-history", action="store_true",
+                             help="Recompute everything, closed periods included")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    try:
+        query = db.query(Shop.id).order_by(Shop.id)
+        if args.shop_id is not None:
+            query = query.filter(Shop.id == args.shop_id)
+        shop_ids = [shop_id for shop_id, in query]
+        if not shop_ids:
+            print(f"✗ Shop {args.shop_id} not found")
+            return False
+
+        for shop_id in shop_ids:
+            start = args.start
+            if start is None and not args.all_history:
+                start = AccountBalanceService.open_period_start(db, shop_id)
+            rows = AccountBalanceService.rebuild(db, shop_id, start=start)
+            db.commit()
+            print(f"✓ Shop {shop_id}: {rows} balance rows")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        db.rollback()
+        return False
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,59 @@
+"""Backfill the daily product sales rollup from existing orders
+
+Usage:
+    python -m scripts.backfill_daily_sales              # every shop, all history
+    python -m scripts.backfill_daily_sales --shop-id 1
+    python -m scripts.backfill_daily_sales --days 30    # only the last 30 days
+
+Run once after deploying the rollup, and again for any range written by
+code that does not record order transitions. Each shop is rebuilt and
+committed on its own, so the command can be re-run safely.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from shared.database import Base, SessionLocal, engine
+from shared.models import Shop
+from app.orders.daily_sales import DailySalesService
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shop-id", type=int,
+                        help="Only this shop (default: every shop)")
+    parser.add_argument("--days", type=int,
+                        help="Only rebuild the last N days (default: all history)")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    start = date.today() - timedelta(days=args.days) if args.days else None
+    db = SessionLocal()
+
+    try:
+        query = db.query(Shop.id).order_by(Shop.id)
+        if args.shop_id is not None:
+            query = query.filter(Shop.id == args.shop_id)
+        shop_ids = [shop_id for shop_id, in query]
+        if not shop_ids:
+            print(f"✗ Shop {args.shop_id} not found")
+            return False
+
+        for shop_id in shop_ids:
+            rows = DailySalesService.rebuild(db, shop_id, start=start)
+            db.commit()
+            print(f"✓ Shop {shop_id}: {rows} daily rows")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        db.rollback()
+        return False
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
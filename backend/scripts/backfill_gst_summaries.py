@@ -0,0 +1,60 @@
+"""Backfill GST record lines and monthly GST return summaries
+
+Usage:
+    python -m scripts.backfill_gst_summaries              # every shop, all months
+    python -m scripts.backfill_gst_summaries --shop-id 1
+    python -m scripts.backfill_gst_summaries --start 2024-04
+
+Run once after deploying the summaries: GST records written before then
+are split by rate and HSN code from their orders' lines, then the monthly
+summaries are recomputed from the lines. Re-run with --start to repair
+recent months only. Each shop is committed on its own, so the command can
+be re-run safely.
+"""
+import argparse
+import sys
+
+from shared.database import Base, SessionLocal, engine
+from shared.models import Shop
+from app.accounting.gst import GSTReturnService, parse_period
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shop-id", type=int,
+                        help="Only this shop (default: every shop)")
+    parser.add_argument("--start", type=parse_period,
+                        help="Recompute summaries from this month (YYYY-MM)")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    try:
+        query = db.query(Shop.id).order_by(Shop.id)
+        if args.shop_id is not None:
+            query = query.filter(Shop.id == args.shop_id)
+        shop_ids = [shop_id for shop_id, in query]
+        if not shop_ids:
+            print(f"✗ Shop {args.shop_id} not found")
+            return False
+
+        for shop_id in shop_ids:
+            records = GSTReturnService.backfill_lines(db, shop_id)
+            rows = GSTReturnService.rebuild(db, shop_id, start=args.start)
+            db.commit()
+            print(f"✓ Shop {shop_id}: {records} records split, {rows} summary rows")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        db.rollback()
+        return False
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,75 @@
+"""Bulk import/export a shop's product catalogue from the command line
+
+Usage:
+    python -m scripts.bulk_products import --shop-id 1 catalogue.csv
+    python -m scripts.bulk_products import --shop-id 1 catalogue.jsonl
+    python -m scripts.bulk_products export --shop-id 1 catalogue.csv
+"""
+import argparse
+import sys
+
+from shared.database import SessionLocal
+from shared.models import Shop
+from product_service.bulk import ProductBulkService
+
+
+def import_catalogue(db, shop_id: int, path: str, fmt: str, chunk_size: int) -> bool:
+    """Import a CSV/JSONL file and print the report"""
+    with open(path, "rb") as stream:
+        records = ProductBulkService.read_records(stream, fmt)
+        report = ProductBulkService.import_records(
+            db, shop_id, records, chunk_size=chunk_size)
+
+    print(f"Received: {report['received']}")
+    print(f"Created:  {report['created']}")
+    print(f"Updated:  {report['updated']}")
+    print(f"Failed:   {report['failed']}")
+    for error in report["errors"]:
+        print(f"  row {error['row']} ({error['sku'] or '-'}): {error['error']}")
+    if report["failed"] > len(report["errors"]):
+        print(f"  ... {report['failed'] - len(report['errors'])} more")
+    return report["failed"] == 0
+
+
+def export_catalogue(db, shop_id: int, path: str, fmt: str) -> bool:
+    """Stream the catalogue to a file"""
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        for chunk in ProductBulkService.export_rows(db, shop_id, fmt):
+            out.write(chunk)
+    print(f"✓ Exported catalogue of shop {shop_id} to {path}")
+    return True
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--shop-id", type=int, required=True)
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    fmt = ProductBulkService.detect_format(args.path, args.format)
+    db = SessionLocal()
+
+    try:
+        if db.get(Shop, args.shop_id) is None:
+            print(f"✗ Shop {args.shop_id} not found")
+            return False
+        if args.command == "import":
+            return import_catalogue(db, args.shop_id, args.path, fmt, args.chunk_size)
+        return export_catalogue(db, args.shop_id, args.path, fmt)
+
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        db.rollback()
+        return False
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -3,14 +3,25 @@ from passlib.context import CryptContext
 from typing import Optional, Dict, Any
 import logging
 
+from shared.config import get_settings
+from shared.password_hasher import PasswordHasher
+
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Password hashing setup - Use argon2 as primary scheme (no bcrypt version issues)
+argon2_options = {}
+if settings.PASSWORD_ARGON2_ROUNDS:
+    argon2_options["argon2__rounds"] = settings.PASSWORD_ARGON2_ROUNDS
 pwd_context = CryptContext(
     schemes=["argon2"],
-    deprecated="auto"
+    deprecated="auto",
+    **argon2_options
 )
 
+# Use from async handlers: hashing runs on a bounded worker pool
+password_hasher = PasswordHasher(pwd_context)
+
 
 def hash_password(password: str) -> str:
     """Hash a password"""
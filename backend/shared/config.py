@@ -14,7 +14,19 @@ class Settings(BaseSettings):
 
     # Database (SQLite for local development, PostgreSQL for production)
     DATABASE_URL: str = "sqlite:///./smartkirana.db"
-    SQLALCHEMY_ECHO: bool = True
+    SQLALCHEMY_ECHO: bool = False
+    # Optional replica for reporting queries (get_read_db)
+    READ_REPLICA_URL: Optional[str] = None
+
+    # Connection pool, per engine and per worker process. Set per environment
+    # so workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under PostgreSQL
+    # max_connections; /api/health/db shows live usage.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; drop connections before server/LB idle timeouts
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # PostgreSQL statement_timeout, 0 disables
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
@@ -25,6 +37,18 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 24 * 60  # 24 hours
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
 
+    # Password hashing (bounded worker pool; 429 once the queue is full)
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # 'thread', 'process'
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    # Changing a cost rehashes each password on its next successful login
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_ROUNDS: Optional[int] = None  # None = passlib default
+
+    # Authenticated principal cache (0 disables)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+
     # OTP
     OTP_EXPIRE_MINUTES: int = 10
     OTP_LENGTH: int = 6
@@ -41,8 +65,62 @@ class Settings(BaseSettings):
     # AI/ML
     FORECAST_DAYS: int = 30
     FORECAST_MIN_HISTORY_DAYS: int = 90
+    # Default forecasting model (app.ai.forecast_models name or 'auto');
+    # shops can select their own (shops.forecast_model)
+    FORECAST_MODEL: str = "linear_regression"
     ANOMALY_DETECTION_ENABLED: bool = True
 
+    # Reorder suggestions: order-up-to policy reviewed every REVIEW_DAYS.
+    # Lead time for suppliers without users.lead_time_days; demand deviation
+    # over the last DEMAND_DEVIATION_DAYS sizes the safety stock.
+    REORDER_SERVICE_LEVEL: float = 0.95
+    REORDER_REVIEW_DAYS: int = 7
+    REORDER_LEAD_TIME_DAYS: int = 1
+    REORDER_DEMAND_DEVIATION_DAYS: int = 28
+
+    # AI insights cache: endpoints serve precomputed payloads. Entries not
+    # checked for MAX_AGE are served stale and refreshed in the background;
+    # past MAX_STALE they are recomputed in the request.
+    AI_INSIGHTS_RUNNER: str = "asyncio"  # 'asyncio', 'celery' (REDIS_URL broker), 'off'
+    AI_INSIGHTS_REFRESH_SECONDS: int = 900
+    AI_INSIGHTS_MAX_AGE_SECONDS: int = 900
+    AI_INSIGHTS_MAX_STALE_SECONDS: int = 24 * 60 * 60
+
+    # Stock reservations (cart holds)
+    STOCK_RESERVATION_TTL_MINUTES: int = 15
+    STOCK_RESERVATION_SWEEP_SECONDS: int = 60
+
+    # Customer carts: 'database' (carts tables), 'redis' (REDIS_URL) or
+    # 'fakeredis' (in-process stand-in for local development)
+    CART_BACKEND: str = "database"
+    CART_TTL_MINUTES: int = 24 * 60  # idle carts are evicted (matches session cookie)
+
+    # Order events (transactional outbox): status changes are recorded with
+    # the order; a dispatcher applies the sales rollup, accounting entries
+    # and cache invalidation afterwards. Failed events are retried with
+    # exponential backoff (RETRY_SECONDS doubled per attempt, capped).
+    ORDER_EVENTS_RUNNER: str = "asyncio"  # 'asyncio', 'celery' (REDIS_URL broker), 'off'
+    ORDER_EVENTS_POLL_SECONDS: float = 1.0
+    ORDER_EVENTS_BATCH_SIZE: int = 500
+    ORDER_EVENTS_MAX_ATTEMPTS: int = 8  # then left unprocessed for a manual replay
+    ORDER_EVENTS_RETRY_SECONDS: int = 5
+    ORDER_EVENTS_RETRY_MAX_SECONDS: int = 15 * 60
+
+    # Order dashboard: read per-shop counters instead of aggregating orders
+    ORDER_DASHBOARD_COUNTERS_ENABLED: bool = False
+
+    # Request instrumentation: SQL statements and time per request go to the
+    # Server-Timing header and the JSON request log. Routes declare budgets
+    # with shared.instrumentation.query_budget; 'raise' fails the request
+    # on an overrun (tests), 'log' warns.
+    SQL_BUDGET_MODE: str = "log"  # 'off', 'log', 'raise'
+    SQL_DEFAULT_QUERY_BUDGET: Optional[int] = None  # for routes without a declared budget
+
+    # Accounting PDF exports: TrueType fonts covering the rupee sign and
+    # Devanagari (Dockerfile installs fonts-freefont-ttf)
+    EXPORT_PDF_FONT: str = "/usr/share/fonts/truetype/freefont/FreeSans.ttf"
+    EXPORT_PDF_BOLD_FONT: str = "/usr/share/fonts/truetype/freefont/FreeSansBold.ttf"
+
     # Pagination
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
@@ -1,26 +1,203 @@
 """Database setup and session management"""
+import threading
+import time
+
 from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from shared.config import get_settings
+from shared.instrumentation import instrument_engine
 
 settings = get_settings()
 
-# Engine configuration
-engine_kwargs = {
-    "echo": settings.SQLALCHEMY_ECHO,
+
+# ===== POOL TELEMETRY =====
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            # Only pool exhaustion; connect errors propagate uncounted
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        waited_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_ms_total += waited_ms
+            self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+            if waited_ms >= 1:
+                self.waits += 1
+        return connection
+
+    def recreate(self):
+        # Keep counters across pool recreation (e.g. engine.dispose())
+        new_pool = super().recreate()
+        for name in ("checkouts", "waits", "wait_ms_total", "wait_ms_max", "timeouts"):
+            setattr(new_pool, name, getattr(self, name))
+        return new_pool
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool for AsyncEngine (asyncio-aware queue)"""
+
+
+def pool_metrics(db_engine: Engine) -> dict:
+    """Snapshot of an engine's connection pool for sizing and monitoring"""
+    if isinstance(db_engine, AsyncEngine):
+        db_engine = db_engine.sync_engine
+    pool = db_engine.pool
+    metrics = {
+        "pool_class": type(pool).__name__,
+        "dialect": db_engine.dialect.name,
+    }
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            metrics.update({
+                "checkouts": pool.checkouts,
+                "waits_over_1ms": pool.waits,
+                "wait_ms_avg": round(pool.wait_ms_total / pool.checkouts, 3)
+                if pool.checkouts else 0.0,
+                "wait_ms_max": round(pool.wait_ms_max, 3),
+                "timeouts": pool.timeouts,
+            })
+    return metrics
+
+
+# ===== ENGINES =====
+
+def build_engine(url: str) -> Engine:
+    """Create an engine with the pool and timeout policy from Settings"""
+    engine_kwargs = {
+        "echo": settings.SQLALCHEMY_ECHO,
+    }
+
+    if "sqlite" in url:
+        # Add SQLite-specific settings if using SQLite
+        engine_kwargs["connect_args"] = {"check_same_thread": False}
+        if ":memory:" in url or url.rstrip("/") == "sqlite:":
+            return create_engine(url, **engine_kwargs)
+    else:
+        connect_args = {"connect_timeout": 10}
+        if url.startswith("postgresql") and settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["options"] = (
+                f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}")
+        engine_kwargs["connect_args"] = connect_args
+
+    engine_kwargs.update({
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    })
+    return create_engine(url, **engine_kwargs)
+
+
+def upsert_for(dialect: str):
+    """Dialect insert construct with ON CONFLICT support (PostgreSQL, SQLite)"""
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+
+# Async drivers for each sync backend; aiosqlite is the local stand-in
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
 }
 
-# Add SQLite-specific settings if using SQLite
-if "sqlite" in settings.DATABASE_URL:
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
-else:
-    engine_kwargs["connect_args"] = {"connect_timeout": 10}
 
-engine = create_engine(settings.DATABASE_URL, **engine_kwargs)
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL (psycopg2/pysqlite) to its async driver"""
+    sync_url = make_url(url)
+    backend = sync_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'")
+    return sync_url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(
+        hide_password=False)
+
+
+def build_async_engine(url: str) -> AsyncEngine:
+    """AsyncEngine counterpart of build_engine (same pool and timeout policy)"""
+    url = async_database_url(url)
+    engine_kwargs = {
+        "echo": settings.SQLALCHEMY_ECHO,
+    }
+
+    if "sqlite" in url:
+        if ":memory:" in url or url.rstrip("/") == "sqlite+aiosqlite:":
+            return create_async_engine(url, **engine_kwargs)
+    else:
+        connect_args = {"timeout": 10}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+        engine_kwargs["connect_args"] = connect_args
+
+    engine_kwargs.update({
+        "poolclass": TimedAsyncQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    })
+    return create_async_engine(url, **engine_kwargs)
+
+
+engine = build_engine(settings.DATABASE_URL)
+
+# Reporting queries go to the replica when one is configured
+read_engine = (
+    build_engine(settings.READ_REPLICA_URL)
+    if settings.READ_REPLICA_URL else engine
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
+# Async handlers share the primary database through their own pool.
+# Objects stay usable after commit: lazy refreshes are not allowed under asyncio.
+async_engine = build_async_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False)
+
+# Attribute statements to the request being served (Server-Timing, budgets)
+instrument_engine(engine)
+instrument_engine(read_engine)
+instrument_engine(async_engine.sync_engine)
+
 
 def get_db():
     """Dependency for FastAPI - provides database session"""
@@ -29,3 +206,37 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Dependency for read-only reporting endpoints - replica session if configured
+
+    Replicas lag the primary slightly; do not use for read-modify-write flows.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Dependency for `async def` handlers - provides an AsyncSession
+
+    Queries are awaited, so the event loop keeps serving other requests
+    while one waits on the database. Reuse sync service code with
+    `await db.run_sync(fn, ...)` (fn receives a regular Session).
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def database_pool_metrics() -> dict:
+    """Pool metrics for the primary, async and (if separate) replica engines"""
+    metrics = {
+        "primary": pool_metrics(engine),
+        "async": pool_metrics(async_engine),
+    }
+    if read_engine is not engine:
+        metrics["replica"] = pool_metrics(read_engine)
+    return metrics
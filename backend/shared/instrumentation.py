@@ -0,0 +1,179 @@
+"""Request instrumentation: SQL statement count and time per request
+
+`instrument_engine` hooks an engine's cursor events. Statements run while
+a request (or a `track_queries` block) is active are attributed to it
+through a context variable, which follows the request into threadpool
+endpoints and AsyncSession greenlets; statements outside one (background
+runners, scripts) cost a context lookup.
+
+RequestInstrumentationMiddleware adds a Server-Timing header (db and app
+time, so browser dev tools show it per request) and writes one JSON line
+per request to the smartkirana.requests logger.
+
+Endpoints declare how many statements they may issue with `query_budget`
+(SQL_DEFAULT_QUERY_BUDGET covers the rest). SQL_BUDGET_MODE decides what
+an overrun does: 'log' a warning, 'raise' QueryBudgetExceeded after the
+response (tests), or 'off'.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from shared.config import get_settings
+from shared.logger import request_logger
+
+settings = get_settings()
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+class QueryStats:
+    """Statements and database time attributed to one request or block"""
+
+    __slots__ = ("queries", "db_ms")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+
+
+class QueryBudgetExceeded(Exception):
+    """A route issued more SQL statements than its declared budget"""
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """Stats of the active request or track_queries block, if any"""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count statements run inside the block (e.g. in service tests)"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Declare the most SQL statements an endpoint may issue per request"""
+    def declare(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return declare
+
+
+# ===== ENGINE HOOKS =====
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    # Counted here so statements that fail are counted too
+    stats.queries += 1
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = getattr(context, "query_started", None)
+    if stats is None or started is None:
+        return
+    stats.db_ms += (time.perf_counter() - started) * 1000
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attribute an engine's statements to the active request (idempotent)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ===== MIDDLEWARE =====
+
+def server_timing(stats: QueryStats, app_ms: float) -> str:
+    """Server-Timing value: database time and statement count, total time"""
+    return (f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", '
+            f"app;dur={app_ms:.1f}")
+
+
+class RequestInstrumentationMiddleware:
+    """Server-Timing header, JSON request log and SQL budget per request
+
+    Pure ASGI middleware: streamed responses pass through untouched; their
+    header carries the timing up to the first byte, the log line the total.
+    """
+
+    def __init__(self, app, budget_mode: Optional[str] = None,
+                 default_budget: Optional[int] = None):
+        self.app = app
+        self.budget_mode = budget_mode or settings.SQL_BUDGET_MODE
+        self.default_budget = (default_budget if default_budget is not None
+                               else settings.SQL_DEFAULT_QUERY_BUDGET)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(
+                    SERVER_TIMING_HEADER,
+                    server_timing(stats, (time.perf_counter() - started) * 1000))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            over_budget = self._log(scope, stats, status_code,
+                                    (time.perf_counter() - started) * 1000)
+
+        if over_budget and self.budget_mode == "raise":
+            raise QueryBudgetExceeded(over_budget)
+
+    def _log(self, scope, stats: QueryStats, status_code: int, duration_ms: float) -> Optional[str]:
+        """Write the request log line; returns the overrun message, if any"""
+        route = scope.get("route")
+        route_path = getattr(route, "path", None) or scope["path"]
+        budget = getattr(scope.get("endpoint"), "query_budget", self.default_budget)
+
+        record = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_path,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "db_queries": stats.queries,
+            "db_ms": round(stats.db_ms, 2),
+            "query_budget": budget,
+        }
+
+        over_budget = None
+        if self.budget_mode != "off" and budget is not None and stats.queries > budget:
+            over_budget = (f"{scope['method']} {route_path} issued {stats.queries} "
+                           f"SQL statements (budget {budget})")
+            request_logger.warning(over_budget, extra=record)
+        else:
+            request_logger.info("request", extra=record)
+        return over_budget
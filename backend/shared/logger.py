@@ -21,3 +21,9 @@ text_handler.setFormatter(text_formatter)
 
 # Add handlers
 logger.addHandler(text_handler)
+
+# Request log: one JSON object per request (shared.instrumentation)
+request_logger = logging.getLogger("smartkirana.requests")
+request_logger.setLevel(logging.INFO)
+request_logger.addHandler(json_handler)
+request_logger.propagate = False
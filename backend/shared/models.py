@@ -1,7 +1,7 @@
 """SQLAlchemy ORM models for all database tables"""
 from sqlalchemy import (
     Column, Integer, String, Numeric, Text, Boolean,
-    DateTime, ForeignKey, Enum, Index, UniqueConstraint
+    Date, DateTime, ForeignKey, Enum, Index, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -57,6 +57,8 @@ class Shop(Base):
     monthly_revenue_est = Column(Numeric(15, 2))
 
     subscription_plan = Column(String(50), default="free")
+    # app.ai.forecast_models name or 'auto'; None = Settings.FORECAST_MODEL
+    forecast_model = Column(String(50))
     is_active = Column(Boolean, default=True)
     onboarded_at = Column(DateTime, default=datetime.utcnow)
 
@@ -103,8 +105,15 @@ class User(Base):
     address = Column(Text)
     city = Column(String(100))
 
+    # Days from purchase order to delivery, for users supplying products
+    # (products.supplier_id); unset: Settings.REORDER_LEAD_TIME_DAYS
+    lead_time_days = Column(Integer)
+
     is_active = Column(Boolean, default=True)
     last_login_at = Column(DateTime)
+    # Bumped to revoke every JWT issued before (role/password/activation changes)
+    token_version = Column(Integer, nullable=False, default=0,
+                           server_default="0")
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow,
@@ -246,6 +255,71 @@ class Inventory(Base):
     )
 
 
+class StockReservation(Base):
+    """Time-limited stock holds (e.g. carts) already deducted from inventory"""
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    inventory_id = Column(Integer, ForeignKey("inventory.id"), nullable=False)
+
+    # Cart/session key the hold belongs to
+    hold_key = Column(String(100), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    # 'held', 'consumed' (turned into an order), 'released' (returned to stock)
+    status = Column(String(20), nullable=False, default="held")
+    expires_at = Column(DateTime, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_reservations_hold", "hold_key", "status"),
+        Index("idx_reservations_expiry", "status", "expires_at"),
+    )
+
+
+# ===== CARTS =====
+class Cart(Base):
+    """Customer cart keyed by the browser session (database cart backend)"""
+    __tablename__ = "carts"
+
+    cart_key = Column(String(64), primary_key=True)
+    # Distinct products in the cart, kept in step with cart_items (header badge)
+    line_count = Column(Integer, nullable=False, default=0, server_default="0")
+    expires_at = Column(DateTime, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_carts_expiry", "expires_at"),
+    )
+
+
+class CartItem(Base):
+    """One product line in a cart; price is the price shown when added"""
+    __tablename__ = "cart_items"
+
+    id = Column(Integer, primary_key=True)
+    cart_key = Column(String(64), ForeignKey("carts.cart_key", ondelete="CASCADE"),
+                      nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_name = Column(String(255), nullable=False)
+    unit_price = Column(Numeric(10, 2), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("cart_key", "product_id", name="unique_cart_product"),
+    )
+
+
 # ===== ORDERS =====
 class Order(Base):
     """Customer orders/transactions"""
@@ -313,6 +387,9 @@ class OrderItem(Base):
     product_name = Column(String(255), nullable=False)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Numeric(10, 2), nullable=False)
+    # Inventory cost price when the order was placed (COGS); NULL on lines
+    # from before cost capture, which fall back to the current cost
+    unit_cost = Column(Numeric(10, 2))
 
     gst_rate = Column(Numeric(5, 2))
     gst_amount = Column(Numeric(10, 2))
@@ -331,6 +408,88 @@ class OrderItem(Base):
     )
 
 
+class ShopOrderCounter(Base):
+    """Running order count and amount per shop and status (dashboard)"""
+    __tablename__ = "shop_order_counters"
+
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    order_status = Column(Enum(OrderStatusEnum), nullable=False)
+
+    order_count = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Numeric(15, 2), default=0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("shop_id", "order_status",
+                         name="unique_shop_order_counter"),
+    )
+
+
+class DailyProductSales(Base):
+    """Units and amounts per shop, product and day (analytics rollup)
+
+    ordered_* count every order that is not cancelled, on its order date
+    (demand); the delivered measures count delivered lines on their
+    delivery date (sales, for accounting).
+    """
+    __tablename__ = "daily_product_sales"
+
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    sale_date = Column(Date, nullable=False)
+
+    ordered_qty = Column(Integer, default=0, nullable=False)
+    ordered_amount = Column(Numeric(15, 2), default=0, nullable=False)
+
+    delivered_qty = Column(Integer, default=0, nullable=False)
+    revenue = Column(Numeric(15, 2), default=0, nullable=False)  # excl. tax
+    cost = Column(Numeric(15, 2), default=0, nullable=False)
+    tax = Column(Numeric(15, 2), default=0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("shop_id", "product_id", "sale_date",
+                         name="unique_daily_product_sales"),
+        Index("idx_daily_sales_date", "shop_id", "sale_date"),
+    )
+
+
+class OrderEvent(Base):
+    """Order status change waiting for its side effects (transactional outbox)
+
+    Written in the transaction of the status change; the dispatcher
+    (app.orders.events) applies the rollup, accounting and cache updates
+    and sets processed_at in one transaction. Failed events are retried
+    from available_at until attempts reaches ORDER_EVENTS_MAX_ATTEMPTS.
+    """
+    __tablename__ = "order_events"
+
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    event_type = Column(String(50), nullable=False)
+    old_status = Column(Enum(OrderStatusEnum), nullable=True)
+    new_status = Column(Enum(OrderStatusEnum), nullable=False)
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_order_events_pending", "processed_at", "available_at"),
+        Index("idx_order_events_order", "order_id"),
+    )
+
+
 # ===== ACCOUNTING =====
 class LedgerEntry(Base):
     """Double-entry bookkeeping ledger"""
@@ -398,6 +557,38 @@ class CashBook(Base):
     )
 
 
+class AccountBalance(Base):
+    """Running account totals at the end of each day with postings
+
+    Book 'ledger' keeps one row per ledger account (debit_account /
+    credit_account names); book 'cash' keeps the cash book under account
+    '' (IN as debit, OUT as credit). Totals are cumulative from the first
+    entry, so the balance as of a day is the latest row on or before it.
+    Maintained by app.accounting.balances as entries are inserted or
+    deleted. Period closes add a row for every account at the period end.
+    """
+    __tablename__ = "account_balances"
+
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+
+    book = Column(String(20), nullable=False)  # 'ledger', 'cash'
+    account = Column(String(100), nullable=False, default="")
+    balance_date = Column(Date, nullable=False)
+
+    debit_total = Column(Numeric(15, 2), nullable=False, default=0)
+    credit_total = Column(Numeric(15, 2), nullable=False, default=0)
+    is_period_close = Column(Boolean, nullable=False, default=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("shop_id", "book", "account", "balance_date",
+                         name="unique_account_balance_day"),
+    )
+
+
 class BankBook(Base):
     """Bank book for bank transactions"""
     __tablename__ = "bank_book"
@@ -488,6 +679,8 @@ class GSTRecord(Base):
     # Relationships
     shop = relationship("Shop")
     order = relationship("Order")
+    lines = relationship("GSTRecordLine", back_populates="gst_record",
+                         cascade="all, delete-orphan")
 
     __table_args__ = (
         UniqueConstraint("order_id", name="unique_gst_per_order"),
@@ -497,6 +690,70 @@ class GSTRecord(Base):
     )
 
 
+class GSTRecordLine(Base):
+    """Taxable value of one GST record at one rate and HSN code
+
+    GSTRecord blends an order's rates into one row; its lines keep the
+    per-rate, per-HSN split that GST returns need. Written at delivery
+    from the order lines (HSN code '' when the product has none).
+    """
+    __tablename__ = "gst_record_lines"
+
+    id = Column(Integer, primary_key=True)
+    gst_record_id = Column(Integer, ForeignKey(
+        "gst_records.id", ondelete="CASCADE"), nullable=False)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    period_start = Column(Date, nullable=False)  # first day of the return month
+
+    gst_rate = Column(Numeric(5, 2), nullable=False)
+    hsn_code = Column(String(8), nullable=False, default="")
+    quantity = Column(Integer, nullable=False, default=0)
+
+    taxable_value = Column(Numeric(15, 2), nullable=False)
+    cgst_amount = Column(Numeric(15, 2), nullable=False, default=0)
+    sgst_amount = Column(Numeric(15, 2), nullable=False, default=0)
+    igst_amount = Column(Numeric(15, 2), nullable=False, default=0)
+
+    # Relationships
+    gst_record = relationship("GSTRecord", back_populates="lines")
+
+    __table_args__ = (
+        Index("idx_gst_lines_record", "gst_record_id"),
+        Index("idx_gst_lines_period", "shop_id", "period_start"),
+    )
+
+
+class GSTMonthlySummary(Base):
+    """Monthly GST totals of a shop per rate and HSN code
+
+    The sum of the month's GSTRecordLine rows, maintained by
+    app.accounting.gst as records are written and reversed. A month's
+    GSTR-1 and GSTR-3B summaries read only these rows.
+    """
+    __tablename__ = "gst_monthly_summaries"
+
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    period_start = Column(Date, nullable=False)
+
+    gst_rate = Column(Numeric(5, 2), nullable=False)
+    hsn_code = Column(String(8), nullable=False, default="")
+    quantity = Column(Integer, nullable=False, default=0)
+
+    taxable_value = Column(Numeric(15, 2), nullable=False, default=0)
+    cgst_amount = Column(Numeric(15, 2), nullable=False, default=0)
+    sgst_amount = Column(Numeric(15, 2), nullable=False, default=0)
+    igst_amount = Column(Numeric(15, 2), nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("shop_id", "period_start", "gst_rate", "hsn_code",
+                         name="unique_gst_summary_rate_hsn"),
+    )
+
+
 class ChartOfAccounts(Base):
     """Standard chart of accounts"""
     __tablename__ = "chart_of_accounts"
@@ -509,3 +766,31 @@ class ChartOfAccounts(Base):
     description = Column(Text)
 
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# ===== AI INSIGHTS =====
+class AIInsight(Base):
+    """Precomputed AI endpoint payload per shop (insights cache)
+
+    `input_watermark` fingerprints the data the payload was computed from;
+    `checked_at` is the last time the payload was computed or confirmed
+    against an unchanged watermark.
+    """
+    __tablename__ = "ai_insights"
+
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    # 'forecast', 'reorder', 'low_stock_risk', 'anomalies'
+    kind = Column(String(50), nullable=False)
+    params = Column(String(200), nullable=False, default="")
+
+    payload = Column(Text, nullable=False)  # response model as JSON
+    input_watermark = Column(String(200), nullable=False)
+
+    computed_at = Column(DateTime, nullable=False)
+    checked_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("shop_id", "kind", "params",
+                         name="unique_ai_insight"),
+    )
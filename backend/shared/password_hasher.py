@@ -0,0 +1,136 @@
+"""Async password hashing on a bounded worker pool"""
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import status
+from passlib.context import CryptContext
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from shared.config import get_settings
+from shared.exceptions import CustomException
+from shared.models import User
+
+settings = get_settings()
+
+
+class HashingBusyError(CustomException):
+    """Raised when the password hashing queue is full (back-pressure)"""
+
+    def __init__(self, detail: str = "Too many login attempts in progress, please retry shortly"):
+        super().__init__(detail, status_code=status.HTTP_429_TOO_MANY_REQUESTS)
+        self.headers = {"Retry-After": "1"}
+
+
+@lru_cache(maxsize=8)
+def _context_from_string(config: str) -> CryptContext:
+    return CryptContext.from_string(config)
+
+
+def _run_context(config: str, method: str, *args):
+    """Worker entry point; contexts travel as strings so process pools work"""
+    return getattr(_context_from_string(config), method)(*args)
+
+
+class PasswordHasher:
+    """Runs CryptContext hash/verify calls off the event loop
+
+    bcrypt/argon2 burn a few hundred milliseconds of CPU per call, which
+    would stall every other request if run inside an `async def` handler.
+    At most `max_workers` calls run at once and at most `max_queue` more
+    wait for a worker; beyond that `HashingBusyError` (HTTP 429) is raised
+    immediately rather than letting logins pile up.
+    """
+
+    def __init__(
+        self,
+        context: CryptContext,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        executor: Optional[str] = None,
+    ):
+        self.config = context.to_string()
+        self.max_workers = max_workers or settings.PASSWORD_HASH_WORKERS
+        self.max_queue = settings.PASSWORD_HASH_MAX_QUEUE if max_queue is None else max_queue
+        self.executor_kind = executor or settings.PASSWORD_HASH_EXECUTOR
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Calls running or waiting for a worker"""
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="password-hash")
+            return self._executor
+
+    async def _submit(self, method: str, *args):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise HashingBusyError()
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), _run_context, self.config, method, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the context's default scheme and cost"""
+        return await self._submit("hash", password)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        """Verify a password against its hash"""
+        if not hashed_password:
+            return False
+        return await self._submit("verify", password, hashed_password)
+
+    async def verify_and_update(
+        self,
+        password: str,
+        hashed_password: Optional[str],
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify a password and rehash it if the scheme or cost has changed
+
+        Returns: (valid, new_hash) - store new_hash when it is not None
+        """
+        if not hashed_password:
+            return False, None
+        return await self._submit("verify_and_update", password, hashed_password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+def save_rehashed_password(db: Session, user: User, new_hash: str) -> None:
+    """Store an upgraded hash of the user's unchanged password (does not commit)
+
+    Written with a plain UPDATE so it is not treated as a password change
+    (which revokes the user's tokens).
+    """
+    db.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(password_hash=new_hash)
+        .execution_options(synchronize_session=False)
+    )
+    set_committed_value(user, "password_hash", new_hash)
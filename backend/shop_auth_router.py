@@ -6,9 +6,10 @@ from sqlalchemy.orm import Session
 from shared.database import get_db
 from shared.models import User, Shop, RoleEnum
 from shared.auth_utils import (
-    hash_password, verify_password,
+    password_hasher,
     set_session_user, clear_session_user, is_customer
 )
+from shared.password_hasher import HashingBusyError, save_rehashed_password
 import os
 
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
@@ -110,8 +111,10 @@ async def customer_login(
                 status_code=401
             )
 
-        # Verify password
-        if not user.password_hash or not verify_password(password, user.password_hash):
+        # Verify password (rehashed if the scheme or cost has changed)
+        valid, new_hash = await password_hasher.verify_and_update(
+            password, user.password_hash)
+        if not valid:
             return templates.TemplateResponse(
                 "shop/login.html",
                 {
@@ -121,6 +124,9 @@ async def customer_login(
                 },
                 status_code=401
             )
+        if new_hash:
+            save_rehashed_password(db, user, new_hash)
+            db.commit()
 
         # Set session
         set_session_user(request, user.id, "customer", user.name)
@@ -128,6 +134,17 @@ async def customer_login(
         # Redirect to shop home
         return RedirectResponse(url="/shop/", status_code=302)
 
+    except HashingBusyError as e:
+        return templates.TemplateResponse(
+            "shop/login.html",
+            {
+                "request": request,
+                "error": e.detail,
+                "cart_count": 0
+            },
+            status_code=e.status_code,
+            headers=e.headers
+        )
     except Exception as e:
         return templates.TemplateResponse(
             "shop/login.html",
@@ -228,7 +245,7 @@ async def customer_register(
             role=RoleEnum.CUSTOMER,  # Auto-set to CUSTOMER
             city=city,  # Store city for India
             address=state,  # Store state (can be extended)
-            password_hash=hash_password(password)
+            password_hash=await password_hasher.hash(password)
         )
 
         db.add(new_user)
@@ -244,6 +261,17 @@ async def customer_register(
         # Redirect to shop home
         return RedirectResponse(url="/shop/", status_code=302)
 
+    except HashingBusyError as e:
+        return templates.TemplateResponse(
+            "shop/register_india.html",
+            {
+                "request": request,
+                "error": e.detail,
+                "cart_count": 0
+            },
+            status_code=e.status_code,
+            headers=e.headers
+        )
     except Exception as e:
         print(f"✗ Customer registration error: {str(e)}")
         return templates.TemplateResponse(
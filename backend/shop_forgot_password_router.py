@@ -2,10 +2,12 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, status
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from shared.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from shared.database import get_async_db
 from shared.models import User, Shop, RoleEnum
-from shared.auth_utils import hash_password
+from shared.auth_utils import password_hasher
+from shared.password_hasher import HashingBusyError
 from datetime import datetime, timedelta
 import random
 import os
@@ -48,7 +50,7 @@ async def forgot_password_page(request: Request):
 @router.post("/forgot-password", response_class=HTMLResponse)
 async def forgot_password_submit(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handle forgot password submission - validate mobile and generate OTP"""
     try:
@@ -74,11 +76,11 @@ async def forgot_password_submit(
             )
 
         # Find user with this phone number and CUSTOMER role
-        user = db.query(User).filter(
+        user = (await db.scalars(select(User).where(
             User.shop_id == DEFAULT_SHOP_ID,
             User.phone == phone,
             User.role == RoleEnum.CUSTOMER
-        ).first()
+        ))).first()
 
         if not user:
             error = "❌ No customer account found with this mobile number"
@@ -96,7 +98,7 @@ async def forgot_password_submit(
         user.otp_code = otp
         user.otp_expiry = expiry
         user.otp_attempts = 0
-        db.commit()
+        await db.commit()
 
         # DEV MODE: Print OTP to console
         # IMPORTANT: Replace with SMS gateway in production
@@ -158,7 +160,7 @@ async def verify_otp_page(request: Request):
 @router.post("/verify-otp", response_class=HTMLResponse)
 async def verify_otp_submit(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handle OTP verification"""
     try:
@@ -190,11 +192,11 @@ async def verify_otp_submit(
             )
 
         # Fetch user
-        user = db.query(User).filter(
+        user = (await db.scalars(select(User).where(
             User.id == user_id,
             User.shop_id == DEFAULT_SHOP_ID,
             User.role == RoleEnum.CUSTOMER
-        ).first()
+        ))).first()
 
         if not user:
             error = "❌ Invalid session. Please try again."
@@ -221,7 +223,7 @@ async def verify_otp_submit(
             user.otp_code = None
             user.otp_expiry = None
             user.otp_attempts = 0
-            db.commit()
+            await db.commit()
             return templates.TemplateResponse(
                 "shop/verify_otp.html",
                 {
@@ -240,13 +242,13 @@ async def verify_otp_submit(
             user.otp_code = None
             user.otp_expiry = None
             user.otp_attempts = 0
-            db.commit()
+            await db.commit()
             return RedirectResponse(url="/shop/forgot-password", status_code=302)
 
         # Verify OTP
         if user.otp_code != otp:
             user.otp_attempts += 1
-            db.commit()
+            await db.commit()
             remaining = OTP_MAX_ATTEMPTS - user.otp_attempts
             error = f"❌ Invalid OTP. {remaining} attempt{'s' if remaining != 1 else ''} remaining."
             return templates.TemplateResponse(
@@ -316,7 +318,7 @@ async def reset_password_page(request: Request):
 @router.post("/reset-password", response_class=HTMLResponse)
 async def reset_password_submit(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handle password reset"""
     try:
@@ -377,22 +379,22 @@ async def reset_password_submit(
             )
 
         # Update password
-        user = db.query(User).filter(
+        user = (await db.scalars(select(User).where(
             User.id == user_id,
             User.shop_id == DEFAULT_SHOP_ID,
             User.role == RoleEnum.CUSTOMER
-        ).first()
+        ))).first()
 
         if not user:
             error = "❌ User not found"
             return RedirectResponse(url="/shop/forgot-password", status_code=302)
 
         # Hash and save new password
-        user.password_hash = hash_password(password)
+        user.password_hash = await password_hasher.hash(password)
         user.otp_code = None
         user.otp_expiry = None
         user.otp_attempts = 0
-        db.commit()
+        await db.commit()
 
         # Clear session
         request.session["forgot_phone"] = None
@@ -410,6 +412,19 @@ async def reset_password_submit(
             }
         )
 
+    except HashingBusyError as e:
+        return templates.TemplateResponse(
+            "shop/reset_password.html",
+            {
+                "request": request,
+                "cart_count": 0,
+                "phone": request.session.get("forgot_phone"),
+                "error": e.detail,
+                "message": "Enter your new password"
+            },
+            status_code=e.status_code,
+            headers=e.headers
+        )
     except Exception as e:
         print(f"❌ Error in reset_password_submit: {str(e)}")
         error = f"An error occurred: {str(e)}"
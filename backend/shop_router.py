@@ -3,9 +3,15 @@ from fastapi import APIRouter, Depends, Request as FastAPIRequest
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
-from sqlalchemy.orm import Session
-from shared.database import get_db
-from shared.models import Product, Order, OrderItem, Shop
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from shared.database import get_async_db
+from shared.models import Product, Order, OrderItem, Shop, OrderStatusEnum, Inventory
+from app.orders.counters import OrderCounterService
+from app.orders.daily_sales import DailySalesService
+from app.cart.store import CartStore, get_cart_key, get_cart_store
+from app.cart.service import CartService
+from app.inventory.reservations import StockReservationService
 import os
 from datetime import datetime
 from decimal import Decimal
@@ -18,26 +24,20 @@ router = APIRouter(
     tags=["Customer Shop"],
 )
 
-# In-memory cart storage (demo - in production use sessions/database)
-customer_carts = {}
-
-
-def get_cart(customer_id: str = "demo_customer"):
-    """Get or create a cart for a customer"""
-    if customer_id not in customer_carts:
-        customer_carts[customer_id] = {}
-    return customer_carts[customer_id]
-
 
 @router.get("/", response_class=HTMLResponse)
-async def shop_home(request: Request, db: Session = Depends(get_db)):
+async def shop_home(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    cart: CartStore = Depends(get_cart_store)
+):
     """Customer Shop Home"""
     try:
         # Get featured products (with checking current_stock instead of stock)
-        products = db.query(Product).filter(
-            Product.current_stock > 0).limit(12).all()
-        cart = get_cart()
-        cart_count = len(cart)
+        products = (await db.scalars(
+            select(Product).where(Product.current_stock > 0).limit(12)
+        )).all()
+        cart_count = await cart.count(get_cart_key(request, create=False))
 
         context = {
             "request": request,
@@ -54,24 +54,25 @@ async def shop_home(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/products", response_class=HTMLResponse)
-async def shop_products(request: Request, category: str = None, db: Session = Depends(get_db)):
+async def shop_products(
+    request: Request,
+    category: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    cart: CartStore = Depends(get_cart_store)
+):
     """Browse all available products"""
     try:
+        query = select(Product).where(Product.current_stock > 0)
         if category:
-            products = db.query(Product).filter(
-                Product.category == category,
-                Product.current_stock > 0
-            ).all()
-        else:
-            products = db.query(Product).filter(
-                Product.current_stock > 0).all()
+            query = query.where(Product.category == category)
+        products = (await db.scalars(query)).all()
 
         # Get categories
-        all_products = db.query(Product).all()
-        categories = list(set(p.category for p in all_products if p.category))
+        categories = list((await db.scalars(
+            select(Product.category).where(Product.category.is_not(None)).distinct()
+        )).all())
 
-        cart = get_cart()
-        cart_count = len(cart)
+        cart_count = await cart.count(get_cart_key(request, create=False))
 
         context = {
             "request": request,
@@ -90,24 +91,25 @@ async def shop_products(request: Request, category: str = None, db: Session = De
 
 
 @router.post("/cart/add/{product_id}")
-async def add_to_cart(product_id: int, quantity: int = 1, db: Session = Depends(get_db)):
+async def add_to_cart(
+    request: Request,
+    product_id: int,
+    quantity: int = 1,
+    db: AsyncSession = Depends(get_async_db),
+    cart: CartStore = Depends(get_cart_store)
+):
     """Add item to cart"""
     try:
-        product = db.query(Product).filter(Product.id == product_id).first()
+        if quantity <= 0:
+            return RedirectResponse("/shop/products?error=Invalid quantity", status_code=302)
+
+        product = await db.get(Product, product_id)
         if not product:
             return RedirectResponse("/shop/products?error=Product not found", status_code=302)
 
-        cart = get_cart()
-
-        if str(product_id) in cart:
-            cart[str(product_id)]["quantity"] += quantity
-        else:
-            cart[str(product_id)] = {
-                "id": product.id,
-                "name": product.name,
-                "price": float(product.selling_price or 0),
-                "quantity": quantity
-            }
+        await cart.add_item(
+            get_cart_key(request), product.id, product.name,
+            Decimal(str(product.selling_price or 0)), quantity)
 
         return RedirectResponse("/shop/products?success=Added to cart", status_code=302)
     except Exception as e:
@@ -115,20 +117,22 @@ async def add_to_cart(product_id: int, quantity: int = 1, db: Session = Depends(
 
 
 @router.get("/cart", response_class=HTMLResponse)
-async def view_cart(request: Request):
+async def view_cart(request: Request, cart: CartStore = Depends(get_cart_store)):
     """View shopping cart"""
     try:
-        cart = get_cart()
+        cart_key = get_cart_key(request, create=False)
+        lines = await cart.get_lines(cart_key) if cart_key else {}
         cart_items = []
         total_amount = 0
 
-        for product_id, item in cart.items():
-            item_total = item["price"] * item["quantity"]
+        for product_id, item in lines.items():
+            price = float(item["price"])
+            item_total = price * item["quantity"]
             total_amount += item_total
             cart_items.append({
                 "product_id": product_id,
                 "name": item["name"],
-                "price": item["price"],
+                "price": price,
                 "quantity": item["quantity"],
                 "total": item_total
             })
@@ -137,7 +141,7 @@ async def view_cart(request: Request):
             "request": request,
             "cart_items": cart_items,
             "total_amount": round(total_amount, 2),
-            "cart_count": len(cart)
+            "cart_count": len(lines)
         }
         return templates.TemplateResponse("shop/cart.html", context)
     except Exception as e:
@@ -149,51 +153,66 @@ async def view_cart(request: Request):
 
 
 @router.post("/cart/remove/{product_id}")
-async def remove_from_cart(product_id: str):
+async def remove_from_cart(
+    request: Request,
+    product_id: int,
+    cart: CartStore = Depends(get_cart_store)
+):
     """Remove item from cart"""
     try:
-        cart = get_cart()
-        if product_id in cart:
-            del cart[product_id]
+        cart_key = get_cart_key(request, create=False)
+        if cart_key:
+            await cart.remove_item(cart_key, product_id)
         return RedirectResponse("/shop/cart", status_code=302)
     except Exception as e:
         return RedirectResponse(f"/shop/cart?error={str(e)}", status_code=302)
 
 
 @router.post("/cart/update/{product_id}")
-async def update_cart_item(product_id: str, quantity: int):
+async def update_cart_item(
+    request: Request,
+    product_id: int,
+    quantity: int,
+    cart: CartStore = Depends(get_cart_store)
+):
     """Update item quantity in cart"""
     try:
-        cart = get_cart()
-        if product_id in cart:
-            if quantity <= 0:
-                del cart[product_id]
-            else:
-                cart[product_id]["quantity"] = quantity
+        cart_key = get_cart_key(request, create=False)
+        if cart_key:
+            await cart.set_quantity(cart_key, product_id, quantity)
         return RedirectResponse("/shop/cart", status_code=302)
     except Exception as e:
         return RedirectResponse(f"/shop/cart?error={str(e)}", status_code=302)
 
 
 @router.get("/checkout", response_class=HTMLResponse)
-async def checkout_page(request: Request, db: Session = Depends(get_db)):
-    """Checkout page"""
+async def checkout_page(
+    request: Request,
+    error: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    cart: CartStore = Depends(get_cart_store)
+):
+    """Checkout page - shows current prices (revalidated against products)"""
     try:
-        cart = get_cart()
-        if not cart:
+        cart_key = get_cart_key(request, create=False)
+        if not cart_key:
+            return RedirectResponse("/shop/cart", status_code=302)
+
+        valid, message, lines = await CartService.revalidate(db, cart, cart_key)
+        if not lines:
             return RedirectResponse("/shop/cart", status_code=302)
 
         cart_items = []
         total_amount = Decimal("0")
 
-        for product_id, item in cart.items():
+        for item in lines:
             item_total = Decimal(
                 str(item["price"])) * Decimal(str(item["quantity"]))
             total_amount += item_total
             cart_items.append({
-                "product_id": product_id,
+                "product_id": item["id"],
                 "name": item["name"],
-                "price": item["price"],
+                "price": float(item["price"]),
                 "quantity": item["quantity"],
                 "total": float(item_total)
             })
@@ -202,7 +221,8 @@ async def checkout_page(request: Request, db: Session = Depends(get_db)):
             "request": request,
             "cart_items": cart_items,
             "total_amount": float(total_amount),
-            "cart_count": len(cart)
+            "cart_count": len(lines),
+            "error": error or (None if valid else message)
         }
         return templates.TemplateResponse("shop/checkout.html", context)
     except Exception as e:
@@ -218,29 +238,40 @@ async def place_order(
     request: Request,
     customer_name: str = None,
     customer_phone: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    cart: CartStore = Depends(get_cart_store)
 ):
     """Place an order"""
     try:
-        cart = get_cart()
-        if not cart:
+        cart_key = get_cart_key(request, create=False)
+        if not cart_key or not await cart.count(cart_key):
             return RedirectResponse("/shop/cart?error=Cart is empty", status_code=302)
 
+        # Reprice every line in one query; changes go back to checkout for review
+        valid, message, lines = await CartService.revalidate(db, cart, cart_key)
+        if not valid:
+            return RedirectResponse(f"/shop/checkout?error={message}", status_code=302)
+
+        # Cost at sale: the product shop's inventory cost price, else the product's
+        inventory_costs = {}
+        for product_id, cost_price in (await db.execute(
+            select(Inventory.product_id, Inventory.cost_price)
+            .join(Product, Product.id == Inventory.product_id)
+            .where(Inventory.shop_id == Product.shop_id,
+                   Inventory.product_id.in_([item["product"].id for item in lines]))
+            .order_by(Inventory.id)
+        )).all():
+            inventory_costs.setdefault(product_id, cost_price)
+
         # Calculate total
         total_amount = Decimal("0")
         order_items = []
 
-        for product_id, item in cart.items():
-            product = db.query(Product).filter(
-                Product.id == int(product_id)).first()
-            if not product:
-                return RedirectResponse(f"/shop/cart?error=Product {product_id} not found", status_code=302)
-
-            if product.current_stock < item["quantity"]:
-                return RedirectResponse(
-                    f"/shop/cart?error={product.name} not enough stock",
-                    status_code=302
-                )
+        for item in lines:
+            product = item["product"]
+            unit_cost = inventory_costs.get(product.id)
+            if unit_cost is None:
+                unit_cost = product.cost_price
 
             item_total = Decimal(str(product.selling_price or 0)) * \
                 Decimal(str(item["quantity"]))
@@ -251,11 +282,18 @@ async def place_order(
                 "product_name": product.name,
                 "quantity": item["quantity"],
                 "unit_price": float(product.selling_price or 0),
+                "unit_cost": unit_cost,
                 "total_price": float(item_total)
             })
 
-            # Reduce stock
-            product.current_stock -= item["quantity"]
+        # Reduce stock with one conditional UPDATE, so concurrent checkouts
+        # cannot both take the last units
+        in_stock = await db.run_sync(
+            StockReservationService.decrement_product_stock,
+            {item["product"].id: item["quantity"] for item in lines})
+        if not in_stock:
+            await db.rollback()
+            return RedirectResponse("/shop/checkout?error=Some items are out of stock", status_code=302)
 
         # Create order with required fields
         order = Order(
@@ -274,7 +312,10 @@ async def place_order(
             created_at=datetime.utcnow()
         )
         db.add(order)
-        db.flush()
+        await db.flush()
+        await db.run_sync(
+            OrderCounterService.record_transition,
+            order.shop_id, None, OrderStatusEnum.PLACED, order.total_amount)
 
         # Create order items
         for item_data in order_items:
@@ -285,26 +326,31 @@ async def place_order(
                 product_name=item_data["product_name"],
                 quantity=item_data["quantity"],
                 unit_price=Decimal(str(item_data["unit_price"])),
+                unit_cost=item_data["unit_cost"],
                 line_total=Decimal(str(item_data["total_price"]))
             )
             db.add(order_item)
+        await db.flush()
+        await db.run_sync(
+            DailySalesService.record_transition,
+            order, None, OrderStatusEnum.PLACED)
 
-        db.commit()
+        await db.commit()
 
         # Clear cart
-        customer_carts.clear()
+        await cart.clear(cart_key)
 
         return RedirectResponse(f"/shop/order-confirmation/{order.id}", status_code=302)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return RedirectResponse(f"/shop/checkout?error={str(e)}", status_code=302)
 
 
 @router.get("/order-confirmation/{order_id}", response_class=HTMLResponse)
-async def order_confirmation(order_id: int, request: Request, db: Session = Depends(get_db)):
+async def order_confirmation(order_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Order confirmation page"""
     try:
-        order = db.query(Order).filter(Order.id == order_id).first()
+        order = await db.get(Order, order_id)
         if not order:
             return RedirectResponse("/shop?error=Order not found", status_code=302)
 
@@ -324,13 +370,18 @@ async def order_confirmation(order_id: int, request: Request, db: Session = Depe
 
 
 @router.get("/orders", response_class=HTMLResponse)
-async def customer_orders(request: Request, db: Session = Depends(get_db)):
+async def customer_orders(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    cart: CartStore = Depends(get_cart_store)
+):
     """View customer's past orders"""
     try:
         # Demo: get orders for demo customer (customer_id = 1)
-        orders = db.query(Order).filter(Order.customer_id == 1).order_by(
-            Order.order_date.desc()
-        ).all()
+        orders = (await db.scalars(
+            select(Order).where(Order.customer_id == 1).order_by(
+                Order.order_date.desc())
+        )).all()
 
         # For each order, set created_at to order_date for template compatibility
         for order in orders:
@@ -341,7 +392,7 @@ async def customer_orders(request: Request, db: Session = Depends(get_db)):
             "request": request,
             "orders": orders,
             "total_orders": len(orders),
-            "cart_count": len(get_cart()),
+            "cart_count": await cart.count(get_cart_key(request, create=False)),
             "status_breakdown": {}  # Add this for template compatibility
         }
         return templates.TemplateResponse("shop/orders.html", context)
@@ -1,8 +1,18 @@
 """Test configuration and fixtures"""
+from decimal import Decimal
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from shared.database import Base, get_db
+from shared.models import (
+    DailyProductSales, Inventory, OrderStatusEnum, Product, RoleEnum, Shop, User
+)
+from app.orders.events import OrderEventService
+from app.orders.schemas import (
+    OrderCreateRequest, OrderItemCreate, OrderStatusUpdate
+)
+from app.orders.service import OrderService
 from main import app
 
 # In-memory SQLite for testing
@@ -46,3 +56,119 @@ def client(db_session):
     """FastAPI test client"""
     from fastapi.testclient import TestClient
     return TestClient(app)
+
+
+# ===== FACTORIES =====
+
+@pytest.fixture
+def make_shop(db_session):
+    """Shop factory: make_shop(name, email, **columns) adds and flushes a shop"""
+    def make(name, email, **columns):
+        shop = Shop(**{
+            "name": name,
+            "email": email,
+            "phone": "9000000000",
+            "address": "Test Address",
+            "city": "Test City",
+            "state": "Test State",
+            "pincode": "100001",
+            **columns
+        })
+        db_session.add(shop)
+        db_session.flush()
+        return shop
+    return make
+
+
+@pytest.fixture
+def create_shop_with_stock(db_session, make_shop):
+    """Factory: a shop, its owner and two stocked products (rice, soap)
+
+    create_shop_with_stock(suffix, stock=100) -> (shop, owner, [rice, soap])
+    """
+    def create(suffix, stock=100):
+        shop = make_shop("Rollup Shop", f"rollup{suffix}@kirana.local")
+        owner = User(shop_id=shop.id, phone=f"94000000{suffix}",
+                     name="Owner", role=RoleEnum.OWNER)
+        db_session.add(owner)
+
+        products = [
+            Product(shop_id=shop.id, name="Rice", sku=f"RRICE{suffix}",
+                    category="Grains", unit="kg", cost_price=Decimal("40"),
+                    mrp=Decimal("60"), selling_price=Decimal("50"),
+                    gst_rate=Decimal("5")),
+            Product(shop_id=shop.id, name="Soap", sku=f"RSOAP{suffix}",
+                    category="Personal Care", unit="piece", cost_price=Decimal("20"),
+                    mrp=Decimal("30"), selling_price=Decimal("25"),
+                    gst_rate=Decimal("18")),
+        ]
+        db_session.add_all(products)
+        db_session.flush()
+
+        for product in products:
+            db_session.add(Inventory(
+                shop_id=shop.id, product_id=product.id, quantity=stock,
+                cost_price=product.cost_price, selling_price=product.selling_price
+            ))
+        db_session.commit()
+        return shop, owner, products
+    return create
+
+
+# ===== ORDER HELPERS =====
+
+@pytest.fixture
+def delivery_path():
+    """Statuses from a new order to delivered"""
+    return (OrderStatusEnum.ACCEPTED, OrderStatusEnum.PACKED,
+            OrderStatusEnum.OUT_FOR_DELIVERY, OrderStatusEnum.DELIVERED)
+
+
+@pytest.fixture
+def place(db_session):
+    """place(shop, owner, (product, quantity), ...) -> created order"""
+    def place_order(shop, owner, *lines):
+        success, message, order = OrderService.create_order(
+            db_session, shop.id, owner, OrderCreateRequest(
+                customer_name="Customer",
+                customer_phone="9876543210",
+                shipping_address="Address",
+                items=[
+                    OrderItemCreate(product_id=product.id, quantity=quantity,
+                                    unit_price=product.selling_price)
+                    for product, quantity in lines
+                ]
+            )
+        )
+        assert success, message
+        return order
+    return place_order
+
+
+@pytest.fixture
+def move(db_session):
+    """move(shop, owner, order, *statuses): change status and dispatch the events"""
+    def move_order(shop, owner, order, *statuses):
+        for status in statuses:
+            success, message, _ = OrderService.update_order_status(
+                db_session, shop.id, order.id,
+                OrderStatusUpdate(new_status=status), owner)
+            assert success, message
+        OrderEventService.dispatch_pending(db_session)
+    return move_order
+
+
+@pytest.fixture
+def rollup_of(db_session):
+    """rollup_of(shop_id) -> {(product_id, day): non-zero daily sales figures}"""
+    def rollup(shop_id):
+        return {
+            (row.product_id, row.sale_date): (
+                row.ordered_qty, row.ordered_amount, row.delivered_qty,
+                row.revenue, row.cost, row.tax)
+            for row in db_session.query(DailyProductSales).filter(
+                DailyProductSales.shop_id == shop_id)
+            if any((row.ordered_qty, row.ordered_amount, row.delivered_qty,
+                    row.revenue, row.cost, row.tax))
+        }
+    return rollup
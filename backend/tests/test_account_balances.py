@@ -0,0 +1,131 @@
+"""Tests for account balance snapshots maintained as entries post"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.accounting.balances import (
+    AccountBalanceService, CASH_ACCOUNT, CASH_BOOK, LEDGER_BOOK
+)
+from app.accounting.service import AccountingService
+from shared.models import AccountBalance, CashBook, LedgerEntry, RoleEnum, User
+
+
+@pytest.fixture
+def create_shop_and_owner(db_session, make_shop):
+    def create(suffix):
+        shop = make_shop("Ledger Shop", f"ledger{suffix}@kirana.local")
+        owner = User(shop_id=shop.id, phone=f"96{suffix:0>8}",
+                     name="Ledger Owner", role=RoleEnum.OWNER)
+        db_session.add(owner)
+        db_session.commit()
+        return shop.id, owner.id
+    return create
+
+
+def ledger_entry(shop_id, owner_id, when, debit, credit, amount):
+    return LedgerEntry(shop_id=shop_id, entry_date=when, description="Test",
+                       debit_account=debit, debit_amount=Decimal(amount),
+                       credit_account=credit, credit_amount=Decimal(amount),
+                       created_by=owner_id)
+
+
+def snapshot_rows(db_session, shop_id):
+    return [
+        (row.book, row.account, str(row.balance_date), row.debit_total,
+         row.credit_total, row.is_period_close)
+        for row in db_session.query(AccountBalance).filter(
+            AccountBalance.shop_id == shop_id
+        ).order_by(AccountBalance.book, AccountBalance.account,
+                   AccountBalance.balance_date)
+    ]
+
+
+def test_postings_keep_running_balances(db_session, create_shop_and_owner):
+    shop_id, owner_id = create_shop_and_owner("1")
+    db_session.add_all([
+        ledger_entry(shop_id, owner_id, datetime(2024, 3, 1, 10), "Cash", "Sales", "100"),
+        ledger_entry(shop_id, owner_id, datetime(2024, 3, 3, 10), "Cash", "Sales", "50"),
+        CashBook(shop_id=shop_id, amount=Decimal("100"), entry_type="IN",
+                 created_by=owner_id, created_at=datetime(2024, 3, 1, 10)),
+        CashBook(shop_id=shop_id, amount=Decimal("30"), entry_type="OUT",
+                 created_by=owner_id, created_at=datetime(2024, 3, 3, 18)),
+    ])
+    db_session.commit()
+
+    # A back-dated entry adds to its day and every later day
+    db_session.add(ledger_entry(
+        shop_id, owner_id, datetime(2024, 3, 2, 9), "Cash", "Sales", "25"))
+    refund = CashBook(shop_id=shop_id, amount=Decimal("20"), entry_type="OUT",
+                      created_by=owner_id, created_at=datetime(2024, 3, 2, 9))
+    db_session.add(refund)
+    db_session.commit()
+    db_session.delete(refund)
+    db_session.commit()
+
+    assert AccountBalanceService.totals_as_of(
+        db_session, shop_id, LEDGER_BOOK, "Cash", date(2024, 3, 2)) == (125, 0)
+    assert AccountBalanceService.totals_as_of(
+        db_session, shop_id, LEDGER_BOOK, "Sales", date(2024, 3, 31)) == (0, 175)
+    assert AccountBalanceService.totals_as_of(
+        db_session, shop_id, LEDGER_BOOK, "Cash", date(2024, 2, 29)) == (0, 0)
+    # Mid-day: the previous day's snapshot plus that day's entries so far
+    assert AccountBalanceService.ledger_totals(
+        db_session, shop_id, "Cash", datetime(2024, 3, 3, 9)) == (125, 0)
+    assert AccountBalanceService.ledger_totals(
+        db_session, shop_id, "Cash", datetime(2024, 3, 3, 11)) == (175, 0)
+
+    cash_book = AccountingService.get_cash_book(
+        shop_id, "2024-03-02", "2024-03-03", db_session)
+    assert (cash_book.opening_balance, cash_book.cash_in, cash_book.cash_out,
+            cash_book.closing_balance) == (100, 0, 30, 70)
+    assert len(cash_book.transactions) == 1  # to_date's entries are in the period
+
+    # Rebuilding from the entries gives the same balances on every day
+    maintained = snapshot_rows(db_session, shop_id)
+    AccountBalanceService.rebuild(db_session, shop_id)
+    db_session.commit()
+    for book, account, day, debit, credit, _ in maintained:
+        assert AccountBalanceService.totals_as_of(
+            db_session, shop_id, book, account, date.fromisoformat(day)) == (debit, credit)
+
+
+def test_period_close_checkpoints_and_bounds_rebuilds(db_session, create_shop_and_owner):
+    shop_id, owner_id = create_shop_and_owner("2")
+    db_session.add_all([
+        ledger_entry(shop_id, owner_id, datetime(2024, 1, 10), "Cash", "Sales", "300"),
+        ledger_entry(shop_id, owner_id, datetime(2024, 2, 5), "Cash", "Sales", "200"),
+        CashBook(shop_id=shop_id, amount=Decimal("300"), entry_type="IN",
+                 created_by=owner_id, created_at=datetime(2024, 1, 10)),
+    ])
+    db_session.commit()
+
+    closing = AccountBalanceService.close_period(db_session, shop_id, date(2024, 1, 31))
+    db_session.commit()
+    assert [(row.book, row.account, row.debit_total, row.credit_total)
+            for row in closing] == [
+        (CASH_BOOK, CASH_ACCOUNT, 300, 0),
+        (LEDGER_BOOK, "Cash", 300, 0),
+        (LEDGER_BOOK, "Sales", 0, 300),
+    ]
+    assert AccountBalanceService.open_period_start(db_session, shop_id) == date(2024, 2, 1)
+
+    # A repair of the open period keeps the closed rows and carries them in
+    db_session.query(AccountBalance).filter(
+        AccountBalance.shop_id == shop_id,
+        AccountBalance.balance_date > date(2024, 1, 31)
+    ).delete(synchronize_session=False)
+    assert AccountBalanceService.rebuild(db_session, shop_id, start=date(2024, 2, 1)) == 2
+    db_session.commit()
+    assert AccountBalanceService.totals_as_of(
+        db_session, shop_id, LEDGER_BOOK, "Cash", date(2024, 2, 5)) == (500, 0)
+
+    # Rebuilding across the close checkpoints it again
+    AccountBalanceService.rebuild(db_session, shop_id)
+    db_session.commit()
+    closed = [row for row in snapshot_rows(db_session, shop_id) if row[5]]
+    assert closed == [
+        (CASH_BOOK, CASH_ACCOUNT, "2024-01-31", 300, 0, True),
+        (LEDGER_BOOK, "Cash", "2024-01-31", 300, 0, True),
+        (LEDGER_BOOK, "Sales", "2024-01-31", 0, 300, True),
+    ]
@@ -0,0 +1,108 @@
+"""Tests for streamed accounting exports"""
+import csv
+import io
+import re
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.accounting.exports import AccountingExportService, PDFTableWriter
+from app.accounting.router import router
+from app.auth.security import get_current_user
+from shared.database import get_read_db
+from shared.models import CashBook, LedgerEntry, RoleEnum, User
+
+
+@pytest.fixture
+def create_shop_with_ledger(db_session, make_shop):
+    def create(suffix, entries):
+        shop = make_shop("Export Shop", f"export{suffix}@kirana.local")
+        owner = User(shop_id=shop.id, phone=f"920000000{suffix}", name="Owner",
+                     role=RoleEnum.OWNER)
+        db_session.add(owner)
+        db_session.flush()
+
+        first = datetime(2024, 1, 1, 9)
+        db_session.add_all([
+            LedgerEntry(shop_id=shop.id, entry_date=first + timedelta(hours=6 * i),
+                        entry_number=f"E{i}", description=f"Sale, order {i} (cash)",
+                        debit_account="Cash", debit_amount=Decimal("10.50"),
+                        credit_account="Sales", credit_amount=Decimal("10.50"),
+                        created_by=owner.id)
+            for i in range(entries)
+        ])
+        db_session.add(CashBook(shop_id=shop.id, amount=Decimal("10.50"), entry_type="IN",
+                                created_by=owner.id, created_at=first))
+        db_session.commit()
+        return shop, owner
+    return create
+
+
+def test_csv_and_pdf_stream_the_whole_range(db_session, create_shop_with_ledger):
+    shop, _ = create_shop_with_ledger("1", 120)
+
+    chunks = list(AccountingExportService.stream(
+        db_session, "ledger", "csv", shop.id, date(2024, 1, 1), date(2024, 1, 10),
+        batch_size=25))
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert len(chunks) == 2  # entries of days 1-10 (39), a batch per chunk
+    assert rows[0][:3] == ["Date", "Entry No", "Description"]
+    assert len(rows) == 40
+    assert rows[1] == ["2024-01-01 09:00", "E0", "Sale, order 0 (cash)", "Cash",
+                       "10.50", "Sales", "10.50", "", ""]
+
+    pdf = b"".join(AccountingExportService.stream(
+        db_session, "ledger", "pdf", shop.id, date(2024, 1, 1), date(2024, 12, 31),
+        shop_name="Export Shop", batch_size=25))
+    pages = -(-120 // PDFTableWriter("", "", ["Date"]).rows_per_page)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    assert pdf.count(b"/Type /Page ") == pages
+    assert f"/Count {pages}".encode() in pdf
+    # Every cross-reference offset points at its object
+    xref_at = pdf.rindex(b"\nxref\n") + 1
+    xref = pdf[xref_at:]
+    offsets = [int(offset) for offset in re.findall(rb"(\d{10}) 00000 n", xref)]
+    for number, offset in enumerate(offsets, start=1):
+        assert pdf[offset:].startswith(f"{number} 0 obj".encode())
+    assert int(pdf.split(b"startxref\n")[1].split(b"\n")[0]) == xref_at
+
+
+def test_export_endpoint(db_session, create_shop_with_ledger):
+    shop, owner = create_shop_with_ledger("2", 3)
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_read_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: owner
+    client = TestClient(app)
+
+    url = f"/api/v1/accounting/export/{shop.id}"
+    response = client.get(f"{url}/cash-book?from_date=2024-01-01&to_date=2024-01-31")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[1] == "2024-01-01 09:00,IN,10.50,,,"
+
+    response = client.get(f"{url}/ledger?from_date=2024-01-01&to_date=2024-01-31&format=pdf")
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+
+    assert client.get(f"{url}/khata?from_date=2024-01-01&to_date=2024-01-31").status_code == 400
+    assert client.get(f"{url}/journal?from_date=2024-01-01&to_date=2024-01-31").status_code == 400
+    other_shop = f"/api/v1/accounting/export/{shop.id + 1}/ledger"
+    assert client.get(f"{other_shop}?from_date=2024-01-01&to_date=2024-01-31").status_code == 403
+
+
+def test_pdf_text_keeps_rupee_sign_and_devanagari():
+    writer = PDFTableWriter("किराना स्टोर", "₹ ledger", ["Description", "Amount"])
+    pdf = b"".join(writer.stream(iter([[["दूध (Milk)", "₹ 10.50"]]])))
+
+    streams = [zlib.decompress(data) for data in re.findall(
+        rb"/FlateDecode [^>]*>>\nstream\n(.*?)\nendstream", pdf, re.S)]
+    to_unicode = b"".join(data for data in streams if b"begincmap" in data)
+    # Each character maps back to its code point, so the text stays searchable
+    for character in "₹किरानादूध":
+        assert f"<{ord(character):04X}>".encode() in to_unicode
+    assert b"/Subtype /TrueType" in pdf and b"/FontFile2" in pdf
@@ -0,0 +1,117 @@
+"""Tests for batch anomaly detection"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import event
+
+from app.ai.anomaly import loss_severities, rolling_scores
+from app.ai.service import AnomalyDetectionService
+from app.ai.utils import detect_stock_anomalies
+from shared.models import (
+    DailyProductSales, Inventory, Product, StockMovement
+)
+
+
+def test_rolling_scores_flag_spikes_against_the_previous_window():
+    # Steady sales with one spike; the spike must not hide the next days
+    quantities = np.array([[10, 12, 9, 11, 10, 50, 10, 11]], dtype=np.float64)
+    for method in ("mad", "zscore"):
+        baselines, scores = rolling_scores(quantities, window=4, method=method)
+        assert scores.shape == (1, 4)
+        assert scores[0, 1] > 3.5
+    baselines, scores = rolling_scores(quantities, window=4, method="mad")
+    assert baselines[0, 1] == 10.5
+    assert abs(scores[0, 2]) < 3.5 and abs(scores[0, 3]) < 3.5
+
+
+def test_rolling_scores_judge_intermittent_sellers_on_selling_days():
+    quantities = np.array([[0, 9, 0, 0, 11, 0, 10, 0, 12, 40]], dtype=np.float64)
+    _, scores = rolling_scores(quantities, window=6)
+    # Against every day the median is 0, so each sale looks like a spike
+    assert (scores[0] > 3.5).tolist() == [True, False, True, True]
+
+    sizes, scores = rolling_scores(quantities, window=6, sizes_only=True)
+    assert sizes[0].tolist() == [10.0, 10.0, 10.5, 11.0]
+    assert (scores[0] > 3.5).tolist() == [False, False, False, True]
+
+
+def test_loss_severities_match_scalar_util():
+    sales = [10, 10, 10, 10, 0, 10]
+    losses = [0, 1, 2, 4, 3, 6]
+    expected = []
+    for sold, loss in zip(sales, losses):
+        # 100 in stock, `sold` units sold and `loss` more units missing
+        is_anomaly, _, severity = detect_stock_anomalies(
+            100 - sold - loss, 100, sold)
+        expected.append(severity if is_anomaly else "")
+    assert loss_severities(np.array(losses), np.array(sales)).tolist() == expected
+
+
+def test_detect_anomalies_in_three_queries(db_session, make_shop):
+    """Sales spikes and adjustment losses are found without per-product queries"""
+    shop = make_shop("Anomaly Shop", "anomaly@kirana.local")
+
+    products = []
+    for i in range(3):
+        product = Product(shop_id=shop.id, name=f"Anomaly {i}", sku=f"AN{i}",
+                          category="General", unit="piece",
+                          cost_price=Decimal("8"), mrp=Decimal("12"),
+                          selling_price=Decimal("10"))
+        db_session.add(product)
+        db_session.flush()
+        db_session.add(Inventory(shop_id=shop.id, product_id=product.id,
+                                 quantity=40, min_quantity=5,
+                                 cost_price=Decimal("8"),
+                                 selling_price=Decimal("10")))
+        products.append(product)
+    spiky, leaky, steady = products
+
+    today = datetime.now()
+    for back in range(1, 26):
+        day = (today - timedelta(days=back)).date()
+        for product in products:
+            quantity = 10 + back % 3
+            if product is spiky and back == 2:
+                quantity = 80
+            db_session.add(DailyProductSales(
+                shop_id=shop.id, product_id=product.id, sale_date=day,
+                ordered_qty=quantity, ordered_amount=Decimal("10") * quantity))
+
+    # 6 units written off on a day that sold 10 + 3 % 3 = 10: a 60% loss
+    loss_at = today - timedelta(days=3)
+    db_session.add_all([
+        StockMovement(shop_id=shop.id, product_id=leaky.id,
+                      movement_type="adjustment", quantity=-6,
+                      reference_type="manual", created_at=loss_at),
+        StockMovement(shop_id=shop.id, product_id=steady.id,
+                      movement_type="inbound", quantity=100,
+                      reference_type="purchase_order", created_at=loss_at),
+    ])
+    db_session.commit()
+
+    shop_id = shop.id
+    spiky_id, leaky_id = spiky.id, leaky.id
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        report = AnomalyDetectionService(db_session).detect_anomalies(
+            shop_id, days_back=7, window=14)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # Sales rollup, stock movements, stock of flagged products
+    assert len(statements) == 3
+    events = [(a.product_id, a.severity, a.deviation) for a in report.anomalies]
+    assert events == [(leaky_id, "CRITICAL", 6), (spiky_id, "HIGH", 69)]
+    assert report.critical_anomalies == 1
+    assert report.total_loss_detected == Decimal("48")
+
+    loss = report.anomalies[0]
+    assert (loss.expected_stock_change, loss.actual_stock_change) == (-10, -16)
+    assert loss.date == str(loss_at.date())
@@ -0,0 +1,112 @@
+"""Tests for the forecasting model registry and its rolling backtest"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from app.ai.forecast_models import (
+    AUTO_MODEL, FORECAST_MODELS, backtest, run_model
+)
+from app.ai.service import DemandForecastingService
+from shared.models import DailyProductSales, Product
+
+WEEKLY = np.array([10, 8, 8, 10, 14, 20, 18], dtype=np.float64)  # Monday first
+
+
+def daily_sales(start: date, days: int, month_start_uplift: float = 1.0) -> np.ndarray:
+    """One product selling WEEKLY by weekday, times the uplift on days 1-5"""
+    dates = [start + timedelta(days=i) for i in range(days)]
+    return np.array([[WEEKLY[day.weekday()] * (month_start_uplift if day.day <= 5 else 1)
+                      for day in dates]])
+
+
+def test_seasonal_models_follow_the_weekday_pattern():
+    start = date(2026, 5, 8)  # forecasts August 7-13: no month start
+    sales = daily_sales(start, 91)
+    first = start + timedelta(days=91)
+    expected = [WEEKLY[(first + timedelta(days=i)).weekday()] for i in range(7)]
+    for name in ("seasonal_naive", "holt_winters"):
+        assert np.allclose(run_model(name, sales, start, 7)[0], expected, atol=0.5), name
+
+    result = backtest(sales, start, horizon=7)
+    wape = dict(zip(result.models, result.wape()))
+    assert result.origins == 4
+    assert wape["seasonal_naive"] == 0
+    assert wape["holt_winters"] < 3 < wape["linear_regression"]
+
+
+def test_month_start_uplift_is_reapplied_to_future_month_starts():
+    first = date(2026, 10, 1)
+    start = first - timedelta(days=91)
+    sales = daily_sales(start, 91, month_start_uplift=2.0)
+
+    predicted = run_model("seasonal_naive", sales, start, 7)[0]
+    weekly = np.array([WEEKLY[(first + timedelta(days=i)).weekday()] for i in range(7)])
+    ratios = predicted / weekly
+    assert (ratios[:5] > 1.7).all()
+    assert np.allclose(ratios[5:], 1, atol=0.1)
+
+
+def test_croston_forecasts_the_rate_of_intermittent_demand():
+    sales = np.zeros((1, 91))
+    sales[0, 4::5] = 10  # 10 units every 5 days
+    predicted = run_model("croston", sales, date(2026, 5, 8), 7)
+    assert np.allclose(predicted, 10 / 5 * (1 - 0.1 / 2))
+
+
+def test_auto_selects_the_best_model_per_product(db_session, make_shop):
+    shop = make_shop("Model Shop", "models@kirana.local", forecast_model=AUTO_MODEL)
+    weekly = Product(shop_id=shop.id, name="Weekly", sku="MODEL1",
+                     category="General", unit="piece", cost_price=Decimal("8"),
+                     mrp=Decimal("12"), selling_price=Decimal("10"))
+    db_session.add(weekly)
+    db_session.flush()
+
+    today = datetime.now().date()
+    for back in range(120):
+        day = today - timedelta(days=back)
+        db_session.add(DailyProductSales(
+            shop_id=shop.id, product_id=weekly.id, sale_date=day,
+            ordered_qty=int(WEEKLY[day.weekday()]),
+            ordered_amount=Decimal("10") * int(WEEKLY[day.weekday()])))
+    db_session.commit()
+
+    shop_id = shop.id
+    service = DemandForecastingService(db_session)
+    forecast = service.forecast_all_products(shop_id)
+    product = forecast.products[0]
+    assert product.forecasts[0].method == "seasonal_naive"
+    assert [d.predicted_quantity for d in product.forecasts] == [
+        int(WEEKLY[(today + timedelta(days=i + 1)).weekday()]) for i in range(7)]
+
+    accuracy = service.get_forecast_accuracy(shop_id)
+    assert accuracy.selected_model == AUTO_MODEL
+    assert [m.model for m in accuracy.models] == list(FORECAST_MODELS)
+    assert sum(m.products_best for m in accuracy.models) == 1
+
+    single = service.get_product_forecast(product.product_id, shop_id)
+    assert single.forecasts == product.forecasts
+
+
+def test_forecast_as_of_ignores_later_sales(db_session, make_shop):
+    shop = make_shop("As Of Shop", "asof@kirana.local")
+    product = Product(shop_id=shop.id, name="Steady", sku="ASOF1",
+                      category="General", unit="piece", cost_price=Decimal("8"),
+                      mrp=Decimal("12"), selling_price=Decimal("10"))
+    db_session.add(product)
+    db_session.flush()
+
+    as_of = datetime.now() - timedelta(days=20)
+    for back in range(40):
+        day = (datetime.now() - timedelta(days=back)).date()
+        quantity = 5 if day <= as_of.date() else 50
+        db_session.add(DailyProductSales(
+            shop_id=shop.id, product_id=product.id, sale_date=day,
+            ordered_qty=quantity, ordered_amount=Decimal("10") * quantity))
+    db_session.commit()
+
+    service = DemandForecastingService(db_session)
+    forecast = service.forecast_all_products(shop.id, model="moving_average", as_of=as_of)
+    days = forecast.products[0].forecasts
+    assert [d.predicted_quantity for d in days] == [5] * 7
+    assert days[0].date == (as_of + timedelta(days=1)).strftime("%Y-%m-%d")
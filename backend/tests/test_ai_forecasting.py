@@ -0,0 +1,96 @@
+"""Tests for batch (vectorized) demand forecasting"""
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import event
+
+from app.ai.forecasting import forecast_matrix, moving_averages
+from app.ai.service import DemandForecastingService
+from app.ai.utils import calculate_moving_average, linear_regression_forecast
+from app.orders.daily_sales import DailySalesService
+from shared.models import (
+    Inventory, Order, OrderItem, OrderStatusEnum, Product, RoleEnum, User
+)
+
+
+def test_matrix_math_matches_scalar_utils():
+    rng = random.Random(7)
+    for days in (0, 1, 2, 5, 15):
+        rows = [[rng.randint(0, 40) for _ in range(days)] for _ in range(50)]
+        quantities = np.array(rows, dtype=np.float64).reshape(50, days)
+
+        predicted = forecast_matrix(quantities, days_ahead=7)
+        averages = moving_averages(quantities, window=7)
+        for i, row in enumerate(rows):
+            assert predicted[i].tolist() == linear_regression_forecast(row, 7)
+            assert averages[i] == calculate_moving_average(row, 7)
+
+
+def test_forecast_all_products_uses_one_sales_query(db_session, make_shop):
+    """Batch forecasts equal the per-product ones, without a query per product"""
+    shop = make_shop("Forecast Shop", "forecast@kirana.local")
+    owner = User(shop_id=shop.id, phone="9822222222",
+                 name="Forecast Owner", role=RoleEnum.OWNER)
+    products = [
+        Product(shop_id=shop.id, name=f"Forecast {i}", sku=f"FC{i}",
+                category="General", unit="piece", cost_price=Decimal("8"),
+                mrp=Decimal("12"), selling_price=Decimal("10"))
+        for i in range(6)
+    ]
+    db_session.add_all([owner, *products])
+    db_session.flush()
+    db_session.add_all([
+        Inventory(shop_id=shop.id, product_id=product.id, quantity=10 * i,
+                  min_quantity=5, cost_price=Decimal("8"),
+                  selling_price=Decimal("10"))
+        for i, product in enumerate(products)
+    ])
+
+    rng = random.Random(11)
+    now = datetime.now()
+    for day in range(13):
+        order = Order(shop_id=shop.id, order_number=f"FC-{day}",
+                      created_by=owner.id, subtotal=Decimal("10"),
+                      total_amount=Decimal("10"),
+                      order_date=now - timedelta(days=day, hours=1),
+                      order_status=OrderStatusEnum.DELIVERED)
+        db_session.add(order)
+        db_session.flush()
+        # Product 5 never sells, so it is not forecast
+        for product in products[:5]:
+            quantity = rng.randint(0, 6) + (12 - day) * product.id % 4
+            if quantity:
+                db_session.add(OrderItem(
+                    order_id=order.id, product_id=product.id, shop_id=shop.id,
+                    product_name=product.name, quantity=quantity,
+                    unit_price=Decimal("10"), line_total=Decimal("10") * quantity))
+    db_session.flush()
+    DailySalesService.rebuild(db_session, shop.id)
+    db_session.commit()
+
+    shop_id, product_ids = shop.id, [p.id for p in products[:5]]
+    service = DemandForecastingService(db_session)
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        batch = service.forecast_all_products(shop_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # Sales aggregate, product names, stock
+    assert len(statements) == 3
+    assert [p.product_id for p in batch.products] == product_ids
+    for forecast in batch.products:
+        single = service.get_product_forecast(forecast.product_id, shop_id)
+        assert forecast.current_stock == single.current_stock
+        assert forecast.historical_daily_avg == single.historical_daily_avg
+        assert [d.predicted_quantity for d in forecast.forecasts] == [
+            d.predicted_quantity for d in single.forecasts]
+    assert any(p.total_predicted_7day for p in batch.products)
@@ -0,0 +1,113 @@
+"""Tests for the precomputed AI insights cache"""
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import BackgroundTasks, Response
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.ai.insights import INSIGHTS, InsightCache, refresh_all_shops, revalidate
+from app.ai.router import INSIGHTS_CACHE_HEADER, serve_insight
+from shared.config import get_settings
+from shared.database import build_async_engine
+from shared.models import (
+    AIInsight, DailyProductSales, Inventory, Product, StockMovement
+)
+
+settings = get_settings()
+
+
+@pytest.fixture
+def create_shop(db_session, make_shop):
+    def create(suffix):
+        shop = make_shop("Insights Shop", f"insights{suffix}@kirana.local")
+        product = Product(shop_id=shop.id, name=f"Insight {suffix}", sku=f"INS{suffix}",
+                          category="General", unit="piece",
+                          cost_price=Decimal("8"), mrp=Decimal("12"),
+                          selling_price=Decimal("10"))
+        db_session.add(product)
+        db_session.flush()
+        db_session.add(Inventory(shop_id=shop.id, product_id=product.id,
+                                 quantity=20, min_quantity=5,
+                                 cost_price=Decimal("8"), selling_price=Decimal("10")))
+        for back in range(1, 15):
+            db_session.add(DailyProductSales(
+                shop_id=shop.id, product_id=product.id,
+                sale_date=(datetime.now() - timedelta(days=back)).date(),
+                ordered_qty=4, ordered_amount=Decimal("40")))
+        db_session.commit()
+        return shop.id, product.id
+    return create
+
+
+def test_runner_recomputes_only_when_inputs_change(db_engine, db_session, create_shop):
+    shop_id, product_id = create_shop("R1")
+
+    assert InsightCache.refresh_shop(db_session, shop_id) == len(INSIGHTS)
+    db_session.commit()
+    entries = db_session.query(AIInsight).filter(AIInsight.shop_id == shop_id).all()
+    assert sorted(entry.kind for entry in entries) == sorted(INSIGHTS)
+    anomalies = InsightCache.get(db_session, shop_id, "anomalies",
+                                 INSIGHTS["anomalies"].default_params)
+    assert anomalies.params == "days_back=7&method=mad&window=14"
+
+    # Unchanged inputs: payloads are only marked as checked
+    computed_at = anomalies.computed_at
+    assert InsightCache.refresh_shop(db_session, shop_id) == 0
+    db_session.commit()
+    db_session.refresh(anomalies)
+    assert anomalies.computed_at == computed_at
+    assert anomalies.checked_at > computed_at
+
+    # A stock write-off changes the watermark; the runner recomputes
+    db_session.add(StockMovement(shop_id=shop_id, product_id=product_id,
+                                 movement_type="adjustment", quantity=-3,
+                                 reference_type="manual"))
+    db_session.commit()
+    refresh_all_shops(sessionmaker(bind=db_engine))
+    db_session.expire_all()
+    assert InsightCache.get(db_session, shop_id, "anomalies",
+                            INSIGHTS["anomalies"].default_params).computed_at > computed_at
+
+
+def test_serve_insight_stale_while_revalidate(db_engine, create_shop):
+    shop_id, _ = create_shop("S1")
+
+    async def serve(db, fresh=False):
+        response, background_tasks = Response(), BackgroundTasks()
+        report = await serve_insight(db, response, background_tasks, shop_id,
+                                     "low_stock_risk", fresh=fresh)
+        return report, response.headers[INSIGHTS_CACHE_HEADER], background_tasks.tasks
+
+    async def main():
+        async_engine = build_async_engine(
+            db_engine.url.render_as_string(hide_password=False))
+        try:
+            async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+                report, status, tasks = await serve(db)
+                assert (status, tasks) == ("miss", [])
+                assert report.risks[0].daily_velocity == 4.0
+
+                report, status, tasks = await serve(db)
+                assert (status, tasks) == ("hit", [])
+
+                # Past the max age: served from the cache, refreshed afterwards
+                await db.execute(update(AIInsight).where(
+                    AIInsight.shop_id == shop_id).values(
+                    checked_at=datetime.utcnow() - timedelta(
+                        seconds=settings.AI_INSIGHTS_MAX_AGE_SECONDS + 1)))
+                await db.commit()
+                report, status, tasks = await serve(db)
+                assert status == "stale"
+                assert [(task.func, task.args) for task in tasks] == [
+                    (revalidate, (shop_id, "low_stock_risk", None))]
+
+                report, status, tasks = await serve(db, fresh=True)
+                assert (status, tasks) == ("bypass", [])
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""Tests for the single-pass reorder engine and purchase order drafts"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from app.ai.service import ReorderSuggestionService
+from shared.models import DailyProductSales, Inventory, Product, User
+
+
+def test_reorder_plan_uses_lead_times_packs_and_levels(db_engine, db_session, make_shop):
+    shop = make_shop("Reorder Shop", "reorder@kirana.local", forecast_model="moving_average")
+    supplier = User(shop_id=shop.id, phone="9100000001", name="Wholesaler",
+                    lead_time_days=3)
+    db_session.add(supplier)
+    db_session.flush()
+
+    def add_product(sku, stock, daily_sales, **settings):
+        product = Product(shop_id=shop.id, name=sku, sku=sku, category="General",
+                          unit="piece", cost_price=Decimal("8"), mrp=Decimal("12"),
+                          selling_price=Decimal("10"), **settings)
+        db_session.add(product)
+        db_session.flush()
+        # Two batches: stock on hand is their sum
+        for batch, quantity in (("B1", stock // 2), ("B2", stock - stock // 2)):
+            db_session.add(Inventory(shop_id=shop.id, product_id=product.id,
+                                     batch_no=batch, quantity=quantity,
+                                     cost_price=Decimal("8"),
+                                     selling_price=Decimal("10")))
+        for back in range(40 if daily_sales else 0):
+            db_session.add(DailyProductSales(
+                shop_id=shop.id, product_id=product.id,
+                sale_date=(datetime.now() - timedelta(days=back)).date(),
+                ordered_qty=daily_sales, ordered_amount=Decimal("10") * daily_sales))
+        return product.id
+
+    packed = add_product("PACKED", 20, 10, supplier_id=supplier.id,
+                         min_stock_level=5, reorder_quantity=12,
+                         last_purchase_price=Decimal("7.50"))
+    idle = add_product("IDLE", 50, 0, supplier_id=supplier.id)
+    capped = add_product("CAPPED", 0, 10, max_stock_level=50)
+    db_session.commit()
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", count)
+    try:
+        report = ReorderSuggestionService(db_session).get_reorder_suggestions(shop.id)
+    finally:
+        event.remove(db_engine, "before_cursor_execute", count)
+    assert len(statements) <= 3  # shop, stock + suppliers, sales
+
+    by_product = {s.product_id: s for s in report.suggestions}
+    # 10/day over 3 + 7 days, safety stock = min level (no variance)
+    assert (by_product[packed].current_stock, by_product[packed].lead_time_days) == (20, 3)
+    assert (by_product[packed].safety_stock, by_product[packed].reorder_point,
+            by_product[packed].order_up_to) == (5, 35, 105)
+    assert by_product[packed].suggested_reorder_qty == 96  # 85 in packs of 12
+    assert by_product[packed].urgent
+    assert by_product[idle].suggested_reorder_qty == 0
+    assert not by_product[idle].urgent
+    # Default lead time of 1 day: (1 + 7) x 10 + 10 = 90, capped at 50
+    assert (by_product[capped].order_up_to, by_product[capped].suggested_reorder_qty) == (50, 50)
+    assert report.urgent_count == 2
+
+    supplied, unassigned = report.purchase_orders
+    assert (supplied.supplier_id, supplied.supplier_name, supplied.lead_time_days) == (
+        supplier.id, "Wholesaler", 3)
+    assert [(line.product_id, line.quantity) for line in supplied.lines] == [(packed, 96)]
+    assert supplied.total_cost == Decimal("720.00")
+    assert unassigned.supplier_id is None
+    assert (unassigned.total_quantity, unassigned.total_cost) == (50, Decimal("400.00"))
@@ -0,0 +1,77 @@
+"""Tests for batch low-stock risk scoring"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import event
+
+from app.ai.risk import RISK_LEVELS, classify_risks
+from app.ai.service import SmartLowStockAlertService
+from app.ai.utils import classify_stock_risk
+from shared.models import DailyProductSales, Inventory, Product
+
+
+def test_classify_risks_matches_scalar_util():
+    days = np.array([0, 0.5, 0.99, 1, 2.9, 3, 6.99, 7, 8, 999])
+    levels = classify_risks(days)
+    assert [RISK_LEVELS[i] for i in levels] == [
+        classify_stock_risk(d) for d in days.tolist()]
+
+
+def test_low_stock_risks_in_two_queries_with_filters(db_session, make_shop):
+    """Velocity comes from one grouped query; min_risk and limit trim the list"""
+    shop = make_shop("Risk Shop", "risk@kirana.local")
+
+    # (stock, minimum, units sold in the last week): days until minimum
+    # CRITICAL 0.5, HIGH 2, MEDIUM 5, LOW 999 (not selling), CRITICAL 0
+    setups = [(15, 5, 140), (25, 5, 70), (15, 5, 14), (50, 5, 0), (3, 5, 7)]
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    for i, (stock, minimum, sold) in enumerate(setups):
+        product = Product(shop_id=shop.id, name=f"Risk {i}", sku=f"RISK{i}",
+                          category="General", unit="piece",
+                          cost_price=Decimal("8"), mrp=Decimal("12"),
+                          selling_price=Decimal("10"))
+        db_session.add(product)
+        db_session.flush()
+        db_session.add(Inventory(shop_id=shop.id, product_id=product.id,
+                                 quantity=stock, min_quantity=minimum,
+                                 cost_price=Decimal("8"),
+                                 selling_price=Decimal("10")))
+        if sold:
+            db_session.add(DailyProductSales(
+                shop_id=shop.id, product_id=product.id, sale_date=yesterday,
+                ordered_qty=sold, ordered_amount=Decimal("10") * sold))
+    db_session.commit()
+
+    shop_id = shop.id
+    service = SmartLowStockAlertService(db_session)
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        report = service.get_low_stock_risks(shop_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # Stock with product names, units sold
+    assert len(statements) == 2
+    assert [(r.product_name, r.risk_level, r.days_until_minimum)
+            for r in report.risks] == [
+        ("Risk 4", "CRITICAL", 0.0), ("Risk 0", "CRITICAL", 0.5),
+        ("Risk 1", "HIGH", 2.0), ("Risk 2", "MEDIUM", 5.0),
+        ("Risk 3", "LOW", 999.0)]
+    assert (report.critical_count, report.high_risk_count,
+            report.medium_risk_count) == (2, 1, 1)
+    assert report.risks[1].daily_velocity == 20.0
+    assert report.risks[1].action_required
+
+    urgent = service.get_low_stock_risks(shop_id, min_risk="HIGH")
+    assert [r.risk_level for r in urgent.risks] == ["CRITICAL", "CRITICAL", "HIGH"]
+    assert urgent.critical_count == 2
+
+    top = service.get_low_stock_risks(shop_id, limit=1)
+    assert [r.product_name for r in top.risks] == ["Risk 4"]
@@ -0,0 +1,23 @@
+"""Tests for the routers mounted on the shipped application"""
+import main_with_auth
+
+
+def test_app_and_legacy_routers_are_both_mounted():
+    """The app.* routers are not replaced by the legacy service routers"""
+    paths = {(method, route.path) for route in main_with_auth.app.routes
+             for method in getattr(route, "methods", None) or ()}
+
+    assert {
+        # app.accounting.router
+        ("GET", "/api/v1/accounting/export/{shop_id}/{report}"),
+        ("GET", "/api/v1/accounting/gst-returns/{shop_id}"),
+        ("POST", "/api/v1/accounting/period-close/{shop_id}"),
+        ("GET", "/api/v1/accounting/cash-book/{shop_id}"),
+        # app.inventory.router
+        ("GET", "/api/v1/inventory/shop/{shop_id}"),
+        ("GET", "/api/v1/inventory/low-stock/{shop_id}"),
+        # legacy accounting_service / inventory_service routers
+        ("GET", "/api/v1/accounting/ledger"),
+        ("GET", "/api/v1/accounting/sales-ledger"),
+        ("GET", "/api/v1/inventory/status"),
+    } <= paths
@@ -0,0 +1,103 @@
+"""Tests for the AsyncSession stack used by the async HTML/AI routers"""
+import asyncio
+from decimal import Decimal
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+import admin_router
+from app.ai.router import verify_shop_access
+from shared.database import async_database_url, build_async_engine, get_async_db
+from shared.models import Product, RoleEnum, User
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+
+@pytest.fixture
+def create_shop(db_session, make_shop):
+    def create(suffix):
+        shop = make_shop(f"Async Shop {suffix}", f"async{suffix}@kirana.local")
+        return shop
+    return create
+
+
+def async_session_factory(db_engine):
+    async_engine = build_async_engine(
+        db_engine.url.render_as_string(hide_password=False))
+    return async_engine, async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+def test_async_database_url_maps_sync_drivers():
+    """Sync URLs are rewritten to asyncpg / aiosqlite"""
+    assert async_database_url("postgresql://u:p@db:5432/kirana") == \
+        "postgresql+asyncpg://u:p@db:5432/kirana"
+    assert async_database_url("postgresql+psycopg2://u@db/kirana") == \
+        "postgresql+asyncpg://u@db/kirana"
+    assert async_database_url("sqlite:///./kirana.db") == \
+        "sqlite+aiosqlite:///./kirana.db"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u@db/kirana")
+
+
+def test_admin_products_page_reads_through_async_session(db_engine, db_session, create_shop):
+    """The ported admin page renders rows loaded with AsyncSession"""
+    shop = create_shop("01")
+    db_session.add(Product(shop_id=shop.id, name="Async Basmati", sku="ASYNC-01",
+                           category="Grains", unit="kg", cost_price=Decimal("80"),
+                           mrp=Decimal("110"), selling_price=Decimal("100"),
+                           current_stock=7))
+    db_session.commit()
+    async_engine, AsyncSessionFactory = async_session_factory(db_engine)
+
+    app = FastAPI()
+    app.include_router(admin_router.router)
+
+    async def override_get_async_db():
+        async with AsyncSessionFactory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *(client.get("/admin/products") for _ in range(3)))
+        await async_engine.dispose()
+        return responses
+
+    for response in asyncio.run(scenario()):
+        assert response.status_code == 200
+        assert "Async Basmati" in response.text
+
+
+def test_ai_shop_access_uses_role_enum(db_engine, db_session, create_shop):
+    """Owners reach their own shop only; admins reach every shop"""
+    own_shop = create_shop("02")
+    other_shop = create_shop("03")
+    owner = User(shop_id=own_shop.id, phone="9500000102",
+                 name="Owner", role=RoleEnum.OWNER)
+    admin = User(shop_id=other_shop.id, phone="9500000103",
+                 name="Admin", role=RoleEnum.ADMIN)
+    db_session.add_all([owner, admin])
+    db_session.commit()
+    async_engine, AsyncSessionFactory = async_session_factory(db_engine)
+
+    async def check(user, shop_id):
+        async with AsyncSessionFactory() as db:
+            try:
+                return await verify_shop_access(shop_id, current_user=user, db=db)
+            except HTTPException as exc:
+                return exc.status_code
+
+    async def scenario():
+        results = [
+            await check(owner, own_shop.id),
+            await check(owner, other_shop.id),
+            await check(admin, own_shop.id),
+            await check(owner, 999999),
+        ]
+        await async_engine.dispose()
+        return results
+
+    assert asyncio.run(scenario()) == [True, 403, True, 404]
@@ -0,0 +1,209 @@
+"""Tests for the session-keyed cart store and checkout revalidation"""
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fakeredis import aioredis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.middleware.sessions import SessionMiddleware
+
+import shop_router
+from app.cart.service import CartService
+from app.cart.store import DatabaseCartStore, RedisCartStore
+from shared.database import build_async_engine, get_async_db
+from shared.models import Cart, Inventory, OrderItem, Product
+
+
+@pytest.fixture
+def create_products(db_session, make_shop):
+    def create(suffix):
+        shop = make_shop("Cart Shop", f"cart{suffix}@kirana.local")
+        products = [
+            Product(shop_id=shop.id, name=f"Dal {suffix}", sku=f"DAL{suffix}",
+                    category="Grains", unit="kg", cost_price=Decimal("80"),
+                    mrp=Decimal("110"), selling_price=Decimal("100"), current_stock=50),
+            Product(shop_id=shop.id, name=f"Tea {suffix}", sku=f"TEA{suffix}",
+                    category="Beverages", unit="piece", cost_price=Decimal("20"),
+                    mrp=Decimal("30"), selling_price=Decimal("25"), current_stock=50),
+        ]
+        db_session.add_all(products)
+        db_session.commit()
+        return [product.id for product in products]
+    return create
+
+
+def run_with_store(db_engine, backend, scenario):
+    """Run `scenario(db, store)` against a fresh store of the given backend"""
+    async def main():
+        async_engine = build_async_engine(
+            db_engine.url.render_as_string(hide_password=False))
+        try:
+            async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+                if backend == "redis":
+                    store = RedisCartStore(aioredis.FakeRedis(decode_responses=True))
+                else:
+                    store = DatabaseCartStore(db)
+                return await scenario(db, store)
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("backend", ["database", "redis"])
+def test_cart_lines_and_count(db_engine, backend, create_products):
+    """Adds merge per product, count tracks distinct lines, keys are isolated"""
+    dal_id, tea_id = create_products(backend[:2] + "1")
+
+    async def scenario(db, store):
+        await store.add_item("s1", dal_id, "Dal", Decimal("100"), 1)
+        await store.add_item("s1", dal_id, "Dal", Decimal("100"), 2)
+        await store.add_item("s1", tea_id, "Tea", Decimal("25"), 1)
+        await store.add_item("s2", tea_id, "Tea", Decimal("25"), 4)
+        counts = [await store.count("s1"), await store.count("s2")]
+
+        await store.set_quantity("s1", tea_id, 5)
+        await store.set_quantity("s1", dal_id, 0)
+        lines = await store.get_lines("s1")
+        counts.append(await store.count("s1"))
+
+        await store.clear("s2")
+        counts.append(await store.count("s2"))
+        return counts, lines
+
+    counts, lines = run_with_store(db_engine, backend, scenario)
+    assert counts == [2, 1, 1, 0]
+    assert lines == {tea_id: {"id": tea_id, "name": "Tea",
+                              "price": Decimal("25"), "quantity": 5}}
+
+
+def test_database_cart_expiry_and_purge(db_engine, create_products):
+    """Expired carts read as empty, restart empty on write and are purged"""
+    dal_id, tea_id = create_products("db2")
+
+    async def scenario(db, store):
+        await store.add_item("old", dal_id, "Dal", Decimal("100"), 1)
+        await store.add_item("stale", dal_id, "Dal", Decimal("100"), 1)
+        await db.execute(update(Cart).where(Cart.cart_key.in_(["old", "stale"]))
+                         .values(expires_at=datetime.utcnow() - timedelta(minutes=1)))
+        await db.commit()
+
+        expired = [await store.count("old"), await store.get_lines("old")]
+        await store.add_item("old", tea_id, "Tea", Decimal("25"), 1)
+        restarted = list(await store.get_lines("old"))
+        purged = await DatabaseCartStore.purge_expired(db)
+        return expired, restarted, purged, await db.get(Cart, "stale")
+
+    expired, restarted, purged, stale = run_with_store(
+        db_engine, "database", scenario)
+    assert expired == [0, {}]
+    assert restarted == [tea_id]
+    assert purged == 1
+    assert stale is None
+
+
+def test_redis_cart_keys_expire():
+    """Redis carts rely on key TTLs refreshed by every write"""
+    async def scenario():
+        client = aioredis.FakeRedis(decode_responses=True)
+        store = RedisCartStore(client)
+        await store.add_item("s1", 1, "Dal", Decimal("100"), 1)
+        return [await client.ttl(key) for key in store._keys("s1")]
+
+    for ttl in asyncio.run(scenario()):
+        assert ttl > 0
+
+
+def test_revalidate_reprices_in_one_query(db_engine, create_products):
+    """Checkout revalidation loads all products at once and reprices the cart"""
+    dal_id, tea_id = create_products("db3")
+
+    async def scenario(db, store):
+        await store.add_item("reprice", dal_id, "Dal", Decimal("100"), 2)
+        await store.add_item("reprice", tea_id, "Tea", Decimal("25"), 1)
+        await db.execute(update(Product).where(Product.id == dal_id)
+                         .values(selling_price=Decimal("120")))
+        await db.commit()
+
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT") and "products" in statement:
+                statements.append(statement)
+
+        event.listen(db.bind.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            first = await CartService.revalidate(db, store, "reprice")
+        finally:
+            event.remove(db.bind.sync_engine, "before_cursor_execute", on_execute)
+        second = await CartService.revalidate(db, store, "reprice")
+        return first, second, len(statements)
+
+    first, second, product_queries = run_with_store(db_engine, "database", scenario)
+    assert product_queries == 1
+    assert first[0] is False
+    assert "now 120.00" in first[1]
+    assert second[0] is True
+    assert {line["id"]: line["price"] for line in second[2]} == {
+        dal_id: Decimal("120"), tea_id: Decimal("25")}
+
+
+def build_worker(db_engine):
+    """Storefront app with its own engine and pool, like one worker process"""
+    async_engine = build_async_engine(
+        db_engine.url.render_as_string(hide_password=False))
+    AsyncSessionFactory = async_sessionmaker(async_engine, expire_on_commit=False)
+    app = FastAPI()
+    # Close pooled connections (and their driver threads) on shutdown
+    app.add_event_handler("shutdown", async_engine.dispose)
+    app.add_middleware(SessionMiddleware, secret_key="test-secret")
+    app.include_router(shop_router.router)
+
+    async def override_get_async_db():
+        async with AsyncSessionFactory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return TestClient(app)
+
+
+def test_cart_is_shared_between_workers(db_engine, create_products):
+    """A session cookie issued by one app instance finds its cart on another"""
+    dal_id, _ = create_products("db4")
+
+    with build_worker(db_engine) as first, build_worker(db_engine) as second:
+        response = first.post(f"/shop/cart/add/{dal_id}?quantity=3",
+                              follow_redirects=False)
+        assert response.status_code == 302
+        second.cookies = first.cookies
+
+        response = second.get("/shop/cart")
+        assert response.status_code == 200
+        assert "Dal db4" in response.text
+
+
+def test_storefront_checkout_captures_cost_and_takes_stock(db_engine, db_session, create_products):
+    """Order lines keep the inventory cost (else the product's) at sale"""
+    dal_id, tea_id = create_products("db5")
+    dal = db_session.get(Product, dal_id)
+    db_session.add(Inventory(shop_id=dal.shop_id, product_id=dal_id, quantity=50,
+                             cost_price=Decimal("75"), selling_price=Decimal("100")))
+    db_session.commit()
+
+    with build_worker(db_engine) as client:
+        client.post(f"/shop/cart/add/{dal_id}?quantity=2", follow_redirects=False)
+        client.post(f"/shop/cart/add/{tea_id}?quantity=1", follow_redirects=False)
+        response = client.post("/shop/checkout/place-order?customer_name=Asha",
+                               follow_redirects=False)
+    assert response.headers["location"].startswith("/shop/order-confirmation/")
+    order_id = int(response.headers["location"].rsplit("/", 1)[1])
+
+    costs = {item.product_id: item.unit_cost for item in db_session.query(OrderItem)
+             .filter(OrderItem.order_id == order_id)}
+    assert costs == {dal_id: Decimal("75"), tea_id: Decimal("20")}
+    db_session.expire_all()
+    assert db_session.get(Product, dal_id).current_stock == 48
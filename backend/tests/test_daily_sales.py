@@ -0,0 +1,107 @@
+"""Tests for the daily product sales rollup"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from app.accounting.service import AccountingService
+from app.orders.daily_sales import DailySalesService
+from shared.models import Inventory, Order, OrderItem, OrderStatusEnum
+
+
+def test_rollup_follows_order_lifecycle_and_matches_rebuild(db_session, create_shop_with_stock,
+                                                            place, move, rollup_of, delivery_path):
+    """Placement, delivery and cancellation keep the rollup equal to a rebuild"""
+    shop, owner, (rice, soap) = create_shop_with_stock("01")
+
+    delivered = place(shop, owner, (rice, 2), (soap, 4))
+    cancelled = place(shop, owner, (rice, 5))
+    place(shop, owner, (soap, 1))
+    move(shop, owner, delivered, *delivery_path)
+    move(shop, owner, cancelled, OrderStatusEnum.CANCELLED)
+
+    today = datetime.utcnow().date()
+    rollup = rollup_of(shop.id)
+    # Rice: the cancelled order no longer counts as demand
+    assert rollup[(rice.id, today)] == (
+        2, Decimal("100.00"), 2, Decimal("100.00"), Decimal("80.00"),
+        Decimal("5.00"))
+    assert rollup[(soap.id, today)] == (
+        5, Decimal("125.00"), 4, Decimal("100.00"), Decimal("80.00"),
+        Decimal("18.00"))
+
+    DailySalesService.rebuild(db_session, shop.id)
+    db_session.commit()
+    assert rollup_of(shop.id) == rollup
+
+    report = AccountingService.get_profit_loss_report(
+        shop.id, today.strftime("%Y-%m"), db_session)
+    assert report.gross_sales == Decimal("223.00")
+    assert report.cost_of_goods_sold == Decimal("160.00")
+    assert report.total_tax_collected == Decimal("23.00")
+
+
+def test_rebuild_range_only_replaces_those_days(db_session, create_shop_with_stock, rollup_of):
+    """A ranged backfill picks up unrecorded orders and keeps older days"""
+    shop, owner, (rice, _) = create_shop_with_stock("02")
+    old_day, new_day = date(2024, 3, 1), date(2024, 3, 10)
+    for number, day in enumerate((old_day, new_day)):
+        # Written directly, without recording the transition
+        order = Order(shop_id=shop.id, order_number=f"RB-{number}",
+                      created_by=owner.id, subtotal=Decimal("50"),
+                      total_amount=Decimal("50"),
+                      order_date=datetime.combine(day, datetime.min.time())
+                      + timedelta(hours=18),
+                      order_status=OrderStatusEnum.PLACED)
+        db_session.add(order)
+        db_session.flush()
+        db_session.add(OrderItem(
+            order_id=order.id, product_id=rice.id, shop_id=shop.id,
+            product_name="Rice", quantity=3, unit_price=Decimal("50"),
+            line_total=Decimal("150")))
+    db_session.commit()
+
+    assert DailySalesService.rebuild(db_session, shop.id, start=new_day) == 1
+    db_session.commit()
+    assert set(rollup_of(shop.id)) == {(rice.id, new_day)}
+
+    DailySalesService.rebuild(db_session, shop.id)
+    db_session.commit()
+    rollup = rollup_of(shop.id)
+    assert set(rollup) == {(rice.id, old_day), (rice.id, new_day)}
+    assert rollup[(rice.id, old_day)][:2] == (3, Decimal("150.00"))
+
+
+def test_cogs_uses_cost_captured_at_sale(db_session, create_shop_with_stock, place, move,
+                                         rollup_of, delivery_path):
+    """A cost price change after the sale leaves that sale's COGS alone"""
+    shop, owner, (rice, _) = create_shop_with_stock("03")
+    before = place(shop, owner, (rice, 2))
+    assert before.items[0].unit_cost == Decimal("40.00")
+
+    db_session.query(Inventory).filter(
+        Inventory.product_id == rice.id).update({"cost_price": Decimal("45")})
+    db_session.commit()
+    after = place(shop, owner, (rice, 1))
+    move(shop, owner, before, *delivery_path)
+    move(shop, owner, after, *delivery_path)
+
+    # Lines from before cost capture fall back to the current cost price
+    legacy = Order(shop_id=shop.id, order_number="RC-legacy",
+                   created_by=owner.id, subtotal=Decimal("50"),
+                   total_amount=Decimal("50"),
+                   order_status=OrderStatusEnum.DELIVERED,
+                   delivery_date=datetime.utcnow())
+    db_session.add(legacy)
+    db_session.flush()
+    db_session.add(OrderItem(
+        order_id=legacy.id, product_id=rice.id, shop_id=shop.id,
+        product_name="Rice", quantity=1, unit_price=Decimal("50"),
+        line_total=Decimal("50")))
+    db_session.commit()
+
+    DailySalesService.rebuild(db_session, shop.id)
+    db_session.commit()
+    today = datetime.utcnow().date()
+    assert rollup_of(shop.id)[(rice.id, today)][4] == Decimal("170.00")
+    report = AccountingService.get_profit_loss_report(
+        shop.id, today.strftime("%Y-%m"), db_session)
+    assert report.cost_of_goods_sold == Decimal("170.00")
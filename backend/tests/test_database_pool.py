@@ -0,0 +1,65 @@
+"""Tests for connection pool configuration and telemetry"""
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from shared.config import get_settings
+from shared.database import TimedQueuePool, build_engine, pool_metrics
+import main_with_auth
+
+
+def test_file_database_uses_configured_timed_pool(tmp_path):
+    """Pool size, overflow and checkout counters come from the engine's pool"""
+    settings = get_settings()
+    engine = build_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    assert isinstance(engine.pool, TimedQueuePool)
+    assert engine.pool._pre_ping is settings.DB_POOL_PRE_PING
+
+    with engine.connect(), engine.connect():
+        metrics = pool_metrics(engine)
+        assert metrics["checked_out"] == 2
+        assert metrics["pool_size"] == settings.DB_POOL_SIZE
+        assert metrics["max_overflow"] == settings.DB_MAX_OVERFLOW
+
+    metrics = pool_metrics(engine)
+    assert metrics["checked_out"] == 0
+    assert metrics["checkouts"] == 2
+    assert metrics["timeouts"] == 0
+    assert metrics["wait_ms_max"] >= metrics["wait_ms_avg"] >= 0
+    engine.dispose()
+
+
+def test_in_memory_database_keeps_default_pool():
+    """In-memory SQLite is not pooled, so only basic metrics are reported"""
+    engine = build_engine("sqlite://")
+    metrics = pool_metrics(engine)
+    assert metrics["dialect"] == "sqlite"
+    assert "checked_out" not in metrics
+    engine.dispose()
+
+
+def test_only_pool_exhaustion_counts_as_timeout(tmp_path):
+    """Connect errors are not reported as pool timeouts"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'timeout.db'}", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    assert pool_metrics(engine)["timeouts"] == 1
+    engine.dispose()
+
+    def refuse():
+        raise sqlite3.OperationalError("connection refused")
+
+    broken = create_engine("sqlite://", poolclass=TimedQueuePool, creator=refuse)
+    with pytest.raises(OperationalError):
+        broken.connect()
+    assert pool_metrics(broken)["timeouts"] == 0
+
+
+def test_pool_metrics_endpoint_requires_admin():
+    """Pool internals are not served to anonymous callers"""
+    assert TestClient(main_with_auth.app).get("/api/health/db").status_code == 401
@@ -0,0 +1,99 @@
+"""Tests for per-rate, per-HSN GST lines and monthly return summaries"""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.accounting.gst import GSTReturnService
+from app.accounting.service import AccountingService
+from app.orders.schemas import OrderCreateRequest, OrderItemCreate, OrderStatusUpdate
+from app.orders.service import OrderService
+from shared.models import (
+    GSTMonthlySummary, GSTRecordLine, Inventory, OrderStatusEnum, Product,
+    RoleEnum, User
+)
+
+DELIVERY_PATH = (OrderStatusEnum.ACCEPTED, OrderStatusEnum.PACKED,
+                 OrderStatusEnum.OUT_FOR_DELIVERY, OrderStatusEnum.DELIVERED)
+
+
+@pytest.fixture
+def create_gst_shop(db_session, make_shop):
+    def create():
+        shop = make_shop("GST Shop", "gst@kirana.local")
+        owner = User(shop_id=shop.id, phone="9300000001", name="Owner",
+                     role=RoleEnum.OWNER)
+        db_session.add(owner)
+
+        products = []
+        for name, price, gst_rate, hsn_code in (("Rice", "50", "5", "1006"),
+                                                ("Soap", "25", "18", "3401"),
+                                                ("Salt", "20", "0", None)):
+            products.append(Product(
+                shop_id=shop.id, name=name, sku=f"GST{name.upper()}",
+                category="General", unit="piece", cost_price=Decimal(price) / 2,
+                mrp=Decimal(price), selling_price=Decimal(price),
+                gst_rate=Decimal(gst_rate), hsn_code=hsn_code))
+        db_session.add_all(products)
+        db_session.flush()
+        db_session.add_all([
+            Inventory(shop_id=shop.id, product_id=product.id, quantity=100,
+                      cost_price=product.cost_price, selling_price=product.selling_price)
+            for product in products
+        ])
+        db_session.commit()
+        return shop, owner, products
+    return create
+
+
+def deliver(db_session, shop, owner, *lines):
+    success, message, order = OrderService.create_order(
+        db_session, shop.id, owner, OrderCreateRequest(
+            customer_name="Customer", customer_phone="9876543210",
+            shipping_address="Address",
+            items=[OrderItemCreate(product_id=product.id, quantity=quantity,
+                                   unit_price=product.selling_price)
+                   for product, quantity in lines]))
+    assert success, message
+    for status in DELIVERY_PATH:
+        success, message, order = OrderService.update_order_status(
+            db_session, shop.id, order.id, OrderStatusUpdate(new_status=status), owner)
+        assert success, message
+    assert AccountingService.process_order_delivery(order, db_session, owner)
+    return order
+
+
+def test_summaries_follow_deliveries_and_match_backfill(db_session, create_gst_shop):
+    shop, owner, (rice, soap, salt) = create_gst_shop()
+    deliver(db_session, shop, owner, (rice, 2), (soap, 1), (salt, 3))
+    deliver(db_session, shop, owner, (rice, 1))
+    cancelled = deliver(db_session, shop, owner, (soap, 4))
+    assert AccountingService.reverse_accounting_entries(cancelled, db_session, owner)
+
+    period = datetime.utcnow().strftime("%Y-%m")
+    summary = GSTReturnService.get_return_summary(db_session, shop.id, period)
+
+    assert [(row.hsn_code, row.gst_rate, row.quantity, row.taxable_value,
+             row.cgst_amount, row.sgst_amount) for row in summary.gstr1.hsn] == [
+        ("", 0, 3, Decimal("60.00"), 0, 0),
+        ("1006", 5, 3, Decimal("150.00"), Decimal("3.75"), Decimal("3.75")),
+        ("3401", 18, 1, Decimal("25.00"), Decimal("2.25"), Decimal("2.25")),
+    ]
+    assert [(rate.gst_rate, rate.taxable_value, rate.total_tax)
+            for rate in summary.gstr1.b2cs] == [
+        (0, Decimal("60.00"), 0),
+        (5, Decimal("150.00"), Decimal("7.50")),
+        (18, Decimal("25.00"), Decimal("4.50")),
+    ]
+    gstr3b = summary.gstr3b
+    assert (gstr3b.taxable_value, gstr3b.cgst_amount, gstr3b.sgst_amount,
+            gstr3b.igst_amount, gstr3b.nil_rated_value) == (
+        Decimal("175.00"), Decimal("6.00"), Decimal("6.00"), 0, Decimal("60.00"))
+
+    # Records from before the lines existed: split and summed from scratch
+    db_session.query(GSTRecordLine).delete(synchronize_session=False)
+    db_session.query(GSTMonthlySummary).delete(synchronize_session=False)
+    assert GSTReturnService.backfill_lines(db_session, shop.id) == 2
+    GSTReturnService.rebuild(db_session, shop.id)
+    db_session.commit()
+    assert GSTReturnService.get_return_summary(db_session, shop.id, period) == summary
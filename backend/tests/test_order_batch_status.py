@@ -0,0 +1,121 @@
+"""Tests for batch order status updates"""
+from decimal import Decimal
+
+from app.accounting.balances import AccountBalanceService
+from app.orders.counters import OrderCounterService
+from app.orders.daily_sales import DailySalesService
+from app.orders.events import OrderEventService
+from app.orders.schemas import OrderStatusUpdate
+from app.orders.service import OrderService
+from shared.models import (
+    AccountBalance, CashBook, GSTRecord, Inventory, LedgerEntry,
+    OrderStatusEnum
+)
+
+TO_DISPATCH = (OrderStatusEnum.ACCEPTED, OrderStatusEnum.PACKED,
+               OrderStatusEnum.OUT_FOR_DELIVERY)
+
+
+def balances_of(db_session, shop_id):
+    return sorted(
+        (row.book, row.account, str(row.balance_date), row.debit_total,
+         row.credit_total)
+        for row in db_session.query(AccountBalance).filter(
+            AccountBalance.shop_id == shop_id)
+    )
+
+
+def stock_of(db_session, shop_id):
+    return {
+        row.product_id: row.quantity
+        for row in db_session.query(Inventory).filter(Inventory.shop_id == shop_id)
+    }
+
+
+def test_batch_delivery_and_cancellation(db_session, create_shop_with_stock, place, move,
+                                         rollup_of):
+    """Valid orders move together; invalid and unknown ids are reported"""
+    shop, owner, (rice, soap) = create_shop_with_stock("11")
+
+    dispatched = [place(shop, owner, (rice, 2), (soap, 1))
+                  for _ in range(3)]
+    for order in dispatched:
+        move(shop, owner, order, *TO_DISPATCH)
+    fresh = place(shop, owner, (rice, 1))
+    dispatched_ids = [order.id for order in dispatched]
+
+    success, message, results = OrderService.update_order_statuses(
+        db_session, shop.id, dispatched_ids + [fresh.id, 999999, dispatched_ids[0]],
+        OrderStatusUpdate(new_status=OrderStatusEnum.DELIVERED, notes="Route 4"),
+        owner)
+
+    assert success, message
+    assert [result["order_id"] for result in results] == (
+        dispatched_ids + [fresh.id, 999999])
+    assert [result["success"] for result in results] == [True, True, True, False, False]
+    assert results[3]["order_status"] == OrderStatusEnum.PLACED
+    assert "not found" in results[4]["message"]
+    assert OrderEventService.dispatch_pending(db_session) == 3
+
+    # One ledger entry, cash entry and GST record per delivered order
+    for model in (LedgerEntry, CashBook):
+        assert db_session.query(model).filter(
+            model.shop_id == shop.id).count() == 3
+    assert {record.order_id for record in db_session.query(GSTRecord).filter(
+        GSTRecord.shop_id == shop.id)} == set(dispatched_ids)
+    for order in dispatched:
+        db_session.refresh(order)
+        assert order.order_status == OrderStatusEnum.DELIVERED
+        assert order.delivery_date is not None
+        assert "Route 4" in order.notes
+
+    # Cancel the remaining order and one already delivered
+    before = stock_of(db_session, shop.id)
+    _, _, results = OrderService.update_order_statuses(
+        db_session, shop.id, [fresh.id, dispatched_ids[0]],
+        OrderStatusUpdate(new_status=OrderStatusEnum.CANCELLED), owner)
+    assert [result["success"] for result in results] == [True, False]
+    OrderEventService.dispatch_pending(db_session)
+    assert stock_of(db_session, shop.id) == {
+        rice.id: before[rice.id] + 1, soap.id: before[soap.id]}
+
+    # Running totals match a rebuild from scratch
+    balances = balances_of(db_session, shop.id)
+    counters = OrderCounterService.get_counters(db_session, shop.id)
+    rollup = rollup_of(shop.id)
+    assert counters[OrderStatusEnum.DELIVERED][0] == 3
+    assert counters[OrderStatusEnum.CANCELLED] == (1, Decimal("52.50"))
+
+    AccountBalanceService.rebuild(db_session, shop.id)
+    OrderCounterService.rebuild(db_session, shop.id)
+    DailySalesService.rebuild(db_session, shop.id)
+    db_session.commit()
+    assert balances_of(db_session, shop.id) == balances
+    assert OrderCounterService.get_counters(db_session, shop.id) == counters
+    assert rollup_of(shop.id) == rollup
+
+
+def test_batch_failure_applies_nothing(db_session, monkeypatch, create_shop_with_stock, place,
+                                       move):
+    """An error inside the transaction rolls the whole batch back"""
+    shop, owner, (rice, _) = create_shop_with_stock("12")
+    orders = [place(shop, owner, (rice, 1)) for _ in range(2)]
+    for order in orders:
+        move(shop, owner, order, *TO_DISPATCH)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("outbox unavailable")
+
+    monkeypatch.setattr(
+        "app.orders.events.OrderEventService.record", fail)
+    success, _, results = OrderService.update_order_statuses(
+        db_session, shop.id, [order.id for order in orders],
+        OrderStatusUpdate(new_status=OrderStatusEnum.DELIVERED), owner)
+
+    assert not success
+    assert all("outbox unavailable" in result["message"] for result in results)
+    for order in orders:
+        db_session.refresh(order)
+        assert order.order_status == OrderStatusEnum.OUT_FOR_DELIVERY
+    assert OrderCounterService.get_counters(db_session, shop.id)[
+        OrderStatusEnum.OUT_FOR_DELIVERY][0] == 2
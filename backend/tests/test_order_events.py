@@ -0,0 +1,169 @@
+"""Tests for the order event outbox and its dispatcher"""
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.accounting.service import AccountingService
+from app.orders import events as order_events
+from app.orders.events import OrderEventService
+from app.orders.schemas import OrderStatusUpdate
+from app.orders.service import OrderService
+from shared.config import get_settings
+from shared.models import (
+    AIInsight, CashBook, LedgerEntry, OrderEvent, OrderStatusEnum
+)
+
+settings = get_settings()
+
+
+def advance(db_session, shop, owner, order, *statuses):
+    """Change status without dispatching the events"""
+    for status in statuses:
+        success, message, _ = OrderService.update_order_status(
+            db_session, shop.id, order.id, OrderStatusUpdate(new_status=status), owner)
+        assert success, message
+
+
+def ledger_count(db_session, order_id):
+    return db_session.query(LedgerEntry).filter(
+        LedgerEntry.reference_id == order_id).count()
+
+
+def test_events_commit_with_the_order_and_apply_once(db_session, create_shop_with_stock, place,
+                                                     rollup_of, delivery_path):
+    """Side effects wait for the dispatcher and are applied exactly once"""
+    shop, owner, (rice, soap) = create_shop_with_stock("21")
+    OrderEventService.dispatch_pending(db_session)
+
+    first = place(shop, owner, (rice, 2))
+    second = place(shop, owner, (soap, 3))
+    advance(db_session, shop, owner, first, *delivery_path)
+    advance(db_session, shop, owner, second, *delivery_path)
+
+    # Recorded with the status change; nothing posted yet
+    assert db_session.query(OrderEvent).filter(
+        OrderEvent.shop_id == shop.id).count() == 8
+    assert ledger_count(db_session, first.id) == 0
+    assert OrderEventService.lag_metrics(db_session)["pending"] == 8
+
+    # Posted directly first: the dispatcher must not post it again
+    assert AccountingService.process_order_delivery(first, db_session, owner)
+
+    assert OrderEventService.dispatch_pending(db_session, batch_size=3) == 8
+    assert OrderEventService.dispatch_pending(db_session) == 0
+    assert ledger_count(db_session, first.id) == 1
+    assert ledger_count(db_session, second.id) == 1
+    assert db_session.query(CashBook).filter(
+        CashBook.order_id.in_([first.id, second.id])).count() == 2
+    today = datetime.utcnow().date()
+    assert rollup_of(shop.id)[(soap.id, today)][2] == 3
+
+    metrics = OrderEventService.lag_metrics(db_session)
+    assert metrics["pending"] == 0
+    assert metrics["oldest_pending_age_seconds"] == 0.0
+    assert metrics["last_dispatch_lag_seconds"] is not None
+
+
+def test_concurrent_dispatchers_apply_each_event_once(db_session, monkeypatch,
+                                                      create_shop_with_stock, place, rollup_of,
+                                                      delivery_path):
+    """A second dispatcher finds the events claimed, not stale and due"""
+    shop, owner, (rice, _) = create_shop_with_stock("25")
+    OrderEventService.dispatch_pending(db_session)
+    order = place(shop, owner, (rice, 2))
+    advance(db_session, shop, owner, order, *delivery_path)
+
+    apply_to_daily_sales = order_events.ORDER_EVENT_HANDLERS["daily_sales"]
+    claimed = threading.Event()
+
+    def slow(db, events, orders):
+        apply_to_daily_sales(db, events, orders)
+        claimed.set()
+        threading.Event().wait(0.3)  # the other dispatcher runs meanwhile
+
+    monkeypatch.setitem(order_events.ORDER_EVENT_HANDLERS, "daily_sales", slow)
+    processed = {}
+
+    def dispatcher(name):
+        db = Session(bind=db_session.get_bind())
+        try:
+            processed[name] = OrderEventService.dispatch_pending(db)
+        finally:
+            db.close()
+
+    first = threading.Thread(target=dispatcher, args=("first",))
+    first.start()
+    assert claimed.wait(5)
+    dispatcher("second")
+    first.join()
+
+    assert processed == {"first": 4, "second": 0}
+    assert ledger_count(db_session, order.id) == 1
+    today = datetime.utcnow().date()
+    assert rollup_of(shop.id)[(rice.id, today)][2] == 2
+
+
+def test_failing_event_is_retried_with_backoff(db_session, monkeypatch, create_shop_with_stock,
+                                               place, delivery_path):
+    """One bad event is isolated from its batch and rescheduled"""
+    shop, owner, (rice, _) = create_shop_with_stock("22")
+    OrderEventService.dispatch_pending(db_session)
+    good = place(shop, owner, (rice, 1))
+    bad = place(shop, owner, (rice, 2))
+    advance(db_session, shop, owner, good, *delivery_path)
+    advance(db_session, shop, owner, bad, *delivery_path)
+
+    post_to_accounting = order_events.ORDER_EVENT_HANDLERS["accounting"]
+
+    def flaky(db, events, orders):
+        if any(event.order_id == bad.id for event in events):
+            raise RuntimeError("ledger locked")
+        post_to_accounting(db, events, orders)
+
+    monkeypatch.setitem(order_events.ORDER_EVENT_HANDLERS, "accounting", flaky)
+    started = datetime.utcnow()
+    assert OrderEventService.dispatch_pending(db_session) == 4
+
+    failed = db_session.query(OrderEvent).filter(
+        OrderEvent.order_id == bad.id, OrderEvent.processed_at.is_(None)).all()
+    assert [event.attempts for event in failed] == [1] * 4
+    assert all(event.last_error == "ledger locked" for event in failed)
+    assert all(event.available_at >= started + timedelta(
+        seconds=settings.ORDER_EVENTS_RETRY_SECONDS) for event in failed)
+    assert ledger_count(db_session, good.id) == 1
+    assert ledger_count(db_session, bad.id) == 0
+
+    metrics = OrderEventService.lag_metrics(db_session)
+    assert metrics["pending"] == metrics["retrying"] == 4
+    assert metrics["oldest_pending_age_seconds"] > 0
+
+    # Not due yet; once due (and the ledger is back) it goes through
+    assert OrderEventService.dispatch_pending(db_session) == 0
+    monkeypatch.setitem(order_events.ORDER_EVENT_HANDLERS, "accounting", post_to_accounting)
+    for event in failed:
+        event.available_at = started
+    db_session.commit()
+    assert OrderEventService.dispatch_pending(db_session) == 4
+    assert ledger_count(db_session, bad.id) == 1
+
+
+def test_sales_mark_cached_insights_for_revalidation(db_session, create_shop_with_stock, place):
+    shop, owner, (rice, _) = create_shop_with_stock("23")
+    now = datetime.utcnow()
+    db_session.add(AIInsight(shop_id=shop.id, kind="forecast", params="",
+                             payload="{}", input_watermark="",
+                             computed_at=now, checked_at=now))
+    db_session.commit()
+
+    order = place(shop, owner, (rice, 1))
+    advance(db_session, shop, owner, order, OrderStatusEnum.ACCEPTED)
+    OrderEventService.dispatch_pending(db_session)
+    insight = db_session.query(AIInsight).filter(AIInsight.shop_id == shop.id).one()
+    assert insight.checked_at == now
+
+    advance(db_session, shop, owner, order, OrderStatusEnum.CANCELLED)
+    OrderEventService.dispatch_pending(db_session)
+    db_session.refresh(insight)
+    age = (datetime.utcnow() - insight.checked_at).total_seconds()
+    assert settings.AI_INSIGHTS_MAX_AGE_SECONDS < age < settings.AI_INSIGHTS_MAX_STALE_SECONDS
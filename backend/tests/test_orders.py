@@ -0,0 +1,148 @@
+"""Tests for order creation"""
+from decimal import Decimal
+
+from shared.models import (
+    Inventory, OrderItem, ShopOrderCounter, OrderStatusEnum
+)
+from app.orders.counters import OrderCounterService
+from app.orders.schemas import (
+    OrderCreateRequest, OrderItemCreate, OrderStatusUpdate
+)
+from app.orders import service as order_service
+from app.orders.service import OrderService
+
+
+def order_request(*lines):
+    return OrderCreateRequest(
+        customer_name="Customer",
+        customer_phone="9876543210",
+        shipping_address="Address",
+        items=[
+            OrderItemCreate(product_id=product.id, quantity=quantity,
+                            unit_price=product.selling_price)
+            for product, quantity in lines
+        ]
+    )
+
+
+def stock_of(db_session, product):
+    return db_session.query(Inventory).filter(
+        Inventory.product_id == product.id).one().quantity
+
+
+def test_create_order_computes_totals_and_deducts_stock(db_session, create_shop_with_stock):
+    """Totals, GST and stock deduction for a multi-line basket"""
+    shop, owner, (rice, soap) = create_shop_with_stock("41", stock=10)
+
+    success, message, order = OrderService.create_order(
+        db_session, shop.id, owner, order_request((rice, 2), (soap, 4))
+    )
+
+    assert success, message
+    assert order.subtotal == Decimal("200.00")
+    # 5% of 100 + 18% of 100
+    assert order.tax_amount == Decimal("23.00")
+    assert order.total_amount == Decimal("223.00")
+    assert len(order.items) == 2
+    assert {item.product_name for item in order.items} == {"Rice", "Soap"}
+    assert stock_of(db_session, rice) == 8
+    assert stock_of(db_session, soap) == 6
+
+
+def test_create_order_insufficient_stock_leaves_inventory(db_session, create_shop_with_stock):
+    """A failing line rejects the whole basket without deducting anything"""
+    shop, owner, (rice, soap) = create_shop_with_stock("42", stock=3)
+
+    success, message, order = OrderService.create_order(
+        db_session, shop.id, owner, order_request((rice, 1), (soap, 5))
+    )
+
+    assert not success
+    assert order is None
+    assert "Insufficient stock for Soap" in message
+    assert stock_of(db_session, rice) == 3
+    assert stock_of(db_session, soap) == 3
+
+
+def test_create_order_repeated_lines_share_stock(db_session, create_shop_with_stock):
+    """Repeated lines for one product are validated against their sum"""
+    shop, owner, (rice, _) = create_shop_with_stock("43", stock=5)
+
+    success, message, _ = OrderService.create_order(
+        db_session, shop.id, owner, order_request((rice, 3), (rice, 3))
+    )
+
+    assert not success
+    assert "Requested: 6" in message
+    assert db_session.query(OrderItem).filter(
+        OrderItem.shop_id == shop.id).count() == 0
+
+
+def place_orders(db_session, shop, owner, product, count):
+    orders = []
+    for _ in range(count):
+        success, message, order = OrderService.create_order(
+            db_session, shop.id, owner, order_request((product, 1)))
+        assert success, message
+        orders.append(order)
+    return orders
+
+
+def move_order(db_session, shop, owner, order, *statuses):
+    for new_status in statuses:
+        success, message, _ = OrderService.update_order_status(
+            db_session, shop.id, order.id,
+            OrderStatusUpdate(new_status=new_status), owner)
+        assert success, message
+
+
+def test_order_dashboard_counts_and_revenue(db_session, monkeypatch, create_shop_with_stock):
+    """Aggregate and counter-backed dashboards agree after transitions"""
+    shop, owner, (rice, _) = create_shop_with_stock("44", stock=10)
+    first, second, third = place_orders(db_session, shop, owner, rice, 3)
+
+    move_order(db_session, shop, owner, first,
+               OrderStatusEnum.ACCEPTED, OrderStatusEnum.PACKED,
+               OrderStatusEnum.OUT_FOR_DELIVERY, OrderStatusEnum.DELIVERED)
+    move_order(db_session, shop, owner, second, OrderStatusEnum.CANCELLED)
+
+    expected = {
+        "total_orders": 3,
+        "placed_orders": 1,
+        "accepted_orders": 0,
+        "packed_orders": 0,
+        "out_for_delivery_orders": 0,
+        "delivered_orders": 1,
+        "cancelled_orders": 1,
+        # 50 + 5% GST
+        "total_revenue": 52.5,
+        "average_order_value": 17.5,
+    }
+
+    dashboard = OrderService.get_order_dashboard(db_session, shop.id)
+    assert {k: dashboard[k] for k in expected} == expected
+
+    monkeypatch.setattr(
+        order_service.settings, "ORDER_DASHBOARD_COUNTERS_ENABLED", True)
+    dashboard = OrderService.get_order_dashboard(db_session, shop.id)
+    assert {k: dashboard[k] for k in expected} == expected
+    assert db_session.query(ShopOrderCounter).filter(
+        ShopOrderCounter.shop_id == shop.id).count() == len(OrderStatusEnum)
+
+
+def test_order_counters_seed_from_existing_history(db_session, create_shop_with_stock):
+    """A shop without counters is seeded from its orders on first transition"""
+    shop, owner, (rice, _) = create_shop_with_stock("45", stock=10)
+    first, _ = place_orders(db_session, shop, owner, rice, 2)
+
+    # Simulate orders written before counters existed
+    db_session.query(ShopOrderCounter).filter(
+        ShopOrderCounter.shop_id == shop.id).delete()
+    db_session.commit()
+    assert OrderCounterService.get_counters(db_session, shop.id) is None
+
+    move_order(db_session, shop, owner, first, OrderStatusEnum.ACCEPTED)
+
+    assert OrderCounterService.get_counters(db_session, shop.id) == \
+        {**{status: (0, Decimal("0")) for status in OrderStatusEnum},
+         **OrderCounterService.aggregate_by_status(db_session, shop.id)}
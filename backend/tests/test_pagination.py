@@ -0,0 +1,147 @@
+"""Tests for keyset (cursor) pagination"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from accounting_service.routes import router as legacy_accounting_router
+from app.accounting.service import AccountingService
+from app.orders.service import OrderService
+from shared.database import get_db
+from shared.models import CashBook, LedgerEntry, Order, RoleEnum, User
+from shared.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from shared.security import create_access_token
+
+
+@pytest.fixture
+def create_shop_and_owner(db_session, make_shop):
+    def create(suffix):
+        shop = make_shop("Paging Shop", f"paging{suffix}@kirana.local")
+        owner = User(shop_id=shop.id, phone=f"97{suffix:0>8}",
+                     name="Paging Owner", role=RoleEnum.OWNER)
+        db_session.add(owner)
+        db_session.commit()
+        return shop, owner
+    return create
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    values = [datetime(2024, 5, 1, 10, 30, 15, 250), Decimal("12.50"), 42, "Dal"]
+    assert decode_cursor(encode_cursor(values), 4) == values
+
+    for bad in ("not-a-cursor", encode_cursor([1, 2])):
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(bad, 3)
+        assert exc.value.status_code == 400
+
+
+def test_order_cursor_pages_match_offset_pages(db_session, create_shop_and_owner):
+    """Walking cursors visits every order once, newest first, ties by id"""
+    shop, owner = create_shop_and_owner("1")
+    base = datetime(2024, 1, 1, 9, 0)
+    for i in range(11):
+        db_session.add(Order(
+            shop_id=shop.id, order_number=f"PG-{i}", created_by=owner.id,
+            # Pairs of orders share a timestamp
+            order_date=base + timedelta(minutes=i // 2),
+            subtotal=Decimal("10"), total_amount=Decimal("10")))
+    db_session.commit()
+
+    expected, total, _ = OrderService.list_orders(db_session, shop.id, limit=50)
+    assert total == 11
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        orders, total, cursor = OrderService.list_orders(
+            db_session, shop.id, limit=4, cursor=cursor, with_total=False)
+        assert total is None
+        seen.extend(orders)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert [o.id for o in seen] == [o.id for o in expected]
+    assert seen[0].order_date > seen[-1].order_date
+
+    # skip/limit still works for old clients
+    legacy, _, _ = OrderService.list_orders(db_session, shop.id, skip=4, limit=4)
+    assert [o.id for o in legacy] == [o.id for o in expected[4:8]]
+
+
+def test_cash_book_pages_keep_period_totals(db_session, create_shop_and_owner):
+    """Paged cash book transactions concatenate to the unpaged list"""
+    shop, owner = create_shop_and_owner("2")
+    db_session.add(CashBook(shop_id=shop.id, amount=Decimal("500"), entry_type="IN",
+                            created_by=owner.id, created_at=datetime(2024, 2, 28)))
+    for i in range(7):
+        db_session.add(CashBook(
+            shop_id=shop.id, amount=Decimal("100"),
+            entry_type="OUT" if i % 3 == 0 else "IN",
+            created_by=owner.id, created_at=datetime(2024, 3, 1 + i)))
+    db_session.commit()
+
+    full = AccountingService.get_cash_book(
+        shop.id, "2024-03-01", "2024-03-31", db_session)
+    assert (full.opening_balance, full.cash_in, full.cash_out,
+            full.closing_balance) == (Decimal("500"), Decimal("400"),
+                                      Decimal("300"), Decimal("600"))
+    assert full.next_cursor is None
+
+    paged, cursor = [], None
+    while True:
+        page = AccountingService.get_cash_book(
+            shop.id, "2024-03-01", "2024-03-31", db_session,
+            limit=3, cursor=cursor)
+        assert page.closing_balance == full.closing_balance
+        paged.extend(page.transactions)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [t.id for t in paged] == [t.id for t in full.transactions]
+
+
+def test_ledger_routes_page_with_cursor_header(db_session, create_shop_and_owner):
+    """The mounted ledger and sales-ledger listings page past the first limit"""
+    shop, owner = create_shop_and_owner("3")
+    base = datetime(2024, 3, 1, 9, 0)
+    for i in range(7):
+        db_session.add(LedgerEntry(
+            shop_id=shop.id, entry_date=base + timedelta(minutes=i // 2),
+            description=f"Entry {i}", debit_account="1001", debit_amount=Decimal("5"),
+            credit_account="4001", credit_amount=Decimal("5"), created_by=owner.id))
+        db_session.add(Order(
+            shop_id=shop.id, order_number=f"SL-{i}", created_by=owner.id,
+            order_date=base + timedelta(minutes=i // 2),
+            subtotal=Decimal("10"), total_amount=Decimal("10")))
+    db_session.commit()
+
+    app = FastAPI()
+    app.include_router(legacy_accounting_router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    client = TestClient(app)
+    token = create_access_token(owner.id, shop.id, "owner", owner.phone)
+
+    def walk(path, key):
+        seen, cursor = [], None
+        while True:
+            params = {"shop_id": shop.id, "token": token, "limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get(path, params=params)
+            assert response.status_code == 200
+            seen.extend(row[key] for row in response.json())
+            cursor = response.headers.get(NEXT_CURSOR_HEADER)
+            if cursor is None:
+                return seen
+
+    ledger = walk("/api/v1/accounting/ledger", "id")
+    assert sorted(ledger) == sorted(
+        e.id for e in db_session.query(LedgerEntry).filter(LedgerEntry.shop_id == shop.id))
+    assert len(set(ledger)) == 7
+
+    sales = walk("/api/v1/accounting/sales-ledger", "order_number")
+    assert sorted(sales) == [f"SL-{i}" for i in range(7)]
+    assert sales[0] == "SL-6"
@@ -0,0 +1,89 @@
+"""Tests for the async password hashing pool"""
+import asyncio
+import inspect
+
+import anyio
+from passlib.context import CryptContext
+
+from app.auth import router as auth_router
+from app.auth.schemas import UserCreate
+from app.auth.service import AuthService
+from shared.password_hasher import HashingBusyError, PasswordHasher
+
+
+def pbkdf2_context(rounds):
+    # hashlib releases the GIL like the bcrypt/argon2 backends do
+    return CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__rounds=rounds)
+
+
+def test_hashing_does_not_block_event_loop():
+    """Other coroutines keep running while a hash is computed"""
+    hasher = PasswordHasher(pbkdf2_context(300000), max_workers=1, max_queue=0)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        hashed = await hasher.hash("secret")
+        task.cancel()
+        return hashed, ticks
+
+    hashed, ticks = asyncio.run(scenario())
+    hasher.shutdown()
+    assert ticks > 5
+    assert pbkdf2_context(300000).verify("secret", hashed)
+
+
+def test_saturated_pool_rejects_with_429():
+    """Work beyond workers + queue is refused immediately"""
+    hasher = PasswordHasher(pbkdf2_context(300000), max_workers=1, max_queue=1)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(hasher.hash("secret") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    hasher.shutdown()
+    busy = [r for r in results if isinstance(r, HashingBusyError)]
+    assert len(busy) == 1
+    assert busy[0].status_code == 429
+    assert hasher.pending == 0
+
+
+def test_verify_and_update_rehashes_on_cost_change():
+    """A hash made with an old cost is replaced after a successful verify"""
+    old_hash = pbkdf2_context(5000).hash("secret")
+    hasher = PasswordHasher(pbkdf2_context(6000))
+
+    valid, new_hash = asyncio.run(hasher.verify_and_update("secret", old_hash))
+    assert valid
+    assert new_hash.startswith("$pbkdf2-sha256$6000$")
+
+    assert asyncio.run(hasher.verify_and_update("wrong", old_hash)) == (False, None)
+    assert asyncio.run(hasher.verify_and_update("secret", new_hash)) == (True, None)
+    hasher.shutdown()
+
+
+def test_auth_service_runs_in_threadpool_and_hashes_on_pool(db_session, monkeypatch):
+    """Register/login stay sync (DB on a worker thread), hashing uses the pool"""
+    hasher = PasswordHasher(pbkdf2_context(5000), max_workers=1)
+    monkeypatch.setattr("app.auth.service.password_hasher", hasher)
+    assert not inspect.iscoroutinefunction(auth_router.register)
+    assert not inspect.iscoroutinefunction(auth_router.login)
+
+    user_create = UserCreate(name="Pool User", email="pool@kirana.in",
+                             phone="9123456780", password="secure-pass", role="customer")
+    user = anyio.run(anyio.to_thread.run_sync, AuthService.create_user,
+                     db_session, user_create)
+    assert user.password_hash != "secure-pass"
+
+    logged_in = anyio.run(anyio.to_thread.run_sync, AuthService.authenticate_user,
+                          db_session, "pool@kirana.in", "secure-pass")
+    assert logged_in.id == user.id
+    hasher.shutdown()
@@ -0,0 +1,88 @@
+"""Tests for the authenticated principal cache"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from shared.models import User, RoleEnum
+from app.auth.principal_cache import PrincipalCache, load_principal, principal_cache
+
+
+@pytest.fixture
+def create_user(db_session, make_shop):
+    def create(suffix):
+        shop = make_shop("Auth Shop", f"auth{suffix}@kirana.local")
+        user = User(shop_id=shop.id, phone=f"95000000{suffix}",
+                    name="Staff", role=RoleEnum.STAFF)
+        db_session.add(user)
+        db_session.commit()
+        return user.id
+    return create
+
+
+def count_statements(db_engine, fn):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", on_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(db_engine, "before_cursor_execute", on_execute)
+    return result, len(statements)
+
+
+def test_cached_principal_skips_users_lookup(db_engine, create_user):
+    """Second resolution of the same token is served without a query"""
+    user_id = create_user("01")
+    Session = sessionmaker(bind=db_engine)
+    principal_cache.clear()
+
+    first, queries = count_statements(
+        db_engine, lambda: load_principal(Session(), user_id, 0))
+    assert first.id == user_id
+    assert queries == 1
+
+    session = Session()
+    second, queries = count_statements(
+        db_engine, lambda: load_principal(session, user_id, 0))
+    assert queries == 0
+    assert second in session
+    assert (second.role, second.shop_id) == (RoleEnum.STAFF, first.shop_id)
+
+
+def test_role_change_and_deactivation_revoke_tokens(db_session, create_user):
+    """Changing access bumps the token version and drops cached entries"""
+    user_id = create_user("02")
+    principal_cache.clear()
+    user = load_principal(db_session, user_id, 0)
+
+    user.role = RoleEnum.OWNER
+    db_session.commit()
+
+    assert user.token_version == 1
+    assert principal_cache.get(user_id, 0) is None
+    assert load_principal(db_session, user_id, 0) is None
+    assert load_principal(db_session, user_id, 1).role == RoleEnum.OWNER
+
+    user.is_active = False
+    db_session.commit()
+    assert load_principal(db_session, user_id, 2) is None
+
+
+def test_principal_cache_ttl_and_lru(monkeypatch):
+    """Entries expire after the TTL and the least recently used is evicted"""
+    clock = [1000.0]
+    monkeypatch.setattr("app.auth.principal_cache.time.monotonic",
+                        lambda: clock[0])
+    cache = PrincipalCache(max_size=2, ttl_seconds=30)
+
+    cache.put(1, 0, {"id": 1})
+    cache.put(2, 0, {"id": 2})
+    assert cache.get(1, 0) == {"id": 1}
+    cache.put(3, 0, {"id": 3})
+    assert cache.get(2, 0) is None
+
+    clock[0] += 31
+    assert cache.get(1, 0) is None
@@ -0,0 +1,141 @@
+"""Tests for bulk catalogue import/export"""
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.security import get_current_user
+from product_service.bulk import ProductBulkService
+from product_service.routes_rbac import router
+from shared.database import get_db
+from shared.models import Product, RoleEnum, User
+
+
+@pytest.fixture
+def create_shop(db_session, make_shop):
+    def create(suffix):
+        shop = make_shop("Bulk Shop", f"bulk{suffix}@kirana.local")
+        db_session.commit()
+        return shop
+    return create
+
+
+def import_text(db_session, shop_id, text, fmt="csv", chunk_size=1000):
+    records = ProductBulkService.read_records(io.BytesIO(text.encode()), fmt)
+    return ProductBulkService.import_records(
+        db_session, shop_id, records, chunk_size=chunk_size)
+
+
+def test_import_upserts_and_reports_bad_rows(db_session, create_shop):
+    """Existing SKUs are updated in place; bad rows are skipped, not fatal"""
+    shop = create_shop("1")
+    db_session.add(Product(
+        shop_id=shop.id, name="Old Rice", sku="RICE", category="Grains",
+        unit="kg", cost_price=Decimal("40"), mrp=Decimal("60"),
+        selling_price=Decimal("50"), current_stock=7, hsn_code="1006"))
+    db_session.commit()
+
+    report = import_text(db_session, shop.id, "\n".join([
+        "sku,name,category,unit,cost_price,selling_price,mrp,current_stock",
+        "RICE,Basmati Rice,Grains,kg,45,55,65,",
+        "DAL,Toor Dal,Grains,kg,80,100,110,20",
+        "OIL,Sunflower Oil,Oils,litre,abc,150,160,5",
+        "SALT,Salt,Spices,kg,10,15,20,-1",
+        "TEA,Tea,Beverages,piece,20,25,30,5",
+        "TEA,Tea Gold,Beverages,piece,22,28,32,8",
+    ]), chunk_size=2)
+
+    assert (report["received"], report["created"], report["updated"],
+            report["failed"]) == (6, 2, 1, 3)
+    assert [(error["row"], error["sku"]) for error in report["errors"]] == [
+        (3, "OIL"), (4, "SALT"), (5, "TEA")]
+    assert "cost_price" in report["errors"][0]["error"]
+
+    products = {p.sku: p for p in db_session.query(Product).filter(
+        Product.shop_id == shop.id)}
+    assert set(products) == {"RICE", "DAL", "TEA"}
+    rice = products["RICE"]
+    assert (rice.name, rice.selling_price) == ("Basmati Rice", Decimal("55"))
+    # Columns left empty keep their stored values
+    assert (rice.current_stock, rice.hsn_code) == (7, "1006")
+    assert products["TEA"].name == "Tea Gold"
+
+
+def test_reimport_reactivates_soft_deleted_sku(db_session, create_shop):
+    """A deleted SKU in the import file comes back in listings and exports"""
+    shop = create_shop("5")
+    db_session.add(Product(
+        shop_id=shop.id, name="Jaggery", sku="GUR", category="Sweeteners",
+        unit="kg", cost_price=Decimal("50"), mrp=Decimal("70"),
+        selling_price=Decimal("60"), is_active=False))
+    db_session.commit()
+
+    report = import_text(db_session, shop.id, "\n".join([
+        "sku,name,category,unit,cost_price,selling_price,mrp",
+        "GUR,Jaggery,Sweeteners,kg,52,62,72",
+    ]))
+    assert report["updated"] == 1
+    db_session.expire_all()
+    assert db_session.query(Product).filter(
+        Product.shop_id == shop.id, Product.sku == "GUR").one().is_active is True
+    assert "GUR" in "".join(ProductBulkService.export_rows(db_session, shop.id, "csv"))
+
+
+def test_export_round_trips_into_another_shop(db_session, create_shop):
+    """A JSONL export imports unchanged into another shop"""
+    source = create_shop("2")
+    target = create_shop("3")
+    import_text(db_session, source.id, "\n".join(json.dumps({
+        "sku": f"SKU{i}", "name": f"Item {i}", "category": "General",
+        "unit": "piece", "cost_price": "8.50", "selling_price": "10",
+        "mrp": "12", "gst_rate": "5", "current_stock": i,
+    }) for i in range(5)), fmt="jsonl")
+
+    exported = "".join(ProductBulkService.export_rows(
+        db_session, source.id, "jsonl", batch_size=2))
+    assert len(exported.splitlines()) == 5
+
+    report = import_text(db_session, target.id, exported, fmt="jsonl")
+    assert (report["created"], report["failed"]) == (5, 0)
+    copied = db_session.query(Product).filter(
+        Product.shop_id == target.id, Product.sku == "SKU3").one()
+    assert (copied.cost_price, copied.gst_rate, copied.current_stock) == (
+        Decimal("8.50"), Decimal("5"), 3)
+
+
+def test_import_and_export_endpoints(db_session, create_shop):
+    """Owners import a file upload and stream the catalogue back as CSV"""
+    shop = create_shop("4")
+    owner = User(shop_id=shop.id, phone="9811111111",
+                 name="Bulk Owner", role=RoleEnum.OWNER)
+    db_session.add(owner)
+    db_session.commit()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: owner
+    client = TestClient(app)
+
+    upload = ("sku,name,category,unit,cost_price,selling_price,mrp\n"
+              "A1,Soap,Personal Care,piece,20,25,30\n"
+              "A2,,Personal Care,piece,20,25,30\n")
+    response = client.post("/api/v1/products/import",
+                           files={"file": ("catalogue.csv", upload, "text/csv")})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (1, 1)
+    assert body["errors"][0]["row"] == 2
+
+    response = client.get("/api/v1/products/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0].startswith("name,sku,category")
+    assert lines[1].startswith("Soap,A1,Personal Care")
+
+    response = client.get(f"/api/v1/products/export?shop_id={shop.id + 100}")
+    assert response.status_code == 403
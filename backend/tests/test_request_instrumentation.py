@@ -0,0 +1,136 @@
+"""Tests for per-request SQL instrumentation and route query budgets"""
+import json
+import logging
+from datetime import datetime
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.accounting.router import router as accounting_router
+from app.auth.security import get_current_user
+from app.orders.router import router as orders_router
+from shared.database import get_db, get_read_db
+from shared.instrumentation import (
+    QueryBudgetExceeded, RequestInstrumentationMiddleware, instrument_engine,
+    query_budget, track_queries
+)
+from shared.logger import json_handler, request_logger
+
+
+class Captured(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def request_log():
+    handler = Captured()
+    request_logger.addHandler(handler)
+    yield handler.records
+    request_logger.removeHandler(handler)
+
+
+def build_app(db_session, owner, *routers, budget_mode="raise"):
+    """App with the middleware and a fresh session per request, like get_db"""
+    instrument_engine(db_session.get_bind())
+    Session = sessionmaker(bind=db_session.get_bind())
+
+    def fresh_session():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router)
+    app.add_middleware(RequestInstrumentationMiddleware, budget_mode=budget_mode)
+    app.dependency_overrides[get_db] = fresh_session
+    app.dependency_overrides[get_read_db] = fresh_session
+    if owner is not None:
+        db_session.refresh(owner)
+        db_session.expunge(owner)
+        app.dependency_overrides[get_current_user] = lambda: owner
+    return app
+
+
+def test_timing_header_and_json_log(db_session, request_log):
+    app = build_app(db_session, None, budget_mode="log")
+
+    @app.get("/probe/{n}")
+    @query_budget(3)
+    def probe(n: int, db=Depends(get_db)):
+        for i in range(n):
+            db.execute(text(f"SELECT {i}"))
+        return {}
+
+    client = TestClient(app)
+    response = client.get("/probe/2")
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert 'desc="2 queries", app;dur=' in response.headers["Server-Timing"]
+
+    record = request_log[-1]
+    assert (record.route, record.path, record.status, record.db_queries,
+            record.query_budget) == ("/probe/{n}", "/probe/2", 200, 2, 3)
+    line = json.loads(json_handler.formatter.format(record))
+    assert line["message"] == "request" and line["db_queries"] == 2
+
+    # Over budget: logged as a warning in 'log' mode, the response is kept
+    assert client.get("/probe/5").status_code == 200
+    assert request_log[-1].levelno == logging.WARNING
+    assert "issued 5 SQL statements (budget 3)" in request_log[-1].getMessage()
+
+    # Outside a request nothing is attributed; track_queries scopes a block
+    with track_queries() as stats:
+        db_session.execute(text("SELECT 1"))
+    assert stats.queries == 1
+
+
+def test_budget_overrun_fails_in_raise_mode(db_session):
+    app = build_app(db_session, None)
+
+    @app.get("/chatty")
+    @query_budget(1)
+    def chatty(db=Depends(get_db)):
+        for _ in range(3):
+            db.execute(text("SELECT 1"))
+        return {}
+
+    with pytest.raises(QueryBudgetExceeded, match="GET /chatty issued 3"):
+        TestClient(app).get("/chatty")
+
+
+def test_order_and_accounting_routes_stay_within_budgets(db_session, create_shop_with_stock, place,
+                                                         move, delivery_path):
+    """Query counts do not grow with the number of orders"""
+    shop, owner, (rice, soap) = create_shop_with_stock("31")
+    orders = [place(shop, owner, (rice, 1), (soap, 2)) for _ in range(25)]
+    for order in orders[:5]:
+        move(shop, owner, order, *delivery_path)
+    client = TestClient(build_app(db_session, owner, orders_router, accounting_router))
+
+    base = f"/api/v1/orders/shops/{shop.id}"
+    assert len(client.get(f"{base}?limit=100").json()["orders"]) == 25
+    assert client.get(f"{base}/{orders[5].id}").status_code == 200
+    assert client.patch(f"{base}/{orders[5].id}/status",
+                        json={"new_status": "accepted"}).status_code == 200
+    response = client.post(f"{base}/status-batch", json={
+        "order_ids": [order.id for order in orders[6:]], "new_status": "cancelled"})
+    assert response.json()["updated"] == 19
+
+    today = datetime.utcnow().date()
+    period = today.strftime("%Y-%m")
+    for url in (f"/daily-sales/{shop.id}?report_date={today}",
+                f"/profit-loss/{shop.id}?period={period}",
+                f"/gst-returns/{shop.id}?period={period}",
+                f"/cash-book/{shop.id}?from_date={today}&to_date={today}",
+                f"/export/{shop.id}/ledger?from_date={today}&to_date={today}"):
+        assert client.get(f"/api/v1/accounting{url}").status_code == 200
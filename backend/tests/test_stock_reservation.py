@@ -0,0 +1,172 @@
+"""Tests for race-free stock reservation"""
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from shared.models import (
+    User, Product, Inventory, Order, StockReservation, RoleEnum
+)
+from app.inventory.reservations import StockReservationService
+from app.orders.schemas import OrderCreateRequest, OrderItemCreate
+from app.orders.service import OrderService
+
+
+@pytest.fixture
+def create_stocked_product(db_session, make_shop):
+    """Create a shop, owner and one product with `stock` units"""
+    def create(suffix, stock):
+        shop = make_shop("Reservation Shop", f"reserve{suffix}@kirana.local")
+
+        owner = User(shop_id=shop.id, phone=f"96000000{suffix}",
+                     name="Owner", role=RoleEnum.OWNER)
+        product = Product(shop_id=shop.id, name="Atta", sku=f"ATTA{suffix}",
+                          category="Grains", unit="kg", cost_price=Decimal("30"),
+                          mrp=Decimal("45"), selling_price=Decimal("40"))
+        db_session.add_all([owner, product])
+        db_session.flush()
+
+        inventory = Inventory(shop_id=shop.id, product_id=product.id,
+                              quantity=stock, cost_price=Decimal("30"),
+                              selling_price=Decimal("40"))
+        db_session.add(inventory)
+        db_session.commit()
+        return shop.id, owner.id, product.id, inventory.id
+    return create
+
+
+def checkout_request(product_id, quantity=1, reservation_key=None):
+    return OrderCreateRequest(
+        customer_name="Customer",
+        customer_phone="9876543210",
+        shipping_address="Address",
+        reservation_key=reservation_key,
+        items=[OrderItemCreate(product_id=product_id, quantity=quantity,
+                               unit_price=Decimal("40"))]
+    )
+
+
+def test_concurrent_checkouts_never_oversell(db_engine, db_session, create_stocked_product):
+    """Many threads racing for the last units sell exactly the stock"""
+    stock, buyers = 25, 60
+    shop_id, owner_id, product_id, inventory_id = create_stocked_product(
+        "01", stock)
+    Session = sessionmaker(bind=db_engine)
+    results = []
+    start = threading.Barrier(buyers)
+
+    def buy():
+        start.wait()
+        session = Session()
+        try:
+            owner = session.get(User, owner_id)
+            success, message, _ = OrderService.create_order(
+                session, shop_id, owner, checkout_request(product_id))
+            results.append((success, message))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=buy) for _ in range(buyers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db_session.expire_all()
+    sold = sum(1 for success, _ in results if success)
+    remaining = db_session.get(Inventory, inventory_id).quantity
+
+    assert len(results) == buyers
+    assert sold == stock
+    assert remaining == 0
+    assert db_session.query(Order).filter(
+        Order.shop_id == shop_id).count() == stock
+    assert all("stock" in message.lower()
+               for success, message in results if not success)
+
+
+def test_cart_hold_is_consumed_by_order_and_expires(db_session, create_stocked_product):
+    """Held units are reserved, used by checkout, and returned after TTL"""
+    shop_id, owner_id, product_id, inventory_id = create_stocked_product(
+        "02", 5)
+
+    ok, _ = StockReservationService.hold_stock(
+        db_session, shop_id, "cart-a", [(product_id, 3)])
+    assert ok
+    assert db_session.get(Inventory, inventory_id).quantity == 2
+
+    # Another cart cannot take the held units
+    ok, message = StockReservationService.hold_stock(
+        db_session, shop_id, "cart-b", [(product_id, 3)])
+    assert not ok
+    assert "Insufficient" in message
+
+    # Checkout of one unit uses the hold; the surplus two go back to stock
+    owner = db_session.get(User, owner_id)
+    success, message, _ = OrderService.create_order(
+        db_session, shop_id, owner, checkout_request(product_id, reservation_key="cart-a"))
+    assert success, message
+    db_session.expire_all()
+    assert db_session.get(Inventory, inventory_id).quantity == 4
+
+    # An abandoned cart is released once its TTL passes
+    ok, _ = StockReservationService.hold_stock(
+        db_session, shop_id, "cart-c", [(product_id, 4)])
+    assert ok
+    released = StockReservationService.expire_holds(
+        db_session, now=datetime.utcnow() + timedelta(hours=1))
+    db_session.expire_all()
+    assert released == 1
+    assert db_session.get(Inventory, inventory_id).quantity == 4
+    assert db_session.query(StockReservation).filter(
+        StockReservation.hold_key == "cart-c").one().status == "released"
+
+
+def test_checkout_with_expired_hold_sees_returned_stock(db_session, create_stocked_product):
+    """Stock released from an expired hold at checkout counts as available"""
+    shop_id, owner_id, product_id, inventory_id = create_stocked_product(
+        "03", 5)
+
+    ok, _ = StockReservationService.hold_stock(
+        db_session, shop_id, "cart-d", [(product_id, 3)])
+    assert ok
+    # Loaded into the session while the hold is live: 2 units on the shelf
+    assert db_session.get(Inventory, inventory_id).quantity == 2
+
+    hold = db_session.query(StockReservation).filter(
+        StockReservation.hold_key == "cart-d").one()
+    hold.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db_session.commit()
+
+    owner = db_session.get(User, owner_id)
+    success, message, _ = OrderService.create_order(
+        db_session, shop_id, owner,
+        checkout_request(product_id, quantity=4, reservation_key="cart-d"))
+
+    assert success, message
+    db_session.expire_all()
+    assert db_session.get(Inventory, inventory_id).quantity == 1
+    assert db_session.get(StockReservation, hold.id).status == "released"
+
+
+def test_storefront_stock_decrement_is_conditional(db_session, create_stocked_product):
+    """products.current_stock is never taken below zero, and holds are capped"""
+    shop_id, _, product_id, _ = create_stocked_product("04", 5)
+    db_session.get(Product, product_id).current_stock = 3
+    db_session.commit()
+
+    assert StockReservationService.decrement_product_stock(db_session, {product_id: 2})
+    db_session.commit()
+    assert not StockReservationService.decrement_product_stock(db_session, {product_id: 2})
+    db_session.rollback()
+    db_session.expire_all()
+    assert db_session.get(Product, product_id).current_stock == 1
+
+    ok, _ = StockReservationService.hold_stock(
+        db_session, shop_id, "cart-long", [(product_id, 1)], ttl_minutes=24 * 60)
+    assert ok
+    hold = db_session.query(StockReservation).filter(
+        StockReservation.hold_key == "cart-long").one()
+    assert hold.expires_at < datetime.utcnow() + timedelta(minutes=16)